@@ -5,35 +5,41 @@ import { Toaster } from "@/components/ui/toaster";
 import { TooltipProvider } from "@/components/ui/tooltip";
 import { CookieBanner } from "@/components/ui/cookie-banner";
 import { Footer } from "@/components/ui/footer";
+import { PageErrorBoundary } from "@/components/ui/page-error-boundary";
 import { UserProvider, useUser } from "@/hooks/use-user";
 import { SupabaseAuthProvider } from "@/hooks/use-supabase-auth";
 import { CookieConsentProvider } from "@/hooks/use-cookie-preferences";
 import { LandingHeader } from "@/components/layout/landing-header";
 import { ProtectedHeader } from "@/components/layout/protected-header";
 import Landing from "@/pages/landing";
-import Dashboard from "@/pages/dashboard";
-import LoginSupabase from "@/pages/login-supabase";
-import RegisterSupabase from "@/pages/register-supabase";
-import ForgotPassword from "@/pages/forgot-password";
-import ResetPassword from "@/pages/reset-password";
-import Profile from "@/pages/profile";
-import Billing from "@/pages/billing";
-import Support from "@/pages/support";
-import Checkout from "@/pages/checkout";
-import PaymentSuccess from "@/pages/payment-success";
-import Analyses from "@/pages/analyses";
-import AnalysisDetails from "@/pages/analysis-details";
-import Trash from "@/pages/trash";
-import BatchProcessing from "@/pages/batch";
-import Admin from "@/pages/admin";
-import PrivacyPolicy from "@/pages/privacy-policy";
-import CookiePolicy from "@/pages/cookie-policy";
-import TermsOfService from "@/pages/terms-of-service";
-import Contact from "@/pages/contact";
 import NotFound from "@/pages/not-found";
-import { useEffect } from "react";
+import { Suspense, useEffect } from "react";
+import { lazyPage, listenForNavigationIntent } from "@/lib/lazy-pages";
 import { debugEnvironment, testSupabaseConnection } from "@/lib/debug";
 
+// Every page but the landing page is its own chunk, so a visitor only downloads
+// the pages they open (the landing page stays in the entry chunk as the most
+// common first page)
+const LoginSupabase = lazyPage("/login", () => import("@/pages/login-supabase"));
+const RegisterSupabase = lazyPage("/register", () => import("@/pages/register-supabase"));
+const ForgotPassword = lazyPage("/forgot-password", () => import("@/pages/forgot-password"));
+const ResetPassword = lazyPage("/reset-password", () => import("@/pages/reset-password"));
+const Dashboard = lazyPage("/dashboard", () => import("@/pages/dashboard"));
+const Profile = lazyPage("/profile", () => import("@/pages/profile"));
+const Billing = lazyPage("/billing", () => import("@/pages/billing"));
+const Support = lazyPage("/support", () => import("@/pages/support"));
+const Checkout = lazyPage("/checkout", () => import("@/pages/checkout"));
+const PaymentSuccess = lazyPage("/payment-success", () => import("@/pages/payment-success"));
+const AnalysisDetails = lazyPage("/analyses/:id", () => import("@/pages/analysis-details"));
+const Analyses = lazyPage("/analyses", () => import("@/pages/analyses"));
+const Trash = lazyPage("/trash", () => import("@/pages/trash"));
+const BatchProcessing = lazyPage("/batch", () => import("@/pages/batch"));
+const Admin = lazyPage("/admin", () => import("@/pages/admin"));
+const PrivacyPolicy = lazyPage("/privacy-policy", () => import("@/pages/privacy-policy"));
+const CookiePolicy = lazyPage("/cookie-policy", () => import("@/pages/cookie-policy"));
+const TermsOfService = lazyPage("/terms-of-service", () => import("@/pages/terms-of-service"));
+const Contact = lazyPage("/contact", () => import("@/pages/contact"));
+
 // Debug em produção
 function DebugComponent() {
   useEffect(() => {
@@ -83,34 +89,51 @@ function Header() {
   return null;
 }
 
+function PageLoading() {
+  return (
+    <div className="min-h-[60vh] flex items-center justify-center">
+      <div className="animate-spin w-8 h-8 border-4 border-primary border-t-transparent rounded-full" />
+    </div>
+  );
+}
+
 function Router() {
+  const [location] = useLocation();
+
+  // Start fetching a page's chunk as soon as the user shows intent to open it
+  useEffect(() => listenForNavigationIntent(), []);
+
   return (
     <div className="min-h-screen flex flex-col">
       <Header />
       <main className="flex-1">
-        <Switch>
-          <Route path="/" component={Landing} />
-          <Route path="/login" component={LoginSupabase} />
-          <Route path="/register" component={RegisterSupabase} />
-          <Route path="/forgot-password" component={ForgotPassword} />
-          <Route path="/reset-password" component={ResetPassword} />
-          <Route path="/dashboard" component={Dashboard} />
-          <Route path="/profile" component={Profile} />
-          <Route path="/billing" component={Billing} />
-          <Route path="/support" component={Support} />
-          <Route path="/checkout" component={Checkout} />
-          <Route path="/payment-success" component={PaymentSuccess} />
-          <Route path="/analyses/:id" component={AnalysisDetails} />
-          <Route path="/analyses" component={Analyses} />
-          <Route path="/trash" component={Trash} />
-          <Route path="/batch" component={BatchProcessing} />
-          <Route path="/admin" component={Admin} />
-          <Route path="/privacy-policy" component={PrivacyPolicy} />
-          <Route path="/cookie-policy" component={CookiePolicy} />
-          <Route path="/terms-of-service" component={TermsOfService} />
-          <Route path="/contact" component={Contact} />
-          <Route component={NotFound} />
-        </Switch>
+        <PageErrorBoundary resetKey={location}>
+          <Suspense fallback={<PageLoading />}>
+            <Switch>
+              <Route path="/" component={Landing} />
+              <Route path="/login" component={LoginSupabase} />
+              <Route path="/register" component={RegisterSupabase} />
+              <Route path="/forgot-password" component={ForgotPassword} />
+              <Route path="/reset-password" component={ResetPassword} />
+              <Route path="/dashboard" component={Dashboard} />
+              <Route path="/profile" component={Profile} />
+              <Route path="/billing" component={Billing} />
+              <Route path="/support" component={Support} />
+              <Route path="/checkout" component={Checkout} />
+              <Route path="/payment-success" component={PaymentSuccess} />
+              <Route path="/analyses/:id" component={AnalysisDetails} />
+              <Route path="/analyses" component={Analyses} />
+              <Route path="/trash" component={Trash} />
+              <Route path="/batch" component={BatchProcessing} />
+              <Route path="/admin" component={Admin} />
+              <Route path="/privacy-policy" component={PrivacyPolicy} />
+              <Route path="/cookie-policy" component={CookiePolicy} />
+              <Route path="/terms-of-service" component={TermsOfService} />
+              <Route path="/contact" component={Contact} />
+              <Route component={NotFound} />
+            </Switch>
+          </Suspense>
+        </PageErrorBoundary>
       </main>
       <Footer />
       <CookieBanner />
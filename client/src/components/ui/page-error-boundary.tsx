@@ -0,0 +1,56 @@
+import { Component, type ErrorInfo, type ReactNode } from "react";
+import { Button } from "@/components/ui/button";
+
+interface PageErrorBoundaryProps {
+  // Changing it (e.g. navigating elsewhere) clears the error
+  resetKey: string;
+  children: ReactNode;
+}
+
+interface PageErrorBoundaryState {
+  error: Error | null;
+}
+
+/**
+ * Keeps a page that failed to render, typically a chunk that could not be
+ * downloaded (offline, or an old asset gone after a deploy), from blanking the
+ * whole app: the header and footer stay and the user can retry or reload.
+ */
+export class PageErrorBoundary extends Component<PageErrorBoundaryProps, PageErrorBoundaryState> {
+  state: PageErrorBoundaryState = { error: null };
+
+  static getDerivedStateFromError(error: Error): PageErrorBoundaryState {
+    return { error };
+  }
+
+  componentDidCatch(error: Error, info: ErrorInfo) {
+    console.error("❌ Page failed to render:", error, info.componentStack);
+  }
+
+  componentDidUpdate(prevProps: PageErrorBoundaryProps) {
+    if (this.state.error && prevProps.resetKey !== this.props.resetKey) {
+      this.setState({ error: null });
+    }
+  }
+
+  render() {
+    if (!this.state.error) return this.props.children;
+
+    return (
+      <div className="min-h-[60vh] flex flex-col items-center justify-center gap-4 px-4 text-center">
+        <h2 className="text-xl font-semibold">Não foi possível carregar esta página</h2>
+        <p className="text-muted-foreground max-w-md">
+          Verifique sua conexão e tente novamente. Se o problema continuar, recarregue para obter a versão mais recente.
+        </p>
+        <div className="flex gap-2">
+          <Button variant="outline" onClick={() => this.setState({ error: null })}>
+            Tentar novamente
+          </Button>
+          <Button onClick={() => window.location.reload()}>
+            Recarregar
+          </Button>
+        </div>
+      </div>
+    );
+  }
+}
@@ -0,0 +1,88 @@
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { getAuthHeaders } from '@/lib/queryClient';
+import { config } from '@/lib/config';
+import type { BatchJob } from '@shared/schema';
+
+interface BatchProgressEvent {
+  type: 'document' | 'progress' | 'status';
+  batchJobId: string;
+  status?: string;
+  processedDocuments?: number;
+  failedDocuments?: number;
+  totalDocuments?: number;
+  progressPercentage?: number;
+}
+
+const TERMINAL_STATUSES = ['completed', 'completed_with_errors', 'failed', 'cancelled'];
+const RECONNECT_DELAY_MS = 3000;
+
+// Subscribe to the server's batch progress stream (SSE over fetch, so the
+// Authorization header can be sent) and apply updates to the query cache
+export function useBatchEvents(enabled: boolean = true) {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    if (!enabled) return;
+
+    const controller = new AbortController();
+    let reconnectTimer: ReturnType<typeof setTimeout> | undefined;
+
+    const applyEvent = (event: BatchProgressEvent) => {
+      if (event.type === 'document') return;
+
+      queryClient.setQueryData<BatchJob[]>(['/api/batch/jobs'], jobs => jobs?.map(job => job.id === event.batchJobId ? {
+        ...job,
+        ...(event.status ? { status: event.status } : {}),
+        ...(event.processedDocuments !== undefined ? { processedDocuments: event.processedDocuments } : {}),
+        ...(event.failedDocuments !== undefined ? { failedDocuments: event.failedDocuments } : {}),
+      } : job));
+
+      if (event.status && TERMINAL_STATUSES.includes(event.status)) {
+        queryClient.invalidateQueries({ queryKey: ['/api/batch/jobs'] });
+        queryClient.invalidateQueries({ queryKey: ['/api/batch/statistics'] });
+      }
+    };
+
+    const connect = async () => {
+      try {
+        const res = await fetch(`${config.api.baseUrl}/api/batch/events`, {
+          headers: { ...(await getAuthHeaders()), Accept: 'text/event-stream' },
+          signal: controller.signal,
+        });
+        if (!res.ok || !res.body) {
+          throw new Error(`${res.status}: ${res.statusText}`);
+        }
+
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = '';
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+
+          buffer += value;
+          const frames = buffer.split('\n\n');
+          buffer = frames.pop() || '';
+          for (const frame of frames) {
+            const data = frame.split('\n').filter(line => line.startsWith('data: ')).map(line => line.slice(6)).join('\n');
+            if (data) applyEvent(JSON.parse(data));
+          }
+        }
+      } catch (error) {
+        if (controller.signal.aborted) return;
+        console.error('Batch events stream error:', error);
+      }
+
+      if (!controller.signal.aborted) {
+        reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+      }
+    };
+
+    connect();
+
+    return () => {
+      controller.abort();
+      if (reconnectTimer) clearTimeout(reconnectTimer);
+    };
+  }, [enabled, queryClient]);
+}
@@ -0,0 +1,77 @@
+import { useQuery, useQueryClient, type QueryKey } from '@tanstack/react-query';
+import { getAuthHeaders } from '@/lib/queryClient';
+import { config } from '@/lib/config';
+
+// Query each /api/bootstrap section is served under elsewhere in the app
+export const BOOTSTRAP_QUERY_KEYS: Record<string, QueryKey> = {
+  profile: ['/api/user/profile'],
+  aiProviderConfigs: ['/api/ai-provider-configs'],
+  templates: ['/api/templates'],
+  recentAnalyses: ['/api/analyses', { limit: 5 }],
+  notifications: ['/api/notifications/unread'],
+};
+
+interface BootstrapSection {
+  etag?: string;
+  notModified?: boolean;
+  data?: unknown;
+  error?: string;
+}
+
+// Last ETag seen per section, sent back so unchanged sections come without data
+const sectionEtags = new Map<string, string>();
+
+// Load the dashboard's initial data in one request and seed the query cache with
+// it, so the page's own queries start out fresh instead of each hitting the API.
+// Sections that failed (or the whole request failing) are left to those queries.
+export function useBootstrap(enabled: boolean) {
+  const queryClient = useQueryClient();
+
+  return useQuery({
+    queryKey: ['/api/bootstrap'],
+    enabled,
+    retry: false,
+    queryFn: async () => {
+      const cachedEtags = Object.keys(BOOTSTRAP_QUERY_KEYS)
+        .filter(name => sectionEtags.has(name) && queryClient.getQueryData(BOOTSTRAP_QUERY_KEYS[name]) !== undefined)
+        .map(name => sectionEtags.get(name)!);
+
+      const res = await fetch(`${config.api.baseUrl}/api/bootstrap`, {
+        headers: {
+          ...(await getAuthHeaders()),
+          ...(cachedEtags.length > 0 ? { 'If-None-Match': cachedEtags.join(', ') } : {}),
+        },
+        cache: 'no-store',
+      });
+
+      const seeded: string[] = [];
+      if (res.status === 304) {
+        // Nothing changed: mark what is cached as fresh again
+        for (const name of Object.keys(BOOTSTRAP_QUERY_KEYS)) {
+          const key = BOOTSTRAP_QUERY_KEYS[name];
+          queryClient.setQueryData(key, queryClient.getQueryData(key));
+          seeded.push(name);
+        }
+        return seeded;
+      }
+      if (!res.ok) {
+        throw new Error(`${res.status}: ${res.statusText}`);
+      }
+
+      const { sections } = await res.json() as { sections: Record<string, BootstrapSection> };
+      for (const [name, section] of Object.entries(sections)) {
+        const key = BOOTSTRAP_QUERY_KEYS[name];
+        if (!key || section.error) continue;
+
+        if (section.notModified) {
+          queryClient.setQueryData(key, queryClient.getQueryData(key));
+        } else {
+          queryClient.setQueryData(key, section.data);
+        }
+        if (section.etag) sectionEtags.set(name, section.etag);
+        seeded.push(name);
+      }
+      return seeded;
+    },
+  });
+}
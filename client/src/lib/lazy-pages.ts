@@ -0,0 +1,101 @@
+import { createElement, lazy, type ComponentType } from "react";
+
+type PageModule = { default: ComponentType<any> };
+
+// Route pattern (as used in <Route path>) -> loader of its page chunk
+const loaders = new Map<string, () => Promise<PageModule>>();
+
+// Downloads a page chunk gets before the failure reaches PageErrorBoundary
+const LOAD_ATTEMPTS = 3;
+const RETRY_DELAY_MS = 500;
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * A route's page, split into its own chunk and loaded the first time the route
+ * renders, or earlier when prefetchRoute sees intent to navigate to it.
+ */
+export function lazyPage(path: string, load: () => Promise<PageModule>): ComponentType<any> {
+  let loading: Promise<PageModule> | null = null;
+  const loadOnce = () => {
+    if (!loading) {
+      // Allow a retry after a failed download (flaky mobile connection)
+      loading = load().catch(error => {
+        loading = null;
+        throw error;
+      });
+    }
+    return loading;
+  };
+
+  const loadWithRetry = async (): Promise<PageModule> => {
+    for (let attempt = 1; ; attempt++) {
+      try {
+        return await loadOnce();
+      } catch (error) {
+        if (attempt >= LOAD_ATTEMPTS) throw error;
+        await sleep(RETRY_DELAY_MS * attempt);
+      }
+    }
+  };
+
+  // React.lazy keeps a rejected import forever, so after a failure the next
+  // render (the error boundary's retry) gets a fresh lazy component
+  const createLazy = () => lazy(async () => {
+    try {
+      return await loadWithRetry();
+    } catch (error) {
+      component = createLazy();
+      throw error;
+    }
+  });
+  let component = createLazy();
+
+  loaders.set(path, loadOnce);
+  return function LazyPage(props: any) {
+    return createElement(component, props);
+  };
+}
+
+function matches(pattern: string, pathname: string): boolean {
+  const patternParts = pattern.split("/");
+  const pathParts = pathname.split("/");
+  return patternParts.length === pathParts.length &&
+    patternParts.every((part, i) => part.startsWith(":") ? pathParts[i] !== "" : part === pathParts[i]);
+}
+
+// Start downloading the page chunk for an in-app URL; resolves once it is loaded
+// (or right away for URLs without a lazy page, including external ones)
+export function prefetchRoute(href: string): Promise<void> {
+  const url = new URL(href, window.location.origin);
+  if (url.origin !== window.location.origin) return Promise.resolve();
+
+  let load = loaders.get(url.pathname);
+  if (!load) {
+    load = Array.from(loaders.entries()).find(([pattern]) => matches(pattern, url.pathname))?.[1];
+  }
+  // A failed prefetch is not an error; rendering the route retries the download
+  return load ? load().then(() => {}, () => {}) : Promise.resolve();
+}
+
+// Prefetch when the pointer rests on, keyboard focuses or a finger touches an in-app link
+export function listenForNavigationIntent(): () => void {
+  const connection = (navigator as any).connection;
+  if (connection?.saveData) return () => {};
+
+  const onIntent = (event: Event) => {
+    const anchor = (event.target as Element | null)?.closest?.("a[href]") as HTMLAnchorElement | null;
+    if (anchor && !anchor.target && !anchor.hasAttribute("download")) {
+      void prefetchRoute(anchor.href);
+    }
+  };
+
+  document.addEventListener("pointerover", onIntent, { passive: true });
+  document.addEventListener("focusin", onIntent, { passive: true });
+  document.addEventListener("touchstart", onIntent, { passive: true });
+  return () => {
+    document.removeEventListener("pointerover", onIntent);
+    document.removeEventListener("focusin", onIntent);
+    document.removeEventListener("touchstart", onIntent);
+  };
+}
@@ -11,7 +11,7 @@ async function throwIfResNotOk(res: Response) {
 }
 
 // Helper function to get authorization headers
-async function getAuthHeaders(): Promise<Record<string, string>> {
+export async function getAuthHeaders(): Promise<Record<string, string>> {
   try {
     const { data: { session }, error } = await supabase.auth.getSession();
     
@@ -34,10 +34,24 @@ async function getAuthHeaders(): Promise<Record<string, string>> {
   }
 }
 
+// Idempotency keys are tied to the request payload object so automatic
+// mutation retries of the same submission reuse the same key
+const idempotencyKeys = new WeakMap<object, string>();
+
+export function getIdempotencyKey(data: object): string {
+  let key = idempotencyKeys.get(data);
+  if (!key) {
+    key = crypto.randomUUID();
+    idempotencyKeys.set(data, key);
+  }
+  return key;
+}
+
 export async function apiRequest(
   method: string,
   url: string,
   data?: unknown | undefined,
+  options?: { idempotencyKey?: string },
 ): Promise<Response> {
   // Handle FormData differently - don't JSON stringify or set Content-Type
   const isFormData = data instanceof FormData;
@@ -51,6 +65,7 @@ export async function apiRequest(
   const headers = {
     ...authHeaders,
     ...(isFormData ? {} : (data ? { "Content-Type": "application/json" } : {})),
+    ...(options?.idempotencyKey ? { 'Idempotency-Key': options.idempotencyKey } : {}),
   };
   
   console.log(`API Request: ${method} ${fullUrl}`, {
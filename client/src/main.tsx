@@ -1,5 +1,12 @@
 import { createRoot } from "react-dom/client";
 import App from "./App";
+import { prefetchRoute } from "./lib/lazy-pages";
 import "./index.css";
 
-createRoot(document.getElementById("root")!).render(<App />);
+const container = document.getElementById("root")!;
+
+// Prerendered pages (landing, legal) show their static markup until the page's
+// chunk is loaded, so the first render replaces it without a loading spinner
+const pageReady = container.hasChildNodes() ? prefetchRoute(window.location.pathname) : Promise.resolve();
+
+pageReady.then(() => createRoot(container).render(<App />));
@@ -1473,7 +1473,7 @@ export default function Admin() {
     mutationFn: (testEmail: string) => 
       apiRequest("POST", "/api/admin/smtp-test", { testEmail }),
     onSuccess: () => {
-      toast({ title: "Sucesso", description: "E-mail de teste enviado com sucesso" });
+      toast({ title: "Sucesso", description: "Conexão SMTP verificada. E-mail de teste enfileirado para envio" });
     },
     onError: (error: any) => {
       toast({
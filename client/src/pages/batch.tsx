@@ -12,7 +12,8 @@ import { Progress } from "@/components/ui/progress";
 import { Badge } from "@/components/ui/badge";
 import { Separator } from "@/components/ui/separator";
 import { useToast } from "@/hooks/use-toast";
-import { apiRequest } from "@/lib/queryClient";
+import { apiRequest, getIdempotencyKey } from "@/lib/queryClient";
+import { useBatchEvents } from "@/hooks/use-batch-events";
 import type { BatchJob, BatchStatistics, Template } from "@shared/schema";
 import { Upload, FileText, X, Play, Calculator, AlertCircle, CheckCircle2, Clock, FileWarning } from "lucide-react";
 
@@ -23,6 +24,25 @@ interface BatchUploadFile {
   error?: string;
 }
 
+interface BatchSubmission {
+  fields: {
+    name: string;
+    description: string;
+    analysisType: string;
+    aiProvider: string;
+    aiModel: string;
+    templateId?: string;
+  };
+  files: BatchUploadFile[];
+}
+
+interface SignedUpload {
+  objectKey: string;
+  uploadUrl: string;
+  method: 'PUT';
+  headers: Record<string, string>;
+}
+
 
 export default function BatchProcessingPage() {
   const [selectedFiles, setSelectedFiles] = useState<BatchUploadFile[]>([]);
@@ -43,6 +63,9 @@ export default function BatchProcessingPage() {
     enabled: true
   });
 
+  // Live progress pushed by the server instead of polling
+  useBatchEvents();
+
   // Fetch templates for dropdown
   const { data: templates = [] } = useQuery<Template[]>({
     queryKey: ['/api/templates']
@@ -119,10 +142,46 @@ export default function BatchProcessingPage() {
     calculateCredits();
   };
 
-  // Create batch job mutation
+  // Create batch job mutation. Files go straight to object storage through
+  // signed URLs when the server offers them, otherwise through the API.
   const createBatchMutation = useMutation({
-    mutationFn: async (data: FormData) => {
-      return await apiRequest('POST', '/api/batch/create', data);
+    mutationFn: async (submission: BatchSubmission) => {
+      const idempotencyKey = getIdempotencyKey(submission);
+
+      let uploads: SignedUpload[] | null = null;
+      try {
+        const signResponse = await apiRequest('POST', '/api/uploads/sign', {
+          files: submission.files.map(({ file }) => ({ fileName: file.name, mimeType: file.type, size: file.size }))
+        });
+        uploads = (await signResponse.json()).uploads;
+      } catch (error: any) {
+        if (!String(error.message).startsWith('503')) throw error;
+      }
+
+      if (!uploads) {
+        const formData = new FormData();
+        Object.entries(submission.fields).forEach(([key, value]) => {
+          if (value) formData.append(key, value);
+        });
+        submission.files.forEach(({ file }) => formData.append('files', file));
+        return await apiRequest('POST', '/api/batch/create', formData, { idempotencyKey });
+      }
+
+      await Promise.all(submission.files.map(async ({ file, id }, index) => {
+        const upload = uploads![index];
+        setSelectedFiles(prev => prev.map(f => f.id === id ? { ...f, status: 'uploading' } : f));
+        const res = await fetch(upload.uploadUrl, { method: upload.method, headers: upload.headers, body: file });
+        if (!res.ok) {
+          setSelectedFiles(prev => prev.map(f => f.id === id ? { ...f, status: 'error', error: `Upload failed (${res.status})` } : f));
+          throw new Error(`Failed to upload ${file.name} (${res.status})`);
+        }
+        setSelectedFiles(prev => prev.map(f => f.id === id ? { ...f, status: 'completed' } : f));
+      }));
+
+      return await apiRequest('POST', '/api/batch/create-from-uploads', {
+        ...submission.fields,
+        uploads: submission.files.map(({ file }, index) => ({ objectKey: uploads![index].objectKey, fileName: file.name, mimeType: file.type }))
+      }, { idempotencyKey });
     },
     onSuccess: (result) => {
       toast({
@@ -179,21 +238,17 @@ export default function BatchProcessingPage() {
       return;
     }
 
-    const formData = new FormData();
-    formData.append('name', batchName);
-    formData.append('description', batchDescription);
-    formData.append('analysisType', analysisType);
-    formData.append('aiProvider', aiProvider);
-    formData.append('aiModel', aiModel);
-    if (templateId && templateId !== "no-template") {
-      formData.append('templateId', templateId);
-    }
-
-    selectedFiles.forEach(({ file }) => {
-      formData.append('files', file);
+    createBatchMutation.mutate({
+      fields: {
+        name: batchName,
+        description: batchDescription,
+        analysisType,
+        aiProvider,
+        aiModel,
+        templateId: templateId && templateId !== "no-template" ? templateId : undefined
+      },
+      files: selectedFiles
     });
-
-    createBatchMutation.mutate(formData);
   };
 
   const getStatusIcon = (status: string) => {
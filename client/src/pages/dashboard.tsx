@@ -12,9 +12,10 @@ import { FileUpload } from '@/components/ui/file-upload';
 import { AIProviderSelector } from '@/components/ui/ai-provider-selector';
 import { TemplateSelector } from '@/components/ui/template-selector';
 import { useSupabaseAuth } from '@/hooks/use-supabase-auth';
+import { useBootstrap } from '@/hooks/use-bootstrap';
 import { useToast } from '@/hooks/use-toast';
 import { useLocation } from 'wouter';
-import { apiRequest } from '@/lib/queryClient';
+import { apiRequest, getIdempotencyKey } from '@/lib/queryClient';
 import { FileText, AlertTriangle, Clock, Coins, Eye, CheckCircle, AlertCircle, TrendingUp } from 'lucide-react';
 import { Link, useLocation } from 'wouter';
 import type { AiProviderConfig } from '@shared/schema';
@@ -65,18 +66,23 @@ export default function Dashboard() {
   const [currentTab, setCurrentTab] = useState('upload');
 
   // ALL HOOKS MUST BE CALLED BEFORE ANY CONDITIONAL RETURNS
+  // One request seeds the queries below (and the provider/template selectors);
+  // they only fetch on their own for sections the bootstrap could not deliver
+  const bootstrap = useBootstrap(!!user);
+  const bootstrapSettled = bootstrap.isSuccess || bootstrap.isError;
+
   const { data: recentAnalyses = [], isLoading: analysesLoading } = useQuery<DocumentAnalysis[]>({
-    queryKey: ['/api/analyses'],
+    queryKey: ['/api/analyses', { limit: 5 }],
     queryFn: async () => {
       const response = await apiRequest('GET', '/api/analyses?limit=5');
       return response.json();
     },
-    enabled: !!user // Only run when user is authenticated
+    enabled: !!user && bootstrapSettled // Only run when user is authenticated
   });
 
   const { data: aiProviderConfigs = [] } = useQuery<AiProviderConfig[]>({
     queryKey: ['/api/ai-provider-configs'],
-    enabled: !!user // Only run when user is authenticated
+    enabled: !!user && bootstrapSettled // Only run when user is authenticated
   });
 
   // Load user profile data including credits
@@ -86,12 +92,12 @@ export default function Dashboard() {
       const response = await apiRequest('GET', '/api/user/profile');
       return response.json();
     },
-    enabled: !!user // Only run when user is authenticated
+    enabled: !!user && bootstrapSettled // Only run when user is authenticated
   });
 
   const analyzeDocumentMutation = useMutation({
     mutationFn: async (data: FormData) => {
-      const response = await apiRequest('POST', '/api/analyze', data);
+      const response = await apiRequest('POST', '/api/analyze', data, { idempotencyKey: getIdempotencyKey(data) });
       return response.json();
     },
     onSuccess: (data) => {
@@ -206,7 +212,7 @@ export default function Dashboard() {
 
   return (
     <div className="min-h-screen bg-background">
-      {loading ? (
+      {loading || (user && !bootstrapSettled) ? (
         <div className="min-h-screen flex items-center justify-center">
           <div className="animate-spin w-8 h-8 border-4 border-primary border-t-transparent rounded-full" />
         </div>
@@ -0,0 +1,64 @@
+#!/usr/bin/env node
+
+// Fails the build when the JS needed to render the first page, any single lazy
+// chunk or the CSS grows past the budgets in bundle-budget.json. Sizes are
+// brotli-compressed, which is what browsers download.
+
+import fs from 'fs';
+import path from 'path';
+import zlib from 'zlib';
+
+const distPath = path.resolve('dist/public');
+const budget = JSON.parse(fs.readFileSync(path.resolve('bundle-budget.json'), 'utf-8'));
+const manifest = JSON.parse(fs.readFileSync(path.join(distPath, '.vite', 'manifest.json'), 'utf-8'));
+
+const sizeCache = new Map();
+function compressedKb(file) {
+  if (!sizeCache.has(file)) {
+    const input = fs.readFileSync(path.join(distPath, file));
+    sizeCache.set(file, zlib.brotliCompressSync(input).length / 1024);
+  }
+  return sizeCache.get(file);
+}
+
+// Chunks the browser loads before the entry can run: the entry and its static imports, transitively
+function staticClosure(key, seen = new Set()) {
+  if (seen.has(key)) return seen;
+  seen.add(key);
+  for (const imported of manifest[key].imports || []) staticClosure(imported, seen);
+  return seen;
+}
+
+const failures = [];
+const entryKey = Object.keys(manifest).find(key => manifest[key].isEntry);
+const initialChunks = staticClosure(entryKey);
+
+const initialKb = Array.from(initialChunks).reduce((total, key) => total + compressedKb(manifest[key].file), 0);
+console.log(`📦 Initial JS: ${initialKb.toFixed(1)} KB (budget ${budget.initialJsKb} KB)`);
+if (initialKb > budget.initialJsKb) {
+  failures.push(`initial JS is ${initialKb.toFixed(1)} KB, budget ${budget.initialJsKb} KB`);
+}
+
+const cssFiles = new Set();
+for (const chunk of Object.values(manifest)) {
+  for (const css of chunk.css || []) cssFiles.add(css);
+  if (!chunk.file.endsWith('.js')) continue;
+
+  const kb = compressedKb(chunk.file);
+  if (kb > budget.chunkJsKb) {
+    failures.push(`${chunk.file} is ${kb.toFixed(1)} KB, budget ${budget.chunkJsKb} KB`);
+  }
+}
+
+const cssKb = Array.from(cssFiles).reduce((total, file) => total + compressedKb(file), 0);
+console.log(`🎨 CSS: ${cssKb.toFixed(1)} KB (budget ${budget.cssKb} KB)`);
+if (cssKb > budget.cssKb) {
+  failures.push(`CSS is ${cssKb.toFixed(1)} KB, budget ${budget.cssKb} KB`);
+}
+
+if (failures.length > 0) {
+  console.error('❌ Bundle budget exceeded:');
+  for (const failure of failures) console.error(`   - ${failure}`);
+  process.exit(1);
+}
+console.log('✅ Bundle within budget');
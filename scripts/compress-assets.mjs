@@ -0,0 +1,48 @@
+#!/usr/bin/env node
+
+// Writes .br and .gz siblings next to the built text assets, compressed once at
+// maximum level, so the server sends them as-is instead of compressing per request.
+
+import fs from 'fs';
+import path from 'path';
+import zlib from 'zlib';
+
+const distPath = path.resolve('dist/public');
+const COMPRESSIBLE = new Set(['.html', '.js', '.css', '.json', '.svg', '.txt', '.xml', '.webmanifest']);
+// Below this the headers outweigh the savings
+const MIN_BYTES = 1024;
+
+function* walk(dir) {
+  for (const entry of fs.readdirSync(dir, { withFileTypes: true })) {
+    const full = path.join(dir, entry.name);
+    if (entry.isDirectory()) yield* walk(full);
+    else yield full;
+  }
+}
+
+let files = 0;
+let originalBytes = 0;
+let brotliBytes = 0;
+
+for (const file of walk(distPath)) {
+  if (!COMPRESSIBLE.has(path.extname(file))) continue;
+  const input = fs.readFileSync(file);
+  if (input.length < MIN_BYTES) continue;
+
+  const brotli = zlib.brotliCompressSync(input, {
+    params: {
+      [zlib.constants.BROTLI_PARAM_MODE]: zlib.constants.BROTLI_MODE_TEXT,
+      [zlib.constants.BROTLI_PARAM_QUALITY]: zlib.constants.BROTLI_MAX_QUALITY,
+      [zlib.constants.BROTLI_PARAM_SIZE_HINT]: input.length,
+    },
+  });
+  const gzip = zlib.gzipSync(input, { level: zlib.constants.Z_BEST_COMPRESSION });
+
+  fs.writeFileSync(`${file}.br`, brotli);
+  fs.writeFileSync(`${file}.gz`, gzip);
+  files++;
+  originalBytes += input.length;
+  brotliBytes += brotli.length;
+}
+
+console.log(`🗜️  Precompressed ${files} files: ${(originalBytes / 1024).toFixed(0)} KB -> ${(brotliBytes / 1024).toFixed(0)} KB brotli`);
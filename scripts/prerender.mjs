@@ -0,0 +1,86 @@
+#!/usr/bin/env node
+
+// Snapshots the public, data-independent pages of the built SPA into static HTML
+// so they paint before the JS bundle arrives. The untouched shell is kept as
+// app.html and serves every other route.
+
+import fs from 'fs';
+import http from 'http';
+import path from 'path';
+
+const distPath = path.resolve('dist/public');
+const ROUTES = ['/', '/privacy-policy', '/cookie-policy', '/terms-of-service'];
+const CONTENT_TYPES = {
+  '.html': 'text/html; charset=utf-8',
+  '.js': 'text/javascript',
+  '.css': 'text/css',
+  '.json': 'application/json',
+  '.svg': 'image/svg+xml',
+  '.png': 'image/png',
+  '.ico': 'image/x-icon',
+  '.woff2': 'font/woff2',
+};
+
+const shell = fs.readFileSync(path.join(distPath, 'index.html'), 'utf-8');
+fs.writeFileSync(path.join(distPath, 'app.html'), shell);
+
+// Serves the build like production does, with app.html for unknown routes
+function startServer() {
+  const server = http.createServer((req, res) => {
+    const pathname = decodeURIComponent(new URL(req.url, 'http://localhost').pathname);
+    let file = path.join(distPath, pathname);
+    if (!file.startsWith(distPath) || !fs.existsSync(file) || fs.statSync(file).isDirectory()) {
+      file = path.join(distPath, 'app.html');
+    }
+    res.writeHead(200, { 'Content-Type': CONTENT_TYPES[path.extname(file)] || 'application/octet-stream' });
+    fs.createReadStream(file).pipe(res);
+  });
+  return new Promise(resolve => server.listen(0, '127.0.0.1', () => resolve(server)));
+}
+
+function outputFile(route) {
+  return route === '/' ? path.join(distPath, 'index.html') : path.join(distPath, route.slice(1), 'index.html');
+}
+
+let browser;
+try {
+  const { chromium } = await import('@playwright/test');
+  browser = await chromium.launch();
+} catch (error) {
+  console.warn(`⚠️  Skipping prerender, no headless browser available: ${error.message.split('\n')[0]}`);
+  process.exit(0);
+}
+
+const server = await startServer();
+const origin = `http://127.0.0.1:${server.address().port}`;
+const prerendered = [];
+
+try {
+  for (const route of ROUTES) {
+    const page = await browser.newPage();
+    // Consent already given, so the cookie banner is not part of the snapshot
+    await page.addInitScript(() => {
+      localStorage.setItem('cookie_preferences', JSON.stringify({
+        essential: true, functional: false, analytics: false, timestamp: new Date().toISOString(), version: '1.0',
+      }));
+    });
+    await page.goto(origin + route, { waitUntil: 'load' });
+    await page.waitForSelector('#root > *');
+    // Give data the page asks for (e.g. public stats) a moment, without depending on it
+    await page.waitForLoadState('networkidle', { timeout: 5000 }).catch(() => {});
+
+    const markup = await page.$eval('#root', root => root.innerHTML);
+    await page.close();
+
+    const file = outputFile(route);
+    fs.mkdirSync(path.dirname(file), { recursive: true });
+    fs.writeFileSync(file, shell.replace('<div id="root"></div>', `<div id="root">${markup}</div>`));
+    prerendered.push(route);
+    console.log(`✅ Prerendered ${route} (${(Buffer.byteLength(markup) / 1024).toFixed(1)} KB)`);
+  }
+} finally {
+  await browser.close();
+  server.close();
+}
+
+fs.writeFileSync(path.join(distPath, 'prerendered.json'), JSON.stringify(prerendered, null, 2));
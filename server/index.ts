@@ -9,8 +9,13 @@ import { setupVite, serveStatic, log } from "./vite";
 import bcrypt from "bcrypt";
 import { storage } from "./storage";
 import { validateEncryptionStartup } from "./lib/encryption";
+import { secretRotation } from "./services/secretRotation";
+import { emailService } from "./services/email";
+import { stripeEventProcessor } from "./services/stripeEvents";
+import { maintenance } from "./services/maintenance";
+import { registerCleanupJobs } from "./services/cleanupJobs";
+import { tempFiles, UPLOAD_DIRECTORIES } from "./services/tempFiles";
 import fs from "fs";
-import path from "path";
 
 const app = express();
 
@@ -24,12 +29,16 @@ app.use(cors({
   ],
   credentials: true,
   methods: ['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'],
-  allowedHeaders: ['Content-Type', 'Authorization', 'X-Requested-With']
+  allowedHeaders: ['Content-Type', 'Authorization', 'X-Requested-With', 'Idempotency-Key'],
+  exposedHeaders: ['Idempotent-Replayed']
 }));
 
 // SECURITY: Set body size limits to prevent payload attacks
 // Regular JSON requests limited to 50MB for batch metadata
-app.use(express.json({ limit: '50mb' }));
+// Stripe webhooks need the raw body for signature verification (express.raw on the route)
+const STRIPE_WEBHOOK_PATHS = new Set(['/api/webhooks/stripe', '/api/stripe-webhook']);
+const jsonParser = express.json({ limit: '50mb' });
+app.use((req, res, next) => STRIPE_WEBHOOK_PATHS.has(req.path) ? next() : jsonParser(req, res, next));
 app.use(express.urlencoded({ extended: false, limit: '50mb' }));
 
 app.use((req, res, next) => {
@@ -64,9 +73,7 @@ app.use((req, res, next) => {
 
 // SECURITY FIX: Ensure upload directories exist on startup
 async function createUploadDirectories() {
-  const uploadDirs = ['/tmp/uploads', '/tmp/batch-uploads'];
-  
-  for (const dir of uploadDirs) {
+  for (const dir of UPLOAD_DIRECTORIES) {
     try {
       await fs.promises.mkdir(dir, { recursive: true });
       log(`✅ Upload directory ensured: ${dir}`);
@@ -77,64 +84,6 @@ async function createUploadDirectories() {
   }
 }
 
-// SECURITY FIX: Periodic cleanup of orphaned temporary files
-async function cleanupOrphanedFiles() {
-  const uploadDirs = ['/tmp/uploads', '/tmp/batch-uploads'];
-  const maxAge = 24 * 60 * 60 * 1000; // 24 hours
-  
-  for (const dir of uploadDirs) {
-    try {
-      const files = await fs.promises.readdir(dir);
-      const now = Date.now();
-      
-      for (const file of files) {
-        const filePath = path.join(dir, file);
-        try {
-          const stats = await fs.promises.stat(filePath);
-          const age = now - stats.mtime.getTime();
-          
-          if (age > maxAge) {
-            await fs.promises.unlink(filePath);
-            log(`🗑️ Cleaned up orphaned file: ${filePath}`);
-          }
-        } catch (fileError: any) {
-          // File might have been deleted already, ignore
-          if (fileError.code !== 'ENOENT') {
-            log(`⚠️ Error checking file ${filePath}: ${fileError.message}`);
-          }
-        }
-      }
-    } catch (dirError: any) {
-      if (dirError.code !== 'ENOENT') {
-        log(`⚠️ Error cleaning directory ${dir}: ${dirError.message}`);
-      }
-    }
-  }
-}
-
-// Start periodic cleanup every hour
-setInterval(cleanupOrphanedFiles, 60 * 60 * 1000);
-// Run initial cleanup after 5 minutes
-setTimeout(cleanupOrphanedFiles, 5 * 60 * 1000);
-
-// Automatic cleanup of deleted analyses older than 7 days
-async function cleanupExpiredAnalyses() {
-  try {
-    const deletedCount = await storage.cleanupExpiredAnalyses();
-    if (deletedCount > 0) {
-      log(`🗑️ Cleaned up ${deletedCount} expired analysis/analyses from trash`);
-    }
-  } catch (error: any) {
-    log(`❌ Error during analysis cleanup: ${error.message}`);
-  }
-}
-
-// Run analysis cleanup daily at 2 AM (if server is running continuously)
-// Otherwise run every 24 hours from server start
-setInterval(cleanupExpiredAnalyses, 24 * 60 * 60 * 1000); // 24 hours
-// Run initial cleanup after 10 minutes
-setTimeout(cleanupExpiredAnalyses, 10 * 60 * 1000);
-
 // Secure admin user creation function
 async function createInitialAdminUser() {
   try {
@@ -179,14 +128,6 @@ async function createInitialAdminUser() {
   // SECURITY FIX: Create upload directories before routes registration
   await createUploadDirectories();
   
-  // SECURITY: Perform one-time migration after encryption validation
-  try {
-    await storage.performOneTimeMigration();
-  } catch (error) {
-    log(`❌ CRITICAL: Security migration failed: ${error}`);
-    process.exit(1);
-  }
-  
   const server = await registerRoutes(app);
   
   // Create initial admin user if needed
@@ -216,5 +157,22 @@ async function createInitialAdminUser() {
   const port = parseInt(process.env.PORT || '3000', 10);
   server.listen(port, () => {
     log(`serving on port ${port}`);
+
+    // SECURITY: Re-encrypt stored secrets with the current key in the background
+    secretRotation.start().catch(error => log(`❌ Secret re-encryption failed: ${error}`));
+
+    // Deliver queued email in the background
+    emailService.start();
+
+    // Apply stored Stripe webhook events in the background
+    stripeEventProcessor.start();
+
+    // Trash purge and orphaned upload sweep, throttled in small batches
+    registerCleanupJobs();
+    maintenance.start();
+    // Uploads left behind by a previous process join the sweep
+    tempFiles.adoptExisting()
+      .then(adopted => adopted > 0 && log(`🗂️ Tracking ${adopted} leftover upload file(s) for cleanup`))
+      .catch(error => log(`⚠️ Failed to scan upload directories: ${error.message}`));
   });
 })();
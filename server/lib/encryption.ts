@@ -7,12 +7,42 @@ const IV_LENGTH = 12; // 96 bits for GCM (recommended)
 const TAG_LENGTH = 16; // 128 bits for GCM auth tag
 
 // Versioning for migration support
-const CURRENT_VERSION = 'v2_gcm';
+// v3 values carry the id of the keyring key that encrypted them: v3:<keyId>:base64(iv:ciphertext:authTag)
+const CURRENT_VERSION = 'v3';
+const SINGLE_KEY_VERSION = 'v2_gcm'; // Always encrypted with ENCRYPTION_KEY
 const LEGACY_VERSION = 'v1_cbc';
 
-// Get encryption key from environment variable
-function getEncryptionKey(): Buffer {
+// Keyring id of ENCRYPTION_KEY itself
+const PRIMARY_KEY_ID = 'primary';
+
+interface Keyring {
+  keys: Map<string, Buffer>;
+  currentKeyId: string;
+}
+
+// Derived keyring, memoized per configuration so hashing runs once per process
+let keyringCache: { signature: string; keyring: Keyring } | null = null;
+
+/**
+ * Keyring from the environment:
+ * - ENCRYPTION_KEY is always present as key id "primary" (and decrypts v2_gcm values)
+ * - ENCRYPTION_KEYS adds versioned keys as "id:secret,id:secret"
+ * - ENCRYPTION_CURRENT_KEY_ID picks the key used for new encryptions
+ *   (default: the last key in ENCRYPTION_KEYS, or "primary")
+ *
+ * Rotating means adding a key, pointing ENCRYPTION_CURRENT_KEY_ID at it and
+ * letting the re-encryption job rewrite stored secrets; old keys can be
+ * removed once it reports nothing left to re-encrypt.
+ */
+function getKeyring(): Keyring {
   const keyString = process.env.ENCRYPTION_KEY;
+  const extraKeys = process.env.ENCRYPTION_KEYS || '';
+  const currentKeyIdSetting = process.env.ENCRYPTION_CURRENT_KEY_ID || '';
+  const signature = `${keyString}\n${extraKeys}\n${currentKeyIdSetting}`;
+  if (keyringCache && keyringCache.signature === signature) {
+    return keyringCache.keyring;
+  }
+
   if (!keyString) {
     throw new Error('ENCRYPTION_KEY environment variable is required for API key encryption');
   }
@@ -21,22 +51,67 @@ function getEncryptionKey(): Buffer {
   if (keyString.length < 32) {
     throw new Error('ENCRYPTION_KEY must be at least 32 characters long for security');
   }
-  
-  // Create a consistent 32-byte key from the environment variable
-  return crypto.createHash('sha256').update(keyString).digest();
+
+  // Create consistent 32-byte keys from the configured secrets
+  const keys = new Map<string, Buffer>([[PRIMARY_KEY_ID, crypto.createHash('sha256').update(keyString).digest()]]);
+  let lastKeyId = PRIMARY_KEY_ID;
+
+  for (const entry of extraKeys.split(',').map(item => item.trim()).filter(Boolean)) {
+    const separator = entry.indexOf(':');
+    const keyId = entry.slice(0, separator);
+    const secret = entry.slice(separator + 1);
+    if (separator <= 0 || !/^[\w.-]+$/.test(keyId)) {
+      throw new Error('ENCRYPTION_KEYS entries must look like "<keyId>:<secret>"');
+    }
+    if (secret.length < 32) {
+      throw new Error(`Encryption key "${keyId}" must be at least 32 characters long for security`);
+    }
+    keys.set(keyId, crypto.createHash('sha256').update(secret).digest());
+    lastKeyId = keyId;
+  }
+
+  const currentKeyId = currentKeyIdSetting || lastKeyId;
+  if (!keys.has(currentKeyId)) {
+    throw new Error(`ENCRYPTION_CURRENT_KEY_ID "${currentKeyId}" is not in the keyring`);
+  }
+
+  const keyring = { keys, currentKeyId };
+  keyringCache = { signature, keyring };
+  return keyring;
+}
+
+// Get the ENCRYPTION_KEY-derived key (v2_gcm and legacy values)
+function getEncryptionKey(): Buffer {
+  return getKeyring().keys.get(PRIMARY_KEY_ID)!;
+}
+
+function getKeyById(keyId: string): Buffer {
+  const key = getKeyring().keys.get(keyId);
+  if (!key) {
+    throw new Error(`Encryption key "${keyId}" is not in the keyring`);
+  }
+  return key;
+}
+
+/**
+ * Id of the key new values are encrypted with
+ */
+export function getCurrentKeyId(): string {
+  return getKeyring().currentKeyId;
 }
 
 /**
  * SECURE: Encrypts a plain text API key using AES-256-GCM with authentication
  * @param plainText - The plain text API key to encrypt
- * @returns Encrypted string in format: version:base64(iv:ciphertext:authTag)
+ * @returns Encrypted string in format: v3:keyId:base64(iv:ciphertext:authTag)
  */
 export function encryptApiKey(plainText: string): string {
   if (!plainText) {
     throw new Error('Cannot encrypt empty or null API key');
   }
 
-  const key = getEncryptionKey();
+  const keyId = getCurrentKeyId();
+  const key = getKeyById(keyId);
   const iv = crypto.randomBytes(IV_LENGTH); // FIXED: Random IV for each encryption
   
   // FIXED: Using secure createCipheriv with IV
@@ -48,19 +123,19 @@ export function encryptApiKey(plainText: string): string {
   // SECURITY: Get authentication tag for GCM
   const authTag = cipher.getAuthTag();
   
-  // SECURE FORMAT: version:iv:ciphertext:authTag (all base64 encoded)
+  // SECURE FORMAT: version:keyId:iv+ciphertext+authTag (base64 encoded)
   const combinedData = Buffer.concat([
     iv,
     Buffer.from(encrypted, 'base64'),
     authTag
   ]);
   
-  return `${CURRENT_VERSION}:${combinedData.toString('base64')}`;
+  return `${CURRENT_VERSION}:${keyId}:${combinedData.toString('base64')}`;
 }
 
 /**
  * SECURE: Decrypts an encrypted API key with authentication verification
- * @param encryptedText - The encrypted text in format: version:base64(iv:ciphertext:authTag)
+ * @param encryptedText - v3:keyId:data, v2_gcm:data or the legacy format
  * @returns The decrypted plain text API key
  */
 export function decryptApiKey(encryptedText: string): string {
@@ -80,13 +155,19 @@ export function decryptApiKey(encryptedText: string): string {
     return decryptLegacyApiKey(encryptedText);
   }
   
-  // Handle current secure format
-  if (version !== CURRENT_VERSION) {
-    throw new Error(`Unsupported encryption version: ${version}`);
+  if (version === CURRENT_VERSION && parts.length === 3) {
+    return decryptGcm(getKeyById(parts[1]), parts[2]);
   }
 
-  const key = getEncryptionKey();
-  const combinedData = Buffer.from(parts[1], 'base64');
+  if (version === SINGLE_KEY_VERSION) {
+    return decryptGcm(getEncryptionKey(), parts[1]);
+  }
+
+  throw new Error(`Unsupported encryption version: ${version}`);
+}
+
+function decryptGcm(key: Buffer, payload: string): string {
+  const combinedData = Buffer.from(payload, 'base64');
   
   // Extract components: iv (12) + ciphertext + authTag (16)
   if (combinedData.length < IV_LENGTH + TAG_LENGTH) {
@@ -107,6 +188,36 @@ export function decryptApiKey(encryptedText: string): string {
   return decrypted;
 }
 
+/**
+ * Whether a stored value is in one of the encrypted formats (as opposed to a
+ * secret saved in plain text before encryption was applied to its column)
+ */
+export function isEncryptedValue(value: string): boolean {
+  if (!value) return false;
+  const parts = value.split(':');
+  return (parts[0] === CURRENT_VERSION && parts.length === 3)
+    || (parts[0] === SINGLE_KEY_VERSION && parts.length === 2)
+    || parts[0] === LEGACY_VERSION
+    || isLegacyFormat(value);
+}
+
+/**
+ * Whether a stored value should be rewritten with the current key: plain text,
+ * legacy and v2_gcm values, and v3 values under an older key id
+ */
+export function needsReencryption(value: string): boolean {
+  if (!value) return false;
+  const parts = value.split(':');
+  return !(parts[0] === CURRENT_VERSION && parts.length === 3 && parts[1] === getCurrentKeyId());
+}
+
+/**
+ * Decrypt a stored secret, passing through values that were saved in plain text
+ */
+export function decryptStoredSecret(value: string): string {
+  return isEncryptedValue(value) ? decryptApiKey(value) : value;
+}
+
 /**
  * LEGACY: Decrypts old format for migration (INSECURE - only for migration)
  * @param encryptedText - Legacy encrypted text
@@ -252,6 +363,14 @@ export function validateEncryptionStartup(): void {
     process.exit(1);
   }
   
+  try {
+    const keyring = getKeyring();
+    console.log(`🔑 Keyring loaded: ${keyring.keys.size} key(s), current "${keyring.currentKeyId}"`);
+  } catch (error) {
+    console.error('❌ CRITICAL: Invalid encryption keyring:', error instanceof Error ? error.message : error);
+    process.exit(1);
+  }
+
   // Validate encryption functionality
   if (!validateEncryption()) {
     console.error('❌ CRITICAL: Encryption validation failed');
@@ -260,39 +379,3 @@ export function validateEncryptionStartup(): void {
   
   console.log('✅ Encryption system validated successfully');
 }
-
-/**
- * Batch migration utility for upgrading all legacy encrypted keys
- * @param legacyKeys - Array of legacy encrypted keys
- * @returns Array of securely encrypted keys
- */
-export function batchMigrateApiKeys(legacyKeys: string[]): string[] {
-  const results: string[] = [];
-  const errors: Array<{index: number, error: string}> = [];
-  
-  legacyKeys.forEach((legacyKey, index) => {
-    try {
-      if (isLegacyFormat(legacyKey)) {
-        const migrated = migrateApiKey(legacyKey);
-        results.push(migrated);
-        console.log(`✅ Migrated key ${index + 1}/${legacyKeys.length}`);
-      } else {
-        // Already in new format
-        results.push(legacyKey);
-        console.log(`✅ Key ${index + 1}/${legacyKeys.length} already secure`);
-      }
-    } catch (error) {
-      errors.push({index, error: error instanceof Error ? error.message : 'Unknown error'});
-      results.push(legacyKey); // Keep original on error
-      console.error(`❌ Failed to migrate key ${index + 1}:`, error);
-    }
-  });
-  
-  if (errors.length > 0) {
-    console.warn(`⚠️  Migration completed with ${errors.length} errors`);
-  } else {
-    console.log('✅ All keys migrated successfully');
-  }
-  
-  return results;
-}
\ No newline at end of file
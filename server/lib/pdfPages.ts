@@ -0,0 +1,95 @@
+// Page-at-a-time access to PDFs through the pdf.js build bundled with pdf-parse.
+// pdf-parse itself always renders every page into one string; going through
+// pdf.js directly lets callers read the page count from the document header and
+// stop pulling pages once they have enough text.
+
+interface PdfTextItem {
+  str: string;
+  transform: number[];
+}
+
+interface PdfPage {
+  getTextContent(options?: Record<string, boolean>): Promise<{ items: PdfTextItem[] }>;
+  cleanup(): void;
+}
+
+interface PdfDocument {
+  numPages: number;
+  getPage(pageNumber: number): Promise<PdfPage>;
+  destroy(): void;
+}
+
+export interface PdfPageText {
+  pageNumber: number;
+  pageCount: number;
+  text: string;
+}
+
+let pdfjs: any = null;
+
+async function loadPdfJs() {
+  if (!pdfjs) {
+    // @ts-expect-error pdf-parse ships its pdf.js build without type declarations
+    const pdfModule = await import('pdf-parse/lib/pdf.js/v1.10.100/build/pdf.js');
+    pdfjs = pdfModule.default ?? pdfModule;
+    pdfjs.disableWorker = true;
+  }
+  return pdfjs;
+}
+
+async function openPdf(buffer: Buffer): Promise<PdfDocument> {
+  const lib = await loadPdfJs();
+  return await lib.getDocument(new Uint8Array(buffer));
+}
+
+// Same line joining as pdf-parse's default page renderer, so output matches
+function renderTextContent(items: PdfTextItem[]): string {
+  let lastY: number | undefined;
+  let text = '';
+  for (const item of items) {
+    if (lastY === undefined || lastY === item.transform[5]) {
+      text += item.str;
+    } else {
+      text += '\n' + item.str;
+    }
+    lastY = item.transform[5];
+  }
+  return text;
+}
+
+/**
+ * Page count from the document catalog, without rendering any page.
+ */
+export async function countPdfPages(buffer: Buffer): Promise<number> {
+  const doc = await openPdf(buffer);
+  try {
+    return doc.numPages;
+  } finally {
+    doc.destroy();
+  }
+}
+
+/**
+ * Yield page text one page at a time. Breaking out of the loop releases the
+ * document, so pages after the break are never parsed.
+ */
+export async function* streamPdfPages(buffer: Buffer): AsyncGenerator<PdfPageText> {
+  const doc = await openPdf(buffer);
+  try {
+    for (let pageNumber = 1; pageNumber <= doc.numPages; pageNumber++) {
+      let text = '';
+      try {
+        const page = await doc.getPage(pageNumber);
+        const content = await page.getTextContent({ normalizeWhitespace: false, disableCombineTextItems: false });
+        text = renderTextContent(content.items);
+        page.cleanup();
+      } catch (error: any) {
+        // Like pdf-parse, an unreadable page contributes no text instead of failing the document
+        console.warn(`⚠️ Failed to extract PDF page ${pageNumber}:`, error.message);
+      }
+      yield { pageNumber, pageCount: doc.numPages, text };
+    }
+  } finally {
+    doc.destroy();
+  }
+}
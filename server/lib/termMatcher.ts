@@ -0,0 +1,286 @@
+/**
+ * Dictionary matching for rule-based (free tier) document analysis.
+ *
+ * All term lists are compiled once into a single Aho-Corasick automaton, and
+ * `profileText` walks the document exactly once to produce word, sentence and
+ * paragraph counts together with every dictionary hit and its position.
+ *
+ * The results reproduce the regex/split heuristics this replaced:
+ * - words are counted like `text.split(' ').length`, i.e. one more than the
+ *   number of space characters;
+ * - whole-word terms use ASCII word boundaries like a JS regex `\b` without the
+ *   `u` flag (an accented letter next to a term counts as a boundary);
+ * - hits within one category never overlap and prefer the earliest start, then
+ *   the term listed first, like a `/\b(a|b|c)\b/g` alternation;
+ * - terms with `wholeWord: false` match anywhere, like `indexOf`, and
+ *   `matchCase: true` terms only match the exact casing given.
+ */
+
+export interface TermDefinition {
+  term: string;
+  category: string;
+  wholeWord?: boolean; // default true
+  matchCase?: boolean; // default false
+}
+
+export interface TermMatch {
+  term: string;
+  category: string;
+  start: number; // inclusive offset into the original text
+  end: number;   // exclusive offset into the original text
+}
+
+export interface TextProfile {
+  wordCount: number; // space characters + 1, as `text.split(' ').length`
+  sentenceCount: number; // sentences longer than 10 non-trimmed characters
+  paragraphCount: number; // non-empty blocks separated by a blank line
+  termCounts: Record<string, number>;
+  matches: TermMatch[];
+}
+
+// Portuguese legal vocabulary used by the free analysis, grouped by category.
+// Whole words, case-insensitive; order within a list is the match priority.
+export const LEGAL_TERM_DICTIONARIES: Record<string, string[]> = {
+  contract: ['contrato', 'contratante', 'contratado', 'acordo', 'convenção', 'pacto'],
+  legal: ['lei', 'artigo', 'parágrafo', 'cláusula', 'disposição', 'decreto', 'resolução', 'portaria'],
+  obligation: ['deve', 'obriga', 'responsável', 'responsabilidade', 'dever', 'direito', 'obrigação'],
+  payment: ['pagamento', 'pagar', 'valor', 'preço', 'remuneração', 'honorário', 'taxa', 'multa'],
+  termination: ['rescisão', 'rescind', 'cancelar', 'terminar', 'encerrar', 'romper', 'fim'],
+};
+
+// Presence checks the free analysis has always done as plain substring searches
+export const LEGAL_SUBSTRING_TERMS: TermDefinition[] = [
+  { term: 'LGPD', category: 'lgpd', wholeWord: false, matchCase: true },
+  { term: 'dados', category: 'personalData', wholeWord: false, matchCase: true },
+  { term: 'pegadinha', category: 'suspicious', wholeWord: false },
+];
+
+const MIN_SENTENCE_LENGTH = 10;
+
+// Same set as a non-unicode regex \w
+function isWordChar(code: number): boolean {
+  return (code >= 48 && code <= 57) || (code >= 65 && code <= 90) || (code >= 97 && code <= 122) || code === 95;
+}
+
+// Same set String.prototype.trim() strips
+function isWhitespace(code: number): boolean {
+  if (code < 128) return code === 32 || (code >= 9 && code <= 13);
+  return code === 160 || code === 0x1680 || (code >= 0x2000 && code <= 0x200a) ||
+    code === 0x2028 || code === 0x2029 || code === 0x202f || code === 0x205f ||
+    code === 0x3000 || code === 0xfeff;
+}
+
+// Case-fold a single UTF-16 unit without changing string length, so match
+// offsets always line up with the original text
+function foldCase(code: number): number {
+  if (code >= 65 && code <= 90) return code + 32;
+  if (code < 128) return code;
+  const lower = String.fromCharCode(code).toLowerCase();
+  return lower.length === 1 ? lower.charCodeAt(0) : code;
+}
+
+interface AutomatonNode {
+  next: Map<number, number>;
+  fail: number;
+  // Indexes into `terms` for every pattern ending at this node (including via fail links)
+  outputs: number[];
+}
+
+export class TermMatcher {
+  private nodes: AutomatonNode[] = [{ next: new Map(), fail: 0, outputs: [] }];
+  private terms: Array<{ term: string; source: string; category: string; wholeWord: boolean; matchCase: boolean }> = [];
+  readonly categories: string[];
+
+  constructor(definitions: TermDefinition[]) {
+    const categories = new Set<string>();
+
+    for (const definition of definitions) {
+      const term = definition.term.toLowerCase();
+      if (!term) continue;
+
+      let state = 0;
+      for (let i = 0; i < term.length; i++) {
+        const code = foldCase(term.charCodeAt(i));
+        let child = this.nodes[state].next.get(code);
+        if (child === undefined) {
+          child = this.nodes.length;
+          this.nodes.push({ next: new Map(), fail: 0, outputs: [] });
+          this.nodes[state].next.set(code, child);
+        }
+        state = child;
+      }
+
+      this.nodes[state].outputs.push(this.terms.length);
+      this.terms.push({
+        term,
+        source: definition.term,
+        category: definition.category,
+        wholeWord: definition.wholeWord !== false,
+        matchCase: definition.matchCase === true,
+      });
+      categories.add(definition.category);
+    }
+
+    this.categories = Array.from(categories);
+    this.buildFailureLinks();
+  }
+
+  static fromDictionaries(dictionaries: Record<string, string[]>, extra: TermDefinition[] = []): TermMatcher {
+    const definitions: TermDefinition[] = [];
+    for (const [category, terms] of Object.entries(dictionaries)) {
+      for (const term of terms) {
+        definitions.push({ term, category });
+      }
+    }
+    return new TermMatcher(definitions.concat(extra));
+  }
+
+  private buildFailureLinks() {
+    const queue: number[] = [];
+    this.nodes[0].next.forEach(child => {
+      this.nodes[child].fail = 0;
+      queue.push(child);
+    });
+
+    for (let head = 0; head < queue.length; head++) {
+      const state = queue[head];
+      this.nodes[state].next.forEach((child, code) => {
+        let fallback = this.nodes[state].fail;
+        while (fallback !== 0 && !this.nodes[fallback].next.has(code)) {
+          fallback = this.nodes[fallback].fail;
+        }
+        const target = this.nodes[fallback].next.get(code);
+        this.nodes[child].fail = target !== undefined && target !== child ? target : 0;
+        this.nodes[child].outputs.push(...this.nodes[this.nodes[child].fail].outputs);
+        queue.push(child);
+      });
+    }
+  }
+
+  /**
+   * Single pass over `text`: advances the automaton and the word / sentence /
+   * paragraph counters on the same character. Hits are then reduced to the
+   * non-overlapping set per category, in text order.
+   */
+  profileText(text: string): TextProfile {
+    const termCounts: Record<string, number> = {};
+    for (const category of this.categories) {
+      termCounts[category] = 0;
+    }
+    // Every acceptable hit as [term index, start], collected in order of end offset
+    const candidates: number[] = [];
+
+    let state = 0;
+    let wordCount = 1;
+
+    let sentenceCount = 0;
+    let sentenceFirst = -1; // first non-whitespace offset of the current sentence
+    let sentenceLast = -1;
+    let inTerminatorRun = false;
+
+    let paragraphCount = 0;
+    let paragraphHasContent = false;
+    let previousWasNewline = false;
+
+    const closeSentence = () => {
+      if (sentenceFirst !== -1 && sentenceLast - sentenceFirst + 1 > MIN_SENTENCE_LENGTH) {
+        sentenceCount++;
+      }
+      sentenceFirst = -1;
+      sentenceLast = -1;
+    };
+
+    for (let i = 0; i < text.length; i++) {
+      const raw = text.charCodeAt(i);
+      const whitespace = isWhitespace(raw);
+
+      // Words: separated by single spaces
+      if (raw === 32) wordCount++;
+
+      // Sentences: split on runs of . ! ?
+      if (raw === 46 || raw === 33 || raw === 63) {
+        if (!inTerminatorRun) {
+          closeSentence();
+          inTerminatorRun = true;
+        }
+      } else {
+        inTerminatorRun = false;
+        if (!whitespace) {
+          if (sentenceFirst === -1) sentenceFirst = i;
+          sentenceLast = i;
+        }
+      }
+
+      // Paragraphs: blocks separated by "\n\n"
+      if (raw === 10) {
+        if (previousWasNewline) {
+          if (paragraphHasContent) paragraphCount++;
+          paragraphHasContent = false;
+          previousWasNewline = false;
+        } else {
+          previousWasNewline = true;
+        }
+      } else {
+        previousWasNewline = false;
+        if (!whitespace) paragraphHasContent = true;
+      }
+
+      // Dictionary terms
+      const code = foldCase(raw);
+      let next = this.nodes[state].next.get(code);
+      while (next === undefined && state !== 0) {
+        state = this.nodes[state].fail;
+        next = this.nodes[state].next.get(code);
+      }
+      state = next === undefined ? 0 : next;
+
+      const outputs = this.nodes[state].outputs;
+      if (outputs.length > 0) {
+        const atWordEnd = i + 1 >= text.length || !isWordChar(foldCase(text.charCodeAt(i + 1)));
+        for (const index of outputs) {
+          const definition = this.terms[index];
+          const start = i - definition.term.length + 1;
+          if (definition.wholeWord) {
+            if (!atWordEnd) continue;
+            if (start > 0 && isWordChar(foldCase(text.charCodeAt(start - 1)))) continue;
+          }
+          if (definition.matchCase && !text.startsWith(definition.source, start)) continue;
+          candidates.push(index, start);
+        }
+      }
+    }
+
+    closeSentence();
+    if (paragraphHasContent) paragraphCount++;
+
+    const matches = this.selectMatches(candidates);
+    for (const match of matches) {
+      termCounts[match.category]++;
+    }
+
+    return { wordCount, sentenceCount, paragraphCount, termCounts, matches };
+  }
+
+  // Leftmost-first, non-overlapping hits per category; ties go to the term defined first
+  private selectMatches(candidates: number[]): TermMatch[] {
+    const order: number[] = [];
+    for (let c = 0; c < candidates.length; c += 2) order.push(c);
+    order.sort((a, b) => candidates[a + 1] - candidates[b + 1] || candidates[a] - candidates[b]);
+
+    const matches: TermMatch[] = [];
+    const categoryEnd = new Map<string, number>();
+    for (const c of order) {
+      const definition = this.terms[candidates[c]];
+      const start = candidates[c + 1];
+      if (start < (categoryEnd.get(definition.category) ?? 0)) continue;
+
+      const end = start + definition.term.length;
+      categoryEnd.set(definition.category, end);
+      matches.push({ term: definition.term, category: definition.category, start, end });
+    }
+    return matches;
+  }
+}
+
+// Compiled once at module load and shared by every free-tier analysis
+export const legalTermMatcher = TermMatcher.fromDictionaries(LEGAL_TERM_DICTIONARIES, LEGAL_SUBSTRING_TERMS);
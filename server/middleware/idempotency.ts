@@ -0,0 +1,198 @@
+import { Response, NextFunction } from 'express';
+import { createHash } from 'crypto';
+import type { AuthenticatedRequest } from './supabase-auth';
+
+const IDEMPOTENCY_HEADER = 'idempotency-key';
+const MAX_KEY_LENGTH = 255;
+
+interface StoredResponse {
+  statusCode: number;
+  body: any;
+  // 'json' bodies are replayed with res.json, anything else as sent
+  kind: 'json' | 'raw';
+  contentType?: string;
+}
+
+interface IdempotencyEntry {
+  expiresAt: number;
+  // Hash of the request the key was first used with
+  fingerprint: string;
+  response?: StoredResponse;
+  // Resolved when the first execution finishes; duplicates wait on it
+  pending?: Promise<StoredResponse>;
+}
+
+/**
+ * In-process store of responses keyed by user + route + Idempotency-Key.
+ * Completed responses are kept for `ttlMs`; in-flight executions are shared
+ * so concurrent retries with the same key never run the handler twice.
+ */
+export class IdempotencyStore {
+  private entries = new Map<string, IdempotencyEntry>();
+
+  constructor(
+    private ttlMs: number = 24 * 60 * 60 * 1000, // 24 hours
+    private maxEntries: number = 10000
+  ) {}
+
+  get(key: string): IdempotencyEntry | undefined {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+
+    if (!entry.pending && entry.expiresAt <= Date.now()) {
+      this.entries.delete(key);
+      return undefined;
+    }
+    return entry;
+  }
+
+  begin(key: string, fingerprint: string): (response: StoredResponse, keep: boolean) => void {
+    let resolvePending!: (response: StoredResponse) => void;
+    const pending = new Promise<StoredResponse>(resolve => { resolvePending = resolve; });
+
+    this.entries.set(key, { expiresAt: Date.now() + this.ttlMs, fingerprint, pending });
+    this.evictIfNeeded();
+
+    // keep = false (server errors, bodies we could not capture): waiters still
+    // get the response, but the next retry executes again
+    return (response, keep) => {
+      if (keep) {
+        this.entries.set(key, { expiresAt: Date.now() + this.ttlMs, fingerprint, response });
+      } else {
+        this.entries.delete(key);
+      }
+      resolvePending(response);
+    };
+  }
+
+  private evictIfNeeded() {
+    if (this.entries.size <= this.maxEntries) return;
+
+    const now = Date.now();
+    for (const [key, entry] of Array.from(this.entries.entries())) {
+      if (!entry.pending && entry.expiresAt <= now) {
+        this.entries.delete(key);
+      }
+    }
+
+    // Still over capacity: drop oldest completed entries (Map keeps insertion order)
+    for (const [key, entry] of Array.from(this.entries.entries())) {
+      if (this.entries.size <= this.maxEntries) break;
+      if (!entry.pending) {
+        this.entries.delete(key);
+      }
+    }
+  }
+
+  getStats() {
+    let inFlight = 0;
+    this.entries.forEach(entry => { if (entry.pending) inFlight++; });
+    return { entries: this.entries.size, inFlight, ttlMs: this.ttlMs, maxEntries: this.maxEntries };
+  }
+}
+
+export const idempotencyStore = new IdempotencyStore(
+  parseInt(process.env.IDEMPOTENCY_TTL_MS || '', 10) || undefined
+);
+
+function replay(res: Response, stored: StoredResponse) {
+  res.set('Idempotent-Replayed', 'true');
+  res.status(stored.statusCode);
+  if (stored.kind === 'json') return res.json(stored.body);
+  if (stored.contentType) res.set('Content-Type', stored.contentType);
+  return stored.body === undefined ? res.end() : res.send(stored.body);
+}
+
+/**
+ * Identifies the request a key was used with, so reusing the key for a
+ * different request is rejected instead of replaying an unrelated response.
+ * Multipart bodies are not parsed yet at this point (the middleware runs
+ * before multer on purpose), so for those the content length stands in.
+ */
+function requestFingerprint(req: AuthenticatedRequest): string {
+  const contentType = (req.get('content-type') || '').split(';')[0].trim().toLowerCase();
+  const body = contentType === 'multipart/form-data'
+    ? `multipart:${req.get('content-length') || ''}`
+    : JSON.stringify(req.body ?? null);
+  return createHash('sha256').update(`${contentType}\n${body}`).digest('hex');
+}
+
+// Middleware honouring the Idempotency-Key header. Must run after
+// requireSupabaseAuth (keys are scoped per user) and before upload parsing so
+// duplicate requests don't write their files to disk again.
+export const withIdempotency = async (
+  req: AuthenticatedRequest,
+  res: Response,
+  next: NextFunction
+) => {
+  const idempotencyKey = req.get(IDEMPOTENCY_HEADER);
+  if (!idempotencyKey || !req.user) {
+    return next();
+  }
+
+  if (idempotencyKey.length > MAX_KEY_LENGTH) {
+    return res.status(400).json({ message: `Idempotency-Key must be at most ${MAX_KEY_LENGTH} characters` });
+  }
+
+  const storeKey = `${req.user.id}:${req.method}:${req.baseUrl}${req.path}:${idempotencyKey}`;
+  const fingerprint = requestFingerprint(req);
+  const existing = idempotencyStore.get(storeKey);
+
+  if (existing && existing.fingerprint !== fingerprint) {
+    return res.status(422).json({ message: 'Idempotency-Key was already used with a different request' });
+  }
+
+  if (existing?.response) {
+    console.log(`🔁 Replaying stored response for Idempotency-Key ${idempotencyKey}`);
+    return replay(res, existing.response);
+  }
+
+  if (existing?.pending) {
+    console.log(`⏳ Coalescing request onto in-flight Idempotency-Key ${idempotencyKey}`);
+    try {
+      const stored = await existing.pending;
+      return replay(res, stored);
+    } catch (error: any) {
+      return res.status(500).json({ message: error.message });
+    }
+  }
+
+  const complete = idempotencyStore.begin(storeKey, fingerprint);
+
+  let settled = false;
+  const settle = (captured: StoredResponse | null) => {
+    if (settled) return;
+    settled = true;
+    if (captured) {
+      // Only keep definitive answers; 5xx responses may be retried
+      complete(captured, captured.statusCode < 500);
+    } else {
+      // Streamed or piped response: waiters get the real status, but nothing is kept to replay
+      complete({ statusCode: res.statusCode, body: undefined, kind: 'raw' }, false);
+    }
+  };
+
+  // Settle as soon as the handler produces its body, even if the client that
+  // sent it has already disconnected - that is exactly the retry we dedupe.
+  // res.json calls res.send, which calls res.end: the first one called wins.
+  const originalJson = res.json;
+  const originalSend = res.send;
+  const originalEnd = res.end;
+  res.json = function (body: any) {
+    settle({ statusCode: res.statusCode, body, kind: 'json' });
+    return originalJson.call(this, body);
+  };
+  res.send = function (body?: any) {
+    settle({ statusCode: res.statusCode, body, kind: 'raw', contentType: res.get('Content-Type') });
+    return originalSend.call(this, body);
+  };
+  res.end = function (this: Response, ...args: any[]) {
+    const chunk = typeof args[0] === 'function' ? undefined : args[0];
+    // After res.write the body went out in pieces we did not keep
+    settle(res.headersSent ? null : { statusCode: res.statusCode, body: chunk, kind: 'raw', contentType: res.get('Content-Type') });
+    return (originalEnd as (...endArgs: any[]) => Response).apply(this, args);
+  } as Response['end'];
+  res.on('finish', () => settle(null));
+
+  next();
+};
@@ -0,0 +1,40 @@
+import multer from "multer";
+import fs from "fs";
+import path from "path";
+import { tempFiles } from "../services/tempFiles";
+
+export const UPLOAD_DIR = '/tmp/uploads';
+
+// Configure multer for file uploads - SECURE: Using disk storage to prevent memory exhaustion
+export const upload = multer({
+  storage: multer.diskStorage({
+    destination: (req, file, cb) => {
+      cb(null, UPLOAD_DIR);
+    },
+    filename: (req, file, cb) => {
+      // SECURITY FIX: Sanitize filename to prevent path traversal attacks
+      const safeBasename = path.basename(file.originalname);
+      const sanitizedName = safeBasename.replace(/[^a-zA-Z0-9._-]/g, "_");
+      const randomString = Math.random().toString(36).substring(2);
+      const uniqueName = `${Date.now()}-${randomString}-${sanitizedName}`;
+
+      // Additional security: reject if any path separators remain
+      if (uniqueName.includes('/') || uniqueName.includes('\\') || uniqueName.includes('..')) {
+        return cb(new Error('Invalid filename detected'), '');
+      }
+
+      tempFiles.track(path.join(UPLOAD_DIR, uniqueName));
+      cb(null, uniqueName);
+    }
+  }),
+  limits: { fileSize: 10 * 1024 * 1024 }, // 10MB limit for single file uploads
+  fileFilter: (req, file, cb) => {
+    const allowedTypes = ['application/pdf', 'application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'text/plain'];
+    cb(null, allowedTypes.includes(file.mimetype));
+  }
+});
+
+// Uploads are stored on disk, so file.buffer is never set; read the bytes from file.path
+export async function readUploadedFile(file: Express.Multer.File): Promise<Buffer> {
+  return fs.promises.readFile(file.path);
+}
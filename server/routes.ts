@@ -2,11 +2,26 @@ import type { Express } from "express";
 import express from "express";
 import { createServer, type Server } from "http";
 import Stripe from "stripe";
-import { storage } from "./storage";
+import { storage, type AnalysisSearchCursor } from "./storage";
 import { aiService } from "./services/ai";
 import { batchProcessor } from "./services/batchProcessor";
 import { emailService } from "./services/email";
+import { clauseIndex } from "./services/clauseIndex";
+import { batchEvents, type BatchProgressEvent } from "./services/batchEvents";
+import { textExtraction, UnsupportedFileTypeError, TIER_WORD_BUDGETS, SUPPORTED_MIME_TYPES } from "./services/textExtraction";
+import { objectStorage } from "./services/objectStorage";
+import { apiKeyCache } from "./services/apiKeyCache";
+import { secretRotation } from "./services/secretRotation";
+import { stripeEventProcessor } from "./services/stripeEvents";
+import { maintenance } from "./services/maintenance";
+import { tempFiles } from "./services/tempFiles";
+import { notificationCache } from "./services/notificationCache";
+import { providerBatchService } from "./services/providerBatch";
+import { modelRouter, NoRouteAvailableError, ROUTING_SLAS, type RoutingDecision, type RoutingSla } from "./services/modelRouter";
+import { batchIngest, type IngestEvent } from "./services/batchIngest";
 import { requireSupabaseAuth, requireSupabaseAdmin, type AuthenticatedRequest } from "./middleware/supabase-auth";
+import { withIdempotency } from "./middleware/idempotency";
+import { upload, readUploadedFile } from "./middleware/upload";
 import { insertDocumentAnalysisSchema, insertSupportTicketSchema, insertTicketMessageSchema, adminTicketMessageSchema, adminUserUpdateSchema, insertAiProviderConfigSchema, insertCreditPackageSchema, insertDocumentTemplateSchema, insertLegalClauseSchema, insertTemplatePromptSchema, insertTemplateAnalysisRuleSchema, insertBatchJobSchema, insertBatchDocumentSchema, insertQueueJobSchema, insertSystemAiProviderSchema, users, creditTransactions, contactFormSchema, insertSiteConfigSchema, insertSmtpConfigSchema, insertAdminNotificationSchema, smtpTestSchema, insertStripeConfigSchema } from "@shared/schema";
 import { setupTestSpriteRoutes } from "./routes/testsprite";
 import { db } from "./db";
@@ -15,6 +30,7 @@ import multer from "multer";
 import { z } from "zod";
 import fs from "fs";
 import path from "path";
+import { createHash } from "crypto";
 
 // Note: @types/pdf-parse package is now installed
 
@@ -116,34 +132,6 @@ async function checkFreeAnalysisLimit(userId: string): Promise<boolean> {
 
 // Helper function removed - no longer needed with Supabase Auth
 
-// Configure multer for file uploads - SECURE: Using disk storage to prevent memory exhaustion
-const upload = multer({
-  storage: multer.diskStorage({
-    destination: (req, file, cb) => {
-      cb(null, '/tmp/uploads');
-    },
-    filename: (req, file, cb) => {
-      // SECURITY FIX: Sanitize filename to prevent path traversal attacks
-      const safeBasename = path.basename(file.originalname);
-      const sanitizedName = safeBasename.replace(/[^a-zA-Z0-9._-]/g, "_");
-      const randomString = Math.random().toString(36).substring(2);
-      const uniqueName = `${Date.now()}-${randomString}-${sanitizedName}`;
-      
-      // Additional security: reject if any path separators remain
-      if (uniqueName.includes('/') || uniqueName.includes('\\') || uniqueName.includes('..')) {
-        return cb(new Error('Invalid filename detected'), '');
-      }
-      
-      cb(null, uniqueName);
-    }
-  }),
-  limits: { fileSize: 10 * 1024 * 1024 }, // 10MB limit for single file uploads
-  fileFilter: (req, file, cb) => {
-    const allowedTypes = ['application/pdf', 'application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document', 'text/plain'];
-    cb(null, allowedTypes.includes(file.mimetype));
-  }
-});
-
 // Configure dedicated multer for batch uploads with 50MB per file limit
 const batchUpload = multer({
   storage: multer.diskStorage({
@@ -162,6 +150,7 @@ const batchUpload = multer({
         return cb(new Error('Invalid filename detected'), '');
       }
       
+      tempFiles.track(path.join('/tmp/batch-uploads', uniqueName));
       cb(null, uniqueName);
     }
   }),
@@ -199,78 +188,34 @@ async function validateBatchSize(req: AuthenticatedRequest, res: express.Respons
 
 // Helper function to cleanup uploaded files (async version defined later)
 
-// Handle successful payment processing from Stripe webhook
-async function handleSuccessfulPayment(paymentIntent: Stripe.PaymentIntent) {
-  try {
-    console.log(`💳 Processing successful payment: ${paymentIntent.id}`);
-    
-    const { userId, packageId } = paymentIntent.metadata;
-    
-    if (!userId || !packageId) {
-      console.error("❌ Missing metadata in payment intent:", paymentIntent.id);
-      return;
-    }
-
-    // Check if this payment has already been processed
-    const existingTransaction = await storage.getCreditTransactionByStripeId(paymentIntent.id);
-    if (existingTransaction) {
-      console.log(`⚠️  Payment already processed: ${paymentIntent.id}`);
-      return;
-    }
-
-    // Get the user
-    const user = await storage.getUser(userId);
-    if (!user) {
-      console.error(`❌ User not found: ${userId}`);
-      return;
-    }
-
-    // SECURITY: Validate customer ID matches user
-    if (user.stripeCustomerId && paymentIntent.customer !== user.stripeCustomerId) {
-      console.error(`❌ Customer ID mismatch for payment ${paymentIntent.id}: user has ${user.stripeCustomerId}, payment has ${paymentIntent.customer}`);
-      return;
-    }
-
-    // Get package details from database (trusted source)
-    const creditPackage = await storage.getCreditPackage(packageId);
-    if (!creditPackage) {
-      console.error(`❌ Package not found: ${packageId}`);
-      return;
-    }
-
-    // Validate payment amount matches package price
-    const expectedAmount = Math.round(parseFloat(creditPackage.price) * 100);
-    if (paymentIntent.amount !== expectedAmount) {
-      console.error(`❌ Amount mismatch for payment ${paymentIntent.id}: expected ${expectedAmount}, got ${paymentIntent.amount}`);
-      return;
-    }
-
-    // ATOMIC: Credit the user account in a single transaction to prevent race conditions
-    const credits = creditPackage.credits;
-    const newCredits = user.credits + credits;
-    
-    // Use storage method that handles atomicity
-    const result = await storage.processPaymentTransaction(userId, {
-      type: "purchase",
-      amount: credits,
-      description: `Webhook: Purchase of ${credits} credits (${creditPackage.name})`,
-      stripePaymentIntentId: paymentIntent.id,
-      newCreditBalance: newCredits
-    });
+// Supabase identity combined with the local user row (credits, Stripe settings)
+async function buildUserProfile(req: AuthenticatedRequest) {
+  const localUser = await storage.getUser(req.user.id);
+  return {
+    id: req.user.id,
+    email: req.user.email,
+    firstName: req.user?.firstName || req.user?.email?.split('@')[0] || '',
+    lastName: req.user?.lastName || '',
+    username: req.user?.username || req.user?.email?.split('@')[0] || '',
+    credits: localUser?.credits || 0,
+    role: req.user?.role || 'user',
+    stripeCustomerId: localUser?.stripeCustomerId || null,
+    stripeMode: localUser?.stripeMode || 'test',
+    createdAt: req.user?.createdAt || new Date().toISOString(),
+    updatedAt: req.user?.updatedAt || new Date().toISOString()
+  };
+}
 
-    console.log(`✅ Successfully processed payment ${paymentIntent.id}: ${credits} credits added to user ${userId}`);
-    
-  } catch (error: any) {
-    console.error(`❌ Error processing payment ${paymentIntent.id}:`, error);
-  }
+// Weak validator for one section of an aggregate response
+function sectionEtag(data: unknown): string {
+  return `W/"${createHash('sha1').update(JSON.stringify(data)).digest('base64url')}"`;
 }
 
 // Helper function to clean up uploaded files
 async function cleanupUploadedFiles(files: Express.Multer.File[]) {
   for (const file of files) {
     try {
-      if (file.path && fs.existsSync(file.path)) {
-        await fs.promises.unlink(file.path);
+      if (file.path && await tempFiles.remove(file.path)) {
         console.log(`🗑️ Cleaned up temp file: ${file.path}`);
       }
     } catch (error) {
@@ -279,7 +224,39 @@ async function cleanupUploadedFiles(files: Express.Multer.File[]) {
   }
 }
 
+// Stream batch progress events to the client as Server-Sent Events until it disconnects
+function streamBatchEvents(
+  req: AuthenticatedRequest,
+  res: express.Response,
+  filter: (event: BatchProgressEvent) => boolean,
+  initialEvents: BatchProgressEvent[] = []
+) {
+  res.writeHead(200, {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache, no-transform',
+    'Connection': 'keep-alive',
+    'X-Accel-Buffering': 'no'
+  });
+
+  const send = (event: BatchProgressEvent) => {
+    res.write(`event: ${event.type}\ndata: ${JSON.stringify(event)}\n\n`);
+  };
+  initialEvents.forEach(send);
+
+  const unsubscribe = batchEvents.subscribe(filter, send);
+  // Keep proxies from closing an idle stream
+  const heartbeat = setInterval(() => res.write(': ping\n\n'), 25000);
+
+  req.on('close', () => {
+    clearInterval(heartbeat);
+    unsubscribe();
+  });
+}
+
 export async function registerRoutes(app: Express): Promise<Server> {
+  // Cross-process batch progress notifications for the SSE endpoints
+  batchEvents.start();
+
   // Stripe webhook endpoint - needs to be before body parsing middleware
   app.post("/api/webhooks/stripe", express.raw({ type: "application/json" }), async (req, res) => {
     const sig = req.headers["stripe-signature"];
@@ -334,23 +311,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
       return res.status(400).send(`Webhook Error: ${err.message}`);
     }
 
-    // Handle the event
-    switch (event.type) {
-      case "payment_intent.succeeded":
-        const paymentIntent = event.data.object as Stripe.PaymentIntent;
-        await handleSuccessfulPayment(paymentIntent);
-        break;
-      
-      case "payment_intent.payment_failed":
-        const failedPayment = event.data.object as Stripe.PaymentIntent;
-        console.error("💳 Payment failed:", failedPayment.id, failedPayment.last_payment_error?.message);
-        break;
-      
-      default:
-        console.log(`🔔 Unhandled event type: ${event.type}`);
+    // Store the event and acknowledge; it is applied in the background (see services/stripeEvents)
+    try {
+      const isNew = await stripeEventProcessor.record(event);
+      res.json({ received: true, duplicate: !isNew });
+    } catch (error: any) {
+      // Not stored, so let Stripe redeliver it
+      console.error(`❌ Failed to store Stripe event ${event.id}:`, error.message);
+      res.status(500).json({ message: "Failed to store event" });
     }
-
-    res.json({ received: true });
   });
 
   // Express setup for Supabase Auth - no sessions needed
@@ -477,24 +446,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         role: req.user?.role
       });
 
-      // Get user from local database to get credits and other local data
-      const localUser = await storage.getUser(req.user.id);
-      console.log('🔍 API /api/user/profile - Local user data:', localUser);
-      
-      // Combine Supabase user data with local database data
-      const userProfile = {
-        id: req.user.id,
-        email: req.user.email,
-        firstName: req.user?.firstName || req.user?.email?.split('@')[0] || '',
-        lastName: req.user?.lastName || '',
-        username: req.user?.username || req.user?.email?.split('@')[0] || '',
-        credits: localUser?.credits || 0,
-        role: req.user?.role || 'user',
-        stripeCustomerId: localUser?.stripeCustomerId || null,
-        stripeMode: localUser?.stripeMode || 'test',
-        createdAt: req.user?.createdAt || new Date().toISOString(),
-        updatedAt: req.user?.updatedAt || new Date().toISOString()
-      };
+      const userProfile = await buildUserProfile(req);
 
       console.log('✅ API /api/user/profile - Response data:', userProfile);
 
@@ -512,6 +464,57 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Everything the dashboard needs on first paint, authenticated once and loaded in parallel.
+  // Each section carries its own ETag; sections the client sent in If-None-Match come back
+  // as { etag, notModified: true } without data, and a fully unchanged response is a 304.
+  app.get("/api/bootstrap", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
+    try {
+      const userId = req.user.id;
+      const loaders: Record<string, () => Promise<unknown>> = {
+        profile: async () => ({ userProfile: await buildUserProfile(req) }),
+        aiProviderConfigs: () => storage.getAiProviderConfigs(),
+        templates: () => storage.getDocumentTemplates(),
+        recentAnalyses: () => storage.getDocumentAnalyses(userId, 5),
+        notifications: () => notificationCache.getUnread(userId),
+      };
+
+      const knownEtags = new Set(
+        (req.headers['if-none-match'] || '').split(',').map(tag => tag.trim()).filter(Boolean)
+      );
+
+      const names = Object.keys(loaders);
+      const results = await Promise.allSettled(names.map(name => loaders[name]()));
+
+      const sections: Record<string, { etag?: string; notModified?: boolean; data?: unknown; error?: string }> = {};
+      let allUnchanged = true;
+      results.forEach((result, index) => {
+        const name = names[index];
+        if (result.status === 'rejected') {
+          // One failing read does not fail the page; the client falls back to the section's own endpoint
+          console.error(`❌ Bootstrap section ${name} failed:`, result.reason);
+          sections[name] = { error: result.reason?.message || 'Failed to load' };
+          allUnchanged = false;
+          return;
+        }
+        const etag = sectionEtag(result.value);
+        if (knownEtags.has(etag)) {
+          sections[name] = { etag, notModified: true };
+        } else {
+          sections[name] = { etag, data: result.value };
+          allUnchanged = false;
+        }
+      });
+
+      res.set({ 'Cache-Control': 'private, no-cache', 'Vary': 'Authorization' });
+      if (allUnchanged) {
+        return res.status(304).end();
+      }
+      res.json({ sections });
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
   // Update user's Stripe mode preference
   app.patch("/api/user/stripe-mode", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
     try {
@@ -535,37 +538,70 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Page count and size for pricing, without extracting the document text
+  app.post("/api/documents/inspect", requireSupabaseAuth, upload.single('file'), async (req: AuthenticatedRequest, res) => {
+    try {
+      if (!req.file) {
+        return res.status(400).json({ message: "No file provided" });
+      }
+
+      const inspection = await textExtraction.inspect(await readUploadedFile(req.file), req.file.mimetype);
+      res.json({
+        ...inspection,
+        wordBudget: req.user.credits > 0 ? TIER_WORD_BUDGETS.paid : TIER_WORD_BUDGETS.free
+      });
+    } catch (error: any) {
+      if (error instanceof UnsupportedFileTypeError) {
+        return res.status(400).json({ message: "Tipo de arquivo não suportado" });
+      }
+      res.status(500).json({ message: error.message });
+    } finally {
+      if (req.file) await cleanupUploadedFiles([req.file]);
+    }
+  });
+
   // Document analysis routes
-  app.post("/api/analyze", requireSupabaseAuth, upload.single('file'), async (req: AuthenticatedRequest, res) => {
+  app.post("/api/analyze", requireSupabaseAuth, withIdempotency, upload.single('file'), async (req: AuthenticatedRequest, res) => {
     try {
+      const { analysisType, aiProvider, aiModel, templateId } = req.body;
+
+      // Check if user can use free analysis (3 per month) or needs credits
+      const canUseFreeAnalysis = await checkFreeAnalysisLimit(req.user.id);
+      const needsCredits = !canUseFreeAnalysis && req.user.credits === 0;
+      
+      if (needsCredits) {
+        return res.status(402).json({ 
+          message: "Você atingiu o limite de 3 análises gratuitas por mês. Compre créditos para continuar." 
+        });
+      }
+
+      // Free users without credits (or explicitly choosing free) get the free tier;
+      // decided before parsing so extraction can stop at the tier's word budget
+      const useFreeTier = canUseFreeAnalysis && (req.user.credits === 0 || aiProvider === 'free');
+
       let content = '';
+      let extraction: { truncated: boolean; wordCount: number; pageCount?: number; pagesRead?: number } | null = null;
       
       if (req.file) {
-        // Proper file processing for different formats
+        // Same extraction (and text cache) as batch processing
         try {
-          if (req.file.mimetype === 'application/pdf') {
-            const pdfParse = await import('pdf-parse');
-            const pdfData = await pdfParse.default(req.file.buffer);
-            content = pdfData.text;
-          } else if (req.file.mimetype === 'application/vnd.openxmlformats-officedocument.wordprocessingml.document') {
-            const mammoth = await import('mammoth');
-            const result = await mammoth.extractRawText({ buffer: req.file.buffer });
-            content = result.value;
-          } else if (req.file.mimetype === 'application/msword') {
-            // For older DOC files, try mammoth but fallback to buffer if needed
-            try {
-              const mammoth = await import('mammoth');
-              const result = await mammoth.extractRawText({ buffer: req.file.buffer });
-              content = result.value;
-            } catch (docError) {
-              content = req.file.buffer.toString('utf-8');
-            }
-          } else if (req.file.mimetype === 'text/plain') {
-            content = req.file.buffer.toString('utf-8');
-          } else {
-            return res.status(400).json({ message: "Tipo de arquivo não suportado" });
+          const extracted = await textExtraction.extract(await readUploadedFile(req.file), req.file.mimetype, {
+            maxWords: useFreeTier ? TIER_WORD_BUDGETS.free : TIER_WORD_BUDGETS.paid
+          });
+          content = extracted.text;
+          extraction = {
+            truncated: extracted.truncated,
+            wordCount: extracted.wordCount,
+            pageCount: extracted.pageCount,
+            pagesRead: extracted.pagesRead
+          };
+          if (extracted.cached) {
+            console.log(`📄 Reusing extracted text for ${req.file.originalname} (${extracted.sha256.slice(0, 12)})`);
           }
         } catch (parseError) {
+          if (parseError instanceof UnsupportedFileTypeError) {
+            return res.status(400).json({ message: "Tipo de arquivo não suportado" });
+          }
           console.error("Erro no processamento do arquivo:", parseError);
           return res.status(400).json({ message: "Erro ao processar arquivo. Tente um formato diferente." });
         }
@@ -575,8 +611,6 @@ export async function registerRoutes(app: Express): Promise<Server> {
         return res.status(400).json({ message: "No content provided" });
       }
 
-      const { analysisType, aiProvider, aiModel, templateId } = req.body;
-      
       // Validate template if provided
       let templateData = null;
       if (templateId) {
@@ -585,36 +619,48 @@ export async function registerRoutes(app: Express): Promise<Server> {
           return res.status(404).json({ message: "Template not found" });
         }
       }
-      
-      // Check if user can use free analysis (3 per month) or needs credits
-      const canUseFreeAnalysis = await checkFreeAnalysisLimit(req.user.id);
-      const needsCredits = !canUseFreeAnalysis && req.user.credits === 0;
-      
-      if (needsCredits) {
-        return res.status(402).json({ 
-          message: "Você atingiu o limite de 3 análises gratuitas por mês. Compre créditos para continuar." 
-        });
+
+      // "auto" lets the router pick the provider/model for this document
+      let selectedProvider = aiProvider;
+      let selectedModel = aiModel;
+      let routing: RoutingDecision | null = null;
+      let routingDecisionId: string | null = null;
+      if (aiProvider === 'auto' && !useFreeTier) {
+        const userProviders = await storage.getAiProviders(req.user.id);
+        const userApiKeys = Object.fromEntries(userProviders.map(p => [p.provider, p.apiKey]));
+        const sla: RoutingSla = ROUTING_SLAS.includes(req.body.sla) ? req.body.sla : 'balanced';
+
+        try {
+          routing = await modelRouter.route({ content, analysisType, sla, userApiKeys });
+        } catch (routeError) {
+          if (routeError instanceof NoRouteAvailableError) {
+            return res.status(503).json({ message: routeError.message, candidates: routeError.candidates });
+          }
+          throw routeError;
+        }
+
+        selectedProvider = routing.provider;
+        selectedModel = routing.model;
       }
 
       // Get user's API key for the provider if needed
       let userApiKey;
-      if (aiProvider !== 'free') {
-        const providerConfig = await storage.getAiProvider(req.user.id, aiProvider);
-        userApiKey = providerConfig?.apiKey;
+      if (selectedProvider !== 'free') {
+        userApiKey = await apiKeyCache.getUserKey(req.user.id, selectedProvider);
       }
 
       // Calculate credits needed - free users can use 'free' provider
-      let actualProvider = aiProvider;
-      let actualModel = aiModel;
+      let actualProvider = selectedProvider;
+      let actualModel = selectedModel;
       let creditsNeeded = 0;
       
-      if (canUseFreeAnalysis && (req.user.credits === 0 || aiProvider === 'free')) {
+      if (useFreeTier) {
         // Force free analysis for users without credits or explicitly choosing free
         actualProvider = 'free';
         actualModel = 'basic';
         creditsNeeded = 0;
       } else {
-        creditsNeeded = aiService.getProviderCredits(`${aiProvider}-${aiModel}`, analysisType);
+        creditsNeeded = aiService.getProviderCredits(`${selectedProvider}-${selectedModel}`, analysisType);
         if (req.user.credits < creditsNeeded) {
           return res.status(402).json({ 
             message: `Créditos insuficientes. Necessário: ${creditsNeeded}, disponível: ${req.user.credits}` 
@@ -626,14 +672,30 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const analysis = await storage.createDocumentAnalysis(req.user.id, {
         title: req.body.title || `Document Analysis ${new Date().toISOString()}`,
         content,
-        aiProvider,
-        aiModel,
+        aiProvider: selectedProvider,
+        aiModel: selectedModel,
         analysisType,
         templateId: templateData?.template.id || null,
         result: {},
         creditsUsed: creditsNeeded,
       });
 
+      if (routing) {
+        const decision = await storage.createModelRoutingDecision(req.user.id, {
+          documentAnalysisId: analysis.id,
+          analysisType,
+          sla: routing.sla,
+          estimatedTokens: routing.estimatedTokens,
+          chosenProvider: routing.provider,
+          chosenModel: routing.model,
+          expectedLatencyMs: Math.round(routing.expectedLatencyMs),
+          creditsCharged: creditsNeeded,
+          candidates: routing.candidates,
+        });
+        routingDecisionId = decision.id;
+      }
+      const analysisStartedAt = Date.now();
+
       try {
         // Perform AI analysis with template support
         const result = await aiService.analyzeDocument(
@@ -642,12 +704,29 @@ export async function registerRoutes(app: Express): Promise<Server> {
           actualProvider,
           actualModel,
           userApiKey,
-          templateId
+          templateId,
+          { hedge: req.body.hedge === true || req.body.hedge === 'true' }
         );
 
+        if (extraction?.truncated) {
+          const pages = extraction.pageCount ? ` (páginas ${extraction.pagesRead} de ${extraction.pageCount})` : '';
+          result.warnings = [
+            ...(result.warnings || []),
+            `Documento excede o limite do plano: apenas as primeiras ${extraction.wordCount} palavras foram analisadas${pages}`
+          ];
+        }
+
         // Update analysis with result
         await storage.updateDocumentAnalysisResult(analysis.id, result, "completed");
 
+        if (routingDecisionId) {
+          await storage.completeModelRoutingDecision(routingDecisionId, {
+            status: 'completed',
+            actualProvider: result.execution?.provider || actualProvider,
+            latencyMs: Date.now() - analysisStartedAt,
+          });
+        }
+
         // Deduct credits and create transaction
         const newCredits = req.user.credits - creditsNeeded;
         await storage.updateUserCredits(req.user.id, newCredits);
@@ -655,7 +734,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           req.user.id,
           "usage",
           -creditsNeeded,
-          `Document analysis using ${aiProvider} ${aiModel}`
+          `Document analysis using ${selectedProvider} ${selectedModel}${routing ? ' (auto)' : ''}`
         );
 
         // Credits updated in database - no session to update
@@ -665,14 +744,25 @@ export async function registerRoutes(app: Express): Promise<Server> {
           result,
           creditsUsed: creditsNeeded,
           remainingCredits: newCredits,
+          extraction,
+          routing: routing && { provider: routing.provider, model: routing.model, sla: routing.sla },
         });
       } catch (error: any) {
         // Mark analysis as failed
         await storage.updateDocumentAnalysisResult(analysis.id, { error: error.message }, "failed");
+        if (routingDecisionId) {
+          await storage.completeModelRoutingDecision(routingDecisionId, {
+            status: 'failed',
+            latencyMs: Date.now() - analysisStartedAt,
+            errorMessage: error.message,
+          });
+        }
         throw error;
       }
     } catch (error: any) {
       res.status(500).json({ message: error.message });
+    } finally {
+      if (req.file) await cleanupUploadedFiles([req.file]);
     }
   });
 
@@ -699,6 +789,38 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Full-text search over the user's analyses; `cursor` is the nextCursor of the previous page
+  app.get("/api/analyses/search", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
+    try {
+      const query = typeof req.query.q === 'string' ? req.query.q.trim() : '';
+      if (!query || query.length > 200) {
+        return res.status(400).json({ message: 'Search query (q) must have between 1 and 200 characters' });
+      }
+      const limit = Math.min(Math.max(parseInt(req.query.limit as string) || 20, 1), 50);
+
+      let after: AnalysisSearchCursor | undefined;
+      if (typeof req.query.cursor === 'string' && req.query.cursor) {
+        try {
+          after = JSON.parse(Buffer.from(req.query.cursor, 'base64url').toString('utf-8'));
+        } catch {
+          after = undefined;
+        }
+        if (!after || typeof after.id !== 'string' || typeof after.createdAt !== 'string' || !/^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(\.\d+)?$/.test(after.createdAt)) {
+          return res.status(400).json({ message: 'Invalid cursor' });
+        }
+      }
+
+      const { hits, nextCursor } = await storage.searchDocumentAnalyses(req.user.id, query, limit, after);
+      res.json({
+        results: hits,
+        nextCursor: nextCursor ? Buffer.from(JSON.stringify(nextCursor)).toString('base64url') : null,
+      });
+    } catch (error: any) {
+      console.error('❌ API /api/analyses/search - Error:', error);
+      res.status(500).json({ message: error.message });
+    }
+  });
+
   app.get("/api/analyses/:id", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
     try {
       const analysis = await storage.getDocumentAnalysis(req.params.id, req.user.id);
@@ -771,6 +893,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       if (existingProvider) {
         // Update existing
         const updated = await storage.updateAiProvider(existingProvider.id, { apiKey });
+        apiKeyCache.invalidateUser(req.user.id, provider);
         res.json({ ...updated, apiKey: '****' });
       } else {
         // Create new
@@ -779,6 +902,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           apiKey,
           isActive: true,
         });
+        apiKeyCache.invalidateUser(req.user.id, provider);
         res.json({ ...newProvider, apiKey: '****' });
       }
     } catch (error: any) {
@@ -799,6 +923,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       await storage.deleteAiProvider(id);
+      apiKeyCache.invalidateUser(req.user.id, providerToDelete.provider);
       res.json({ message: "AI provider deleted successfully" });
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -889,7 +1014,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         webhookSecret = await decryptApiKey(webhookSecret);
       } else {
         // Fallback to environment variable if no webhook secret in config
-        webhookSecret = endpointSecret;
+        webhookSecret = process.env.STRIPE_WEBHOOK_SECRET!;
       }
 
       // Try to verify with test mode first, then live mode
@@ -911,20 +1036,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
 
     console.log(`🎯 Received Stripe webhook: ${event.type}`);
 
-    // Handle the event
-    switch (event.type) {
-      case 'payment_intent.succeeded':
-        const paymentIntent = event.data.object as Stripe.PaymentIntent;
-        await handleSuccessfulPayment(paymentIntent);
-        break;
-      case 'payment_intent.payment_failed':
-        console.log(`💳 Payment failed: ${event.data.object.id}`);
-        break;
-      default:
-        console.log(`🤷 Unhandled event type: ${event.type}`);
+    // Store the event and acknowledge; it is applied in the background (see services/stripeEvents)
+    try {
+      const isNew = await stripeEventProcessor.record(event);
+      res.json({ received: true, duplicate: !isNew });
+    } catch (error: any) {
+      // Not stored, so let Stripe redeliver it
+      console.error(`❌ Failed to store Stripe event ${event.id}:`, error.message);
+      res.status(500).json({ message: "Failed to store event" });
     }
-
-    res.json({ received: true });
   });
 
   app.post("/api/confirm-payment", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
@@ -1969,6 +2089,77 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  app.get("/api/admin/ai-health", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      res.json({
+        hedging: aiService.getHedgingStats(),
+        circuitBreakers: aiService.getCircuitBreakerStats()
+      });
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  app.get("/api/admin/routing-decisions", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      const requestedLimit = parseInt(req.query.limit as string);
+      const limit = Number.isFinite(requestedLimit) ? Math.min(Math.max(requestedLimit, 1), 1000) : 100;
+      const decisions = await storage.getModelRoutingDecisions(limit, req.query.userId as string | undefined);
+      res.json(decisions);
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Stored secret re-encryption (key rotation) progress; POST starts a pass if none is running
+  app.get("/api/admin/encryption/rotation", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    res.json(secretRotation.getStatus());
+  });
+
+  app.post("/api/admin/encryption/rotation", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      secretRotation.start().catch(error => console.error('❌ Secret re-encryption failed:', error));
+      res.status(202).json(secretRotation.getStatus());
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Background maintenance jobs (trash purge, orphaned upload sweep) and their progress
+  app.get("/api/admin/maintenance", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      res.json({
+        jobs: maintenance.getStatus(),
+        trackedTempFiles: tempFiles.size,
+        contentStore: await storage.getDocumentContentStats(),
+      });
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Queue a job to run now; progress is visible through GET /api/admin/maintenance
+  app.post("/api/admin/maintenance/:name/run", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    const job = maintenance.getStatus().find(status => status.name === req.params.name);
+    if (!job) {
+      return res.status(404).json({ message: "Maintenance job not found" });
+    }
+    maintenance.runNow(job.name).catch(error => console.error(`❌ Maintenance job ${job.name} failed:`, error));
+    res.status(202).json(job);
+  });
+
+  app.post("/api/admin/ai-health/circuits/:key/reset", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      const { key } = req.params;
+      if (!aiService.resetCircuitBreaker(key)) {
+        return res.status(404).json({ message: "Circuit breaker not found" });
+      }
+      res.json({ message: "Circuit breaker reset", circuitBreakers: aiService.getCircuitBreakerStats() });
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
   app.get("/api/admin/ai-usage", requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
     try {
       const aiUsage = await storage.getAiUsageAnalytics();
@@ -2314,6 +2505,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const { id } = req.params;
       const templateData = insertDocumentTemplateSchema.partial().parse(req.body);
       const template = await storage.updateDocumentTemplate(id, templateData);
+      clauseIndex.invalidate(id);
       res.json(template);
     } catch (error: any) {
       if (error.name === 'ZodError') {
@@ -2330,6 +2522,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const { id } = req.params;
       await storage.deleteDocumentTemplate(id);
+      clauseIndex.invalidate(id);
       res.status(204).send();
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -2370,6 +2563,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const clauseData = insertLegalClauseSchema.parse(req.body);
       const clause = await storage.createLegalClause(clauseData);
+      clauseIndex.invalidate();
       res.status(201).json(clause);
     } catch (error: any) {
       if (error.name === 'ZodError') {
@@ -2384,6 +2578,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const { id } = req.params;
       const clauseData = insertLegalClauseSchema.partial().parse(req.body);
       const clause = await storage.updateLegalClause(id, clauseData);
+      clauseIndex.invalidate();
       res.json(clause);
     } catch (error: any) {
       if (error.name === 'ZodError') {
@@ -2400,6 +2595,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const { id } = req.params;
       await storage.deleteLegalClause(id);
+      clauseIndex.invalidate();
       res.status(204).send();
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -2559,6 +2755,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
           return cb(new Error('Invalid filename detected'), '');
         }
         
+        tempFiles.track(path.join('/tmp/batch-uploads', uniqueName));
         cb(null, uniqueName);
       }
     }),
@@ -2610,7 +2807,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
   };
 
   // Create batch job with multiple files - SECURE: Disk-based storage with atomic credit reservation
-  app.post("/api/batch/create", requireSupabaseAuth, batchUpload.array('files', 25), validateBatchSizeLocal, async (req: AuthenticatedRequest, res) => {
+  app.post("/api/batch/create", requireSupabaseAuth, withIdempotency, batchUpload.array('files', 25), validateBatchSizeLocal, async (req: AuthenticatedRequest, res) => {
     let uploadedFiles: Express.Multer.File[] = [];
     let batchJobCreated = false;
     
@@ -2644,8 +2841,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
         }
       }
 
+      // Economy mode (provider batch APIs) trades latency for a lower price
+      const executionMode = req.body.executionMode === 'economy' && providerBatchService.supports(aiProvider)
+        ? 'economy'
+        : 'interactive';
+
       // Calculate total credits needed based on analysis type
-      const creditsPerDocument = aiService.getProviderCredits(`${aiProvider}-${aiModel}`, analysisType);
+      const creditsPerDocument = executionMode === 'economy'
+        ? providerBatchService.getEconomyCredits(aiProvider, aiModel, analysisType)
+        : aiService.getProviderCredits(`${aiProvider}-${aiModel}`, analysisType);
       const totalCreditsNeeded = creditsPerDocument * files.length;
       
       // RACE CONDITION FIX: Atomic credit check and reservation
@@ -2678,7 +2882,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         aiModel,
         totalDocuments: files.length,
         totalCreditsEstimated: totalCreditsNeeded,
-        metadata: {}
+        metadata: { executionMode }
       });
       batchJobCreated = true;
 
@@ -2708,7 +2912,8 @@ export async function registerRoutes(app: Express): Promise<Server> {
           aiProvider,
           aiModel,
           analysisType,
-          templateId
+          templateId,
+          executionMode
         },
         priority: 1
       });
@@ -2752,6 +2957,183 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Signed URLs for uploading documents straight to object storage
+  const signUploadsSchema = z.object({
+    files: z.array(z.object({
+      fileName: z.string().min(1).max(255),
+      mimeType: z.enum(SUPPORTED_MIME_TYPES as [string, ...string[]]),
+      size: z.number().int().positive().max(50 * 1024 * 1024),
+    })).min(1).max(100),
+  });
+
+  app.post("/api/uploads/sign", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
+    try {
+      if (!objectStorage.isConfigured()) {
+        return res.status(503).json({ message: "Direct uploads are not available" });
+      }
+
+      const { files } = signUploadsSchema.parse(req.body);
+      const uploads = await Promise.all(files.map(file => objectStorage.createUpload(req.user.id, file.fileName, file.mimeType)));
+      res.json({ uploads });
+    } catch (error: any) {
+      if (error instanceof z.ZodError) {
+        return res.status(400).json({ message: "Invalid upload request", errors: error.errors });
+      }
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Create a batch from objects uploaded through /api/uploads/sign; workers fetch them when processing
+  const createBatchFromUploadsSchema = z.object({
+    name: z.string().min(1),
+    description: z.string().optional(),
+    analysisType: z.string().min(1),
+    aiProvider: z.string().min(1),
+    aiModel: z.string().min(1),
+    templateId: z.string().optional(),
+    executionMode: z.enum(['interactive', 'economy']).optional(),
+    uploads: z.array(z.object({
+      objectKey: z.string().min(1),
+      fileName: z.string().min(1).max(255),
+      mimeType: z.enum(SUPPORTED_MIME_TYPES as [string, ...string[]]),
+    })).min(1).max(100),
+  });
+
+  app.post("/api/batch/create-from-uploads", requireSupabaseAuth, withIdempotency, async (req: AuthenticatedRequest, res) => {
+    try {
+      if (!objectStorage.isConfigured()) {
+        return res.status(503).json({ message: "Direct uploads are not available" });
+      }
+
+      const { name, description, analysisType, aiProvider, aiModel, templateId, executionMode: requestedMode, uploads } = createBatchFromUploadsSchema.parse(req.body);
+
+      const foreignKey = uploads.find(upload => !objectStorage.ownsObject(req.user.id, upload.objectKey));
+      if (foreignKey) {
+        return res.status(403).json({ message: `Upload does not belong to this user: ${foreignKey.objectKey}` });
+      }
+
+      // Confirm every object actually landed before reserving credits
+      const objects = await Promise.all(uploads.map(upload => objectStorage.stat(upload.objectKey)));
+      const missing = uploads.filter((_, index) => !objects[index]);
+      if (missing.length > 0) {
+        return res.status(400).json({ message: "Some uploads were not found", missing: missing.map(upload => upload.objectKey) });
+      }
+      const totalSize = objects.reduce((sum, object) => sum + object!.size, 0);
+      if (totalSize > 500 * 1024 * 1024) {
+        return res.status(413).json({ message: "Total batch size exceeds limit. Maximum: 500MB", actualSize: totalSize });
+      }
+
+      let templateData = null;
+      if (templateId) {
+        templateData = await storage.getTemplateWithPrompts(templateId);
+        if (!templateData) {
+          return res.status(404).json({ message: "Template not found" });
+        }
+      }
+
+      const executionMode = requestedMode === 'economy' && providerBatchService.supports(aiProvider)
+        ? 'economy'
+        : 'interactive';
+      const creditsPerDocument = executionMode === 'economy'
+        ? providerBatchService.getEconomyCredits(aiProvider, aiModel, analysisType)
+        : aiService.getProviderCredits(`${aiProvider}-${aiModel}`, analysisType);
+      const totalCreditsNeeded = creditsPerDocument * uploads.length;
+
+      try {
+        await storage.deductUserCredits(req.user.id, totalCreditsNeeded, `Batch processing reservation: ${name}`);
+      } catch (creditError: any) {
+        if (creditError.message.includes("Insufficient credits")) {
+          return res.status(402).json({
+            message: "Insufficient credits for batch processing",
+            creditsNeeded: totalCreditsNeeded,
+            creditsAvailable: req.user.credits,
+            documentsCount: uploads.length
+          });
+        }
+        throw creditError;
+      }
+
+      let batchJob;
+      let batchDocuments;
+      try {
+        batchJob = await storage.createBatchJob(req.user.id, {
+          name,
+          description,
+          analysisType,
+          templateId: templateData?.template.id || null,
+          aiProvider,
+          aiModel,
+          totalDocuments: uploads.length,
+          totalCreditsEstimated: totalCreditsNeeded,
+          metadata: { executionMode }
+        });
+
+        batchDocuments = await storage.createBatchDocuments(uploads.map((upload, index) => ({
+          batchJobId: batchJob!.id,
+          originalFileName: upload.fileName,
+          fileSize: objects[index]!.size,
+          fileMimeType: upload.mimeType,
+          sortOrder: index,
+          metadata: { objectKey: upload.objectKey, deleteObjectAfterProcessing: true }
+        })));
+
+        await storage.createQueueJob({
+          jobType: 'batch_processing',
+          jobData: { batchJobId: batchJob.id, userId: req.user.id, aiProvider, aiModel, analysisType, templateId, executionMode },
+          priority: 1
+        });
+      } catch (error) {
+        await storage.refundUserCredits(req.user.id, totalCreditsNeeded, `Batch creation failed - refund for: ${name}`)
+          .catch(refundError => console.error('❌ Failed to refund credits after batch creation failure:', refundError));
+        throw error;
+      }
+
+      console.log(`✅ Batch job created from uploads: ${batchJob.id} with ${uploads.length} objects`);
+      res.status(201).json({ batchJob, documents: batchDocuments, estimatedCredits: totalCreditsNeeded });
+    } catch (error: any) {
+      if (error instanceof z.ZodError) {
+        return res.status(400).json({ message: "Invalid batch request", errors: error.errors });
+      }
+      console.error('❌ Batch creation from uploads error:', error);
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Streaming ingestion for API clients: one JSON document per line
+  // ({ title, content, analysisType, provider, model?, templateId? }), no size limit.
+  // Batch jobs are created as the body arrives; the response streams one NDJSON
+  // line per created batch or rejected document, then a summary.
+  app.post("/api/batch/stream", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
+    if (!req.is('application/x-ndjson') && !req.is('application/jsonl')) {
+      return res.status(415).json({ message: "Expected Content-Type application/x-ndjson" });
+    }
+
+    res.status(200);
+    res.setHeader('Content-Type', 'application/x-ndjson');
+    res.setHeader('Cache-Control', 'no-cache');
+    res.flushHeaders();
+
+    // Stop reading the body while the client is not consuming our responses
+    const emit = async (event: IngestEvent) => {
+      if (!res.write(JSON.stringify(event) + '\n')) {
+        await new Promise<void>(resolve => {
+          res.once('drain', resolve);
+          res.once('close', resolve);
+        });
+      }
+    };
+
+    try {
+      await batchIngest.ingest(req.user.id, req, emit, { name: req.query.name as string | undefined });
+    } catch (error: any) {
+      console.error('❌ Batch stream ingestion error:', error);
+      if (!res.writableEnded) {
+        res.write(JSON.stringify({ type: 'error', message: error.message }) + '\n');
+      }
+    }
+    res.end();
+  });
+
   // Get user's batch jobs
   app.get("/api/batch/jobs", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
     try {
@@ -2779,6 +3161,53 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Live progress for one batch job (SSE); starts with a snapshot of the current state
+  app.get("/api/batch/jobs/:id/events", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
+    try {
+      const { id } = req.params;
+      const batchJob = await storage.getBatchJob(id, req.user.id);
+      if (!batchJob) {
+        return res.status(404).json({ message: "Batch job not found" });
+      }
+
+      const documents = await storage.getBatchDocuments(id);
+      const now = new Date().toISOString();
+      const snapshot: BatchProgressEvent[] = [
+        {
+          type: 'status',
+          batchJobId: id,
+          userId: req.user.id,
+          status: batchJob.status,
+          processedDocuments: batchJob.processedDocuments,
+          failedDocuments: batchJob.failedDocuments,
+          totalDocuments: batchJob.totalDocuments,
+          progressPercentage: (batchJob.metadata as any)?.progressPercentage,
+          at: now
+        },
+        ...documents.map(doc => ({
+          type: 'document' as const,
+          batchJobId: id,
+          userId: req.user.id,
+          documentId: doc.id,
+          fileName: doc.originalFileName,
+          status: doc.status,
+          error: doc.errorMessage || undefined,
+          at: now
+        }))
+      ];
+
+      streamBatchEvents(req, res, event => event.batchJobId === id, snapshot);
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Live progress for all of the user's batch jobs (SSE)
+  app.get("/api/batch/events", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
+    const userId = req.user.id;
+    streamBatchEvents(req, res, event => event.userId === userId);
+  });
+
   // Get batch job statistics
   app.get("/api/batch/statistics", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
     try {
@@ -2789,7 +3218,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
-  // Cancel batch job (if still pending)
+  // Cancel batch job (pending or in flight)
   app.post("/api/batch/jobs/:id/cancel", requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
     try {
       const { id } = req.params;
@@ -2798,12 +3227,22 @@ export async function registerRoutes(app: Express): Promise<Server> {
         return res.status(404).json({ message: "Batch job not found" });
       }
 
-      if (batchJob.status !== 'pending') {
-        return res.status(400).json({ message: "Cannot cancel batch job that is already processing or completed" });
+      if (batchJob.status !== 'pending' && batchJob.status !== 'processing') {
+        return res.status(400).json({ message: "Cannot cancel batch job that is already completed" });
+      }
+
+      await storage.updateBatchJobStatus(id, 'cancelled');
+      // Aborts in-flight provider calls on whichever process is running the job
+      batchEvents.publish({ type: 'status', batchJobId: id, userId: req.user.id, status: 'cancelled' });
+
+      // Nothing is running yet, so settle skipped documents and refunds right away.
+      // In-flight jobs settle themselves once their current calls are aborted.
+      let refundedCredits = 0;
+      if (batchJob.status === 'pending') {
+        refundedCredits = await batchProcessor.finalizeCancelledBatch(id, req.user.id);
       }
 
-      const updatedJob = await storage.updateBatchJobStatus(id, 'cancelled');
-      res.json(updatedJob);
+      res.json({ message: "Batch job cancelled", status: 'cancelled', refundedCredits });
     } catch (error: any) {
       res.status(500).json({ message: error.message });
     }
@@ -2911,6 +3350,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
       }
       
       const systemProvider = await storage.createSystemAiProvider(validatedData);
+      apiKeyCache.invalidateSystem(systemProvider.provider);
       res.status(201).json(systemProvider);
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -2922,7 +3362,15 @@ export async function registerRoutes(app: Express): Promise<Server> {
       const { id } = req.params;
       const validatedData = insertSystemAiProviderSchema.partial().parse(req.body);
       
+      // Changing the provider moves the key, so the old name's cached key must go as well
+      const previousProvider = validatedData.provider
+        ? (await storage.getSystemAiProviders()).find(p => p.id === id)?.provider
+        : undefined;
       const updatedProvider = await storage.updateSystemAiProvider(id, validatedData);
+      apiKeyCache.invalidateSystem(updatedProvider.provider);
+      if (previousProvider && previousProvider !== updatedProvider.provider) {
+        apiKeyCache.invalidateSystem(previousProvider);
+      }
       res.json(updatedProvider);
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -2933,6 +3381,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const { id } = req.params;
       await storage.deleteSystemAiProvider(id);
+      apiKeyCache.invalidateSystem();
       res.status(204).send();
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -3220,10 +3669,10 @@ export async function registerRoutes(app: Express): Promise<Server> {
       // Validate request body with Zod schema
       const validatedData = contactFormSchema.parse(req.body);
       
-      // Send email using the email service
-      await emailService.sendContactEmail(validatedData);
+      // Queue the email; the outbox sender delivers it in the background
+      await emailService.queueContactEmail(validatedData);
       
-      res.json({ 
+      res.status(202).json({ 
         success: true, 
         message: 'Mensagem enviada com sucesso! Retornaremos em breve.' 
       });
@@ -3339,14 +3788,54 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // Delivery status of a queued email (e.g. the SMTP test)
+  app.get('/api/admin/email-outbox/:id', requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      const entry = await storage.getEmailOutboxEntry(req.params.id);
+      if (!entry) {
+        return res.status(404).json({ message: 'E-mail não encontrado' });
+      }
+      const { textBody, htmlBody, ...status } = entry;
+      res.json(status);
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
+  // Recent Stripe webhook events and their processing state
+  app.get('/api/admin/stripe-events', requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
+    try {
+      const limit = Math.min(parseInt(req.query.limit as string) || 100, 500);
+      const status = typeof req.query.status === 'string' ? req.query.status : undefined;
+      const events = await storage.getStripeEvents(limit, status);
+      res.json({
+        events: events.map(({ payload, ...event }) => event),
+        stats: stripeEventProcessor.getStats(),
+      });
+    } catch (error: any) {
+      res.status(500).json({ message: error.message });
+    }
+  });
+
   // SMTP test endpoint
   app.post('/api/admin/smtp-test', requireSupabaseAdmin, async (req: AuthenticatedRequest, res) => {
     try {
       const validatedData = smtpTestSchema.parse(req.body);
-      await emailService.sendTestEmail(validatedData.testEmail);
-      res.json({ 
+
+      // Check the server and credentials now, so a broken config is reported
+      // here instead of only in the outbox retries
+      const verification = await emailService.verifyConnection();
+      if (!verification.ok) {
+        return res.status(503).json({
+          message: 'Falha na conexão SMTP: ' + verification.error
+        });
+      }
+
+      const entry = await emailService.queueTestEmail(validatedData.testEmail);
+      res.status(202).json({ 
         success: true, 
-        message: 'E-mail de teste enviado com sucesso!' 
+        message: 'Conexão SMTP verificada. E-mail de teste enfileirado para envio.',
+        emailId: entry.id
       });
     } catch (error: any) {
       console.error('SMTP test error:', error);
@@ -3574,6 +4063,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         createdBy: req.user.id
       };
       const notification = await storage.createAdminNotification(notificationData);
+      notificationCache.invalidateAll();
       res.json(notification);
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -3584,6 +4074,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const { id } = req.params;
       const notification = await storage.updateAdminNotification(id, req.body);
+      notificationCache.invalidateAll();
       res.json(notification);
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -3594,6 +4085,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
     try {
       const { id } = req.params;
       await storage.deleteAdminNotification(id);
+      notificationCache.invalidateAll();
       res.status(204).send();
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -3604,7 +4096,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
   app.get('/api/notifications/unread', requireSupabaseAuth, async (req: AuthenticatedRequest, res) => {
     try {
       ensureAuthenticated(req);
-      const notifications = await storage.getUnreadNotificationsForUser(req.user.id);
+      const notifications = await notificationCache.getUnread(req.user.id);
       res.json(notifications);
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -3619,6 +4111,7 @@ export async function registerRoutes(app: Express): Promise<Server> {
         userId: req.user.id,
         notificationId: id
       });
+      notificationCache.invalidateUser(req.user.id);
       res.json({ success: true });
     } catch (error: any) {
       res.status(500).json({ message: error.message });
@@ -0,0 +1,84 @@
+// Benchmark for the free-tier rule-based analysis.
+//
+// Runs analyzeWithRules on a synthetic contract in 1..N worker threads for a
+// fixed duration and prints documents/second for each worker count, showing
+// that throughput scales with available CPU cores.
+//
+// Usage: npx tsx server/scripts/benchmark-free-analysis.ts [durationMs] [maxWorkers]
+import { Worker, isMainThread, parentPort, workerData } from 'worker_threads';
+import os from 'os';
+import { analyzeWithRules } from '../services/freeAnalysis';
+
+const SAMPLE_CLAUSES = [
+  'CLÁUSULA PRIMEIRA - DO OBJETO. O presente contrato tem por objeto a prestação de serviços de consultoria jurídica pelo CONTRATADO ao CONTRATANTE.',
+  'CLÁUSULA SEGUNDA - DO PAGAMENTO. O CONTRATANTE deve pagar o valor mensal de R$ 5.000,00, sob pena de multa de 2% e juros conforme o artigo 406 do Código Civil.',
+  'CLÁUSULA TERCEIRA - DAS OBRIGAÇÕES. O CONTRATADO é responsável pela confidencialidade dos dados pessoais tratados, nos termos da Lei nº 13.709/2018.',
+  'CLÁUSULA QUARTA - DA RESCISÃO. Qualquer das partes poderá rescindir este acordo mediante aviso prévio de 30 dias, sem prejuízo do direito à remuneração devida.',
+  'CLÁUSULA QUINTA - DO FORO. Fica eleito o foro da comarca de São Paulo para dirimir quaisquer controvérsias oriundas deste contrato.',
+];
+
+function buildDocument(targetWords: number): string {
+  const paragraphs: string[] = [];
+  let words = 0;
+  while (words < targetWords) {
+    const clause = SAMPLE_CLAUSES[paragraphs.length % SAMPLE_CLAUSES.length];
+    paragraphs.push(clause);
+    words += clause.split(' ').length;
+  }
+  return paragraphs.join('\n\n');
+}
+
+function runFor(durationMs: number, document: string): number {
+  const deadline = Date.now() + durationMs;
+  let processed = 0;
+  while (Date.now() < deadline) {
+    analyzeWithRules(document);
+    processed++;
+  }
+  return processed;
+}
+
+async function runWithWorkers(workers: number, durationMs: number, document: string): Promise<number> {
+  const counts = await Promise.all(Array.from({ length: workers }, () => new Promise<number>((resolve, reject) => {
+    const worker = new Worker(new URL(import.meta.url), {
+      workerData: { durationMs, document },
+      execArgv: process.execArgv,
+    });
+    worker.once('message', resolve);
+    worker.once('error', reject);
+  })));
+  return counts.reduce((total, count) => total + count, 0);
+}
+
+async function main() {
+  const durationMs = parseInt(process.argv[2] || '3000', 10);
+  const maxWorkers = parseInt(process.argv[3] || String(os.cpus().length), 10);
+  const document = buildDocument(2000);
+
+  console.log(`📊 Free analysis benchmark: ${document.length} chars, ${durationMs}ms per run, up to ${maxWorkers} workers`);
+
+  // Warm up the JIT before measuring
+  runFor(500, document);
+
+  let baseline = 0;
+  for (let workers = 1; workers <= maxWorkers; workers *= 2) {
+    const processed = await runWithWorkers(workers, durationMs, document);
+    const throughput = processed / (durationMs / 1000);
+    if (workers === 1) baseline = throughput;
+    console.log(`  ${String(workers).padStart(3)} worker(s): ${throughput.toFixed(1)} docs/s (${(throughput / baseline).toFixed(2)}x)`);
+    if (workers * 2 > maxWorkers && workers !== maxWorkers) {
+      workers = maxWorkers / 2; // make sure the last run uses every core
+    }
+  }
+
+  console.log('ℹ️ The previous implementation slept 2s per document: ~0.5 docs/s per in-flight request regardless of CPU.');
+}
+
+if (isMainThread) {
+  main().catch(error => {
+    console.error('❌ Benchmark failed:', error);
+    process.exit(1);
+  });
+} else {
+  parentPort!.postMessage(runFor(workerData.durationMs, workerData.document));
+}
@@ -0,0 +1,97 @@
+// Local S3-style stand-in for direct-to-object-storage uploads, for running
+// the signed-URL upload flow without a Supabase Storage bucket.
+//
+// Objects are kept under STANDIN_OBJECT_DIR. Every request must carry a URL
+// signed with the shared secret (see server/services/objectStorage.ts). Run
+// the server with:
+//   OBJECT_STORAGE_DRIVER=standin
+//   OBJECT_STORAGE_URL=http://localhost:4020
+//   OBJECT_STORAGE_SECRET=<same value as here>
+//
+// Usage: OBJECT_STORAGE_SECRET=dev npx tsx server/scripts/object-storage-standin.ts [port]
+import http from 'http';
+import fs from 'fs';
+import os from 'os';
+import path from 'path';
+import { pipeline } from 'stream/promises';
+import { verifyStandinRequest } from '../services/objectStorage';
+
+const port = parseInt(process.argv[2] || '4020', 10);
+const secret = process.env.OBJECT_STORAGE_SECRET;
+const rootDir = process.env.STANDIN_OBJECT_DIR || path.join(os.tmpdir(), 'object-storage-standin');
+
+if (!secret) {
+  console.error('❌ OBJECT_STORAGE_SECRET is required');
+  process.exit(1);
+}
+
+fs.mkdirSync(rootDir, { recursive: true });
+
+const corsHeaders = {
+  'Access-Control-Allow-Origin': '*',
+  'Access-Control-Allow-Methods': 'GET, PUT, HEAD, DELETE, OPTIONS',
+  'Access-Control-Allow-Headers': 'Content-Type',
+};
+
+function send(res: http.ServerResponse, status: number, message?: string) {
+  res.writeHead(status, { ...corsHeaders, 'Content-Type': 'application/json' });
+  res.end(message ? JSON.stringify({ message }) : undefined);
+}
+
+const server = http.createServer(async (req, res) => {
+  const url = new URL(req.url || '/', `http://localhost:${port}`);
+  const method = req.method || 'GET';
+
+  if (method === 'OPTIONS') {
+    res.writeHead(204, corsHeaders);
+    return res.end();
+  }
+
+  const match = url.pathname.match(/^\/objects\/(.+)$/);
+  if (!match) return send(res, 404, 'Not found');
+
+  const objectKey = decodeURIComponent(match[1]);
+  const expires = parseInt(url.searchParams.get('expires') || '', 10);
+  if (!verifyStandinRequest(secret, method, objectKey, expires, url.searchParams.get('signature') || '')) {
+    return send(res, 403, 'Invalid or expired signature');
+  }
+
+  const filePath = path.join(rootDir, objectKey);
+  if (!filePath.startsWith(rootDir + path.sep)) return send(res, 400, 'Invalid object key');
+  const metaPath = `${filePath}.meta.json`;
+
+  try {
+    if (method === 'PUT') {
+      await fs.promises.mkdir(path.dirname(filePath), { recursive: true });
+      // Stream straight to disk; the stand-in never holds an object in memory
+      await pipeline(req, fs.createWriteStream(filePath));
+      await fs.promises.writeFile(metaPath, JSON.stringify({ contentType: req.headers['content-type'] || 'application/octet-stream' }));
+      console.log(`📥 Stored ${objectKey}`);
+      return send(res, 200);
+    }
+
+    if (!fs.existsSync(filePath)) return send(res, 404, 'Object not found');
+
+    if (method === 'DELETE') {
+      await fs.promises.rm(filePath, { force: true });
+      await fs.promises.rm(metaPath, { force: true });
+      console.log(`🗑️ Removed ${objectKey}`);
+      return send(res, 204);
+    }
+
+    const { size } = await fs.promises.stat(filePath);
+    const { contentType } = JSON.parse(await fs.promises.readFile(metaPath, 'utf-8').catch(() => '{}'));
+    res.writeHead(200, { ...corsHeaders, 'Content-Type': contentType || 'application/octet-stream', 'Content-Length': size });
+    if (method === 'HEAD') return res.end();
+    if (method === 'GET') return void (await pipeline(fs.createReadStream(filePath), res));
+
+    send(res, 405, 'Method not allowed');
+  } catch (error: any) {
+    if (!res.headersSent) send(res, 500, error.message);
+    else res.destroy(error);
+  }
+});
+
+server.listen(port, () => {
+  console.log(`🧪 Object storage stand-in listening on http://localhost:${port} (${rootDir})`);
+});
@@ -0,0 +1,172 @@
+// Local stand-in for the OpenAI Batch API and Anthropic Message Batches API,
+// for exercising economy batch jobs without provider credentials.
+//
+// Every request "succeeds" with a canned analysis after STANDIN_DELAY_MS. Run
+// the server with:
+//   OPENAI_BATCH_BASE_URL=http://localhost:4010/v1
+//   ANTHROPIC_BATCH_BASE_URL=http://localhost:4010
+//   PROVIDER_BATCH_POLL_MS=5000
+//
+// Usage: npx tsx server/scripts/provider-batch-standin.ts [port]
+import http from 'http';
+import { randomUUID } from 'crypto';
+
+const port = parseInt(process.argv[2] || '4010', 10);
+const delayMs = parseInt(process.env.STANDIN_DELAY_MS || '10000', 10);
+const baseUrl = `http://localhost:${port}`;
+
+interface StandinBatch {
+  id: string;
+  customIds: string[];
+  createdAt: number;
+  cancelled: boolean;
+}
+
+const files = new Map<string, string>();
+const openaiBatches = new Map<string, StandinBatch & { inputFileId: string }>();
+const anthropicBatches = new Map<string, StandinBatch>();
+
+const cannedAnalysis = (customId: string) => JSON.stringify({
+  summary: `Análise simulada para ${customId}`,
+  criticalFlaws: [],
+  warnings: ['Resultado gerado pelo stand-in local do provedor'],
+  improvements: [],
+  legalCompliance: { score: 80, issues: [] },
+  recommendations: [],
+  riskLevel: 'low',
+});
+
+const isDone = (batch: StandinBatch) => batch.cancelled || Date.now() - batch.createdAt >= delayMs;
+
+function readBody(req: http.IncomingMessage): Promise<Buffer> {
+  return new Promise((resolve, reject) => {
+    const chunks: Buffer[] = [];
+    req.on('data', chunk => chunks.push(chunk));
+    req.on('end', () => resolve(Buffer.concat(chunks)));
+    req.on('error', reject);
+  });
+}
+
+function sendJson(res: http.ServerResponse, status: number, body: unknown) {
+  res.writeHead(status, { 'Content-Type': 'application/json' });
+  res.end(JSON.stringify(body));
+}
+
+// Pull the uploaded file out of a multipart body without a parser dependency
+function extractMultipartFile(body: Buffer, contentType: string): string {
+  const boundary = contentType.split('boundary=')[1]?.replace(/"/g, '');
+  const text = body.toString('utf-8');
+  for (const part of text.split(`--${boundary}`)) {
+    if (!part.includes('name="file"')) continue;
+    const start = part.indexOf('\r\n\r\n');
+    return part.slice(start + 4).replace(/\r\n$/, '');
+  }
+  return '';
+}
+
+function openaiBatchView(batch: StandinBatch & { inputFileId: string }) {
+  const done = isDone(batch);
+  return {
+    id: batch.id,
+    object: 'batch',
+    endpoint: '/v1/chat/completions',
+    input_file_id: batch.inputFileId,
+    completion_window: '24h',
+    status: batch.cancelled ? 'cancelled' : done ? 'completed' : 'in_progress',
+    output_file_id: done && !batch.cancelled ? `${batch.id}-output` : null,
+    error_file_id: null,
+    created_at: Math.floor(batch.createdAt / 1000),
+    request_counts: { total: batch.customIds.length, completed: done ? batch.customIds.length : 0, failed: 0 },
+  };
+}
+
+function anthropicBatchView(batch: StandinBatch) {
+  const done = isDone(batch);
+  return {
+    id: batch.id,
+    type: 'message_batch',
+    processing_status: done ? 'ended' : 'in_progress',
+    request_counts: {
+      processing: done ? 0 : batch.customIds.length,
+      succeeded: done && !batch.cancelled ? batch.customIds.length : 0,
+      errored: 0,
+      canceled: batch.cancelled ? batch.customIds.length : 0,
+      expired: 0,
+    },
+    results_url: done ? `${baseUrl}/v1/messages/batches/${batch.id}/results` : null,
+    created_at: new Date(batch.createdAt).toISOString(),
+  };
+}
+
+const server = http.createServer(async (req, res) => {
+  const url = new URL(req.url || '/', baseUrl);
+  const path = url.pathname;
+  let match: RegExpMatchArray | null;
+
+  try {
+    // OpenAI: file upload, batch create/retrieve/cancel, file content
+    if (req.method === 'POST' && path === '/v1/files') {
+      const body = await readBody(req);
+      const id = `file-${randomUUID()}`;
+      files.set(id, extractMultipartFile(body, req.headers['content-type'] || ''));
+      return sendJson(res, 200, { id, object: 'file', purpose: 'batch', bytes: body.length });
+    }
+    if (req.method === 'POST' && path === '/v1/batches') {
+      const { input_file_id } = JSON.parse((await readBody(req)).toString('utf-8'));
+      const lines = (files.get(input_file_id) || '').split('\n').filter(line => line.trim());
+      const batch = { id: `batch_${randomUUID()}`, inputFileId: input_file_id, customIds: lines.map(line => JSON.parse(line).custom_id), createdAt: Date.now(), cancelled: false };
+      openaiBatches.set(batch.id, batch);
+      console.log(`📦 OpenAI stand-in batch ${batch.id}: ${batch.customIds.length} requests`);
+      return sendJson(res, 200, openaiBatchView(batch));
+    }
+    if ((match = path.match(/^\/v1\/batches\/([^/]+)(\/cancel)?$/))) {
+      const batch = openaiBatches.get(match[1]);
+      if (!batch) return sendJson(res, 404, { error: { message: 'Batch not found' } });
+      if (match[2]) batch.cancelled = true;
+      return sendJson(res, 200, openaiBatchView(batch));
+    }
+    if (req.method === 'GET' && (match = path.match(/^\/v1\/files\/(.+)-output\/content$/))) {
+      const batch = openaiBatches.get(match[1]);
+      if (!batch) return sendJson(res, 404, { error: { message: 'File not found' } });
+      res.writeHead(200, { 'Content-Type': 'application/jsonl' });
+      return res.end(batch.customIds.map(customId => JSON.stringify({
+        id: `req_${randomUUID()}`,
+        custom_id: customId,
+        response: { status_code: 200, body: { choices: [{ message: { role: 'assistant', content: cannedAnalysis(customId) } }] } },
+        error: null,
+      })).join('\n'));
+    }
+
+    // Anthropic: message batch create/retrieve/cancel/results
+    if (req.method === 'POST' && path === '/v1/messages/batches') {
+      const { requests } = JSON.parse((await readBody(req)).toString('utf-8'));
+      const batch = { id: `msgbatch_${randomUUID()}`, customIds: requests.map((request: any) => request.custom_id), createdAt: Date.now(), cancelled: false };
+      anthropicBatches.set(batch.id, batch);
+      console.log(`📦 Anthropic stand-in batch ${batch.id}: ${batch.customIds.length} requests`);
+      return sendJson(res, 200, anthropicBatchView(batch));
+    }
+    if ((match = path.match(/^\/v1\/messages\/batches\/([^/]+)(\/cancel|\/results)?$/))) {
+      const batch = anthropicBatches.get(match[1]);
+      if (!batch) return sendJson(res, 404, { type: 'error', error: { type: 'not_found_error', message: 'Batch not found' } });
+      if (match[2] === '/cancel') batch.cancelled = true;
+      if (match[2] === '/results') {
+        res.writeHead(200, { 'Content-Type': 'application/binary' });
+        return res.end(batch.customIds.map(customId => JSON.stringify({
+          custom_id: customId,
+          result: batch.cancelled
+            ? { type: 'canceled' }
+            : { type: 'succeeded', message: { role: 'assistant', content: [{ type: 'text', text: cannedAnalysis(customId) }] } },
+        })).join('\n'));
+      }
+      return sendJson(res, 200, anthropicBatchView(batch));
+    }
+
+    sendJson(res, 404, { error: { message: `No stand-in route for ${req.method} ${path}` } });
+  } catch (error: any) {
+    sendJson(res, 500, { error: { message: error.message } });
+  }
+});
+
+server.listen(port, () => {
+  console.log(`🧪 Provider batch stand-in listening on ${baseUrl} (results after ${delayMs}ms)`);
+});
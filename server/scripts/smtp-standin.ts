@@ -0,0 +1,122 @@
+// Local SMTP stand-in for exercising the email outbox without a real mail
+// server. Accepts any credentials, prints each message it receives and can
+// fail or slow down deliveries to exercise retries and the connection pool.
+//
+// Point the SMTP configuration in the admin panel at it:
+//   host localhost, port 2525, secure off, any username/password
+//
+// Usage: npx tsx server/scripts/smtp-standin.ts [port]
+//   STANDIN_FAIL_RATE=0.3  reject 30% of messages with a temporary 451
+//   STANDIN_DELAY_MS=2000  wait before accepting each message
+import net from 'net';
+
+const port = parseInt(process.argv[2] || '2525', 10);
+const failRate = parseFloat(process.env.STANDIN_FAIL_RATE || '0');
+const delayMs = parseInt(process.env.STANDIN_DELAY_MS || '0', 10);
+
+let connections = 0;
+let received = 0;
+
+const server = net.createServer(socket => {
+  connections++;
+  console.log(`🔌 Connection opened (${connections} open)`);
+
+  let buffer = '';
+  let inData = false;
+  let authStep: 'username' | 'password' | null = null;
+  let envelope = { from: '', to: [] as string[] };
+  let data: string[] = [];
+
+  const reply = (line: string) => socket.write(`${line}\r\n`);
+
+  const finishMessage = async () => {
+    const message = data.join('\r\n');
+    const subject = message.match(/^Subject: (.*)$/im)?.[1] ?? '(no subject)';
+    data = [];
+    inData = false;
+
+    if (delayMs) await new Promise(resolve => setTimeout(resolve, delayMs));
+
+    if (Math.random() < failRate) {
+      console.log(`⚠️ Rejected message to ${envelope.to.join(', ')}: ${subject}`);
+      reply('451 4.3.0 Temporary failure (stand-in)');
+    } else {
+      received++;
+      console.log(`📨 #${received} ${envelope.from} → ${envelope.to.join(', ')}: ${subject} (${message.length} bytes)`);
+      reply(`250 2.0.0 Ok: queued as standin-${received}`);
+    }
+    envelope = { from: '', to: [] };
+  };
+
+  const handleLine = async (line: string) => {
+    if (inData) {
+      if (line === '.') return finishMessage();
+      // Undo dot-stuffing
+      data.push(line.startsWith('..') ? line.slice(1) : line);
+      return;
+    }
+
+    if (authStep) {
+      authStep = authStep === 'username' ? 'password' : null;
+      return reply(authStep ? '334 UGFzc3dvcmQ6' : '235 2.7.0 Authentication successful');
+    }
+
+    const [command, ...rest] = line.split(' ');
+    const argument = rest.join(' ');
+    switch (command.toUpperCase()) {
+      case 'EHLO':
+        return socket.write(`250-localhost\r\n250-AUTH PLAIN LOGIN\r\n250-8BITMIME\r\n250 SIZE 52428800\r\n`);
+      case 'HELO':
+        return reply('250 localhost');
+      case 'AUTH':
+        if (argument.toUpperCase().startsWith('LOGIN')) {
+          authStep = 'username';
+          return reply('334 VXNlcm5hbWU6');
+        }
+        return reply('235 2.7.0 Authentication successful');
+      case 'MAIL':
+        envelope.from = argument.replace(/^FROM:\s*/i, '').split(' ')[0];
+        return reply('250 2.1.0 Ok');
+      case 'RCPT':
+        envelope.to.push(argument.replace(/^TO:\s*/i, '').split(' ')[0]);
+        return reply('250 2.1.5 Ok');
+      case 'DATA':
+        inData = true;
+        return reply('354 End data with <CR><LF>.<CR><LF>');
+      case 'RSET':
+        envelope = { from: '', to: [] };
+        return reply('250 2.0.0 Ok');
+      case 'NOOP':
+        return reply('250 2.0.0 Ok');
+      case 'QUIT':
+        reply('221 2.0.0 Bye');
+        return socket.end();
+      default:
+        return reply('502 5.5.2 Command not recognized');
+    }
+  };
+
+  // Commands are handled strictly in order, even when one waits (STANDIN_DELAY_MS)
+  let pending = Promise.resolve();
+  socket.on('data', chunk => {
+    buffer += chunk.toString('utf-8');
+    let newline: number;
+    while ((newline = buffer.indexOf('\r\n')) !== -1) {
+      const line = buffer.slice(0, newline);
+      buffer = buffer.slice(newline + 2);
+      pending = pending.then(() => handleLine(line));
+    }
+  });
+
+  socket.on('close', () => {
+    connections--;
+    console.log(`🔌 Connection closed (${connections} open)`);
+  });
+  socket.on('error', error => console.warn('⚠️ Socket error:', error.message));
+
+  reply('220 localhost ESMTP stand-in');
+});
+
+server.listen(port, () => {
+  console.log(`🧪 SMTP stand-in listening on localhost:${port} (fail rate ${failRate}, delay ${delayMs}ms)`);
+});
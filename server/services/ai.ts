@@ -2,6 +2,11 @@ import OpenAI from "openai";
 import Anthropic from '@anthropic-ai/sdk';
 import { GoogleGenAI } from "@google/genai";
 import { storage } from '../storage';
+import { analyzeWithRules } from './freeAnalysis';
+import { clauseIndex, applyClauseScreening, type ClauseScreening } from './clauseIndex';
+import { providerLatency } from './providerLatency';
+import { apiKeyCache } from './apiKeyCache';
+import { providerBreakers, CircuitOpenError } from './circuitBreaker';
 import type { DocumentTemplate, LegalClause, TemplatePrompt, TemplateAnalysisRule } from '@shared/schema';
 
 /*
@@ -53,13 +58,80 @@ export interface AnalysisResult {
     }>;
     complianceScore: number;
   };
+  // How the result was obtained when hedging/failover is in play
+  execution?: ProviderExecution;
 }
 
+export interface AnalyzeOptions {
+  // Fire a secondary provider when the primary runs past its rolling p95
+  hedge?: boolean;
+  // Retry on the next provider when the current one errors
+  failover?: boolean;
+  // Let hedging/failover move a call made with the user's own API key onto the platform's keys
+  systemKeyFallback?: boolean;
+  // Aborts in-flight provider calls (e.g. batch cancellation)
+  signal?: AbortSignal;
+}
+
+export class AnalysisCancelledError extends Error {
+  constructor() {
+    super('Analysis cancelled');
+    this.name = 'AnalysisCancelledError';
+  }
+}
+
+export interface ProviderExecution {
+  provider: string;
+  hedged: boolean;
+  failedOver: boolean;
+  attempts: Array<{
+    provider: string;
+    outcome: 'won' | 'failed' | 'cancelled';
+    durationMs: number;
+    reason?: string;
+  }>;
+  // Credits spent on provider calls beyond the one the user paid for
+  extraCredits: number;
+}
+
+// Providers tried, in order, when hedging or failing over from the key provider
+const PROVIDER_FALLBACKS: Record<string, string[]> = {
+  openai: ['anthropic', 'gemini'],
+  anthropic: ['openai', 'gemini'],
+  gemini: ['openai', 'anthropic'],
+};
+
+// Credit keys used to price calls made on a fallback provider
+const PROVIDER_CREDIT_KEYS: Record<string, string> = {
+  openai: 'openai-gpt5',
+  anthropic: 'anthropic-claude',
+  gemini: 'gemini-pro',
+};
+
+// Models used when a provider is reached through hedging/failover
+export const DEFAULT_PROVIDER_MODELS: Record<string, string> = {
+  openai: 'gpt-5',
+  anthropic: 'claude-sonnet-4-20250514',
+  gemini: 'gemini-2.5-pro',
+};
+
+const HEDGE_MIN_SAMPLES = 20;
+const HEDGE_DEFAULT_DELAY_MS = parseInt(process.env.AI_HEDGE_DELAY_MS || '45000', 10);
+const HEDGE_MIN_DELAY_MS = 1000;
+
 export class AIService {
   private openai?: OpenAI;
   private anthropic?: Anthropic;
   private gemini?: GoogleGenAI;
 
+  private hedgingStats = {
+    requests: 0,
+    hedgesFired: 0,
+    failovers: 0,
+    secondaryWins: 0,
+    extraCredits: 0,
+  };
+
   constructor() {
     // Initialize with default API keys if available
     if (process.env.OPENAI_API_KEY) {
@@ -76,7 +148,7 @@ export class AIService {
   // Get system API key as fallback
   private async getSystemApiKey(provider: string): Promise<string | undefined> {
     try {
-      return await storage.getSystemApiKeyByProvider(provider);
+      return await apiKeyCache.getSystemKey(provider);
     } catch (error) {
       console.warn(`Failed to get system API key for ${provider}:`, error);
       return undefined;
@@ -110,6 +182,23 @@ export class AIService {
     }
   }
 
+  // Key a call to this provider would use (user, system or environment)
+  async resolveApiKey(provider: string, userApiKey?: string): Promise<string | undefined> {
+    return await this.getApiKeyWithFallback(provider, userApiKey);
+  }
+
+  // Whether a call to this provider would find an API key
+  async hasApiKey(provider: string, userApiKey?: string): Promise<boolean> {
+    return !!(await this.getApiKeyWithFallback(provider, userApiKey));
+  }
+
+  // System prompt exactly as the interactive provider call would send it
+  async buildSystemPrompt(provider: string, analysisType: string, templateData?: any): Promise<string> {
+    return templateData
+      ? await this.getTemplateSpecificPrompt(templateData, provider)
+      : this.getSystemPrompt(analysisType);
+  }
+
   private getSystemPrompt(analysisType: string): string {
     const basePrompt = `
     # Persona e Contexto Principal
@@ -184,10 +273,29 @@ export class AIService {
       analysisRules: TemplateAnalysisRule[];
       requiredClauses: LegalClause[];
       optionalClauses: LegalClause[];
+      clauseScreening?: ClauseScreening;
     },
     aiProvider: string
   ): Promise<string> {
-    const { template, prompts, analysisRules, requiredClauses, optionalClauses } = templateData;
+    const { template, prompts, analysisRules, clauseScreening } = templateData;
+
+    // With a local pre-screening only the uncertain clauses need the model's
+    // attention; clauses already confirmed present or absent are listed by name
+    let requiredClauses = templateData.requiredClauses;
+    let optionalClauses = templateData.optionalClauses;
+    let screeningSection = '';
+    if (clauseScreening) {
+      const uncertain = clauseScreening.uncertain;
+      requiredClauses = uncertain.filter(s => s.required).map(s => s.clause);
+      optionalClauses = uncertain.filter(s => !s.required).map(s => s.clause);
+
+      const names = (list: typeof uncertain) => list.map(s => s.clause.name).join(', ') || 'nenhuma';
+      screeningSection = `
+## Pré-triagem Local de Cláusulas
+- **Identificadas no documento (avalie apenas a adequação técnica em identifiedClausesAnalysis):** ${names(clauseScreening.present)}
+- **Ausentes no documento (já registradas como faltantes, não repita):** ${names(clauseScreening.absent)}
+`;
+    }
     
     // Find prompts for this AI provider
     const applicablePrompts = prompts.filter(p => 
@@ -204,6 +312,7 @@ Conselheiro Ius, além da sua análise jurídica geral, aplique seu conhecimento
 - **NOME DO TEMPLATE:** ${template.name}
 - **DESCRIÇÃO:** ${template.description}
 
+${screeningSection}
 ## Lista de Cláusulas Essenciais
 Você deve verificar a presença e a adequação técnica das seguintes cláusulas obrigatórias:
 ${requiredClauses.map(clause => `- **${clause.name}:** ${clause.description}`).join('\n')}
@@ -271,17 +380,14 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
     optionalClauses: LegalClause[];
   } | null> {
     try {
-      // Note: Template loading functionality would need to be implemented in storage
-      // For now, return null to avoid compilation errors
-      console.log(`Template loading not yet implemented for ${templateId}`);
-      return null;
+      return await storage.getTemplateWithPrompts(templateId, aiProvider);
     } catch (error) {
       console.error(`Error loading template data for ${templateId}:`, error);
       return null;
     }
   }
 
-  async analyzeWithOpenAI(content: string, analysisType: string, apiKey?: string, templateData?: any): Promise<AnalysisResult> {
+  async analyzeWithOpenAI(content: string, analysisType: string, apiKey?: string, templateData?: any, signal?: AbortSignal): Promise<AnalysisResult> {
     const finalApiKey = await this.getApiKeyWithFallback('openai', apiKey);
     if (!finalApiKey) {
       throw new Error("No OpenAI API key available (user key, system key, or environment variable)");
@@ -308,13 +414,13 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
       ],
       response_format: { type: "json_object" },
       temperature: 0.1,
-    });
+    }, { signal });
 
     const result = JSON.parse(response.choices[0].message.content || '{}');
     return result as AnalysisResult;
   }
 
-  async analyzeWithAnthropic(content: string, analysisType: string, apiKey?: string, templateData?: any): Promise<AnalysisResult> {
+  async analyzeWithAnthropic(content: string, analysisType: string, apiKey?: string, templateData?: any, signal?: AbortSignal): Promise<AnalysisResult> {
     const finalApiKey = await this.getApiKeyWithFallback('anthropic', apiKey);
     if (!finalApiKey) {
       throw new Error("No Anthropic API key available (user key, system key, or environment variable)");
@@ -338,7 +444,7 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
       ],
       max_tokens: 4000,
       temperature: 0.1,
-    });
+    }, { signal });
 
     const textBlock = response.content.find(block => block.type === 'text');
     if (!textBlock || textBlock.type !== 'text') {
@@ -348,7 +454,7 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
     return result as AnalysisResult;
   }
 
-  async analyzeWithGemini(content: string, analysisType: string, apiKey?: string, templateData?: any): Promise<AnalysisResult> {
+  async analyzeWithGemini(content: string, analysisType: string, apiKey?: string, templateData?: any, signal?: AbortSignal): Promise<AnalysisResult> {
     const finalApiKey = await this.getApiKeyWithFallback('gemini', apiKey);
     if (!finalApiKey) {
       throw new Error("No Gemini API key available (user key, system key, or environment variable)");
@@ -366,6 +472,7 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
       config: {
         systemInstruction: systemPrompt,
         responseMimeType: "application/json",
+        abortSignal: signal,
       },
       contents: `Please analyze the following legal document:\n\n${content}`,
     });
@@ -375,152 +482,8 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
   }
 
   async analyzeWithFreeAI(content: string, analysisType: string, templateData?: any): Promise<AnalysisResult> {
-    // Enhanced free analysis with actual content processing
-    await new Promise(resolve => setTimeout(resolve, 2000)); // Simulate processing time
-    
-    const wordCount = content.split(' ').length;
-    const sentences = content.split(/[.!?]+/).filter(s => s.trim().length > 10);
-    const paragraphs = content.split('\n\n').filter(p => p.trim().length > 0);
-    
-    // Legal terms analysis
-    const contractTerms = content.toLowerCase().match(/\b(contrato|contratante|contratado|acordo|convenção|pacto)\b/gi) || [];
-    const legalTerms = content.toLowerCase().match(/\b(lei|artigo|parágrafo|cláusula|disposição|decreto|resolução|portaria)\b/gi) || [];
-    const obligationTerms = content.toLowerCase().match(/\b(deve|obriga|responsável|responsabilidade|dever|direito|obrigação)\b/gi) || [];
-    const paymentTerms = content.toLowerCase().match(/\b(pagamento|pagar|valor|preço|remuneração|honorário|taxa|multa)\b/gi) || [];
-    const terminationTerms = content.toLowerCase().match(/\b(rescisão|rescind|cancelar|terminar|encerrar|romper|fim)\b/gi) || [];
-    
-    // Identify potential issues
-    const criticalFlaws = [];
-    const warnings = [];
-    const improvements = [];
-    
-    // Content analysis
-    if (wordCount < 50) {
-      warnings.push("Documento muito curto - pode estar incompleto");
-    }
-    if (wordCount > 5000) {
-      warnings.push("Documento extenso - análise detalhada requer plano premium");
-    }
-    if (sentences.length < 5) {
-      warnings.push("Estrutura de frases pode estar inadequada");
-    }
-    
-    // Legal compliance checks
-    if (contractTerms.length > 0 && paymentTerms.length === 0) {
-      criticalFlaws.push("Contrato identificado sem cláusulas de pagamento claras");
-    }
-    if (contractTerms.length > 0 && terminationTerms.length === 0) {
-      warnings.push("Contrato sem cláusulas de rescisão aparentes");
-    }
-    if (obligationTerms.length === 0 && contractTerms.length > 0) {
-      warnings.push("Poucas definições de obrigações e responsabilidades");
-    }
-    
-    // Content improvements
-    if (paragraphs.length < 3) {
-      improvements.push("Melhorar organização em parágrafos para maior clareza");
-    }
-    if (legalTerms.length < 3) {
-      improvements.push("Incluir mais referências legais específicas se aplicável");
-    }
-    if (content.indexOf('LGPD') === -1 && content.indexOf('dados') > -1) {
-      improvements.push("Considerar cláusulas LGPD se houver tratamento de dados");
-    }
-    
-    // Calculate compliance score
-    let complianceScore = 60; // Base score
-    if (contractTerms.length > 0) complianceScore += 10;
-    if (legalTerms.length > 2) complianceScore += 10;
-    if (paymentTerms.length > 0) complianceScore += 5;
-    if (terminationTerms.length > 0) complianceScore += 5;
-    if (obligationTerms.length > 2) complianceScore += 10;
-    
-    // Risk level calculation
-    let riskLevel: 'low' | 'medium' | 'high' | 'critical' = 'low';
-    if (criticalFlaws.length > 0) riskLevel = 'high';
-    else if (warnings.length > 2) riskLevel = 'medium';
-    else if (warnings.length > 0) riskLevel = 'low';
-    
-    // Generate meaningful summary
-    let summary = `Documento com ${wordCount} palavras`;
-    if (contractTerms.length > 0) summary += `, identificado como documento contratual`;
-    if (legalTerms.length > 0) summary += `, com ${legalTerms.length} referências legais`;
-    if (paymentTerms.length > 0) summary += `, incluindo cláusulas de pagamento`;
-    summary += `. Análise gratuita detectou aspectos básicos - use plano premium para análise completa.`;
-    
-    // Enhanced content-specific analysis
-    let specificAnalysis = [];
-    let detectedIssues = [];
-    
-    // Detect potential "pegadinhas" or tricky content
-    if (content.toLowerCase().includes('pegadinha')) {
-      specificAnalysis.push("ATENÇÃO: Documento contém termo 'pegadinha' - pode ser texto de teste ou conteúdo suspeito");
-      detectedIssues.push("Conteúdo potencialmente não-oficial detectado");
-    }
-    
-    // Check for incomplete or test content
-    if (wordCount < 100 && !contractTerms.length && !legalTerms.length) {
-      specificAnalysis.push("Documento parece ser um teste ou conteúdo incompleto");
-      detectedIssues.push("Conteúdo muito simples - pode não ser documento legal real");
-    }
-    
-    // Real content analysis based on what's actually in the text
-    if (contractTerms.length > 0) {
-      specificAnalysis.push(`Identificado como CONTRATO com ${contractTerms.length} termos contratuais`);
-    }
-    if (paymentTerms.length > 0) {
-      specificAnalysis.push(`Encontradas ${paymentTerms.length} referências a pagamento`);
-    }
-    if (terminationTerms.length > 0) {
-      specificAnalysis.push(`Identificadas ${terminationTerms.length} cláusulas de rescisão`);
-    }
-    
-    // Fix the contradiction - don't say "no critical flaws" if we count them as critical
-    const finalCriticalFlaws = criticalFlaws.length > 0 ? criticalFlaws : [];
-    const finalWarnings = warnings.length > 0 ? warnings : [];
-    
-    let baseResult = {
-      summary: `${summary} ${specificAnalysis.length > 0 ? 'ANÁLISE ESPECÍFICA: ' + specificAnalysis.join('. ') : ''}`,
-      criticalFlaws: finalCriticalFlaws,
-      warnings: finalWarnings.concat(detectedIssues),
-      improvements: improvements.length > 0 ? improvements : ["Documento analisado - estrutura básica identificada"],
-      legalCompliance: {
-        score: Math.min(complianceScore, 85),
-        issues: finalCriticalFlaws.length > 0 ? finalCriticalFlaws : finalWarnings.slice(0, 2)
-      },
-      recommendations: [
-        `Análise gratuita detectou: ${specificAnalysis.length > 0 ? specificAnalysis[0] : 'estrutura básica do documento'}`,
-        ...improvements.slice(0, 1),
-        "Para análise jurídica detalhada, considere plano premium"
-      ],
-      riskLevel
-    };
-
-    // Add basic template analysis if template data is provided
-    if (templateData) {
-      baseResult.summary += ` Análise baseada no template: ${templateData.template.name}.`;
-      (baseResult as any).templateAnalysis = {
-        templateId: templateData.template.templateId,
-        templateName: templateData.template.name,
-        missingClauses: [], // Free tier doesn't provide detailed clause analysis
-        identifiedClauses: [],
-        validationResults: [{
-          ruleName: "Análise Básica",
-          status: "warning",
-          message: "Análise básica realizada. Use análise premium para validação completa de template.",
-          recommendation: "Upgrade para análise detalhada com validação de cláusulas específicas"
-        }],
-        templateSpecificRisks: [{
-          category: "Limitações da Análise Gratuita",
-          level: "medium",
-          description: "Análise gratuita não incluiu validação específica de template",
-          mitigation: "Considere upgrade para análise premium com validação completa"
-        }],
-        complianceScore: 50
-      };
-    }
-
-    return baseResult as AnalysisResult;
+    // Rule-based analysis: one pass over the text with precompiled dictionaries
+    return analyzeWithRules(content, templateData);
   }
 
   getProviderCredits(provider: string, analysisType: string = 'general'): number {
@@ -558,34 +521,243 @@ Ao gerar o JSON final, adicione o seguinte objeto \`templateAnalysis\` dentro da
     provider: string,
     model: string,
     apiKey?: string,
-    templateId?: string
+    templateId?: string,
+    options: AnalyzeOptions = {}
   ): Promise<AnalysisResult> {
+    const { signal } = options;
     try {
+      if (signal?.aborted) throw new AnalysisCancelledError();
+
       // Load template data if templateId is provided
       let templateData = null;
+      let clauseScreening: ClauseScreening | null = null;
       if (templateId) {
         templateData = await this.loadTemplateData(templateId, provider);
         // Use template analysis type for pricing calculation
         analysisType = 'template';
-      }
 
-      switch (provider) {
-        case 'openai':
-          return await this.analyzeWithOpenAI(content, analysisType, apiKey, templateData);
-        case 'anthropic':
-          return await this.analyzeWithAnthropic(content, analysisType, apiKey, templateData);
-        case 'gemini':
-          return await this.analyzeWithGemini(content, analysisType, apiKey, templateData);
-        case 'free':
-          return await this.analyzeWithFreeAI(content, analysisType, templateData);
-        default:
-          throw new Error(`Unsupported AI provider: ${provider}`);
+        // Settle clearly present/absent clauses locally before calling the provider
+        if (templateData) {
+          clauseScreening = clauseIndex.screen(templateData, content);
+          templateData = { ...templateData, clauseScreening };
+          console.log(`📋 Clause pre-screening for ${clauseScreening.templateId}: ${clauseScreening.present.length} present, ${clauseScreening.absent.length} absent, ${clauseScreening.uncertain.length} uncertain`);
+        }
       }
+
+      const hedge = options.hedge ?? process.env.AI_HEDGING_ENABLED === 'true';
+      const failover = options.failover ?? process.env.AI_FAILOVER_ENABLED === 'true';
+      // A call on the user's own key (even an invalid one) never silently runs on system keys
+      const systemKeyFallback = options.systemKeyFallback ?? process.env.AI_SYSTEM_KEY_FALLBACK_ENABLED === 'true';
+      const fallbacks = apiKey && !systemKeyFallback ? [] : PROVIDER_FALLBACKS[provider] || [];
+
+      const result = provider === 'free' || fallbacks.length === 0 || (!hedge && !failover)
+        ? await this.runProviderTimed(provider, model, content, analysisType, apiKey, templateData, signal)
+        : await this.analyzeWithHedging(provider, model, content, analysisType, apiKey, templateData, fallbacks, hedge, failover, signal);
+
+      return clauseScreening ? applyClauseScreening(result, clauseScreening) : result;
     } catch (error: any) {
+      if (signal?.aborted) throw new AnalysisCancelledError();
+      // Callers reschedule work on an open circuit, so keep the error type
+      if (error instanceof CircuitOpenError) throw error;
       throw new Error(`AI Analysis failed: ${error.message}`);
     }
   }
 
+  private async runProvider(
+    provider: string,
+    model: string,
+    content: string,
+    analysisType: string,
+    apiKey: string | undefined,
+    templateData: any,
+    signal?: AbortSignal
+  ): Promise<AnalysisResult> {
+    switch (provider) {
+      case 'openai':
+      case 'anthropic':
+      case 'gemini':
+        // Fail fast while the provider/model circuit is open
+        return await providerBreakers.get(provider, model).execute(async () => {
+          if (provider === 'openai') return await this.analyzeWithOpenAI(content, analysisType, apiKey, templateData, signal);
+          if (provider === 'anthropic') return await this.analyzeWithAnthropic(content, analysisType, apiKey, templateData, signal);
+          return await this.analyzeWithGemini(content, analysisType, apiKey, templateData, signal);
+        }, signal);
+      case 'free':
+        return await this.analyzeWithFreeAI(content, analysisType, templateData);
+      default:
+        throw new Error(`Unsupported AI provider: ${provider}`);
+    }
+  }
+
+  private async runProviderTimed(
+    provider: string,
+    model: string,
+    content: string,
+    analysisType: string,
+    apiKey: string | undefined,
+    templateData: any,
+    signal?: AbortSignal
+  ): Promise<AnalysisResult> {
+    const startedAt = Date.now();
+    const result = await this.runProvider(provider, model, content, analysisType, apiKey, templateData, signal);
+    providerLatency.record(provider, Date.now() - startedAt);
+    return result;
+  }
+
+  isValidResult(result: AnalysisResult | undefined): boolean {
+    return !!result && typeof result.summary === 'string' && !!result.riskLevel;
+  }
+
+  // Delay before hedging: the provider's rolling p95 once we have enough samples
+  private getHedgeDelay(provider: string): number {
+    if (providerLatency.sampleCount(provider) < HEDGE_MIN_SAMPLES) {
+      return HEDGE_DEFAULT_DELAY_MS;
+    }
+    return Math.max(HEDGE_MIN_DELAY_MS, providerLatency.percentile(provider, 95) || HEDGE_DEFAULT_DELAY_MS);
+  }
+
+  /**
+   * Run the primary provider and, depending on the policy, race it against a
+   * fallback provider once it exceeds its p95 (hedge) or after it errors
+   * (failover). The first valid result wins and every other call is aborted.
+   */
+  private analyzeWithHedging(
+    provider: string,
+    model: string,
+    content: string,
+    analysisType: string,
+    apiKey: string | undefined,
+    templateData: any,
+    fallbacks: string[],
+    hedge: boolean,
+    failover: boolean,
+    signal?: AbortSignal
+  ): Promise<AnalysisResult> {
+    this.hedgingStats.requests++;
+
+    return new Promise<AnalysisResult>((resolve, reject) => {
+      const pending = [provider, ...fallbacks];
+      const running = new Map<string, { controller: AbortController; startedAt: number }>();
+      const errors: string[] = [];
+      const circuitErrors: CircuitOpenError[] = [];
+      const execution: ProviderExecution = { provider, hedged: false, failedOver: false, attempts: [], extraCredits: 0 };
+      let settled = false;
+      let hedgeTimer: NodeJS.Timeout | undefined;
+
+      const settle = (won: boolean) => {
+        settled = true;
+        if (hedgeTimer) clearTimeout(hedgeTimer);
+
+        // Cancel the losers
+        const now = Date.now();
+        running.forEach((attempt, other) => {
+          attempt.controller.abort();
+          const durationMs = now - attempt.startedAt;
+          execution.attempts.push({ provider: other, outcome: 'cancelled', durationMs });
+          // A loser took at least this long; leaving it out would bias p95 low and make hedges fire ever sooner
+          if (won) providerLatency.record(other, durationMs);
+        });
+        running.clear();
+
+        // The user pays for the provider they picked; anything else is hedging overhead
+        execution.extraCredits = execution.attempts
+          .filter(attempt => attempt.provider !== provider)
+          .reduce((total, attempt) => total + this.getProviderCredits(PROVIDER_CREDIT_KEYS[attempt.provider], analysisType), 0);
+        this.hedgingStats.extraCredits += execution.extraCredits;
+      };
+
+      const launch = (): boolean => {
+        const next = pending.shift();
+        if (!next) return false;
+
+        const controller = new AbortController();
+        const startedAt = Date.now();
+        running.set(next, { controller, startedAt });
+
+        // The user's own key and model choice only apply to the provider they belong to
+        const providerKey = next === provider ? apiKey : undefined;
+        const providerModel = next === provider ? model : DEFAULT_PROVIDER_MODELS[next];
+
+        this.runProvider(next, providerModel, content, analysisType, providerKey, templateData, controller.signal)
+          .then(result => {
+            if (settled) return;
+            if (!this.isValidResult(result)) {
+              throw new Error('Invalid analysis result');
+            }
+
+            const durationMs = Date.now() - startedAt;
+            providerLatency.record(next, durationMs);
+            running.delete(next);
+            execution.provider = next;
+            execution.attempts.push({ provider: next, outcome: 'won', durationMs });
+            if (next !== provider) this.hedgingStats.secondaryWins++;
+
+            settle(true);
+            resolve({ ...result, execution });
+          })
+          .catch((error: any) => {
+            if (settled) return;
+
+            running.delete(next);
+            execution.attempts.push({ provider: next, outcome: 'failed', durationMs: Date.now() - startedAt, reason: error.message });
+            errors.push(`${next}: ${error.message}`);
+            if (error instanceof CircuitOpenError) circuitErrors.push(error);
+            console.warn(`⚠️ Provider ${next} failed: ${error.message}`);
+
+            if (failover && launch()) {
+              execution.failedOver = true;
+              this.hedgingStats.failovers++;
+              return;
+            }
+            if (running.size === 0) {
+              settle(false);
+              // Every provider was short-circuited: surface the earliest retry time
+              if (circuitErrors.length === execution.attempts.length) {
+                reject(circuitErrors.sort((a, b) => a.retryAt.getTime() - b.retryAt.getTime())[0]);
+              } else {
+                reject(new Error(errors.join('; ')));
+              }
+            }
+          });
+
+        return true;
+      };
+
+      // Caller cancellation aborts every attempt still running
+      signal?.addEventListener('abort', () => {
+        if (settled) return;
+        settle(false);
+        reject(new AnalysisCancelledError());
+      }, { once: true });
+
+      launch();
+
+      if (hedge) {
+        const delay = this.getHedgeDelay(provider);
+        hedgeTimer = setTimeout(() => {
+          if (settled || running.size === 0) return;
+          if (launch()) {
+            execution.hedged = true;
+            this.hedgingStats.hedgesFired++;
+            console.log(`🔄 Hedging ${provider} after ${delay}ms`);
+          }
+        }, delay);
+      }
+    });
+  }
+
+  getCircuitBreakerStats() {
+    return providerBreakers.getStats();
+  }
+
+  resetCircuitBreaker(key: string): boolean {
+    return providerBreakers.reset(key);
+  }
+
+  getHedgingStats() {
+    return { ...this.hedgingStats, latency: providerLatency.getStats() };
+  }
+
   // Helper method to get analysis type display name and description
   getAnalysisTypeInfo(analysisType: string): { name: string; description: string; credits: string } {
     const typeInfo = {
@@ -0,0 +1,111 @@
+import { storage } from "../storage";
+
+const CACHE_MAX_ENTRIES = parseInt(process.env.API_KEY_CACHE_MAX_ENTRIES || '1000', 10);
+// Also bounds how long another instance can keep using a key changed elsewhere
+const CACHE_TTL_MS = parseInt(process.env.API_KEY_CACHE_TTL_MS || '300000', 10);
+
+interface CacheEntry {
+  apiKey: string | undefined;
+  expiresAt: number;
+}
+
+/**
+ * In-memory cache of resolved provider API keys: the user's own key per
+ * (user, provider) and the decrypted system key per provider. Misses are cached
+ * too, since most users have no key of their own. Decrypted values only live in
+ * this process; nothing is written back anywhere.
+ *
+ * Routes that change keys (/api/ai-providers, /api/admin/system-api-keys)
+ * invalidate the affected entries; other instances pick the change up within
+ * API_KEY_CACHE_TTL_MS.
+ */
+class ApiKeyCache {
+  // Map iteration order doubles as recency order (oldest first)
+  private cache = new Map<string, CacheEntry>();
+  // Concurrent lookups of the same key share one query
+  private inFlight = new Map<string, Promise<string | undefined>>();
+  private stats = { hits: 0, misses: 0, evictions: 0, invalidations: 0 };
+  // Bumped on every invalidation so loads started before it are not cached
+  private generation = 0;
+
+  async getUserKey(userId: string, provider: string): Promise<string | undefined> {
+    return this.resolve(`user:${userId}:${provider}`, async () => {
+      const providerConfig = await storage.getAiProvider(userId, provider);
+      return providerConfig?.apiKey || undefined;
+    });
+  }
+
+  async getSystemKey(provider: string): Promise<string | undefined> {
+    return this.resolve(`system:${provider}`, () => storage.getSystemApiKeyByProvider(provider));
+  }
+
+  invalidateUser(userId: string, provider?: string) {
+    this.invalidatePrefix(provider ? `user:${userId}:${provider}` : `user:${userId}:`);
+  }
+
+  invalidateSystem(provider?: string) {
+    this.invalidatePrefix(provider ? `system:${provider}` : 'system:');
+  }
+
+  private async resolve(key: string, load: () => Promise<string | undefined>): Promise<string | undefined> {
+    const entry = this.cache.get(key);
+    if (entry && entry.expiresAt > Date.now()) {
+      this.stats.hits++;
+      // Refresh recency
+      this.cache.delete(key);
+      this.cache.set(key, entry);
+      return entry.apiKey;
+    }
+
+    let pending = this.inFlight.get(key);
+    if (!pending) {
+      this.stats.misses++;
+      const generation = this.generation;
+      const loading = load().then(apiKey => {
+        // An invalidation while loading means this value may already be stale
+        if (generation === this.generation) this.store(key, apiKey);
+        return apiKey;
+      }).finally(() => {
+        if (this.inFlight.get(key) === loading) this.inFlight.delete(key);
+      });
+      pending = loading;
+      this.inFlight.set(key, pending);
+    }
+    return pending;
+  }
+
+  private store(key: string, apiKey: string | undefined) {
+    this.cache.delete(key);
+    this.cache.set(key, { apiKey, expiresAt: Date.now() + CACHE_TTL_MS });
+
+    for (const cachedKey of this.cache.keys()) {
+      if (this.cache.size <= CACHE_MAX_ENTRIES) break;
+      this.cache.delete(cachedKey);
+      this.stats.evictions++;
+    }
+  }
+
+  private invalidatePrefix(prefix: string) {
+    this.generation++;
+    for (const key of Array.from(this.cache.keys())) {
+      if (key.startsWith(prefix)) {
+        this.cache.delete(key);
+        this.stats.invalidations++;
+      }
+    }
+    for (const key of Array.from(this.inFlight.keys())) {
+      if (key.startsWith(prefix)) this.inFlight.delete(key);
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      entries: this.cache.size,
+      maxEntries: CACHE_MAX_ENTRIES,
+      ttlMs: CACHE_TTL_MS,
+    };
+  }
+}
+
+export const apiKeyCache = new ApiKeyCache();
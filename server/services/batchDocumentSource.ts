@@ -0,0 +1,80 @@
+import fs from "fs";
+import type { BatchDocument, BatchDocumentMetadata } from "@shared/schema";
+import { textExtraction, TIER_WORD_BUDGETS } from "./textExtraction";
+import { objectStorage } from "./objectStorage";
+import { tempFiles } from "./tempFiles";
+
+export type BatchDocumentSourceMetadata = BatchDocumentMetadata & { filePath?: string; tempFile?: boolean };
+
+/**
+ * Text of a batch document, wherever it was ingested from: inline content sent
+ * through the NDJSON stream, an object uploaded through a signed URL, or a file
+ * written to disk by /api/batch/create. Files and objects go through the shared
+ * extraction service with the paid word budget.
+ */
+export async function loadBatchDocumentText(document: BatchDocument): Promise<string> {
+  const metadata = document.metadata as BatchDocumentSourceMetadata;
+
+  if (typeof metadata?.content === 'string') {
+    return metadata.content;
+  }
+
+  if (metadata?.objectKey) {
+    const objectBuffer = await objectStorage.download(metadata.objectKey);
+    console.log(`📝 Fetched object: ${document.originalFileName} (${objectBuffer.length} bytes)`);
+    const { text } = await textExtraction.extract(objectBuffer, document.fileMimeType, {
+      maxWords: TIER_WORD_BUDGETS.paid
+    });
+    return text;
+  }
+
+  const filePath = metadata?.filePath;
+  if (!filePath) {
+    throw new Error('File path not found in document metadata');
+  }
+  if (!fs.existsSync(filePath)) {
+    throw new Error(`File not found on disk: ${filePath}`);
+  }
+
+  // Read file content from disk - SECURE: No more base64 in memory
+  let fileBuffer: Buffer;
+  try {
+    fileBuffer = await fs.promises.readFile(filePath);
+    console.log(`📝 Read file from disk: ${document.originalFileName} (${fileBuffer.length} bytes)`);
+  } catch (readError: any) {
+    throw new Error(`Failed to read file ${filePath}: ${readError.message}`);
+  }
+
+  // Extract plain text the same way /api/analyze does (PDF/DOCX parsing, cached by hash)
+  const { text } = await textExtraction.extract(fileBuffer, document.fileMimeType, {
+    maxWords: TIER_WORD_BUDGETS.paid
+  });
+  return text;
+}
+
+/**
+ * Drop the document's temporary source once it is no longer needed: the temp
+ * file of a multipart upload or the uploaded object.
+ */
+export async function releaseBatchDocumentSource(document: BatchDocument): Promise<void> {
+  const metadata = document.metadata as BatchDocumentSourceMetadata;
+
+  if (metadata?.tempFile && metadata?.filePath) {
+    try {
+      if (await tempFiles.remove(metadata.filePath)) {
+        console.log(`🗑️ Cleaned up temp file: ${metadata.filePath}`);
+      }
+    } catch (error) {
+      console.error(`❌ Failed to cleanup temp file ${metadata.filePath}:`, error);
+    }
+  }
+
+  if (metadata?.objectKey && metadata?.deleteObjectAfterProcessing) {
+    try {
+      await objectStorage.remove(metadata.objectKey);
+      console.log(`🗑️ Removed uploaded object: ${metadata.objectKey}`);
+    } catch (error) {
+      console.error(`❌ Failed to remove uploaded object ${metadata.objectKey}:`, error);
+    }
+  }
+}
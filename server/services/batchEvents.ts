@@ -0,0 +1,118 @@
+import { EventEmitter } from "events";
+import { randomUUID } from "crypto";
+import type { PoolClient } from "@neondatabase/serverless";
+import { pool } from "../db";
+
+const CHANNEL = 'batch_progress';
+const RECONNECT_DELAY_MS = 5000;
+
+export interface BatchProgressEvent {
+  type: 'document' | 'progress' | 'status';
+  batchJobId: string;
+  userId: string;
+  documentId?: string;
+  fileName?: string;
+  status?: string;
+  error?: string;
+  processedDocuments?: number;
+  failedDocuments?: number;
+  totalDocuments?: number;
+  progressPercentage?: number;
+  at: string;
+}
+
+/**
+ * Batch progress channel. Events are delivered to local subscribers right away
+ * and forwarded through Postgres NOTIFY so SSE clients connected to other
+ * server processes see them too. Events carrying our own instance id are
+ * ignored when they come back through LISTEN.
+ */
+class BatchEventBus {
+  private emitter = new EventEmitter();
+  private instanceId = randomUUID();
+  private listenClient: PoolClient | null = null;
+  private starting = false;
+  private stopped = false;
+
+  constructor() {
+    // One listener per open SSE connection
+    this.emitter.setMaxListeners(0);
+  }
+
+  async start() {
+    if (this.listenClient || this.starting) return;
+    this.starting = true;
+    this.stopped = false;
+
+    try {
+      const client = await pool.connect();
+      client.on('notification', (message: any) => this.handleNotification(message.payload));
+      client.on('error', (error: Error) => {
+        console.error('❌ Batch events LISTEN connection error:', error.message);
+        this.scheduleReconnect();
+      });
+      await client.query(`LISTEN ${CHANNEL}`);
+      this.listenClient = client;
+      console.log(`✅ Listening for batch progress on channel ${CHANNEL}`);
+    } catch (error: any) {
+      console.error('❌ Failed to start batch events listener:', error.message);
+      this.scheduleReconnect();
+    } finally {
+      this.starting = false;
+    }
+  }
+
+  private scheduleReconnect() {
+    if (this.listenClient) {
+      this.listenClient.release(true);
+      this.listenClient = null;
+    }
+    if (this.stopped) return;
+    setTimeout(() => this.start(), RECONNECT_DELAY_MS);
+  }
+
+  stop() {
+    this.stopped = true;
+    if (this.listenClient) {
+      this.listenClient.release();
+      this.listenClient = null;
+    }
+  }
+
+  private handleNotification(payload?: string) {
+    if (!payload) return;
+    try {
+      const { origin, event } = JSON.parse(payload);
+      if (origin === this.instanceId) return;
+      this.emitter.emit('event', event as BatchProgressEvent);
+    } catch (error) {
+      console.warn('⚠️ Ignoring malformed batch progress notification:', error);
+    }
+  }
+
+  publish(event: Omit<BatchProgressEvent, 'at'>) {
+    const fullEvent: BatchProgressEvent = { ...event, at: new Date().toISOString() };
+    this.emitter.emit('event', fullEvent);
+
+    // Cross-process fan-out is best effort; local subscribers already have the event
+    pool.query('SELECT pg_notify($1, $2)', [CHANNEL, JSON.stringify({ origin: this.instanceId, event: fullEvent })])
+      .catch((error: any) => console.warn(`⚠️ Failed to NOTIFY batch progress: ${error.message}`));
+  }
+
+  subscribe(filter: (event: BatchProgressEvent) => boolean, listener: (event: BatchProgressEvent) => void): () => void {
+    const handler = (event: BatchProgressEvent) => {
+      if (filter(event)) listener(event);
+    };
+    this.emitter.on('event', handler);
+    return () => this.emitter.off('event', handler);
+  }
+
+  getStatus() {
+    return {
+      listening: this.listenClient !== null,
+      subscribers: this.emitter.listenerCount('event'),
+    };
+  }
+}
+
+export const batchEvents = new BatchEventBus();
@@ -0,0 +1,222 @@
+import { StringDecoder } from "string_decoder";
+import { z } from "zod";
+import { storage } from "../storage";
+import { aiService } from "./ai";
+import { defaultRouteModel } from "./modelRouter";
+import type { InsertBatchDocument } from "@shared/schema";
+
+// Documents per batch job; a group is flushed as soon as it reaches either limit
+const INGEST_BATCH_SIZE = parseInt(process.env.STREAM_INGEST_BATCH_SIZE || '100', 10);
+const INGEST_BATCH_BYTES = parseInt(process.env.STREAM_INGEST_BATCH_BYTES || String(8 * 1024 * 1024), 10);
+// A single document line; the request itself has no size limit
+const INGEST_MAX_LINE_BYTES = parseInt(process.env.STREAM_INGEST_MAX_LINE_BYTES || String(10 * 1024 * 1024), 10);
+
+export const streamDocumentSchema = z.object({
+  title: z.string().min(1).max(500),
+  content: z.string().min(1),
+  analysisType: z.enum(['general', 'contract', 'legal', 'compliance']),
+  provider: z.enum(['openai', 'anthropic', 'gemini']),
+  model: z.string().min(1).optional(),
+  templateId: z.string().min(1).optional(),
+});
+
+export type StreamDocument = z.infer<typeof streamDocumentSchema>;
+
+export type IngestEvent =
+  | { type: 'batch'; batchJobId: string; documents: number; lines: [number, number]; aiProvider: string; aiModel: string; analysisType: string; credits: number }
+  | { type: 'error'; line?: number; lines?: number[]; message: string }
+  | { type: 'summary'; accepted: number; rejected: number; batchJobs: string[]; creditsReserved: number };
+
+interface PendingGroup {
+  aiProvider: string;
+  aiModel: string;
+  analysisType: string;
+  templateId?: string;
+  documents: Array<{ line: number; title: string; content: string; bytes: number }>;
+  bytes: number;
+}
+
+/**
+ * Ingests newline-delimited JSON documents for high-volume API clients. Lines
+ * are parsed as they arrive and grouped by provider, model, analysis type and
+ * template; every full group becomes its own batch job (credits reserved, rows
+ * written, queue job created) before more of the body is read, so the client is
+ * held back by the database instead of the server buffering the whole upload.
+ * Document text is stored inline in the batch document metadata.
+ */
+class BatchIngestService {
+  async ingest(
+    userId: string,
+    body: AsyncIterable<Buffer | string>,
+    emit: (event: IngestEvent) => Promise<void>,
+    options: { name?: string } = {}
+  ) {
+    const name = options.name || `Stream ${new Date().toISOString()}`;
+    const groups = new Map<string, PendingGroup>();
+    const templates = new Map<string, boolean>();
+    const summary = { accepted: 0, rejected: 0, batchJobs: [] as string[], creditsReserved: 0 };
+    const decoder = new StringDecoder('utf8');
+    let buffered = '';
+    let lineNumber = 0;
+    let skippingLongLine = false;
+
+    const handleLine = async (raw: string) => {
+      lineNumber++;
+      const line = raw.trim();
+      if (!line) return;
+
+      let document: StreamDocument;
+      try {
+        document = streamDocumentSchema.parse(JSON.parse(line));
+      } catch (error: any) {
+        summary.rejected++;
+        const message = error instanceof z.ZodError
+          ? error.errors.map(issue => `${issue.path.join('.')}: ${issue.message}`).join('; ')
+          : `Invalid JSON: ${error.message}`;
+        return emit({ type: 'error', line: lineNumber, message });
+      }
+
+      if (document.templateId) {
+        if (!templates.has(document.templateId)) {
+          templates.set(document.templateId, !!(await storage.getTemplateWithPrompts(document.templateId)));
+        }
+        if (!templates.get(document.templateId)) {
+          summary.rejected++;
+          return emit({ type: 'error', line: lineNumber, message: "Template not found" });
+        }
+      }
+
+      const aiModel = document.model || defaultRouteModel(document.provider)!;
+      const key = [document.provider, aiModel, document.analysisType, document.templateId || ''].join('|');
+      let group = groups.get(key);
+      if (!group) {
+        group = { aiProvider: document.provider, aiModel, analysisType: document.analysisType, templateId: document.templateId, documents: [], bytes: 0 };
+        groups.set(key, group);
+      }
+
+      const bytes = Buffer.byteLength(document.content, 'utf-8');
+      group.documents.push({ line: lineNumber, title: document.title, content: document.content, bytes });
+      group.bytes += bytes;
+
+      if (group.documents.length >= INGEST_BATCH_SIZE || group.bytes >= INGEST_BATCH_BYTES) {
+        groups.delete(key);
+        await this.flushGroup(userId, name, group, summary, emit);
+      }
+    };
+
+    for await (const chunk of body) {
+      buffered += typeof chunk === 'string' ? chunk : decoder.write(chunk);
+
+      let newline: number;
+      while ((newline = buffered.indexOf('\n')) !== -1) {
+        const line = buffered.slice(0, newline);
+        buffered = buffered.slice(newline + 1);
+        if (skippingLongLine) {
+          // Tail of an oversized line that was already rejected
+          skippingLongLine = false;
+          continue;
+        }
+        await handleLine(line);
+      }
+
+      if (!skippingLongLine && Buffer.byteLength(buffered, 'utf-8') > INGEST_MAX_LINE_BYTES) {
+        lineNumber++;
+        summary.rejected++;
+        skippingLongLine = true;
+        await emit({ type: 'error', line: lineNumber, message: `Line exceeds ${INGEST_MAX_LINE_BYTES} bytes` });
+      }
+      if (skippingLongLine) buffered = '';
+    }
+
+    buffered += decoder.end();
+    if (buffered && !skippingLongLine) await handleLine(buffered);
+
+    for (const group of groups.values()) {
+      await this.flushGroup(userId, name, group, summary, emit);
+    }
+
+    await emit({ type: 'summary', ...summary });
+    console.log(`📥 Stream ingestion for user ${userId}: ${summary.accepted} accepted, ${summary.rejected} rejected, ${summary.batchJobs.length} batch jobs`);
+    return summary;
+  }
+
+  private async flushGroup(
+    userId: string,
+    name: string,
+    group: PendingGroup,
+    summary: { accepted: number; rejected: number; batchJobs: string[]; creditsReserved: number },
+    emit: (event: IngestEvent) => Promise<void>
+  ) {
+    const { aiProvider, aiModel, analysisType, templateId, documents } = group;
+    const lines = documents.map(doc => doc.line);
+    const creditsPerDocument = aiService.getProviderCredits(`${aiProvider}-${aiModel}`, analysisType);
+    const totalCredits = creditsPerDocument * documents.length;
+    const jobName = `${name} #${summary.batchJobs.length + 1}`;
+
+    try {
+      await storage.deductUserCredits(userId, totalCredits, `Batch processing reservation: ${jobName}`);
+    } catch (creditError: any) {
+      summary.rejected += documents.length;
+      return emit({ type: 'error', lines, message: creditError.message });
+    }
+
+    let batchJobId: string | undefined;
+    try {
+      const batchJob = await storage.createBatchJob(userId, {
+        name: jobName,
+        description: `NDJSON stream, lines ${lines[0]}-${lines[lines.length - 1]}`,
+        analysisType,
+        templateId: templateId || null,
+        aiProvider,
+        aiModel,
+        totalDocuments: documents.length,
+        totalCreditsEstimated: totalCredits,
+        metadata: { executionMode: 'interactive', source: 'stream' }
+      });
+      batchJobId = batchJob.id;
+
+      await storage.createBatchDocuments(documents.map((doc, index): InsertBatchDocument => ({
+        batchJobId: batchJob.id,
+        originalFileName: doc.title,
+        fileSize: doc.bytes,
+        fileMimeType: 'text/plain',
+        sortOrder: index,
+        metadata: { content: doc.content, line: doc.line }
+      })));
+
+      await storage.createQueueJob({
+        jobType: 'batch_processing',
+        jobData: { batchJobId: batchJob.id, userId, aiProvider, aiModel, analysisType, templateId, executionMode: 'interactive' },
+        priority: 1
+      });
+    } catch (error: any) {
+      console.error('❌ Stream batch creation error:', error);
+      if (batchJobId) {
+        await storage.updateBatchJobStatus(batchJobId, 'failed', error.message).catch(() => {});
+      }
+      try {
+        await storage.refundUserCredits(userId, totalCredits, `Batch creation failed - refund for: ${jobName}`);
+      } catch (refundError) {
+        console.error('❌ Failed to refund credits after batch creation failure:', refundError);
+      }
+      summary.rejected += documents.length;
+      return emit({ type: 'error', lines, message: error.message });
+    }
+
+    summary.accepted += documents.length;
+    summary.batchJobs.push(batchJobId!);
+    summary.creditsReserved += totalCredits;
+    await emit({
+      type: 'batch',
+      batchJobId: batchJobId!,
+      documents: documents.length,
+      lines: [lines[0], lines[lines.length - 1]],
+      aiProvider,
+      aiModel,
+      analysisType,
+      credits: totalCredits
+    });
+  }
+}
+
+export const batchIngest = new BatchIngestService();
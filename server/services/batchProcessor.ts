@@ -1,7 +1,12 @@
 import { storage } from "../storage";
-import { aiService } from "./ai";
-import type { QueueJob, BatchJob, BatchDocument, BatchJobMetadata, BatchDocumentMetadata } from "@shared/schema";
-import fs from "fs";
+import { aiService, AnalysisCancelledError, type AnalysisResult } from "./ai";
+import { providerBreakers, CircuitOpenError } from "./circuitBreaker";
+import { batchEvents } from "./batchEvents";
+import { batchStatusWriter } from "./batchStatusWriter";
+import { apiKeyCache } from "./apiKeyCache";
+import { loadBatchDocumentText, releaseBatchDocumentSource } from "./batchDocumentSource";
+import { providerBatchService, PROVIDER_BATCH_POLL_JOB } from "./providerBatch";
+import type { QueueJob, BatchJob, BatchDocument, BatchJobMetadata } from "@shared/schema";
 
 interface BatchProcessingJob {
   batchJobId: string;
@@ -10,6 +15,7 @@ interface BatchProcessingJob {
   aiModel: string;
   analysisType: string;
   templateId?: string;
+  executionMode?: 'interactive' | 'economy';
 }
 
 class BatchProcessor {
@@ -17,9 +23,33 @@ class BatchProcessor {
   private processingInterval: NodeJS.Timeout | null = null;
   private maxConcurrentJobs = 5; // Process up to 5 documents in parallel
   private pollingInterval = 5000; // Check for new jobs every 5 seconds
+  // Abort controllers for batch jobs running in this process
+  private activeJobs = new Map<string, AbortController>();
+  // Cancellations that arrived before the job registered its controller
+  private pendingCancellations = new Set<string>();
 
   constructor() {
     this.startPolling();
+
+    // Cancellation requests reach us through the batch event channel, including
+    // ones made on another server process (LISTEN/NOTIFY)
+    batchEvents.subscribe(
+      event => event.type === 'status' && event.status === 'cancelled',
+      event => this.abortBatchJob(event.batchJobId)
+    );
+  }
+
+  private abortBatchJob(batchJobId: string) {
+    const controller = this.activeJobs.get(batchJobId);
+    if (controller) {
+      if (!controller.signal.aborted) {
+        console.log(`⏹️ Cancelling in-flight batch job: ${batchJobId}`);
+        controller.abort();
+      }
+    } else {
+      this.pendingCancellations.add(batchJobId);
+      setTimeout(() => this.pendingCancellations.delete(batchJobId), 60 * 1000);
+    }
   }
 
   private startPolling() {
@@ -54,7 +84,7 @@ class BatchProcessor {
   }
 
   private async processQueueJob(queueJob: QueueJob) {
-    if (queueJob.jobType !== 'batch_processing') {
+    if (queueJob.jobType !== 'batch_processing' && queueJob.jobType !== PROVIDER_BATCH_POLL_JOB) {
       console.log(`⏭️ Skipping non-batch job: ${queueJob.jobType}`);
       return;
     }
@@ -65,6 +95,16 @@ class BatchProcessor {
       // Update queue job status to processing
       await storage.updateQueueJobStatus(queueJob.id, 'processing');
 
+      if (queueJob.jobType === PROVIDER_BATCH_POLL_JOB) {
+        // Economy batches: the job stays queued (rescheduled) until the provider finishes
+        const finished = await providerBatchService.poll(queueJob);
+        if (finished) {
+          await storage.updateQueueJobStatus(queueJob.id, 'completed');
+          console.log(`✅ Completed queue job: ${queueJob.id}`);
+        }
+        return;
+      }
+
       const jobData = queueJob.jobData as BatchProcessingJob;
       await this.processBatchJob(jobData);
 
@@ -72,6 +112,18 @@ class BatchProcessor {
       await storage.updateQueueJobStatus(queueJob.id, 'completed');
       console.log(`✅ Completed queue job: ${queueJob.id}`);
     } catch (error: any) {
+      // Provider circuit is open: put the job back for after the cool-down instead of failing it
+      if (error instanceof CircuitOpenError) {
+        console.log(`⏸️ Deferring queue job ${queueJob.id} until ${error.retryAt.toISOString()}: ${error.message}`);
+        await storage.rescheduleQueueJob(queueJob.id, error.retryAt, error.message);
+        const jobData = queueJob.jobData as BatchProcessingJob;
+        if (jobData.batchJobId) {
+          await storage.updateBatchJobStatus(jobData.batchJobId, 'pending');
+          batchEvents.publish({ type: 'status', batchJobId: jobData.batchJobId, userId: jobData.userId, status: 'pending', error: error.message });
+        }
+        return;
+      }
+
       console.error(`❌ Failed to process queue job ${queueJob.id}:`, error);
       
       // Update queue job with error
@@ -81,6 +133,7 @@ class BatchProcessor {
       const jobData = queueJob.jobData as BatchProcessingJob;
       if (jobData.batchJobId) {
         await storage.updateBatchJobStatus(jobData.batchJobId, 'failed', error.message);
+        batchEvents.publish({ type: 'status', batchJobId: jobData.batchJobId, userId: jobData.userId, status: 'failed', error: error.message });
       }
     } finally {
       this.isProcessing = false;
@@ -88,7 +141,7 @@ class BatchProcessor {
   }
 
   private async processBatchJob(jobData: BatchProcessingJob) {
-    const { batchJobId, userId, aiProvider, aiModel, analysisType, templateId } = jobData;
+    const { batchJobId, userId } = jobData;
 
     console.log(`🚀 Starting batch processing for job: ${batchJobId}`);
 
@@ -103,8 +156,43 @@ class BatchProcessor {
       throw new Error(`No documents found for batch job: ${batchJobId}`);
     }
 
+    // Cancelled while still queued
+    if (batchJob.status === 'cancelled') {
+      await this.finalizeCancelledBatch(batchJobId, userId);
+      return;
+    }
+
+    // Economy mode hands the whole batch to the provider's batch API
+    if (jobData.executionMode === 'economy' && providerBatchService.supports(jobData.aiProvider)) {
+      await storage.updateBatchJobStatus(batchJobId, 'processing');
+      await providerBatchService.submit(batchJob, batchDocuments);
+      return;
+    }
+
+    const controller = new AbortController();
+    this.activeJobs.set(batchJobId, controller);
+    if (this.pendingCancellations.delete(batchJobId)) {
+      controller.abort();
+    }
+
+    try {
+      await this.runBatchJob(jobData, batchJob, batchDocuments, controller.signal);
+    } finally {
+      this.activeJobs.delete(batchJobId);
+    }
+  }
+
+  private async runBatchJob(
+    jobData: BatchProcessingJob,
+    batchJob: BatchJob,
+    batchDocuments: BatchDocument[],
+    signal: AbortSignal
+  ) {
+    const { batchJobId, userId, aiProvider, aiModel, analysisType, templateId } = jobData;
+
     // Update batch job status to processing
     await storage.updateBatchJobStatus(batchJobId, 'processing');
+    batchEvents.publish({ type: 'status', batchJobId, userId, status: 'processing', totalDocuments: batchDocuments.length });
 
     // Get user to check credits and API keys
     const user = await storage.getUser(userId);
@@ -115,8 +203,7 @@ class BatchProcessor {
     // Get user's API key for the provider if needed
     let userApiKey: string | undefined;
     if (aiProvider !== 'free') {
-      const providerConfig = await storage.getAiProvider(userId, aiProvider);
-      userApiKey = providerConfig?.apiKey;
+      userApiKey = await apiKeyCache.getUserKey(userId, aiProvider);
     }
 
     // Get template data if specified
@@ -125,16 +212,28 @@ class BatchProcessor {
       templateData = await storage.getTemplateWithPrompts(templateId);
     }
 
-    let totalCreditsUsed = 0;
-    let processedCount = 0;
-    let failedCount = 0;
+    // Documents settled by an earlier run (e.g. before a circuit-breaker deferral) are kept
+    const completedDocuments = batchDocuments.filter(doc => doc.status === 'completed');
+    const remainingDocuments = batchDocuments.filter(doc => doc.status === 'pending' || doc.status === 'processing');
+
+    let totalCreditsUsed = completedDocuments.reduce((total, doc) => total + (doc.creditsUsed || 0), 0);
+    let processedCount = completedDocuments.length;
+    let failedCount = batchDocuments.filter(doc => doc.status === 'failed').length;
 
     try {
       // Process documents in parallel batches
       const chunkSize = this.maxConcurrentJobs;
-      const documentChunks = this.chunkArray(batchDocuments, chunkSize);
+      const documentChunks = this.chunkArray(remainingDocuments, chunkSize);
 
       for (const chunk of documentChunks) {
+        if (signal.aborted) break;
+
+        // Don't tie up worker slots on a provider that is known to be down
+        const breaker = providerBreakers.get(aiProvider, aiModel);
+        if (breaker.getState() === 'open') {
+          throw new CircuitOpenError(breaker.key, breaker.getRetryAt());
+        }
+
         const promises = chunk.map(doc => this.processDocument(
           doc,
           userId,
@@ -142,10 +241,15 @@ class BatchProcessor {
           aiModel,
           analysisType,
           userApiKey,
-          templateId
+          templateId,
+          signal
         ));
 
         const results = await Promise.allSettled(promises);
+        let deferredError: CircuitOpenError | null = null;
+
+        // Document states for this chunk must be durable before the job-level counters move
+        await batchStatusWriter.flush();
         
         // Process results
         for (let i = 0; i < results.length; i++) {
@@ -157,10 +261,16 @@ class BatchProcessor {
             totalCreditsUsed += creditsUsed;
             processedCount++;
             console.log(`✅ Processed document: ${document.originalFileName}`);
+          } else if (result.reason instanceof AnalysisCancelledError) {
+            // Document was marked skipped; counted when the cancellation is finalized
+            continue;
+          } else if (result.reason instanceof CircuitOpenError) {
+            // Document was reset to pending; it is picked up again when the job is rescheduled
+            deferredError = result.reason;
           } else {
+            // The document itself was marked failed in processDocument
             failedCount++;
             console.error(`❌ Failed to process document ${document.originalFileName}:`, result.reason);
-            await storage.updateBatchDocumentStatus(document.id, 'failed', result.reason?.message || 'Processing failed');
           }
         }
 
@@ -175,6 +285,24 @@ class BatchProcessor {
             progressPercentage 
           } as BatchJobMetadata
         });
+        batchEvents.publish({
+          type: 'progress',
+          batchJobId,
+          userId,
+          processedDocuments: processedCount,
+          failedDocuments: failedCount,
+          totalDocuments: batchDocuments.length,
+          progressPercentage
+        });
+
+        if (deferredError) {
+          throw deferredError;
+        }
+      }
+
+      if (signal.aborted) {
+        await this.finalizeCancelledBatch(batchJobId, userId);
+        return;
       }
 
       // Determine final status
@@ -183,10 +311,23 @@ class BatchProcessor {
 
       // Update final batch job status
       await storage.updateBatchJobStatus(batchJobId, finalStatus);
+      batchEvents.publish({
+        type: 'status',
+        batchJobId,
+        userId,
+        status: finalStatus,
+        processedDocuments: processedCount,
+        failedDocuments: failedCount,
+        totalDocuments: batchDocuments.length,
+        progressPercentage: 100
+      });
 
       console.log(`🎉 Batch processing completed for ${batchJobId}: ${processedCount} success, ${failedCount} failed`);
 
     } catch (error: any) {
+      if (error instanceof CircuitOpenError) {
+        throw error;
+      }
       console.error(`❌ Batch processing failed for ${batchJobId}:`, error);
       await storage.updateBatchJobStatus(batchJobId, 'failed', error.message);
       throw error;
@@ -200,93 +341,143 @@ class BatchProcessor {
     aiModel: string,
     analysisType: string,
     userApiKey?: string,
-    templateId?: string
+    templateId?: string,
+    signal?: AbortSignal
   ): Promise<{ creditsUsed: number }> {
-    // UPDATED: Extract file metadata once for cleanup in finally block
-    const metadata = document.metadata as BatchDocumentMetadata & { filePath?: string; tempFile?: boolean };
+    // Deferred documents keep their file for the rescheduled run
+    let deferred = false;
     
     try {
-      // Update document status to processing
-      await storage.updateBatchDocumentStatus(document.id, 'processing');
+      // Update document status to processing (buffered, written with the chunk's other transitions)
+      batchStatusWriter.record(document.id, { status: 'processing' });
+      this.publishDocumentStatus(document, userId, 'processing');
 
-      const filePath = metadata?.filePath;
-      
-      if (!filePath) {
-        throw new Error('File path not found in document metadata');
-      }
-      
-      if (!fs.existsSync(filePath)) {
-        throw new Error(`File not found on disk: ${filePath}`);
-      }
-
-      // Read file content from disk - SECURE: No more base64 in memory
-      let content: string;
-      try {
-        const fileBuffer = await fs.promises.readFile(filePath);
-        content = fileBuffer.toString('utf-8');
-        console.log(`📝 Read file from disk: ${document.originalFileName} (${fileBuffer.length} bytes)`);
-      } catch (readError: any) {
-        throw new Error(`Failed to read file ${filePath}: ${readError.message}`);
-      }
+      const content = await loadBatchDocumentText(document);
 
       // Calculate credits needed
       const creditsNeeded = aiService.getProviderCredits(`${aiProvider}-${aiModel}`);
 
-      // Create document analysis record
-      const analysis = await storage.createDocumentAnalysis(userId, {
+      const analysisRecord = {
         title: `Batch: ${document.originalFileName}`,
         content,
         aiProvider,
         aiModel,
         analysisType,
         templateId: templateId || null,
-        result: {},
         creditsUsed: creditsNeeded,
-      });
+      };
 
+      let result: AnalysisResult;
       try {
         // Perform AI analysis
-        const result = await aiService.analyzeDocument(
+        result = await aiService.analyzeDocument(
           content,
           analysisType,
           aiProvider,
           aiModel,
           userApiKey,
-          templateId
+          templateId,
+          { signal }
         );
-
-        // Update analysis with result
-        await storage.updateDocumentAnalysisResult(analysis.id, result, "completed");
-
-        // Link batch document to analysis
-        await storage.linkBatchDocumentToAnalysis(document.id, analysis.id);
-
-        // Update document status to completed
-        await storage.updateBatchDocumentStatus(document.id, 'completed');
-
-        // FIXED: Credits were already deducted at batch creation, so don't deduct again
-        return { creditsUsed: creditsNeeded };
-
       } catch (analysisError: any) {
-        // Update analysis as failed
-        await storage.updateDocumentAnalysisResult(analysis.id, { error: analysisError.message }, "failed");
+        // Keep a failed analysis record for real provider errors; cancellations and
+        // circuit deferrals are not failures of this document
+        if (!(analysisError instanceof AnalysisCancelledError) && !(analysisError instanceof CircuitOpenError)) {
+          const failedAnalysis = await storage.createDocumentAnalysis(userId, {
+            ...analysisRecord,
+            result: { error: analysisError.message },
+          }, "failed");
+          analysisError.documentAnalysisId = failedAnalysis.id;
+        }
         throw analysisError;
       }
 
+      // Store the analysis with its result in a single insert
+      const analysis = await storage.createDocumentAnalysis(userId, { ...analysisRecord, result }, "completed");
+
+      // Link batch document to analysis and mark it completed (buffered)
+      batchStatusWriter.record(document.id, {
+        status: 'completed',
+        creditsUsed: creditsNeeded,
+        documentAnalysisId: analysis.id
+      });
+      this.publishDocumentStatus(document, userId, 'completed');
+
+      // FIXED: Credits were already deducted at batch creation, so don't deduct again
+      return { creditsUsed: creditsNeeded };
+
     } catch (error: any) {
+      if (error instanceof AnalysisCancelledError) {
+        batchStatusWriter.record(document.id, { status: 'skipped', errorMessage: 'Cancelled by user' });
+        this.publishDocumentStatus(document, userId, 'skipped', 'Cancelled by user');
+        throw error;
+      }
+      if (error instanceof CircuitOpenError) {
+        deferred = true;
+        batchStatusWriter.record(document.id, { status: 'pending', errorMessage: error.message });
+        this.publishDocumentStatus(document, userId, 'pending', error.message);
+        throw error;
+      }
       console.error(`❌ Error processing document ${document.originalFileName}:`, error);
-      await storage.updateBatchDocumentStatus(document.id, 'failed', error.message);
+      batchStatusWriter.record(document.id, {
+        status: 'failed',
+        errorMessage: error.message,
+        documentAnalysisId: error.documentAnalysisId
+      });
+      this.publishDocumentStatus(document, userId, 'failed', error.message);
       throw error;
     } finally {
       // REQUIRED: Always clean up temp file in finally block regardless of success/failure
       try {
-        await this.cleanupDocumentFile(document, metadata);
+        if (!deferred) await this.cleanupDocumentFile(document);
       } catch (cleanupError) {
         console.error(`❌ Failed to cleanup file in finally block:`, cleanupError);
       }
     }
   }
 
+  /**
+   * Settle a cancelled batch: skip documents that never started, remove their
+   * temp files and refund the credits reserved for them. Safe to call more
+   * than once; the refund is only applied the first time.
+   */
+  public async finalizeCancelledBatch(batchJobId: string, userId: string): Promise<number> {
+    await batchStatusWriter.flush();
+    const documents = await storage.getBatchDocuments(batchJobId);
+    const skippedCount = await storage.skipPendingBatchDocuments(batchJobId, 'Cancelled by user');
+
+    for (const doc of documents.filter(doc => doc.status === 'pending')) {
+      await this.cleanupDocumentFile(doc);
+    }
+
+    const refunded = await storage.refundUnusedBatchCredits(batchJobId);
+    await storage.updateBatchJobStatus(batchJobId, 'cancelled');
+
+    const completedCount = documents.filter(doc => doc.status === 'completed').length;
+    batchEvents.publish({
+      type: 'progress',
+      batchJobId,
+      userId,
+      processedDocuments: completedCount,
+      totalDocuments: documents.length
+    });
+
+    console.log(`⏹️ Batch job ${batchJobId} cancelled: ${skippedCount} documents skipped, ${refunded} credits refunded`);
+    return refunded;
+  }
+
+  private publishDocumentStatus(document: BatchDocument, userId: string, status: string, error?: string) {
+    batchEvents.publish({
+      type: 'document',
+      batchJobId: document.batchJobId,
+      userId,
+      documentId: document.id,
+      fileName: document.originalFileName,
+      status,
+      error
+    });
+  }
+
   private chunkArray<T>(array: T[], chunkSize: number): T[][] {
     const chunks: T[][] = [];
     for (let i = 0; i < array.length; i += chunkSize) {
@@ -296,17 +487,8 @@ class BatchProcessor {
   }
 
   // Helper method to clean up temporary files after processing
-  private async cleanupDocumentFile(document: BatchDocument, metadata: any) {
-    if (metadata?.tempFile && metadata?.filePath) {
-      try {
-        if (fs.existsSync(metadata.filePath)) {
-          await fs.promises.unlink(metadata.filePath);
-          console.log(`🗑️ Cleaned up temp file: ${metadata.filePath}`);
-        }
-      } catch (error) {
-        console.error(`❌ Failed to cleanup temp file ${metadata.filePath}:`, error);
-      }
-    }
+  private async cleanupDocumentFile(document: BatchDocument) {
+    await releaseBatchDocumentSource(document);
   }
 
   // Public methods for external control
@@ -328,7 +510,8 @@ class BatchProcessor {
         await storage.updateBatchDocumentStatus(doc.id, 'pending');
       }
 
-      // Create new queue job
+      // Create new queue job, in the mode the batch was created (and charged) for
+      const metadata = batchJob.metadata as BatchJobMetadata || {};
       await storage.createQueueJob({
         jobType: 'batch_processing',
         jobData: {
@@ -337,7 +520,8 @@ class BatchProcessor {
           aiProvider: batchJob.aiProvider,
           aiModel: batchJob.aiModel,
           analysisType: batchJob.analysisType,
-          templateId: batchJob.templateId
+          templateId: batchJob.templateId,
+          executionMode: metadata.executionMode
         },
         priority: 2 // Higher priority for retries
       });
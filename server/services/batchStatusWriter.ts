@@ -0,0 +1,135 @@
+import { storage, type BatchDocumentStatusUpdate } from "../storage";
+
+const FLUSH_INTERVAL_MS = parseInt(process.env.BATCH_STATUS_FLUSH_MS || '250', 10);
+const FLUSH_MAX_EVENTS = parseInt(process.env.BATCH_STATUS_FLUSH_EVENTS || '50', 10);
+const FINAL_STATUSES = new Set(['completed', 'failed', 'skipped']);
+
+export interface BatchDocumentTransition {
+  status: string;
+  errorMessage?: string | null;
+  creditsUsed?: number;
+  documentAnalysisId?: string;
+}
+
+/**
+ * Write-behind buffer for batch document status transitions. Transitions for
+ * the same document are coalesced (processing -> completed becomes one row
+ * write) and pending rows are flushed together in a single multi-row UPDATE,
+ * every FLUSH_INTERVAL_MS or FLUSH_MAX_EVENTS transitions, whichever comes first.
+ *
+ * Flushes run one at a time in the order they were requested, so a later state
+ * never lands before an earlier one. Callers that need durability (before
+ * updating the batch job, rescheduling or finalizing) await `flush()`.
+ */
+class BatchStatusWriter {
+  private pending = new Map<string, BatchDocumentStatusUpdate>();
+  // Latest transition number per document, so a failed flush never re-applies a stale row
+  private versions = new Map<string, number>();
+  private nextVersion = 0;
+  private eventsSinceFlush = 0;
+  private timer: NodeJS.Timeout | null = null;
+  private flushChain: Promise<void> = Promise.resolve();
+  private stats = { events: 0, flushes: 0, rowsWritten: 0, failedFlushes: 0 };
+
+  record(documentId: string, transition: BatchDocumentTransition) {
+    const now = new Date();
+    const update: BatchDocumentStatusUpdate = {
+      id: documentId,
+      status: transition.status,
+      errorMessage: transition.errorMessage ?? null,
+      creditsUsed: transition.creditsUsed,
+      documentAnalysisId: transition.documentAnalysisId,
+      processingStartedAt: transition.status === 'processing' ? now : undefined,
+      processingCompletedAt: FINAL_STATUSES.has(transition.status) ? now : undefined,
+      updatedAt: now,
+    };
+
+    const previous = this.pending.get(documentId);
+    this.pending.set(documentId, previous ? this.merge(previous, update) : update);
+    this.versions.set(documentId, ++this.nextVersion);
+    this.stats.events++;
+    this.eventsSinceFlush++;
+
+    if (this.eventsSinceFlush >= FLUSH_MAX_EVENTS) {
+      this.flush().catch(() => {});
+    } else {
+      this.scheduleFlush();
+    }
+  }
+
+  private scheduleFlush() {
+    if (this.timer) return;
+    this.timer = setTimeout(() => {
+      this.timer = null;
+      this.flush().catch(() => {});
+    }, FLUSH_INTERVAL_MS);
+    this.timer.unref();
+  }
+
+  // Newer transition wins; fields it leaves undefined are carried over
+  private merge(older: BatchDocumentStatusUpdate, newer: BatchDocumentStatusUpdate): BatchDocumentStatusUpdate {
+    return {
+      id: newer.id,
+      status: newer.status,
+      errorMessage: newer.errorMessage,
+      creditsUsed: newer.creditsUsed ?? older.creditsUsed,
+      documentAnalysisId: newer.documentAnalysisId ?? older.documentAnalysisId,
+      processingStartedAt: newer.processingStartedAt ?? older.processingStartedAt,
+      processingCompletedAt: newer.processingCompletedAt ?? older.processingCompletedAt,
+      updatedAt: newer.updatedAt,
+    };
+  }
+
+  /**
+   * Write everything buffered so far. Resolves once those rows are committed;
+   * rejects (after putting the rows back) if the write failed.
+   */
+  flush(): Promise<void> {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+
+    const batch = Array.from(this.pending.values());
+    const batchVersions = new Map(batch.map(update => [update.id, this.versions.get(update.id)!]));
+    this.pending.clear();
+    this.eventsSinceFlush = 0;
+
+    const run = this.flushChain.then(async () => {
+      if (batch.length === 0) return;
+      try {
+        await storage.applyBatchDocumentUpdates(batch);
+        this.stats.flushes++;
+        this.stats.rowsWritten += batch.length;
+        batchVersions.forEach((version, id) => {
+          if (this.versions.get(id) === version) this.versions.delete(id);
+        });
+      } catch (error: any) {
+        this.stats.failedFlushes++;
+        console.error(`❌ Failed to flush ${batch.length} batch document updates:`, error.message);
+        // Put the rows back underneath anything recorded since, so the next flush retries
+        // them. Rows superseded by a transition already handed to a later flush are dropped.
+        for (const update of batch) {
+          const newer = this.pending.get(update.id);
+          if (newer) {
+            this.pending.set(update.id, this.merge(update, newer));
+          } else if (this.versions.get(update.id) === batchVersions.get(update.id)) {
+            this.pending.set(update.id, update);
+          }
+        }
+        this.scheduleFlush();
+        throw error;
+      }
+    });
+
+    // Keep the chain alive after a failed flush
+    this.flushChain = run.catch(() => {});
+    return run;
+  }
+
+  getStats() {
+    return { ...this.stats, buffered: this.pending.size };
+  }
+}
+
+export const batchStatusWriter = new BatchStatusWriter();
@@ -0,0 +1,197 @@
+export type CircuitState = 'closed' | 'open' | 'half-open';
+
+export interface CircuitBreakerOptions {
+  // Share of failed calls in the window that opens the circuit
+  errorRateThreshold: number;
+  // Consecutive failures that open the circuit regardless of the window
+  consecutiveFailureThreshold: number;
+  // Calls slower than this count as failures (0 disables)
+  slowCallThresholdMs: number;
+  // Minimum calls in the window before the error rate is evaluated
+  minimumCalls: number;
+  windowSize: number;
+  // How long the circuit stays open before a half-open probe is allowed
+  coolDownMs: number;
+}
+
+// Thrown instead of calling a provider whose circuit is open
+export class CircuitOpenError extends Error {
+  constructor(public readonly circuitKey: string, public readonly retryAt: Date) {
+    super(`Circuit open for ${circuitKey}, retry after ${retryAt.toISOString()}`);
+    this.name = 'CircuitOpenError';
+  }
+}
+
+const TRANSIENT_NETWORK_CODES = new Set(['ECONNRESET', 'ECONNREFUSED', 'ETIMEDOUT', 'ENOTFOUND', 'EAI_AGAIN', 'EPIPE', 'UND_ERR_SOCKET', 'UND_ERR_CONNECT_TIMEOUT', 'UND_ERR_HEADERS_TIMEOUT']);
+
+/**
+ * Whether an error says something about the provider's health: 5xx, 408/429,
+ * timeouts and network failures. A 401/403 from one user's bad key, or a
+ * response we failed to parse or validate, must not open a circuit shared by
+ * every user of the provider.
+ */
+export function isProviderFailure(error: any): boolean {
+  const status = error?.status ?? error?.statusCode ?? error?.response?.status;
+  if (typeof status === 'number') {
+    return status >= 500 || status === 408 || status === 429;
+  }
+
+  const code = error?.code ?? error?.cause?.code;
+  if (typeof code === 'string' && TRANSIENT_NETWORK_CODES.has(code)) return true;
+  if (['APIConnectionError', 'APIConnectionTimeoutError', 'TimeoutError', 'FetchError'].includes(error?.name)) return true;
+  return /timed? ?out|fetch failed|socket hang up|network/i.test(error?.message || '');
+}
+
+const DEFAULT_OPTIONS: CircuitBreakerOptions = {
+  errorRateThreshold: parseFloat(process.env.AI_BREAKER_ERROR_RATE || '0.5'),
+  consecutiveFailureThreshold: parseInt(process.env.AI_BREAKER_CONSECUTIVE_FAILURES || '5', 10),
+  slowCallThresholdMs: parseInt(process.env.AI_BREAKER_SLOW_CALL_MS || '120000', 10),
+  minimumCalls: parseInt(process.env.AI_BREAKER_MIN_CALLS || '10', 10),
+  windowSize: parseInt(process.env.AI_BREAKER_WINDOW || '50', 10),
+  coolDownMs: parseInt(process.env.AI_BREAKER_COOLDOWN_MS || '30000', 10),
+};
+
+export class CircuitBreaker {
+  private state: CircuitState = 'closed';
+  private outcomes: boolean[] = []; // true = failure
+  private consecutiveFailures = 0;
+  private openedAt = 0;
+  private probeInFlight = false;
+  private lastError?: string;
+
+  constructor(readonly key: string, private options: CircuitBreakerOptions = DEFAULT_OPTIONS) {}
+
+  getState(): CircuitState {
+    if (this.state === 'open' && Date.now() - this.openedAt >= this.options.coolDownMs) {
+      this.state = 'half-open';
+      this.probeInFlight = false;
+      console.log(`🔄 Circuit ${this.key} half-open, allowing a probe call`);
+    }
+    return this.state;
+  }
+
+  getRetryAt(): Date {
+    return new Date(this.openedAt + this.options.coolDownMs);
+  }
+
+  async execute<T>(fn: () => Promise<T>, signal?: AbortSignal): Promise<T> {
+    const state = this.getState();
+    if (state === 'open' || (state === 'half-open' && this.probeInFlight)) {
+      throw new CircuitOpenError(this.key, this.getRetryAt());
+    }
+
+    const isProbe = state === 'half-open';
+    if (isProbe) this.probeInFlight = true;
+
+    const startedAt = Date.now();
+    try {
+      const result = await fn();
+      const slow = this.options.slowCallThresholdMs > 0 && Date.now() - startedAt > this.options.slowCallThresholdMs;
+      this.recordOutcome(slow, slow ? `Slow call (${Date.now() - startedAt}ms)` : undefined);
+      return result;
+    } catch (error: any) {
+      // A call we cancelled ourselves, or a caller-side error, says nothing about provider health
+      if (signal?.aborted || !isProviderFailure(error)) {
+        if (isProbe) this.probeInFlight = false;
+      } else {
+        this.recordOutcome(true, error.message);
+      }
+      throw error;
+    }
+  }
+
+  private recordOutcome(failed: boolean, reason?: string) {
+    if (this.state === 'half-open') {
+      this.probeInFlight = false;
+      if (failed) {
+        this.open(reason);
+      } else {
+        this.close();
+      }
+      return;
+    }
+
+    this.outcomes.push(failed);
+    if (this.outcomes.length > this.options.windowSize) {
+      this.outcomes.shift();
+    }
+
+    if (!failed) {
+      this.consecutiveFailures = 0;
+      return;
+    }
+
+    this.consecutiveFailures++;
+    this.lastError = reason;
+
+    const failures = this.outcomes.filter(Boolean).length;
+    const errorRate = failures / this.outcomes.length;
+    if (
+      this.consecutiveFailures >= this.options.consecutiveFailureThreshold ||
+      (this.outcomes.length >= this.options.minimumCalls && errorRate >= this.options.errorRateThreshold)
+    ) {
+      this.open(reason);
+    }
+  }
+
+  private open(reason?: string) {
+    this.state = 'open';
+    this.openedAt = Date.now();
+    this.lastError = reason || this.lastError;
+    console.warn(`⚠️ Circuit ${this.key} opened: ${this.lastError}`);
+  }
+
+  private close() {
+    this.state = 'closed';
+    this.outcomes = [];
+    this.consecutiveFailures = 0;
+    console.log(`✅ Circuit ${this.key} closed`);
+  }
+
+  reset() {
+    this.close();
+  }
+
+  getStats() {
+    const state = this.getState();
+    return {
+      key: this.key,
+      state,
+      calls: this.outcomes.length,
+      failures: this.outcomes.filter(Boolean).length,
+      consecutiveFailures: this.consecutiveFailures,
+      lastError: this.lastError,
+      retryAt: state === 'open' ? this.getRetryAt().toISOString() : null,
+    };
+  }
+}
+
+/**
+ * One breaker per provider + model, created on first use.
+ */
+class CircuitBreakerRegistry {
+  private breakers = new Map<string, CircuitBreaker>();
+
+  get(provider: string, model: string): CircuitBreaker {
+    const key = `${provider}:${model}`;
+    let breaker = this.breakers.get(key);
+    if (!breaker) {
+      breaker = new CircuitBreaker(key);
+      this.breakers.set(key, breaker);
+    }
+    return breaker;
+  }
+
+  reset(key: string): boolean {
+    const breaker = this.breakers.get(key);
+    if (!breaker) return false;
+    breaker.reset();
+    return true;
+  }
+
+  getStats() {
+    return Array.from(this.breakers.values()).map(breaker => breaker.getStats());
+  }
+}
+
+export const providerBreakers = new CircuitBreakerRegistry();
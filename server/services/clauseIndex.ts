@@ -0,0 +1,219 @@
+import { TermMatcher, type TermDefinition } from '../lib/termMatcher';
+import type { AnalysisResult } from './ai';
+import type { DocumentTemplate, LegalClause } from '@shared/schema';
+
+export type ClausePresence = 'present' | 'absent' | 'uncertain';
+
+export interface ScreenedClause {
+  clause: LegalClause;
+  required: boolean;
+  presence: ClausePresence;
+  phraseFound: boolean;
+  keywordCoverage: number; // 0..1 share of the clause keywords found in the document
+}
+
+export interface ClauseScreening {
+  templateId: string;
+  present: ScreenedClause[];
+  absent: ScreenedClause[];
+  uncertain: ScreenedClause[];
+}
+
+interface IndexedClause {
+  clause: LegalClause;
+  required: boolean;
+  keywordCount: number;
+}
+
+interface CompiledTemplateIndex {
+  matcher: TermMatcher;
+  clauses: Map<string, IndexedClause>;
+}
+
+const PHRASE = 'phrase';
+const KEYWORD = 'keyword';
+const MAX_KEYWORDS_PER_CLAUSE = 12;
+const MIN_KEYWORD_LENGTH = 5;
+const MIN_KEYWORDS_FOR_ABSENCE = 3;
+
+// Generic legal words that appear in almost every clause and carry no signal
+const STOPWORDS = new Set([
+  'clausula', 'contrato', 'contratante', 'contratada', 'contratado', 'partes', 'parte',
+  'presente', 'presentes', 'sobre', 'mediante', 'quaisquer', 'qualquer', 'outras', 'outros',
+  'conforme', 'nesta', 'neste', 'desta', 'deste', 'pelas', 'pelos', 'entre', 'quando',
+  'assim', 'ainda', 'devera', 'deverao', 'podera', 'poderao', 'sendo', 'serao', 'todas', 'todos',
+]);
+
+/**
+ * Normalize text for clause matching: lowercase, strip accents and collapse
+ * punctuation so "Cláusula de Rescisão" and "CLAUSULA DE RESCISAO" compare equal.
+ */
+export function normalizeForMatching(text: string): string {
+  return text
+    .normalize('NFD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+    .replace(/[^a-z0-9]+/g, ' ')
+    .trim();
+}
+
+function clausePhrase(clause: LegalClause): string {
+  return normalizeForMatching(clause.name).replace(/^clausula (de |da |do |das |dos )?/, '');
+}
+
+function clauseKeywords(clause: LegalClause): string[] {
+  const source = normalizeForMatching(`${clause.standardText} ${clause.alternativeText || ''}`);
+  const frequency = new Map<string, number>();
+
+  for (const word of source.split(' ')) {
+    if (word.length < MIN_KEYWORD_LENGTH || STOPWORDS.has(word) || /^\d+$/.test(word)) continue;
+    frequency.set(word, (frequency.get(word) || 0) + 1);
+  }
+
+  return Array.from(frequency.entries())
+    .sort((a, b) => b[1] - a[1] || b[0].length - a[0].length)
+    .slice(0, MAX_KEYWORDS_PER_CLAUSE)
+    .map(([word]) => word);
+}
+
+/**
+ * Local clause detector built from the legal_clauses table. Each template gets
+ * one compiled matcher over its clauses' name phrases and keywords; the index is
+ * rebuilt lazily after `invalidate()` (called when admins edit clauses or templates).
+ */
+class ClauseIndex {
+  private templates = new Map<string, CompiledTemplateIndex>();
+
+  private compile(requiredClauses: LegalClause[], optionalClauses: LegalClause[]): CompiledTemplateIndex {
+    const definitions: TermDefinition[] = [];
+    const clauses = new Map<string, IndexedClause>();
+
+    const addClause = (clause: LegalClause, required: boolean) => {
+      if (clauses.has(clause.clauseId)) return;
+
+      const phrase = clausePhrase(clause);
+      if (phrase) {
+        definitions.push({ term: phrase, category: `${clause.clauseId}:${PHRASE}` });
+      }
+
+      const keywords = clauseKeywords(clause);
+      for (const keyword of keywords) {
+        definitions.push({ term: keyword, category: `${clause.clauseId}:${KEYWORD}` });
+      }
+
+      clauses.set(clause.clauseId, { clause, required, keywordCount: keywords.length });
+    };
+
+    requiredClauses.forEach(clause => addClause(clause, true));
+    optionalClauses.forEach(clause => addClause(clause, false));
+
+    return { matcher: new TermMatcher(definitions), clauses };
+  }
+
+  private getCompiled(templateData: {
+    template: DocumentTemplate;
+    requiredClauses: LegalClause[];
+    optionalClauses: LegalClause[];
+  }): CompiledTemplateIndex {
+    let compiled = this.templates.get(templateData.template.id);
+    if (!compiled) {
+      compiled = this.compile(templateData.requiredClauses, templateData.optionalClauses);
+      this.templates.set(templateData.template.id, compiled);
+      console.log(`📋 Compiled clause index for template ${templateData.template.templateId} (${compiled.clauses.size} clauses)`);
+    }
+    return compiled;
+  }
+
+  screen(
+    templateData: {
+      template: DocumentTemplate;
+      requiredClauses: LegalClause[];
+      optionalClauses: LegalClause[];
+    },
+    content: string
+  ): ClauseScreening {
+    const compiled = this.getCompiled(templateData);
+    const profile = compiled.matcher.profileText(normalizeForMatching(content));
+
+    const phraseHits = new Set<string>();
+    const keywordHits = new Map<string, Set<string>>();
+    for (const match of profile.matches) {
+      const separator = match.category.lastIndexOf(':');
+      const clauseId = match.category.slice(0, separator);
+      if (match.category.slice(separator + 1) === PHRASE) {
+        phraseHits.add(clauseId);
+      } else {
+        if (!keywordHits.has(clauseId)) keywordHits.set(clauseId, new Set());
+        keywordHits.get(clauseId)!.add(match.term);
+      }
+    }
+
+    const screening: ClauseScreening = {
+      templateId: templateData.template.templateId,
+      present: [],
+      absent: [],
+      uncertain: [],
+    };
+
+    compiled.clauses.forEach((indexed, clauseId) => {
+      const phraseFound = phraseHits.has(clauseId);
+      const keywordCoverage = indexed.keywordCount > 0
+        ? (keywordHits.get(clauseId)?.size || 0) / indexed.keywordCount
+        : 0;
+
+      let presence: ClausePresence = 'uncertain';
+      if ((phraseFound && keywordCoverage >= 0.3) || keywordCoverage >= 0.6) {
+        presence = 'present';
+      } else if (!phraseFound && keywordCoverage < 0.1 && indexed.keywordCount >= MIN_KEYWORDS_FOR_ABSENCE) {
+        presence = 'absent';
+      }
+
+      screening[presence].push({
+        clause: indexed.clause,
+        required: indexed.required,
+        presence,
+        phraseFound,
+        keywordCoverage,
+      });
+    });
+
+    return screening;
+  }
+
+  invalidate(templateId?: string) {
+    if (templateId) {
+      this.templates.delete(templateId);
+    } else {
+      this.templates.clear();
+    }
+  }
+
+  getStats() {
+    return { compiledTemplates: this.templates.size };
+  }
+}
+
+/**
+ * Fold the local screening back into the provider result so clauses the model
+ * was not asked about still show up in templateAnalysis.
+ */
+export function applyClauseScreening(result: AnalysisResult, screening: ClauseScreening): AnalysisResult {
+  if (!result.templateAnalysis) return result;
+
+  const missingClauses = result.templateAnalysis.missingClauses || [];
+  const reported = new Set(missingClauses.map((missing: any) => normalizeForMatching(missing.clauseName || '')));
+
+  for (const screened of screening.absent) {
+    if (reported.has(normalizeForMatching(screened.clause.name))) continue;
+    missingClauses.push({
+      clauseName: screened.clause.name,
+      importance: screened.required ? 'Obrigatória' : 'Recomendada',
+      recommendation: screened.clause.description,
+    } as any);
+  }
+
+  result.templateAnalysis.missingClauses = missingClauses;
+  return result;
+}
+
+export const clauseIndex = new ClauseIndex();
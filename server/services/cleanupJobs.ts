@@ -0,0 +1,109 @@
+import { storage } from "../storage";
+import { maintenance } from "./maintenance";
+import { tempFiles } from "./tempFiles";
+
+const TRASH_RETENTION_DAYS = 30;
+const ANALYSIS_PURGE_BATCH_SIZE = parseInt(process.env.ANALYSIS_PURGE_BATCH_SIZE || '500', 10);
+const TEMP_FILE_MAX_AGE_MS = 24 * 60 * 60 * 1000;
+const TEMP_FILE_SWEEP_BATCH_SIZE = 100;
+const CONTENT_BATCH_SIZE = 100;
+// Stored text nothing references is kept this long, so an analysis being written can still link to it
+const UNREFERENCED_CONTENT_GRACE_MS = 24 * 60 * 60 * 1000;
+
+export function registerCleanupJobs() {
+  // Permanently delete analyses that have been in the trash for TRASH_RETENTION_DAYS
+  maintenance.register({
+    name: 'purge-expired-analyses',
+    description: `Remove analyses deleted more than ${TRASH_RETENTION_DAYS} days ago`,
+    intervalMs: 24 * 60 * 60 * 1000,
+    initialDelayMs: 10 * 60 * 1000,
+    async run(context) {
+      const deletedBefore = new Date(Date.now() - TRASH_RETENTION_DAYS * 24 * 60 * 60 * 1000);
+      // Deleted rows no longer match, so every batch naturally continues where the last one stopped
+      while (true) {
+        const deleted = await storage.purgeExpiredAnalysesBatch(deletedBefore, ANALYSIS_PURGE_BATCH_SIZE);
+        context.batchDone(deleted);
+        if (deleted < ANALYSIS_PURGE_BATCH_SIZE) break;
+        await context.pause();
+      }
+    },
+  });
+
+  // SECURITY: Remove upload temp files nobody consumed (aborted requests, crashes)
+  maintenance.register({
+    name: 'sweep-orphaned-uploads',
+    description: 'Remove upload temp files older than 24 hours',
+    intervalMs: 60 * 60 * 1000,
+    initialDelayMs: 5 * 60 * 1000,
+    async run(context) {
+      while (true) {
+        const expired = tempFiles.expired(TEMP_FILE_MAX_AGE_MS, TEMP_FILE_SWEEP_BATCH_SIZE);
+        if (expired.length === 0) break;
+
+        let removed = 0;
+        for (const filePath of expired) {
+          try {
+            if (await tempFiles.remove(filePath)) {
+              removed++;
+              console.log(`🗑️ Cleaned up orphaned file: ${filePath}`);
+            }
+          } catch (error: any) {
+            console.warn(`⚠️ Error removing file ${filePath}: ${error.message}`);
+          }
+        }
+        context.batchDone(removed);
+        if (expired.length < TEMP_FILE_SWEEP_BATCH_SIZE) break;
+        await context.pause();
+      }
+    },
+  });
+
+  // Move the inline text of analyses written before the content store into it
+  maintenance.register({
+    name: 'compact-analysis-content',
+    description: 'Move inline analysis text and large results into compressed storage',
+    intervalMs: 6 * 60 * 60 * 1000,
+    initialDelayMs: 15 * 60 * 1000,
+    async run(context) {
+      while (true) {
+        const compacted = await storage.compactInlineAnalysisContentBatch(CONTENT_BATCH_SIZE);
+        context.batchDone(compacted);
+        if (compacted === 0) break;
+        await context.pause();
+      }
+    },
+  });
+
+  // Fill the search columns of analyses written before full-text search existed
+  maintenance.register({
+    name: 'index-analyses-for-search',
+    description: 'Index analyses written before full-text search for searching',
+    intervalMs: 6 * 60 * 60 * 1000,
+    initialDelayMs: 20 * 60 * 1000,
+    async run(context) {
+      while (true) {
+        const indexed = await storage.indexAnalysesForSearchBatch(CONTENT_BATCH_SIZE);
+        context.batchDone(indexed);
+        if (indexed === 0) break;
+        await context.pause();
+      }
+    },
+  });
+
+  // Drop stored text whose analyses were all purged
+  maintenance.register({
+    name: 'purge-unreferenced-content',
+    description: 'Remove stored document text no analysis references',
+    intervalMs: 24 * 60 * 60 * 1000,
+    initialDelayMs: 30 * 60 * 1000,
+    async run(context) {
+      const unreferencedBefore = new Date(Date.now() - UNREFERENCED_CONTENT_GRACE_MS);
+      while (true) {
+        const deleted = await storage.purgeUnreferencedContentBatch(unreferencedBefore, CONTENT_BATCH_SIZE);
+        context.batchDone(deleted);
+        if (deleted < CONTENT_BATCH_SIZE) break;
+        await context.pause();
+      }
+    },
+  });
+}
@@ -1,14 +1,37 @@
 import nodemailer from 'nodemailer';
 import { storage } from '../storage';
 import { decryptApiKey } from '../lib/encryption';
+import type { EmailOutbox, SmtpConfig } from '@shared/schema';
 
+// Pooled SMTP connections; also the number of emails sent at once
+const SMTP_MAX_CONNECTIONS = parseInt(process.env.SMTP_MAX_CONNECTIONS || '3', 10);
+const OUTBOX_POLL_MS = parseInt(process.env.EMAIL_OUTBOX_POLL_MS || '5000', 10);
+const OUTBOX_BATCH_SIZE = parseInt(process.env.EMAIL_OUTBOX_BATCH_SIZE || '20', 10);
+// A claimed email not settled within this long is picked up again
+const OUTBOX_LEASE_MS = 5 * 60 * 1000;
+const RETRY_BASE_MS = parseInt(process.env.EMAIL_RETRY_BASE_MS || '30000', 10);
+const RETRY_MAX_MS = 60 * 60 * 1000;
+
+/**
+ * Email goes through an outbox: request handlers only insert a row in
+ * email_outbox and return, and a background sender in every server process
+ * claims due rows in batches and delivers them over a pooled SMTP transport.
+ * Failed attempts are retried with exponential backoff until maxAttempts.
+ */
 export class EmailService {
   private transporter: nodemailer.Transporter | null = null;
   private lastConfigUpdate: Date | null = null;
+  private config: SmtpConfig | null = null;
+  private pollInterval: NodeJS.Timeout | null = null;
+  private draining: Promise<void> | null = null;
+  private drainRequested = false;
+  private stats = { sent: 0, retried: 0, failed: 0 };
+  // Sends in progress per transporter; a replaced transporter is closed once its count drops to zero
+  private activeSends = new Map<nodemailer.Transporter, number>();
 
-  async getTransporter(): Promise<nodemailer.Transporter> {
+  async getTransporter(forceRefresh: boolean = false): Promise<nodemailer.Transporter> {
     // Check if we need to refresh the transporter (every 5 minutes)
-    const shouldRefresh = !this.transporter || 
+    const shouldRefresh = forceRefresh || !this.transporter || 
       !this.lastConfigUpdate || 
       (Date.now() - this.lastConfigUpdate.getTime() > 5 * 60 * 1000);
 
@@ -19,26 +42,147 @@ export class EmailService {
         throw new Error('Configuração SMTP não encontrada. Configure o SMTP no painel administrativo.');
       }
 
-      // Decrypt password
-      const decryptedPassword = await decryptApiKey(config.password);
-
-      this.transporter = nodemailer.createTransport({
-        host: config.host,
-        port: config.port,
-        secure: config.secure, // true for 465, false for other ports
-        auth: {
-          user: config.username,
-          pass: decryptedPassword,
-        },
-      });
+      // Keep the pool (and its open connections) while the configuration is unchanged
+      const unchanged = this.transporter && this.config
+        && this.config.id === config.id
+        && this.config.updatedAt?.getTime() === config.updatedAt?.getTime();
+
+      if (!unchanged) {
+        // Decrypt password
+        const decryptedPassword = await decryptApiKey(config.password);
 
+        if (this.transporter) this.retire(this.transporter);
+        this.transporter = nodemailer.createTransport({
+          pool: true,
+          maxConnections: SMTP_MAX_CONNECTIONS,
+          maxMessages: 100,
+          host: config.host,
+          port: config.port,
+          secure: config.secure, // true for 465, false for other ports
+          auth: {
+            user: config.username,
+            pass: decryptedPassword,
+          },
+        });
+      }
+
+      this.config = config;
       this.lastConfigUpdate = new Date();
     }
 
     return this.transporter!;
   }
 
-  async sendContactEmail(params: {
+  // Close a replaced transporter without cutting off sends still using it
+  private retire(transporter: nodemailer.Transporter) {
+    if (!this.activeSends.has(transporter)) {
+      transporter.close();
+    }
+  }
+
+  private async withTransporter<T>(send: (transporter: nodemailer.Transporter, config: SmtpConfig) => Promise<T>): Promise<T> {
+    const transporter = await this.getTransporter();
+    const config = this.config!;
+    this.activeSends.set(transporter, (this.activeSends.get(transporter) || 0) + 1);
+    try {
+      return await send(transporter, config);
+    } finally {
+      const remaining = this.activeSends.get(transporter)! - 1;
+      if (remaining > 0) {
+        this.activeSends.set(transporter, remaining);
+      } else {
+        this.activeSends.delete(transporter);
+        if (transporter !== this.transporter) transporter.close();
+      }
+    }
+  }
+
+  start() {
+    if (this.pollInterval) return;
+    this.pollInterval = setInterval(() => this.kick(), OUTBOX_POLL_MS);
+    this.kick();
+  }
+
+  // Drain the outbox now instead of waiting for the next poll
+  kick() {
+    if (this.draining) {
+      this.drainRequested = true;
+      return;
+    }
+    this.draining = this.drain()
+      .catch(error => console.error('❌ Email outbox drain failed:', error))
+      .finally(() => {
+        this.draining = null;
+        if (this.drainRequested) {
+          this.drainRequested = false;
+          this.kick();
+        }
+      });
+  }
+
+  private async drain() {
+    while (true) {
+      const batch = await storage.claimEmailOutboxBatch(OUTBOX_BATCH_SIZE, OUTBOX_LEASE_MS);
+      if (batch.length === 0) return;
+
+      // Up to SMTP_MAX_CONNECTIONS sends in flight, one per pooled connection
+      const queue = [...batch];
+      await Promise.all(Array.from({ length: Math.min(SMTP_MAX_CONNECTIONS, queue.length) }, async () => {
+        let entry: EmailOutbox | undefined;
+        while ((entry = queue.shift())) {
+          await this.deliver(entry);
+        }
+      }));
+
+      if (batch.length < OUTBOX_BATCH_SIZE) return;
+    }
+  }
+
+  private async deliver(entry: EmailOutbox) {
+    try {
+      const info = await this.withTransporter((transporter, config) => transporter.sendMail({
+        from: `"${config.fromName}" <${config.fromEmail}>`,
+        to: entry.toAddress || config.fromEmail,
+        replyTo: entry.replyTo || undefined,
+        subject: entry.subject,
+        text: entry.textBody,
+        html: entry.htmlBody || undefined,
+      }));
+
+      await storage.markEmailSent(entry.id, info.messageId);
+      this.stats.sent++;
+      console.log(`📧 Email sent (${entry.kind}):`, { id: entry.id, messageId: info.messageId, attempt: entry.attempts });
+    } catch (error: any) {
+      const exhausted = entry.attempts >= entry.maxAttempts;
+      let nextAttemptAt: Date | null = null;
+      if (!exhausted) {
+        const backoff = Math.min(RETRY_BASE_MS * 2 ** (entry.attempts - 1), RETRY_MAX_MS);
+        // ±20% jitter so a burst of failures does not retry in lockstep
+        nextAttemptAt = new Date(Date.now() + backoff * (0.8 + Math.random() * 0.4));
+      }
+
+      await storage.markEmailAttemptFailed(entry.id, error.message, nextAttemptAt);
+      if (exhausted) {
+        this.stats.failed++;
+        console.error(`❌ Email ${entry.id} (${entry.kind}) failed after ${entry.attempts} attempts:`, error.message);
+      } else {
+        this.stats.retried++;
+        console.warn(`⚠️ Email ${entry.id} (${entry.kind}) attempt ${entry.attempts} failed, retrying at ${nextAttemptAt!.toISOString()}:`, error.message);
+      }
+    }
+  }
+
+  private async enqueue(email: Parameters<typeof storage.enqueueEmail>[0]): Promise<EmailOutbox> {
+    const entry = await storage.enqueueEmail(email);
+    this.kick();
+    return entry;
+  }
+
+  getStats() {
+    return { ...this.stats, maxConnections: SMTP_MAX_CONNECTIONS, draining: !!this.draining };
+  }
+
+  async queueContactEmail(params: {
     name: string;
     email: string;
     company?: string;
@@ -47,13 +191,6 @@ export class EmailService {
     phone?: string;
   }) {
     const { name, email, company, subject, message, phone } = params;
-    
-    const transporter = await this.getTransporter();
-    const config = await storage.getSmtpConfig();
-    
-    if (!config) {
-      throw new Error('Configuração SMTP não disponível');
-    }
 
     const subjectLabels: Record<string, string> = {
       general: "Informações Gerais",
@@ -109,41 +246,32 @@ Esta mensagem foi enviada através do formulário de contato do JusValida.
 Data/Hora: ${new Date().toLocaleString('pt-BR', { timeZone: 'America/Sao_Paulo' })}
     `;
 
-    const mailOptions = {
-      from: `"${config.fromName}" <${config.fromEmail}>`,
-      to: config.fromEmail, // Send to the same email configured
+    const entry = await this.enqueue({
+      kind: 'contact',
+      toAddress: null, // Send to the same email configured
       replyTo: email, // Allow replying directly to the contact
       subject: `[JusValida] ${subjectLabels[subject] || 'Contato'} - ${name}`,
-      text: textContent,
-      html: htmlContent,
-    };
+      textBody: textContent,
+      htmlBody: htmlContent,
+    });
 
-    const info = await transporter.sendMail(mailOptions);
-    
-    console.log('Contact email sent:', {
-      messageId: info.messageId,
+    console.log('Contact email queued:', {
+      id: entry.id,
       from: email,
       subject: subjectLabels[subject] || subject,
       timestamp: new Date().toISOString()
     });
 
-    return info;
+    return entry;
   }
 
-  async sendTestEmail(testEmail: string) {
-    const transporter = await this.getTransporter();
-    const config = await storage.getSmtpConfig();
-    
-    if (!config) {
-      throw new Error('Configuração SMTP não disponível');
-    }
-
-    const mailOptions = {
-      from: `"${config.fromName}" <${config.fromEmail}>`,
-      to: testEmail,
+  async queueTestEmail(testEmail: string) {
+    const entry = await this.enqueue({
+      kind: 'smtp_test',
+      toAddress: testEmail,
       subject: '[JusValida] Teste de Configuração SMTP',
-      text: `Este é um e-mail de teste para verificar a configuração SMTP do JusValida.\n\nSe você recebeu esta mensagem, a configuração está funcionando corretamente!\n\nData/Hora do teste: ${new Date().toLocaleString('pt-BR', { timeZone: 'America/Sao_Paulo' })}`,
-      html: `
+      textBody: `Este é um e-mail de teste para verificar a configuração SMTP do JusValida.\n\nSe você recebeu esta mensagem, a configuração está funcionando corretamente!\n\nData/Hora do teste: ${new Date().toLocaleString('pt-BR', { timeZone: 'America/Sao_Paulo' })}`,
+      htmlBody: `
         <html>
           <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
             <h2 style="color: #2563eb;">Teste de Configuração SMTP - JusValida</h2>
@@ -157,27 +285,26 @@ Data/Hora: ${new Date().toLocaleString('pt-BR', { timeZone: 'America/Sao_Paulo'
           </body>
         </html>
       `,
-    };
+    });
 
-    const info = await transporter.sendMail(mailOptions);
-    
-    console.log('Test email sent:', {
-      messageId: info.messageId,
+    console.log('Test email queued:', {
+      id: entry.id,
       to: testEmail,
       timestamp: new Date().toISOString()
     });
 
-    return info;
+    return entry;
   }
 
-  async verifyConnection(): Promise<boolean> {
+  // Connect and authenticate with the saved configuration (reloaded, so a config just saved is what gets checked)
+  async verifyConnection(): Promise<{ ok: boolean; error?: string }> {
     try {
-      const transporter = await this.getTransporter();
-      await transporter.verify();
-      return true;
-    } catch (error) {
+      await this.getTransporter(true);
+      await this.withTransporter(transporter => transporter.verify());
+      return { ok: true };
+    } catch (error: any) {
       console.error('SMTP verification failed:', error);
-      return false;
+      return { ok: false, error: error.message };
     }
   }
 }
@@ -0,0 +1,145 @@
+import { legalTermMatcher } from '../lib/termMatcher';
+import type { AnalysisResult } from './ai';
+
+/**
+ * Rule-based analysis used by the free tier. Pure CPU work with no I/O, so
+ * throughput is bounded only by the matcher (see scripts/benchmark-free-analysis.ts).
+ */
+export function analyzeWithRules(content: string, templateData?: any): AnalysisResult {
+  const profile = legalTermMatcher.profileText(content);
+  const { wordCount, termCounts } = profile;
+
+  const contractTerms = termCounts.contract;
+  const legalTerms = termCounts.legal;
+  const obligationTerms = termCounts.obligation;
+  const paymentTerms = termCounts.payment;
+  const terminationTerms = termCounts.termination;
+
+  // Identify potential issues
+  const criticalFlaws: string[] = [];
+  const warnings: string[] = [];
+  const improvements: string[] = [];
+
+  // Content analysis
+  if (wordCount < 50) {
+    warnings.push("Documento muito curto - pode estar incompleto");
+  }
+  if (wordCount > 5000) {
+    warnings.push("Documento extenso - análise detalhada requer plano premium");
+  }
+  if (profile.sentenceCount < 5) {
+    warnings.push("Estrutura de frases pode estar inadequada");
+  }
+
+  // Legal compliance checks
+  if (contractTerms > 0 && paymentTerms === 0) {
+    criticalFlaws.push("Contrato identificado sem cláusulas de pagamento claras");
+  }
+  if (contractTerms > 0 && terminationTerms === 0) {
+    warnings.push("Contrato sem cláusulas de rescisão aparentes");
+  }
+  if (obligationTerms === 0 && contractTerms > 0) {
+    warnings.push("Poucas definições de obrigações e responsabilidades");
+  }
+
+  // Content improvements
+  if (profile.paragraphCount < 3) {
+    improvements.push("Melhorar organização em parágrafos para maior clareza");
+  }
+  if (legalTerms < 3) {
+    improvements.push("Incluir mais referências legais específicas se aplicável");
+  }
+  if (termCounts.lgpd === 0 && termCounts.personalData > 0) {
+    improvements.push("Considerar cláusulas LGPD se houver tratamento de dados");
+  }
+
+  // Calculate compliance score
+  let complianceScore = 60; // Base score
+  if (contractTerms > 0) complianceScore += 10;
+  if (legalTerms > 2) complianceScore += 10;
+  if (paymentTerms > 0) complianceScore += 5;
+  if (terminationTerms > 0) complianceScore += 5;
+  if (obligationTerms > 2) complianceScore += 10;
+
+  // Risk level calculation
+  let riskLevel: 'low' | 'medium' | 'high' | 'critical' = 'low';
+  if (criticalFlaws.length > 0) riskLevel = 'high';
+  else if (warnings.length > 2) riskLevel = 'medium';
+
+  // Generate meaningful summary
+  let summary = `Documento com ${wordCount} palavras`;
+  if (contractTerms > 0) summary += `, identificado como documento contratual`;
+  if (legalTerms > 0) summary += `, com ${legalTerms} referências legais`;
+  if (paymentTerms > 0) summary += `, incluindo cláusulas de pagamento`;
+  summary += `. Análise gratuita detectou aspectos básicos - use plano premium para análise completa.`;
+
+  // Enhanced content-specific analysis
+  const specificAnalysis: string[] = [];
+  const detectedIssues: string[] = [];
+
+  // Detect potential "pegadinhas" or tricky content
+  if (termCounts.suspicious > 0) {
+    specificAnalysis.push("ATENÇÃO: Documento contém termo 'pegadinha' - pode ser texto de teste ou conteúdo suspeito");
+    detectedIssues.push("Conteúdo potencialmente não-oficial detectado");
+  }
+
+  // Check for incomplete or test content
+  if (wordCount < 100 && !contractTerms && !legalTerms) {
+    specificAnalysis.push("Documento parece ser um teste ou conteúdo incompleto");
+    detectedIssues.push("Conteúdo muito simples - pode não ser documento legal real");
+  }
+
+  // Real content analysis based on what's actually in the text
+  if (contractTerms > 0) {
+    specificAnalysis.push(`Identificado como CONTRATO com ${contractTerms} termos contratuais`);
+  }
+  if (paymentTerms > 0) {
+    specificAnalysis.push(`Encontradas ${paymentTerms} referências a pagamento`);
+  }
+  if (terminationTerms > 0) {
+    specificAnalysis.push(`Identificadas ${terminationTerms} cláusulas de rescisão`);
+  }
+
+  const result: AnalysisResult = {
+    summary: `${summary} ${specificAnalysis.length > 0 ? 'ANÁLISE ESPECÍFICA: ' + specificAnalysis.join('. ') : ''}`,
+    criticalFlaws,
+    warnings: warnings.concat(detectedIssues),
+    improvements: improvements.length > 0 ? improvements : ["Documento analisado - estrutura básica identificada"],
+    legalCompliance: {
+      score: Math.min(complianceScore, 85),
+      issues: criticalFlaws.length > 0 ? criticalFlaws : warnings.slice(0, 2)
+    },
+    recommendations: [
+      `Análise gratuita detectou: ${specificAnalysis.length > 0 ? specificAnalysis[0] : 'estrutura básica do documento'}`,
+      ...improvements.slice(0, 1),
+      "Para análise jurídica detalhada, considere plano premium"
+    ],
+    riskLevel
+  };
+
+  // Add basic template analysis if template data is provided
+  if (templateData) {
+    result.summary += ` Análise baseada no template: ${templateData.template.name}.`;
+    (result as any).templateAnalysis = {
+      templateId: templateData.template.templateId,
+      templateName: templateData.template.name,
+      missingClauses: [], // Free tier doesn't provide detailed clause analysis
+      identifiedClauses: [],
+      validationResults: [{
+        ruleName: "Análise Básica",
+        status: "warning",
+        message: "Análise básica realizada. Use análise premium para validação completa de template.",
+        recommendation: "Upgrade para análise detalhada com validação de cláusulas específicas"
+      }],
+      templateSpecificRisks: [{
+        category: "Limitações da Análise Gratuita",
+        level: "medium",
+        description: "Análise gratuita não incluiu validação específica de template",
+        mitigation: "Considere upgrade para análise premium com validação completa"
+      }],
+      complianceScore: 50
+    };
+  }
+
+  return result;
+}
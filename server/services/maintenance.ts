@@ -0,0 +1,145 @@
+// Pause between batches; a batch that took longer than this waits as long as it ran instead
+const BATCH_PAUSE_MS = parseInt(process.env.MAINTENANCE_BATCH_PAUSE_MS || '200', 10);
+
+export interface MaintenanceJobContext {
+  /** Record a committed batch */
+  batchDone(processed: number): void;
+  /** Throttle between batches so maintenance never competes with request traffic */
+  pause(): Promise<void>;
+}
+
+export interface MaintenanceJob {
+  name: string;
+  description: string;
+  intervalMs: number;
+  initialDelayMs: number;
+  run(context: MaintenanceJobContext): Promise<void>;
+}
+
+export interface MaintenanceJobStatus {
+  name: string;
+  description: string;
+  running: boolean;
+  runs: number;
+  processedTotal: number;
+  lastRun: {
+    startedAt: string;
+    finishedAt: string | null;
+    processed: number;
+    batches: number;
+    durationMs: number | null;
+    error: string | null;
+  } | null;
+  nextRunAt: string | null;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * Runs periodic housekeeping (purging expired trash, sweeping temp files) in
+ * small batches with a pause in between, one job at a time, so it never holds
+ * long locks or starves request handling. Every batch is committed on its own,
+ * so a run that is interrupted or fails loses nothing: jobs select their work
+ * from what is left, and the next run simply continues.
+ */
+class MaintenanceScheduler {
+  private jobs = new Map<string, { job: MaintenanceJob; status: MaintenanceJobStatus; timer: NodeJS.Timeout | null }>();
+  // Jobs run one after another, never concurrently
+  private queue: Promise<void> = Promise.resolve();
+
+  register(job: MaintenanceJob) {
+    this.jobs.set(job.name, {
+      job,
+      status: {
+        name: job.name,
+        description: job.description,
+        running: false,
+        runs: 0,
+        processedTotal: 0,
+        lastRun: null,
+        nextRunAt: null,
+      },
+      timer: null,
+    });
+  }
+
+  start() {
+    for (const entry of Array.from(this.jobs.values())) {
+      if (entry.timer) continue;
+      this.schedule(entry.job.name, entry.job.initialDelayMs);
+    }
+  }
+
+  // Run a job now (admin trigger); resolves when it finished, or false if unknown
+  async runNow(name: string): Promise<MaintenanceJobStatus | false> {
+    const entry = this.jobs.get(name);
+    if (!entry) return false;
+    await this.enqueue(name);
+    return entry.status;
+  }
+
+  getStatus(): MaintenanceJobStatus[] {
+    return Array.from(this.jobs.values()).map(entry => entry.status);
+  }
+
+  private schedule(name: string, delayMs: number) {
+    const entry = this.jobs.get(name)!;
+    entry.status.nextRunAt = new Date(Date.now() + delayMs).toISOString();
+    entry.timer = setTimeout(() => {
+      this.enqueue(name).finally(() => this.schedule(name, entry.job.intervalMs));
+    }, delayMs);
+  }
+
+  private enqueue(name: string): Promise<void> {
+    const run = this.queue.then(() => this.execute(name));
+    this.queue = run;
+    return run;
+  }
+
+  private async execute(name: string) {
+    const { job, status } = this.jobs.get(name)!;
+    const startedAt = Date.now();
+    const lastRun: NonNullable<MaintenanceJobStatus['lastRun']> = {
+      startedAt: new Date(startedAt).toISOString(),
+      finishedAt: null,
+      processed: 0,
+      batches: 0,
+      durationMs: null,
+      error: null,
+    };
+    status.running = true;
+    status.runs++;
+    status.lastRun = lastRun;
+
+    let lastBatchMs = 0;
+    let batchStartedAt = Date.now();
+    const context: MaintenanceJobContext = {
+      batchDone: processed => {
+        lastRun.processed += processed;
+        lastRun.batches++;
+        status.processedTotal += processed;
+        lastBatchMs = Date.now() - batchStartedAt;
+      },
+      pause: async () => {
+        await sleep(Math.max(BATCH_PAUSE_MS, lastBatchMs));
+        batchStartedAt = Date.now();
+      },
+    };
+
+    try {
+      await job.run(context);
+      if (lastRun.processed > 0) {
+        console.log(`🧹 ${job.name}: ${lastRun.processed} processed in ${lastRun.batches} batches`);
+      }
+    } catch (error: any) {
+      lastRun.error = error.message;
+      console.error(`❌ Maintenance job ${job.name} failed after ${lastRun.processed} items:`, error.message);
+    } finally {
+      status.running = false;
+      lastRun.finishedAt = new Date().toISOString();
+      lastRun.durationMs = Date.now() - startedAt;
+    }
+  }
+}
+
+export const maintenance = new MaintenanceScheduler();
@@ -0,0 +1,139 @@
+import { aiService } from "./ai";
+import { providerLatency } from "./providerLatency";
+import { providerBreakers } from "./circuitBreaker";
+
+export type RoutingSla = 'fast' | 'cheap' | 'balanced';
+
+export const ROUTING_SLAS: RoutingSla[] = ['fast', 'cheap', 'balanced'];
+
+interface RouteCandidate {
+  provider: string;
+  model: string; // Model key as used in credit keys (`${provider}-${model}`) and breaker keys
+  contextTokens: number;
+  // Latency assumed until enough real samples exist
+  priorLatencyMs: number;
+}
+
+// Models the router may pick. Context windows leave room for the system prompt.
+const ROUTE_CANDIDATES: RouteCandidate[] = [
+  { provider: 'gemini', model: 'pro', contextTokens: 1_000_000, priorLatencyMs: 40000 },
+  { provider: 'openai', model: 'gpt5', contextTokens: 400_000, priorLatencyMs: 60000 },
+  { provider: 'anthropic', model: 'claude', contextTokens: 200_000, priorLatencyMs: 45000 },
+];
+
+// Model key to use when a caller names only the provider
+export function defaultRouteModel(provider: string): string | undefined {
+  return ROUTE_CANDIDATES.find(candidate => candidate.provider === provider)?.model;
+}
+
+// Room for the system/template prompt and the JSON answer
+const PROMPT_OVERHEAD_TOKENS = 8000;
+const MIN_LATENCY_SAMPLES = 5;
+
+export interface ScoredCandidate {
+  provider: string;
+  model: string;
+  eligible: boolean;
+  reason?: string;
+  credits?: number;
+  expectedLatencyMs?: number;
+  latencySource?: 'observed' | 'prior';
+  score?: number;
+}
+
+export interface RoutingDecision {
+  provider: string;
+  model: string;
+  sla: RoutingSla;
+  estimatedTokens: number;
+  credits: number;
+  expectedLatencyMs: number;
+  candidates: ScoredCandidate[];
+}
+
+export class NoRouteAvailableError extends Error {
+  constructor(public readonly candidates: ScoredCandidate[]) {
+    super(`No AI model can handle this document right now: ${candidates.map(c => `${c.provider}-${c.model} (${c.reason})`).join(', ')}`);
+    this.name = 'NoRouteAvailableError';
+  }
+}
+
+// Rough token estimate for Portuguese legal text (~4 characters per token)
+export function estimateTokens(content: string): number {
+  return Math.ceil(content.length / 4);
+}
+
+/**
+ * Picks a provider/model for `aiProvider: 'auto'` requests. Candidates that
+ * cannot fit the document, have no API key or have an open circuit are
+ * excluded; the rest are ranked by the user's SLA preference using the credit
+ * cost for the analysis type and the p50 latency each provider is actually
+ * showing (falling back to a prior until there are enough samples).
+ */
+class ModelRouter {
+  async route(params: {
+    content: string;
+    analysisType: string;
+    sla: RoutingSla;
+    userApiKeys?: Record<string, string | undefined>;
+  }): Promise<RoutingDecision> {
+    const { content, analysisType, sla, userApiKeys = {} } = params;
+    const estimatedTokens = estimateTokens(content);
+
+    const scored: ScoredCandidate[] = await Promise.all(ROUTE_CANDIDATES.map(async candidate => {
+      const base = { provider: candidate.provider, model: candidate.model };
+
+      if (estimatedTokens + PROMPT_OVERHEAD_TOKENS > candidate.contextTokens) {
+        return { ...base, eligible: false, reason: 'document too large for context window' };
+      }
+      if (providerBreakers.get(candidate.provider, candidate.model).getState() === 'open') {
+        return { ...base, eligible: false, reason: 'circuit open' };
+      }
+      if (!(await aiService.hasApiKey(candidate.provider, userApiKeys[candidate.provider]))) {
+        return { ...base, eligible: false, reason: 'no API key configured' };
+      }
+
+      const observed = providerLatency.sampleCount(candidate.provider) >= MIN_LATENCY_SAMPLES
+        ? providerLatency.percentile(candidate.provider, 50)
+        : undefined;
+
+      return {
+        ...base,
+        eligible: true,
+        credits: aiService.getProviderCredits(`${candidate.provider}-${candidate.model}`, analysisType),
+        expectedLatencyMs: observed ?? candidate.priorLatencyMs,
+        latencySource: observed !== undefined ? 'observed' as const : 'prior' as const,
+      };
+    }));
+
+    const eligible = scored.filter(candidate => candidate.eligible);
+    if (eligible.length === 0) {
+      throw new NoRouteAvailableError(scored);
+    }
+
+    // Normalize against the best eligible value so cost and latency are comparable
+    const minCredits = Math.max(1, Math.min(...eligible.map(c => c.credits!)));
+    const minLatency = Math.max(1, Math.min(...eligible.map(c => c.expectedLatencyMs!)));
+    const weights = { fast: [0.1, 0.9], cheap: [0.9, 0.1], balanced: [0.5, 0.5] }[sla];
+
+    for (const candidate of eligible) {
+      candidate.score = weights[0] * (candidate.credits! / minCredits) + weights[1] * (candidate.expectedLatencyMs! / minLatency);
+    }
+
+    const chosen = eligible.reduce((best, candidate) => candidate.score! < best.score! ? candidate : best);
+
+    console.log(`🧭 Routed ${analysisType} analysis (~${estimatedTokens} tokens, sla=${sla}) to ${chosen.provider}-${chosen.model}`);
+
+    return {
+      provider: chosen.provider,
+      model: chosen.model,
+      sla,
+      estimatedTokens,
+      credits: chosen.credits!,
+      expectedLatencyMs: chosen.expectedLatencyMs!,
+      candidates: scored,
+    };
+  }
+}
+
+export const modelRouter = new ModelRouter();
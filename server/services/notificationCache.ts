@@ -0,0 +1,88 @@
+import { storage } from "../storage";
+import type { AdminNotification } from "@shared/schema";
+
+const CACHE_MAX_USERS = parseInt(process.env.NOTIFICATION_CACHE_MAX_USERS || '5000', 10);
+// Also bounds how long another instance can serve a list changed elsewhere
+const CACHE_TTL_MS = parseInt(process.env.NOTIFICATION_CACHE_TTL_MS || '60000', 10);
+
+interface CacheEntry {
+  notifications: AdminNotification[];
+  expiresAt: number;
+}
+
+/**
+ * Per-user cache of unread admin notifications, which every page load asks
+ * for. A user's entry is dropped when they view a notification; publishing,
+ * editing or deleting a notification drops every entry. Notifications that
+ * expire while cached are filtered out on read.
+ */
+class NotificationCache {
+  // Map iteration order doubles as recency order (oldest first)
+  private cache = new Map<string, CacheEntry>();
+  private inFlight = new Map<string, Promise<AdminNotification[]>>();
+  private stats = { hits: 0, misses: 0, invalidations: 0 };
+  // Bumped on every invalidation so loads started before it are not cached
+  private generation = 0;
+
+  async getUnread(userId: string): Promise<AdminNotification[]> {
+    const entry = this.cache.get(userId);
+    if (entry && entry.expiresAt > Date.now()) {
+      this.stats.hits++;
+      this.cache.delete(userId);
+      this.cache.set(userId, entry);
+      return this.withoutExpired(entry.notifications);
+    }
+
+    let pending = this.inFlight.get(userId);
+    if (!pending) {
+      this.stats.misses++;
+      const generation = this.generation;
+      const loading = storage.getUnreadNotificationsForUser(userId).then(notifications => {
+        if (generation === this.generation) this.store(userId, notifications);
+        return notifications;
+      }).finally(() => {
+        if (this.inFlight.get(userId) === loading) this.inFlight.delete(userId);
+      });
+      pending = loading;
+      this.inFlight.set(userId, pending);
+    }
+    return pending;
+  }
+
+  // The user viewed (dismissed) a notification
+  invalidateUser(userId: string) {
+    this.generation++;
+    this.cache.delete(userId);
+    this.inFlight.delete(userId);
+    this.stats.invalidations++;
+  }
+
+  // A notification was published, changed or removed
+  invalidateAll() {
+    this.generation++;
+    this.cache.clear();
+    this.inFlight.clear();
+    this.stats.invalidations++;
+  }
+
+  private store(userId: string, notifications: AdminNotification[]) {
+    this.cache.delete(userId);
+    this.cache.set(userId, { notifications, expiresAt: Date.now() + CACHE_TTL_MS });
+
+    for (const cachedUserId of this.cache.keys()) {
+      if (this.cache.size <= CACHE_MAX_USERS) break;
+      this.cache.delete(cachedUserId);
+    }
+  }
+
+  private withoutExpired(notifications: AdminNotification[]): AdminNotification[] {
+    const now = Date.now();
+    return notifications.filter(notification => !notification.expiresAt || notification.expiresAt.getTime() > now);
+  }
+
+  getStats() {
+    return { ...this.stats, users: this.cache.size, maxUsers: CACHE_MAX_USERS, ttlMs: CACHE_TTL_MS };
+  }
+}
+
+export const notificationCache = new NotificationCache();
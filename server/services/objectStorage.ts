@@ -0,0 +1,218 @@
+import { createClient, type SupabaseClient } from "@supabase/supabase-js";
+import { createHmac, randomUUID, timingSafeEqual } from "crypto";
+
+// Signed upload URLs stay valid this long
+const UPLOAD_URL_TTL_SECONDS = parseInt(process.env.OBJECT_UPLOAD_URL_TTL_SECONDS || '900', 10);
+const UPLOAD_PREFIX = 'uploads';
+
+export interface SignedUpload {
+  objectKey: string;
+  uploadUrl: string;
+  method: 'PUT';
+  headers: Record<string, string>;
+  expiresAt: string;
+}
+
+export interface StoredObject {
+  size: number;
+  contentType?: string;
+}
+
+export class ObjectNotFoundError extends Error {
+  constructor(public readonly objectKey: string) {
+    super(`Object not found: ${objectKey}`);
+    this.name = 'ObjectNotFoundError';
+  }
+}
+
+interface ObjectStoreDriver {
+  readonly name: string;
+  signUpload(objectKey: string, mimeType: string): Promise<Omit<SignedUpload, 'objectKey' | 'expiresAt'>>;
+  stat(objectKey: string): Promise<StoredObject | null>;
+  download(objectKey: string): Promise<Buffer>;
+  remove(objectKey: string): Promise<void>;
+}
+
+/**
+ * Supabase Storage bucket (OBJECT_STORAGE_BUCKET). The service key signs the
+ * upload URLs; clients PUT to them without any other credentials.
+ */
+class SupabaseObjectStore implements ObjectStoreDriver {
+  readonly name = 'supabase';
+  private client: SupabaseClient;
+
+  constructor(url: string, serviceKey: string, private bucket: string) {
+    this.client = createClient(url, serviceKey, { auth: { persistSession: false } });
+  }
+
+  async signUpload(objectKey: string, mimeType: string) {
+    const { data, error } = await this.client.storage.from(this.bucket).createSignedUploadUrl(objectKey);
+    if (error || !data) {
+      throw new Error(`Failed to sign upload URL: ${error?.message}`);
+    }
+    return { uploadUrl: data.signedUrl, method: 'PUT' as const, headers: { 'Content-Type': mimeType } };
+  }
+
+  async stat(objectKey: string): Promise<StoredObject | null> {
+    const folder = objectKey.slice(0, objectKey.lastIndexOf('/'));
+    const fileName = objectKey.slice(objectKey.lastIndexOf('/') + 1);
+    const { data, error } = await this.client.storage.from(this.bucket).list(folder, { search: fileName });
+    if (error) {
+      throw new Error(`Failed to stat ${objectKey}: ${error.message}`);
+    }
+    const entry = data?.find(item => item.name === fileName);
+    return entry ? { size: entry.metadata?.size ?? 0, contentType: entry.metadata?.mimetype } : null;
+  }
+
+  async download(objectKey: string): Promise<Buffer> {
+    const { data, error } = await this.client.storage.from(this.bucket).download(objectKey);
+    if (error || !data) {
+      throw new ObjectNotFoundError(objectKey);
+    }
+    return Buffer.from(await data.arrayBuffer());
+  }
+
+  async remove(objectKey: string): Promise<void> {
+    const { error } = await this.client.storage.from(this.bucket).remove([objectKey]);
+    if (error) {
+      throw new Error(`Failed to remove ${objectKey}: ${error.message}`);
+    }
+  }
+}
+
+/**
+ * The local stand-in (server/scripts/object-storage-standin.ts). Every request,
+ * including the server's own reads, goes through an HMAC-signed URL, so the
+ * stand-in only needs the shared secret.
+ */
+class StandinObjectStore implements ObjectStoreDriver {
+  readonly name = 'standin';
+
+  constructor(private baseUrl: string, private secret: string) {}
+
+  private signedUrl(method: string, objectKey: string, ttlSeconds = 60) {
+    const expires = Math.floor(Date.now() / 1000) + ttlSeconds;
+    const signature = signStandinRequest(this.secret, method, objectKey, expires);
+    return `${this.baseUrl}/objects/${objectKey}?expires=${expires}&signature=${signature}`;
+  }
+
+  async signUpload(objectKey: string, mimeType: string) {
+    return {
+      uploadUrl: this.signedUrl('PUT', objectKey, UPLOAD_URL_TTL_SECONDS),
+      method: 'PUT' as const,
+      headers: { 'Content-Type': mimeType },
+    };
+  }
+
+  async stat(objectKey: string): Promise<StoredObject | null> {
+    const res = await fetch(this.signedUrl('HEAD', objectKey), { method: 'HEAD' });
+    if (res.status === 404) return null;
+    if (!res.ok) throw new Error(`Failed to stat ${objectKey}: HTTP ${res.status}`);
+    return {
+      size: parseInt(res.headers.get('content-length') || '0', 10),
+      contentType: res.headers.get('content-type') || undefined,
+    };
+  }
+
+  async download(objectKey: string): Promise<Buffer> {
+    const res = await fetch(this.signedUrl('GET', objectKey));
+    if (res.status === 404) throw new ObjectNotFoundError(objectKey);
+    if (!res.ok) throw new Error(`Failed to download ${objectKey}: HTTP ${res.status}`);
+    return Buffer.from(await res.arrayBuffer());
+  }
+
+  async remove(objectKey: string): Promise<void> {
+    const res = await fetch(this.signedUrl('DELETE', objectKey), { method: 'DELETE' });
+    if (!res.ok && res.status !== 404) throw new Error(`Failed to remove ${objectKey}: HTTP ${res.status}`);
+  }
+}
+
+export function signStandinRequest(secret: string, method: string, objectKey: string, expires: number): string {
+  return createHmac('sha256', secret).update(`${method}\n${objectKey}\n${expires}`).digest('hex');
+}
+
+export function verifyStandinRequest(secret: string, method: string, objectKey: string, expires: number, signature: string): boolean {
+  if (!Number.isFinite(expires) || expires < Date.now() / 1000) return false;
+  const expected = Buffer.from(signStandinRequest(secret, method, objectKey, expires));
+  const given = Buffer.from(signature || '');
+  return expected.length === given.length && timingSafeEqual(expected, given);
+}
+
+// Keep object keys to a safe character set; the original name is stored separately
+function sanitizeFileName(fileName: string): string {
+  return fileName.normalize('NFKD').replace(/[^\w.-]+/g, '_').slice(-120) || 'document';
+}
+
+/**
+ * Direct-to-object-storage uploads. The API hands out short-lived signed URLs,
+ * the browser or API client uploads straight to the bucket, and workers fetch
+ * the object when they process it, so upload bytes never pass through the
+ * HTTP tier and workers need no shared disk with it.
+ *
+ * OBJECT_STORAGE_DRIVER selects 'supabase' (OBJECT_STORAGE_BUCKET, default
+ * 'documents') or 'standin' (OBJECT_STORAGE_URL + OBJECT_STORAGE_SECRET); when
+ * unset, Supabase is used if its service key is configured.
+ */
+class ObjectStorageService {
+  private driver: ObjectStoreDriver | null | undefined;
+
+  private getDriver(): ObjectStoreDriver | null {
+    if (this.driver !== undefined) return this.driver;
+
+    const supabaseUrl = process.env.SUPABASE_URL || process.env.VITE_SUPABASE_URL;
+    const supabaseKey = process.env.SUPABASE_SERVICE_KEY;
+    const driverName = process.env.OBJECT_STORAGE_DRIVER || (supabaseUrl && supabaseKey ? 'supabase' : 'none');
+
+    if (driverName === 'supabase' && supabaseUrl && supabaseKey) {
+      this.driver = new SupabaseObjectStore(supabaseUrl, supabaseKey, process.env.OBJECT_STORAGE_BUCKET || 'documents');
+    } else if (driverName === 'standin' && process.env.OBJECT_STORAGE_SECRET) {
+      this.driver = new StandinObjectStore(process.env.OBJECT_STORAGE_URL || 'http://localhost:4020', process.env.OBJECT_STORAGE_SECRET);
+    } else {
+      this.driver = null;
+    }
+
+    console.log(`🪣 Object storage: ${this.driver?.name ?? 'not configured'}`);
+    return this.driver;
+  }
+
+  isConfigured(): boolean {
+    return this.getDriver() !== null;
+  }
+
+  private requireDriver(): ObjectStoreDriver {
+    const driver = this.getDriver();
+    if (!driver) {
+      throw new Error('Object storage is not configured');
+    }
+    return driver;
+  }
+
+  async createUpload(userId: string, fileName: string, mimeType: string): Promise<SignedUpload> {
+    const objectKey = `${UPLOAD_PREFIX}/${userId}/${randomUUID()}/${sanitizeFileName(fileName)}`;
+    const signed = await this.requireDriver().signUpload(objectKey, mimeType);
+    return {
+      objectKey,
+      ...signed,
+      expiresAt: new Date(Date.now() + UPLOAD_URL_TTL_SECONDS * 1000).toISOString(),
+    };
+  }
+
+  // Uploads are namespaced per user; a key outside the caller's prefix is never theirs
+  ownsObject(userId: string, objectKey: string): boolean {
+    return objectKey.startsWith(`${UPLOAD_PREFIX}/${userId}/`) && !objectKey.includes('..');
+  }
+
+  async stat(objectKey: string): Promise<StoredObject | null> {
+    return this.requireDriver().stat(objectKey);
+  }
+
+  async download(objectKey: string): Promise<Buffer> {
+    return this.requireDriver().download(objectKey);
+  }
+
+  async remove(objectKey: string): Promise<void> {
+    return this.requireDriver().remove(objectKey);
+  }
+}
+
+export const objectStorage = new ObjectStorageService();
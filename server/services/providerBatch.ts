@@ -0,0 +1,453 @@
+import OpenAI, { toFile } from "openai";
+import Anthropic from "@anthropic-ai/sdk";
+import { storage } from "../storage";
+import { aiService, DEFAULT_PROVIDER_MODELS, type AnalysisResult } from "./ai";
+import { clauseIndex, applyClauseScreening } from "./clauseIndex";
+import { loadBatchDocumentText, releaseBatchDocumentSource } from "./batchDocumentSource";
+import { batchStatusWriter } from "./batchStatusWriter";
+import { apiKeyCache } from "./apiKeyCache";
+import { batchEvents } from "./batchEvents";
+import type { BatchDocument, BatchJob, BatchJobMetadata, QueueJob } from "@shared/schema";
+
+export const PROVIDER_BATCH_POLL_JOB = 'provider_batch_poll';
+
+const POLL_INTERVAL_MS = parseInt(process.env.PROVIDER_BATCH_POLL_MS || '60000', 10);
+// Both providers bill batch requests at half price; pass the saving on
+const ECONOMY_CREDIT_MULTIPLIER = parseFloat(process.env.ECONOMY_CREDIT_MULTIPLIER || '0.5');
+const SUPPORTED_PROVIDERS = ['openai', 'anthropic'];
+const USER_MESSAGE_PREFIX = 'Please analyze the following legal document:\n\n';
+
+export interface ProviderBatchPollJob {
+  batchJobId: string;
+  userId: string;
+  provider: string;
+  providerBatchId: string;
+  analysisType: string;
+  aiModel: string;
+  templateId?: string;
+}
+
+interface ProviderBatchOutcome {
+  documentId: string;
+  text?: string;
+  error?: string;
+}
+
+/**
+ * "Economy" execution for batch jobs: every document is submitted in one
+ * OpenAI Batch API / Anthropic Message Batches request instead of one chat
+ * call per document. The submission is tracked by a `provider_batch_poll`
+ * queue job that is rescheduled until the provider finishes, then results are
+ * ingested into the document_analyses rows created at submission time.
+ *
+ * OPENAI_BATCH_BASE_URL / ANTHROPIC_BATCH_BASE_URL point the clients at a
+ * local stand-in for the provider API.
+ */
+class ProviderBatchService {
+  supports(provider: string): boolean {
+    return SUPPORTED_PROVIDERS.includes(provider);
+  }
+
+  getEconomyCredits(provider: string, model: string, analysisType: string): number {
+    return Math.max(1, Math.ceil(aiService.getProviderCredits(`${provider}-${model}`, analysisType) * ECONOMY_CREDIT_MULTIPLIER));
+  }
+
+  private async getApiKey(userId: string, provider: string): Promise<string> {
+    const apiKey = await aiService.resolveApiKey(provider, await apiKeyCache.getUserKey(userId, provider));
+    if (!apiKey) {
+      throw new Error(`No ${provider} API key available for batch submission`);
+    }
+    return apiKey;
+  }
+
+  private openaiClient(apiKey: string) {
+    return new OpenAI({ apiKey, baseURL: process.env.OPENAI_BATCH_BASE_URL || undefined });
+  }
+
+  private anthropicClient(apiKey: string) {
+    return new Anthropic({ apiKey, baseURL: process.env.ANTHROPIC_BATCH_BASE_URL || undefined });
+  }
+
+  private async loadTemplate(templateId: string | undefined, provider: string) {
+    return templateId ? await aiService.loadTemplateData(templateId, provider) : null;
+  }
+
+  /**
+   * Extract every pending document, create its analysis record and submit all
+   * of them to the provider in a single batch. Temp files are removed once the
+   * submission is accepted; the extracted text lives on in document_analyses.
+   */
+  async submit(batchJob: BatchJob, documents: BatchDocument[]): Promise<void> {
+    const provider = batchJob.aiProvider;
+    const analysisType = batchJob.templateId ? 'template' : batchJob.analysisType;
+    const templateId = batchJob.templateId || undefined;
+    const apiKey = await this.getApiKey(batchJob.userId, provider);
+    const templateData = await this.loadTemplate(templateId, provider);
+    const creditsPerDocument = this.getEconomyCredits(provider, batchJob.aiModel, batchJob.analysisType);
+
+    const requests: Array<{ documentId: string; analysisId: string; systemPrompt: string; userMessage: string }> = [];
+    const submitted: BatchDocument[] = [];
+
+    for (const document of documents.filter(doc => doc.status === 'pending' || doc.status === 'processing')) {
+      try {
+        const content = await loadBatchDocumentText(document);
+
+        const clauseScreening = templateData ? clauseIndex.screen(templateData, content) : null;
+        const systemPrompt = await aiService.buildSystemPrompt(
+          provider,
+          analysisType,
+          templateData ? { ...templateData, clauseScreening } : undefined
+        );
+
+        const analysis = await storage.createDocumentAnalysis(batchJob.userId, {
+          title: `Batch: ${document.originalFileName}`,
+          content,
+          aiProvider: provider,
+          aiModel: batchJob.aiModel,
+          analysisType: batchJob.analysisType,
+          templateId: templateId || null,
+          result: {},
+          creditsUsed: creditsPerDocument,
+        }, "processing");
+
+        batchStatusWriter.record(document.id, { status: 'processing', documentAnalysisId: analysis.id });
+        requests.push({ documentId: document.id, analysisId: analysis.id, systemPrompt, userMessage: `${USER_MESSAGE_PREFIX}${content}` });
+        submitted.push(document);
+      } catch (error: any) {
+        console.error(`❌ Failed to prepare ${document.originalFileName} for provider batch:`, error.message);
+        batchStatusWriter.record(document.id, { status: 'failed', errorMessage: error.message });
+        await releaseBatchDocumentSource(document);
+      }
+    }
+
+    if (requests.length === 0) {
+      await batchStatusWriter.flush();
+      await this.completeBatch(batchJob, { provider, batchId: '', status: 'empty', submittedAt: new Date().toISOString(), requestCount: 0 });
+      return;
+    }
+
+    let providerBatchId: string;
+    try {
+      providerBatchId = await this.submitRequests(provider, apiKey, batchJob.id, requests);
+    } catch (error: any) {
+      // Leave the documents pending (files are still on disk) so a retry can resubmit them
+      for (const request of requests) {
+        batchStatusWriter.record(request.documentId, { status: 'pending', errorMessage: error.message });
+        await storage.updateDocumentAnalysisResult(request.analysisId, { error: error.message }, "failed");
+      }
+      await batchStatusWriter.flush();
+      throw error;
+    }
+
+    console.log(`📦 Submitted ${requests.length} documents to ${provider} batch ${providerBatchId} for job ${batchJob.id}`);
+
+    await batchStatusWriter.flush();
+    await storage.updateBatchJob(batchJob.id, {
+      metadata: {
+        ...(batchJob.metadata as BatchJobMetadata || {}),
+        executionMode: 'economy',
+        providerBatch: {
+          provider,
+          batchId: providerBatchId,
+          status: 'submitted',
+          submittedAt: new Date().toISOString(),
+          requestCount: requests.length,
+        },
+      } as BatchJobMetadata
+    });
+
+    const pollJob: ProviderBatchPollJob = {
+      batchJobId: batchJob.id,
+      userId: batchJob.userId,
+      provider,
+      providerBatchId,
+      analysisType: batchJob.analysisType,
+      aiModel: batchJob.aiModel,
+      templateId,
+    };
+    await storage.createQueueJob({
+      jobType: PROVIDER_BATCH_POLL_JOB,
+      jobData: pollJob,
+      priority: 0,
+      scheduledFor: new Date(Date.now() + POLL_INTERVAL_MS),
+    });
+
+    for (const document of submitted) {
+      await releaseBatchDocumentSource(document);
+    }
+
+    batchEvents.publish({
+      type: 'status',
+      batchJobId: batchJob.id,
+      userId: batchJob.userId,
+      status: 'processing',
+      totalDocuments: documents.length
+    });
+  }
+
+  // Hand the prepared requests to the provider; returns the provider's batch id
+  private async submitRequests(
+    provider: string,
+    apiKey: string,
+    batchJobId: string,
+    requests: Array<{ documentId: string; systemPrompt: string; userMessage: string }>
+  ): Promise<string> {
+    const model = DEFAULT_PROVIDER_MODELS[provider];
+
+    if (provider === 'openai') {
+      const client = this.openaiClient(apiKey);
+      const jsonl = requests.map(request => JSON.stringify({
+        custom_id: request.documentId,
+        method: 'POST',
+        url: '/v1/chat/completions',
+        body: {
+          model,
+          messages: [
+            { role: 'system', content: request.systemPrompt },
+            { role: 'user', content: request.userMessage }
+          ],
+          response_format: { type: 'json_object' },
+          temperature: 0.1,
+        },
+      })).join('\n');
+
+      const inputFile = await client.files.create({
+        file: await toFile(Buffer.from(jsonl, 'utf-8'), `batch-${batchJobId}.jsonl`),
+        purpose: 'batch',
+      });
+      const batch = await client.batches.create({
+        input_file_id: inputFile.id,
+        endpoint: '/v1/chat/completions',
+        completion_window: '24h',
+        metadata: { batch_job_id: batchJobId },
+      });
+      return batch.id;
+    }
+
+    const client = this.anthropicClient(apiKey);
+    const batch = await client.messages.batches.create({
+      requests: requests.map(request => ({
+        custom_id: request.documentId,
+        params: {
+          model,
+          system: request.systemPrompt,
+          messages: [{ role: 'user' as const, content: request.userMessage }],
+          max_tokens: 4000,
+          temperature: 0.1,
+        },
+      })),
+    });
+    return batch.id;
+  }
+
+  /**
+   * Check the provider batch once. Returns false (after rescheduling the queue
+   * job) while the provider is still working, true once results were ingested.
+   */
+  async poll(queueJob: QueueJob): Promise<boolean> {
+    const job = queueJob.jobData as ProviderBatchPollJob;
+    const batchJob = await storage.getBatchJobById(job.batchJobId);
+    if (!batchJob) {
+      throw new Error(`Batch job not found: ${job.batchJobId}`);
+    }
+
+    const apiKey = await this.getApiKey(job.userId, job.provider);
+
+    if (batchJob.status === 'cancelled') {
+      await this.cancel(job, apiKey);
+      return true;
+    }
+
+    const outcomes = job.provider === 'openai'
+      ? await this.fetchOpenAIResults(job, apiKey)
+      : await this.fetchAnthropicResults(job, apiKey);
+
+    if (!outcomes) {
+      await storage.rescheduleQueueJob(queueJob.id, new Date(Date.now() + POLL_INTERVAL_MS), 'Waiting for provider batch');
+      return false;
+    }
+
+    await this.ingest(batchJob, job, outcomes);
+    return true;
+  }
+
+  // null while the batch is still running
+  private async fetchOpenAIResults(job: ProviderBatchPollJob, apiKey: string): Promise<ProviderBatchOutcome[] | null> {
+    const client = this.openaiClient(apiKey);
+    const batch = await client.batches.retrieve(job.providerBatchId);
+    if (['validating', 'in_progress', 'finalizing', 'cancelling'].includes(batch.status)) {
+      return null;
+    }
+
+    const outcomes: ProviderBatchOutcome[] = [];
+    const readLines = async (fileId?: string | null) => {
+      if (!fileId) return [];
+      const response = await client.files.content(fileId);
+      return (await response.text()).split('\n').filter(line => line.trim()).map(line => JSON.parse(line));
+    };
+
+    for (const line of await readLines(batch.output_file_id)) {
+      const body = line.response?.body;
+      if (line.response?.status_code === 200 && body?.choices?.[0]?.message?.content) {
+        outcomes.push({ documentId: line.custom_id, text: body.choices[0].message.content });
+      } else {
+        outcomes.push({ documentId: line.custom_id, error: body?.error?.message || line.error?.message || 'Request failed' });
+      }
+    }
+    for (const line of await readLines(batch.error_file_id)) {
+      outcomes.push({ documentId: line.custom_id, error: line.error?.message || line.response?.body?.error?.message || 'Request failed' });
+    }
+
+    if (batch.status !== 'completed') {
+      console.warn(`⚠️ OpenAI batch ${batch.id} ended with status ${batch.status}`);
+    }
+    return outcomes;
+  }
+
+  private async fetchAnthropicResults(job: ProviderBatchPollJob, apiKey: string): Promise<ProviderBatchOutcome[] | null> {
+    const client = this.anthropicClient(apiKey);
+    const batch = await client.messages.batches.retrieve(job.providerBatchId);
+    if (batch.processing_status !== 'ended') {
+      return null;
+    }
+
+    const outcomes: ProviderBatchOutcome[] = [];
+    for await (const entry of await client.messages.batches.results(job.providerBatchId)) {
+      if (entry.result.type === 'succeeded') {
+        const textBlock = entry.result.message.content.find(block => block.type === 'text');
+        outcomes.push(textBlock && textBlock.type === 'text'
+          ? { documentId: entry.custom_id, text: textBlock.text }
+          : { documentId: entry.custom_id, error: 'No text content in response' });
+      } else if (entry.result.type === 'errored') {
+        outcomes.push({ documentId: entry.custom_id, error: entry.result.error?.error?.message || 'Request failed' });
+      } else {
+        outcomes.push({ documentId: entry.custom_id, error: `Request ${entry.result.type}` });
+      }
+    }
+    return outcomes;
+  }
+
+  private async ingest(batchJob: BatchJob, job: ProviderBatchPollJob, outcomes: ProviderBatchOutcome[]) {
+    const documents = await storage.getBatchDocuments(batchJob.id);
+    const byId = new Map(outcomes.map(outcome => [outcome.documentId, outcome]));
+    const templateData = await this.loadTemplate(job.templateId, job.provider);
+    const creditsPerDocument = this.getEconomyCredits(job.provider, job.aiModel, job.analysisType);
+
+    for (const document of documents.filter(doc => doc.status === 'processing')) {
+      const outcome = byId.get(document.id) || { documentId: document.id, error: 'No result returned by provider batch' };
+      const analysisId = document.documentAnalysisId;
+
+      try {
+        if (outcome.error || !outcome.text) {
+          throw new Error(outcome.error || 'Empty response');
+        }
+        if (!analysisId) {
+          throw new Error('Analysis record missing for batch document');
+        }
+
+        let result = JSON.parse(outcome.text) as AnalysisResult;
+        if (!aiService.isValidResult(result)) {
+          throw new Error('Invalid analysis result');
+        }
+        if (templateData) {
+          const analysis = await storage.getDocumentAnalysis(analysisId, job.userId);
+          result = applyClauseScreening(result, clauseIndex.screen(templateData, analysis?.content || ''));
+        }
+
+        await storage.updateDocumentAnalysisResult(analysisId, result, "completed");
+        batchStatusWriter.record(document.id, { status: 'completed', creditsUsed: creditsPerDocument });
+        this.publishDocumentStatus(document, job.userId, 'completed');
+      } catch (error: any) {
+        if (analysisId) {
+          await storage.updateDocumentAnalysisResult(analysisId, { error: error.message }, "failed");
+        }
+        batchStatusWriter.record(document.id, { status: 'failed', errorMessage: error.message });
+        this.publishDocumentStatus(document, job.userId, 'failed', error.message);
+      }
+    }
+
+    await batchStatusWriter.flush();
+    const metadata = batchJob.metadata as BatchJobMetadata || {};
+    await this.completeBatch(batchJob, {
+      ...metadata.providerBatch!,
+      status: 'ingested',
+      completedAt: new Date().toISOString(),
+    });
+  }
+
+  private async completeBatch(batchJob: BatchJob, providerBatch: NonNullable<BatchJobMetadata['providerBatch']>) {
+    const documents = await storage.getBatchDocuments(batchJob.id);
+    const processedCount = documents.filter(doc => doc.status === 'completed').length;
+    const failedCount = documents.filter(doc => doc.status === 'failed').length;
+    const totalCreditsUsed = documents.reduce((total, doc) => total + (doc.status === 'completed' ? doc.creditsUsed || 0 : 0), 0);
+
+    await storage.updateBatchJob(batchJob.id, {
+      processedDocuments: processedCount,
+      failedDocuments: failedCount,
+      totalCreditsUsed,
+      metadata: {
+        ...(batchJob.metadata as BatchJobMetadata || {}),
+        executionMode: 'economy',
+        progressPercentage: 100,
+        providerBatch,
+      } as BatchJobMetadata
+    });
+
+    // Requests that failed in the provider batch are not billed; return their reservation
+    await storage.refundUnusedBatchCredits(batchJob.id);
+
+    const finalStatus = failedCount === documents.length ? 'failed' :
+                       failedCount > 0 ? 'completed_with_errors' : 'completed';
+    await storage.updateBatchJobStatus(batchJob.id, finalStatus);
+    batchEvents.publish({
+      type: 'status',
+      batchJobId: batchJob.id,
+      userId: batchJob.userId,
+      status: finalStatus,
+      processedDocuments: processedCount,
+      failedDocuments: failedCount,
+      totalDocuments: documents.length,
+      progressPercentage: 100
+    });
+
+    console.log(`🎉 Provider batch ingested for ${batchJob.id}: ${processedCount} success, ${failedCount} failed`);
+  }
+
+  private async cancel(job: ProviderBatchPollJob, apiKey: string) {
+    try {
+      if (job.provider === 'openai') {
+        await this.openaiClient(apiKey).batches.cancel(job.providerBatchId);
+      } else {
+        await this.anthropicClient(apiKey).messages.batches.cancel(job.providerBatchId);
+      }
+    } catch (error: any) {
+      console.warn(`⚠️ Failed to cancel ${job.provider} batch ${job.providerBatchId}:`, error.message);
+    }
+
+    const documents = await storage.getBatchDocuments(job.batchJobId);
+    for (const document of documents.filter(doc => doc.status === 'processing')) {
+      batchStatusWriter.record(document.id, { status: 'skipped', errorMessage: 'Cancelled by user' });
+      if (document.documentAnalysisId) {
+        await storage.updateDocumentAnalysisResult(document.documentAnalysisId, { error: 'Cancelled by user' }, "failed");
+      }
+    }
+    await batchStatusWriter.flush();
+
+    const refunded = await storage.refundUnusedBatchCredits(job.batchJobId);
+    console.log(`⏹️ Provider batch ${job.providerBatchId} cancelled, ${refunded} credits refunded`);
+  }
+
+  private publishDocumentStatus(document: BatchDocument, userId: string, status: string, error?: string) {
+    batchEvents.publish({
+      type: 'document',
+      batchJobId: document.batchJobId,
+      userId,
+      documentId: document.id,
+      fileName: document.originalFileName,
+      status,
+      error
+    });
+  }
+}
+
+export const providerBatchService = new ProviderBatchService();
@@ -0,0 +1,54 @@
+/**
+ * Rolling latency window per AI provider (across its models), used to decide
+ * when a call is slow enough to hedge and to report provider health to admins.
+ */
+class ProviderLatencyTracker {
+  private samples = new Map<string, number[]>();
+  private nextIndex = new Map<string, number>();
+
+  constructor(private windowSize: number = 100) {}
+
+  record(provider: string, durationMs: number) {
+    let window = this.samples.get(provider);
+    if (!window) {
+      window = [];
+      this.samples.set(provider, window);
+    }
+
+    if (window.length < this.windowSize) {
+      window.push(durationMs);
+    } else {
+      const index = this.nextIndex.get(provider) || 0;
+      window[index] = durationMs;
+      this.nextIndex.set(provider, (index + 1) % this.windowSize);
+    }
+  }
+
+  percentile(provider: string, percentile: number): number | undefined {
+    const window = this.samples.get(provider);
+    if (!window || window.length === 0) return undefined;
+
+    const sorted = [...window].sort((a, b) => a - b);
+    const index = Math.min(sorted.length - 1, Math.ceil((percentile / 100) * sorted.length) - 1);
+    return sorted[Math.max(0, index)];
+  }
+
+  sampleCount(provider: string): number {
+    return this.samples.get(provider)?.length || 0;
+  }
+
+  getStats() {
+    const stats: Record<string, { samples: number; p50?: number; p95?: number; p99?: number }> = {};
+    this.samples.forEach((window, provider) => {
+      stats[provider] = {
+        samples: window.length,
+        p50: this.percentile(provider, 50),
+        p95: this.percentile(provider, 95),
+        p99: this.percentile(provider, 99),
+      };
+    });
+    return stats;
+  }
+}
+
+export const providerLatency = new ProviderLatencyTracker();
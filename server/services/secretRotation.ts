@@ -0,0 +1,112 @@
+import { storage, ENCRYPTED_SECRET_COLUMNS, type EncryptedSecretTable } from "../storage";
+import { decryptStoredSecret, encryptApiKey, getCurrentKeyId, needsReencryption } from "../lib/encryption";
+
+const BATCH_SIZE = parseInt(process.env.SECRET_ROTATION_BATCH_SIZE || '100', 10);
+// Pause between batches so rotation never competes with request traffic
+const BATCH_PAUSE_MS = parseInt(process.env.SECRET_ROTATION_PAUSE_MS || '50', 10);
+
+interface TableProgress {
+  scanned: number;
+  reencrypted: number;
+  skipped: number; // changed concurrently, already written with the current key by whoever changed it
+  errors: Array<{ id: string; column: string; error: string }>;
+  cursor: string | null;
+  done: boolean;
+}
+
+export interface RotationStatus {
+  running: boolean;
+  keyId: string | null;
+  startedAt: string | null;
+  finishedAt: string | null;
+  tables: Partial<Record<EncryptedSecretTable, TableProgress>>;
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+/**
+ * Background re-encryption of stored secrets with the keyring's current key.
+ * Each table is walked in id order, BATCH_SIZE rows at a time, and only values
+ * not already under the current key are rewritten, using compare-and-swap so a
+ * secret edited meanwhile is left alone. Startup kicks it off without waiting,
+ * and several instances may run it at once: the work is idempotent.
+ *
+ * This replaces the startup-blocking legacy migration; legacy and v2_gcm values
+ * as well as user keys saved in plain text are converted on the same pass.
+ */
+class SecretRotationService {
+  private status: RotationStatus = { running: false, keyId: null, startedAt: null, finishedAt: null, tables: {} };
+  private current: Promise<RotationStatus> | null = null;
+
+  start(): Promise<RotationStatus> {
+    if (!this.current) {
+      this.current = this.run().finally(() => { this.current = null; });
+    }
+    return this.current;
+  }
+
+  getStatus(): RotationStatus {
+    return this.status;
+  }
+
+  private async run(): Promise<RotationStatus> {
+    const keyId = getCurrentKeyId();
+    this.status = { running: true, keyId, startedAt: new Date().toISOString(), finishedAt: null, tables: {} };
+    console.log(`🔑 Re-encrypting stored secrets with key "${keyId}"...`);
+
+    for (const table of Object.keys(ENCRYPTED_SECRET_COLUMNS) as EncryptedSecretTable[]) {
+      const progress: TableProgress = { scanned: 0, reencrypted: 0, skipped: 0, errors: [], cursor: null, done: false };
+      this.status.tables[table] = progress;
+
+      try {
+        await this.rotateTable(table, progress);
+      } catch (error: any) {
+        // A table missing on a fresh install is not an error
+        if (error.message?.includes('relation') && error.message?.includes('does not exist')) {
+          progress.done = true;
+          continue;
+        }
+        console.error(`❌ Secret re-encryption stopped on ${table}:`, error.message);
+        progress.errors.push({ id: progress.cursor || '', column: '*', error: error.message });
+      }
+
+      if (progress.reencrypted > 0 || progress.errors.length > 0) {
+        console.log(`🔑 ${table}: ${progress.reencrypted} re-encrypted, ${progress.skipped} skipped, ${progress.errors.length} errors (${progress.scanned} rows)`);
+      }
+    }
+
+    this.status.running = false;
+    this.status.finishedAt = new Date().toISOString();
+    console.log('✅ Stored secret re-encryption finished');
+    return this.status;
+  }
+
+  private async rotateTable(table: EncryptedSecretTable, progress: TableProgress) {
+    while (true) {
+      const rows = await storage.getEncryptedSecretBatch(table, progress.cursor, BATCH_SIZE);
+      if (rows.length === 0) break;
+
+      for (const row of rows) {
+        for (const [column, value] of Object.entries(row.values)) {
+          if (!value || !needsReencryption(value)) continue;
+          try {
+            const replacement = encryptApiKey(decryptStoredSecret(value));
+            const replaced = await storage.replaceEncryptedSecret(table, row.id, column, value, replacement);
+            if (replaced) progress.reencrypted++;
+            else progress.skipped++;
+          } catch (error: any) {
+            progress.errors.push({ id: row.id, column, error: error.message });
+          }
+        }
+      }
+
+      progress.scanned += rows.length;
+      progress.cursor = rows[rows.length - 1].id;
+      if (rows.length < BATCH_SIZE) break;
+      await sleep(BATCH_PAUSE_MS);
+    }
+    progress.done = true;
+  }
+}
+
+export const secretRotation = new SecretRotationService();
@@ -0,0 +1,183 @@
+import type Stripe from "stripe";
+import { storage } from "../storage";
+import type { StripeEvent } from "@shared/schema";
+
+const POLL_MS = parseInt(process.env.STRIPE_EVENT_POLL_MS || '5000', 10);
+const BATCH_SIZE = parseInt(process.env.STRIPE_EVENT_BATCH_SIZE || '20', 10);
+// A claimed event not settled within this long is picked up again
+const LEASE_MS = 5 * 60 * 1000;
+const RETRY_BASE_MS = 15 * 1000;
+const RETRY_MAX_MS = 60 * 60 * 1000;
+
+// Events of one customer are processed strictly in order; unrelated events need no ordering
+function orderingKeyFor(event: Stripe.Event): string {
+  const object = event.data.object as { customer?: string | { id: string } | null; metadata?: Record<string, string> };
+  const customer = typeof object.customer === 'string' ? object.customer : object.customer?.id;
+  if (customer) return `customer:${customer}`;
+  if (object.metadata?.userId) return `user:${object.metadata.userId}`;
+  return `event:${event.id}`;
+}
+
+/**
+ * Stripe webhooks are acknowledged as soon as the verified event is stored.
+ * Redeliveries of an event id hit the primary key and are dropped, and this
+ * worker (one per server process) applies the stored events in the background,
+ * in Stripe's order per customer, retrying failures with backoff.
+ */
+class StripeEventProcessor {
+  private pollInterval: NodeJS.Timeout | null = null;
+  private draining: Promise<void> | null = null;
+  private drainRequested = false;
+  private stats = { received: 0, duplicates: 0, processed: 0, retried: 0, failed: 0 };
+
+  // Store a verified event; false when Stripe already delivered it
+  async record(event: Stripe.Event): Promise<boolean> {
+    const isNew = await storage.recordStripeEvent({
+      id: event.id,
+      type: event.type,
+      orderingKey: orderingKeyFor(event),
+      livemode: event.livemode,
+      payload: event,
+      stripeCreatedAt: new Date(event.created * 1000),
+    });
+
+    if (isNew) {
+      this.stats.received++;
+      this.kick();
+    } else {
+      this.stats.duplicates++;
+    }
+    return isNew;
+  }
+
+  start() {
+    if (this.pollInterval) return;
+    this.pollInterval = setInterval(() => this.kick(), POLL_MS);
+    this.kick();
+  }
+
+  kick() {
+    if (this.draining) {
+      this.drainRequested = true;
+      return;
+    }
+    this.draining = this.drain()
+      .catch(error => console.error('❌ Stripe event drain failed:', error))
+      .finally(() => {
+        this.draining = null;
+        if (this.drainRequested) {
+          this.drainRequested = false;
+          this.kick();
+        }
+      });
+  }
+
+  private async drain() {
+    while (true) {
+      // At most one event per customer, so the batch can run concurrently
+      const batch = await storage.claimStripeEvents(BATCH_SIZE, LEASE_MS);
+      if (batch.length === 0) return;
+      await Promise.all(batch.map(event => this.process(event)));
+    }
+  }
+
+  private async process(stored: StripeEvent) {
+    const event = stored.payload as Stripe.Event;
+    try {
+      await this.handle(event);
+      await storage.markStripeEventProcessed(stored.id);
+      this.stats.processed++;
+    } catch (error: any) {
+      const exhausted = stored.attempts >= stored.maxAttempts;
+      const backoff = Math.min(RETRY_BASE_MS * 2 ** (stored.attempts - 1), RETRY_MAX_MS);
+      await storage.markStripeEventAttemptFailed(stored.id, error.message, exhausted ? null : new Date(Date.now() + backoff));
+
+      if (exhausted) {
+        this.stats.failed++;
+        console.error(`❌ Stripe event ${stored.id} (${stored.type}) failed after ${stored.attempts} attempts:`, error.message);
+      } else {
+        this.stats.retried++;
+        console.warn(`⚠️ Stripe event ${stored.id} (${stored.type}) attempt ${stored.attempts} failed:`, error.message);
+      }
+    }
+  }
+
+  private async handle(event: Stripe.Event) {
+    switch (event.type) {
+      case 'payment_intent.succeeded':
+        await this.handleSuccessfulPayment(event.data.object as Stripe.PaymentIntent);
+        break;
+      case 'payment_intent.payment_failed': {
+        const failedPayment = event.data.object as Stripe.PaymentIntent;
+        console.error("💳 Payment failed:", failedPayment.id, failedPayment.last_payment_error?.message);
+        break;
+      }
+      default:
+        console.log(`🔔 Unhandled event type: ${event.type}`);
+    }
+  }
+
+  // Invalid payments are logged and settled; only unexpected errors are retried
+  private async handleSuccessfulPayment(paymentIntent: Stripe.PaymentIntent) {
+    console.log(`💳 Processing successful payment: ${paymentIntent.id}`);
+
+    const { userId, packageId, stripeMode } = paymentIntent.metadata;
+
+    if (!userId || !packageId) {
+      console.error("❌ Missing metadata in payment intent:", paymentIntent.id);
+      return;
+    }
+
+    // Check if this payment has already been processed
+    const existingTransaction = await storage.getCreditTransactionByStripeId(paymentIntent.id);
+    if (existingTransaction) {
+      console.log(`⚠️  Payment already processed: ${paymentIntent.id}`);
+      return;
+    }
+
+    // Get the user
+    const user = await storage.getUser(userId);
+    if (!user) {
+      console.error(`❌ User not found: ${userId}`);
+      return;
+    }
+
+    // SECURITY: Validate customer ID matches user
+    if (user.stripeCustomerId && paymentIntent.customer !== user.stripeCustomerId) {
+      console.error(`❌ Customer ID mismatch for payment ${paymentIntent.id}: user has ${user.stripeCustomerId}, payment has ${paymentIntent.customer}`);
+      return;
+    }
+
+    // Get package details from database (trusted source)
+    const creditPackage = await storage.getCreditPackage(packageId);
+    if (!creditPackage) {
+      console.error(`❌ Package not found: ${packageId}`);
+      return;
+    }
+
+    // Validate payment amount matches package price
+    const expectedAmount = Math.round(parseFloat(creditPackage.price) * 100);
+    if (paymentIntent.amount !== expectedAmount) {
+      console.error(`❌ Amount mismatch for payment ${paymentIntent.id}: expected ${expectedAmount}, got ${paymentIntent.amount}`);
+      return;
+    }
+
+    // ATOMIC: Credit the user account in a single transaction (idempotent on the payment intent id)
+    await storage.processPaymentTransaction({
+      userId,
+      stripePaymentIntentId: paymentIntent.id,
+      amount: paymentIntent.amount / 100,
+      credits: creditPackage.credits,
+      packageId,
+      stripeMode: stripeMode === 'live' ? 'live' : 'test',
+    });
+
+    console.log(`✅ Successfully processed payment ${paymentIntent.id}: ${creditPackage.credits} credits added to user ${userId}`);
+  }
+
+  getStats() {
+    return { ...this.stats, draining: !!this.draining };
+  }
+}
+
+export const stripeEventProcessor = new StripeEventProcessor();
@@ -0,0 +1,74 @@
+import fs from "fs";
+import path from "path";
+
+export const UPLOAD_DIRECTORIES = ['/tmp/uploads', '/tmp/batch-uploads'];
+
+/**
+ * Manifest of the upload temp files this process wrote. Multer registers each
+ * file as it is stored and the code consuming it removes it through here, so
+ * the orphan sweep only looks at files still listed instead of stat'ing every
+ * file in the upload directories. Files left by a previous process are picked
+ * up by a single directory scan at startup (adoptExisting).
+ */
+class TempFileManifest {
+  // path -> time it was written
+  private files = new Map<string, number>();
+
+  track(filePath: string) {
+    this.files.set(filePath, Date.now());
+  }
+
+  // Unlink a temp file and drop it from the manifest; a missing file is fine
+  async remove(filePath: string): Promise<boolean> {
+    this.files.delete(filePath);
+    try {
+      await fs.promises.unlink(filePath);
+      return true;
+    } catch (error: any) {
+      if (error.code === 'ENOENT') return false;
+      throw error;
+    }
+  }
+
+  async adoptExisting(directories: string[] = UPLOAD_DIRECTORIES): Promise<number> {
+    let adopted = 0;
+    for (const dir of directories) {
+      try {
+        for (const file of await fs.promises.readdir(dir)) {
+          const filePath = path.join(dir, file);
+          if (this.files.has(filePath)) continue;
+          try {
+            const stats = await fs.promises.stat(filePath);
+            if (!stats.isFile()) continue;
+            this.files.set(filePath, stats.mtime.getTime());
+            adopted++;
+          } catch (fileError: any) {
+            if (fileError.code !== 'ENOENT') throw fileError;
+          }
+        }
+      } catch (dirError: any) {
+        if (dirError.code !== 'ENOENT') {
+          console.warn(`⚠️ Error scanning directory ${dir}: ${dirError.message}`);
+        }
+      }
+    }
+    return adopted;
+  }
+
+  // Up to `limit` listed files older than maxAgeMs (an in-memory scan, no file system access)
+  expired(maxAgeMs: number, limit: number): string[] {
+    const cutoff = Date.now() - maxAgeMs;
+    const expired: string[] = [];
+    for (const [filePath, writtenAt] of Array.from(this.files.entries())) {
+      if (expired.length >= limit) break;
+      if (writtenAt <= cutoff) expired.push(filePath);
+    }
+    return expired;
+  }
+
+  get size() {
+    return this.files.size;
+  }
+}
+
+export const tempFiles = new TempFileManifest();
@@ -0,0 +1,240 @@
+import { createHash } from "crypto";
+import { countPdfPages, streamPdfPages } from "../lib/pdfPages";
+
+const CACHE_MAX_BYTES = parseInt(process.env.TEXT_CACHE_MAX_BYTES || String(64 * 1024 * 1024), 10);
+
+// Words of document text each tier can use. PDF extraction stops at the page
+// where the budget is reached, so oversized uploads cost at most one extra page.
+export const TIER_WORD_BUDGETS = {
+  free: parseInt(process.env.FREE_TIER_MAX_WORDS || '5000', 10),
+  paid: parseInt(process.env.ANALYSIS_MAX_WORDS || '120000', 10),
+};
+
+export const SUPPORTED_MIME_TYPES = [
+  'application/pdf',
+  'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+  'application/msword',
+  'text/plain',
+];
+
+export class UnsupportedFileTypeError extends Error {
+  constructor(public readonly mimeType: string) {
+    super(`Unsupported file type: ${mimeType}`);
+    this.name = 'UnsupportedFileTypeError';
+  }
+}
+
+export interface ExtractOptions {
+  // Return at most this many words; PDFs stop parsing at the page that reaches it
+  maxWords?: number;
+}
+
+export interface ExtractedText {
+  text: string;
+  sha256: string;
+  cached: boolean;
+  wordCount: number;
+  truncated: boolean;
+  pageCount?: number;
+  pagesRead?: number;
+}
+
+export interface DocumentInspection {
+  sha256: string;
+  mimeType: string;
+  sizeBytes: number;
+  pageCount?: number;
+}
+
+interface ParsedText {
+  text: string;
+  wordCount: number;
+  truncated: boolean;
+  pageCount?: number;
+  pagesRead?: number;
+}
+
+interface CacheEntry extends ParsedText {
+  bytes: number;
+}
+
+function countWords(text: string): number {
+  return text.match(/\S+/g)?.length || 0;
+}
+
+// Cut text after its first `maxWords` words, keeping the original whitespace
+function truncateWords(text: string, maxWords: number): string {
+  const pattern = /\S+/g;
+  let words = 0;
+  let match: RegExpExecArray | null;
+  while ((match = pattern.exec(text)) !== null) {
+    if (++words === maxWords) return text.slice(0, match.index + match[0].length);
+  }
+  return text;
+}
+
+/**
+ * Plain-text extraction for uploaded documents, shared by /api/analyze and the
+ * batch processor. Results are cached by the SHA-256 of the file bytes, so a
+ * re-upload or a re-analysis with another provider skips parsing. The cache is
+ * an LRU bounded by the total size of the stored text.
+ *
+ * Budgeted extractions (`maxWords`) of PDFs read page by page and stop early;
+ * those partial texts are cached under their own key so they never stand in
+ * for the full document.
+ */
+class TextExtractionService {
+  // Map iteration order doubles as recency order (oldest first)
+  private cache = new Map<string, CacheEntry>();
+  private cachedBytes = 0;
+  // Concurrent extractions of the same file share one parse
+  private inFlight = new Map<string, Promise<ParsedText>>();
+  private stats = { hits: 0, misses: 0, evictions: 0, truncated: 0 };
+
+  async extract(buffer: Buffer, mimeType: string, options: ExtractOptions = {}): Promise<ExtractedText> {
+    if (!SUPPORTED_MIME_TYPES.includes(mimeType)) {
+      throw new UnsupportedFileTypeError(mimeType);
+    }
+
+    const sha256 = createHash('sha256').update(buffer).digest('hex');
+    const { maxWords } = options;
+
+    // A cached full text serves any budget
+    const full = this.lookup(sha256);
+    if (full) {
+      this.stats.hits++;
+      return this.applyBudget({ ...full, sha256, cached: true }, maxWords);
+    }
+
+    const cacheKey = maxWords ? `${sha256}:${maxWords}` : sha256;
+    const partial = maxWords ? this.lookup(cacheKey) : undefined;
+    if (partial) {
+      this.stats.hits++;
+      return { ...partial, sha256, cached: true };
+    }
+
+    let pending = this.inFlight.get(cacheKey);
+    if (!pending) {
+      this.stats.misses++;
+      pending = this.parse(buffer, mimeType, maxWords).finally(() => this.inFlight.delete(cacheKey));
+      this.inFlight.set(cacheKey, pending);
+    }
+
+    const parsed = await pending;
+    if (parsed.truncated) this.stats.truncated++;
+    // A budgeted parse that read the whole document is the full text
+    this.store(parsed.truncated ? cacheKey : sha256, parsed);
+    return this.applyBudget({ ...parsed, sha256, cached: false }, maxWords);
+  }
+
+  /**
+   * Cheap metadata for pricing before extraction. For PDFs the page count comes
+   * from the document catalog; no page is parsed.
+   */
+  async inspect(buffer: Buffer, mimeType: string): Promise<DocumentInspection> {
+    if (!SUPPORTED_MIME_TYPES.includes(mimeType)) {
+      throw new UnsupportedFileTypeError(mimeType);
+    }
+
+    const sha256 = createHash('sha256').update(buffer).digest('hex');
+    const inspection: DocumentInspection = { sha256, mimeType, sizeBytes: buffer.length };
+
+    if (mimeType === 'application/pdf') {
+      inspection.pageCount = this.lookup(sha256)?.pageCount ?? await countPdfPages(buffer);
+    }
+    return inspection;
+  }
+
+  private lookup(key: string): CacheEntry | undefined {
+    const entry = this.cache.get(key);
+    if (entry) {
+      // Refresh recency
+      this.cache.delete(key);
+      this.cache.set(key, entry);
+    }
+    return entry;
+  }
+
+  private applyBudget(result: ExtractedText, maxWords?: number): ExtractedText {
+    if (!maxWords || result.wordCount <= maxWords) {
+      return result;
+    }
+    return { ...result, text: truncateWords(result.text, maxWords), wordCount: maxWords, truncated: true };
+  }
+
+  private async parse(buffer: Buffer, mimeType: string, maxWords?: number): Promise<ParsedText> {
+    if (mimeType === 'application/pdf') {
+      return this.parsePdf(buffer, maxWords);
+    }
+
+    let text: string;
+    if (mimeType === 'application/vnd.openxmlformats-officedocument.wordprocessingml.document') {
+      const mammoth = await import('mammoth');
+      const result = await mammoth.extractRawText({ buffer });
+      text = result.value;
+    } else if (mimeType === 'application/msword') {
+      // For older DOC files, try mammoth but fallback to buffer if needed
+      try {
+        const mammoth = await import('mammoth');
+        const result = await mammoth.extractRawText({ buffer });
+        text = result.value;
+      } catch (docError) {
+        text = buffer.toString('utf-8');
+      }
+    } else {
+      text = buffer.toString('utf-8');
+    }
+
+    return { text, wordCount: countWords(text), truncated: false };
+  }
+
+  private async parsePdf(buffer: Buffer, maxWords?: number): Promise<ParsedText> {
+    let text = '';
+    let wordCount = 0;
+    let pageCount = 0;
+    let pagesRead = 0;
+
+    for await (const page of streamPdfPages(buffer)) {
+      pageCount = page.pageCount;
+      pagesRead = page.pageNumber;
+      text = `${text}\n\n${page.text}`;
+      wordCount += countWords(page.text);
+
+      if (maxWords && wordCount >= maxWords) break;
+    }
+
+    const truncated = pagesRead < pageCount;
+    if (truncated) {
+      console.log(`✂️ PDF extraction stopped at page ${pagesRead}/${pageCount} (${wordCount} words, budget ${maxWords})`);
+    }
+    return { text, wordCount, truncated, pageCount, pagesRead };
+  }
+
+  private store(key: string, parsed: ParsedText) {
+    if (this.cache.has(key)) return;
+
+    const bytes = Buffer.byteLength(parsed.text, 'utf-8');
+    if (bytes > CACHE_MAX_BYTES) return;
+
+    this.cache.set(key, { ...parsed, bytes });
+    this.cachedBytes += bytes;
+
+    for (const [cachedKey, entry] of this.cache) {
+      if (this.cachedBytes <= CACHE_MAX_BYTES) break;
+      this.cache.delete(cachedKey);
+      this.cachedBytes -= entry.bytes;
+      this.stats.evictions++;
+    }
+  }
+
+  getStats() {
+    return {
+      ...this.stats,
+      entries: this.cache.size,
+      cachedBytes: this.cachedBytes,
+      maxBytes: CACHE_MAX_BYTES,
+    };
+  }
+}
+
+export const textExtraction = new TextExtractionService();
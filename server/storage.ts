@@ -1,9 +1,88 @@
-import { type User, type InsertUser, type LoginUser, type AiProvider, type InsertAiProvider, type SystemAiProvider, type InsertSystemAiProvider, type DocumentAnalysis, type InsertDocumentAnalysis, type CreditTransaction, type SupportTicket, type InsertSupportTicket, type TicketMessage, type InsertTicketMessage, type AiProviderConfig, type InsertAiProviderConfig, type CreditPackage, type InsertCreditPackage, type PlatformStats, type InsertPlatformStats, type DocumentTemplate, type InsertDocumentTemplate, type LegalClause, type InsertLegalClause, type TemplatePrompt, type InsertTemplatePrompt, type TemplateAnalysisRule, type InsertTemplateAnalysisRule, type BatchJob, type InsertBatchJob, type BatchDocument, type InsertBatchDocument, type QueueJob, type InsertQueueJob, type BatchDocumentMetadata, type SiteConfig, type InsertSiteConfig, type SmtpConfig, type InsertSmtpConfig, type AdminNotification, type InsertAdminNotification, type UserNotificationView, type InsertUserNotificationView, type StripeConfig, type InsertStripeConfig } from "@shared/schema";
-import { encryptApiKey, decryptApiKey, migrateApiKey, isLegacyFormat, batchMigrateApiKeys } from "./lib/encryption";
+import { type User, type InsertUser, type LoginUser, type AiProvider, type InsertAiProvider, type SystemAiProvider, type InsertSystemAiProvider, type DocumentAnalysis, type DocumentAnalysisRow, type DocumentAnalysisSummary, type InsertDocumentAnalysis, type CreditTransaction, type SupportTicket, type InsertSupportTicket, type TicketMessage, type InsertTicketMessage, type AiProviderConfig, type InsertAiProviderConfig, type CreditPackage, type InsertCreditPackage, type PlatformStats, type InsertPlatformStats, type DocumentTemplate, type InsertDocumentTemplate, type LegalClause, type InsertLegalClause, type TemplatePrompt, type InsertTemplatePrompt, type TemplateAnalysisRule, type InsertTemplateAnalysisRule, type BatchJob, type InsertBatchJob, type BatchDocument, type InsertBatchDocument, type QueueJob, type InsertQueueJob, type BatchDocumentMetadata, type BatchJobMetadata, type SiteConfig, type InsertSiteConfig, type SmtpConfig, type InsertSmtpConfig, type EmailOutbox, type InsertEmailOutbox, type StripeEvent, type AdminNotification, type InsertAdminNotification, type UserNotificationView, type InsertUserNotificationView, type StripeConfig, type InsertStripeConfig, type ModelRoutingDecision, type InsertModelRoutingDecision } from "@shared/schema";
+import { encryptApiKey, decryptApiKey, decryptStoredSecret } from "./lib/encryption";
+import { CONTENT_ENCODING, compressText, decompressText, sha256Hex } from "./lib/compression";
 import type { Express } from "express";
 import { db } from "./db";
-import { users, aiProviders, systemAiProviders, documentAnalyses, creditTransactions, supportTickets, ticketMessages, aiProviderConfigs, creditPackages, platformStats, documentTemplates, legalClauses, templatePrompts, templateAnalysisRules, batchJobs, batchDocuments, queueJobs, siteConfig, smtpConfig, adminNotifications, userNotificationViews, stripeConfig } from "@shared/schema";
-import { eq, desc, and, count, sum, gte, sql, isNotNull, isNull, lte } from "drizzle-orm";
+import { users, aiProviders, systemAiProviders, documentAnalyses, documentContents, creditTransactions, supportTickets, ticketMessages, aiProviderConfigs, creditPackages, platformStats, documentTemplates, legalClauses, templatePrompts, templateAnalysisRules, batchJobs, batchDocuments, queueJobs, siteConfig, smtpConfig, emailOutbox, stripeEvents, adminNotifications, userNotificationViews, stripeConfig, modelRoutingDecisions } from "@shared/schema";
+import { eq, desc, and, or, count, sum, gt, gte, lt, sql, isNotNull, isNull, lte, inArray, getTableColumns } from "drizzle-orm";
+
+// Results whose JSON is at least this large are stored brotli-compressed
+const RESULT_COMPRESSION_MIN_BYTES = parseInt(process.env.RESULT_COMPRESSION_MIN_BYTES || '4096', 10);
+
+// Every analysis column except the legacy inline text, which list views never need, and the search columns
+const {
+  content: _inlineContent,
+  searchText: _searchText,
+  contentLexemes: _contentLexemes,
+  searchVector: _searchVector,
+  ...analysisColumns
+} = getTableColumns(documentAnalyses);
+
+// Document text past this is not indexed for search (tsvector positions stop at 16383 anyway)
+const SEARCH_CONTENT_MAX_CHARS = parseInt(process.env.SEARCH_CONTENT_MAX_CHARS || '100000', 10);
+const SEARCH_TEXT_MAX_CHARS = 20000;
+// Private-use characters around matches, turned into <mark> once the snippet is HTML-escaped
+const HIGHLIGHT_START = '\uE000';
+const HIGHLIGHT_STOP = '\uE001';
+const SNIPPET_OPTIONS = `MaxFragments=2, MaxWords=30, MinWords=10, FragmentDelimiter=" … ", StartSel=${HIGHLIGHT_START}, StopSel=${HIGHLIGHT_STOP}`;
+const TITLE_OPTIONS = `HighlightAll=true, StartSel=${HIGHLIGHT_START}, StopSel=${HIGHLIGHT_STOP}`;
+
+// Lexemes of document text, weighted below the title (A) and result fields (B) in the generated search vector
+function contentLexemes(text: string) {
+  return sql`setweight(to_tsvector('portuguese', ${text.slice(0, SEARCH_CONTENT_MAX_CHARS)}), 'D')`;
+}
+
+// The searchable fields of an analysis result as plain text; null for failed or pending analyses
+function analysisSearchText(result: any): string | null {
+  if (!result || typeof result !== 'object' || result.error) return null;
+  const lists = [result.criticalFlaws, result.warnings, result.improvements, result.recommendations, result.legalCompliance?.issues];
+  const parts = [result.summary, ...lists.flatMap(list => Array.isArray(list) ? list : [])]
+    .filter((part): part is string => typeof part === 'string' && part.trim() !== '');
+  return parts.length > 0 ? parts.join('\n').slice(0, SEARCH_TEXT_MAX_CHARS) : null;
+}
+
+function highlightHtml(headline: string): string {
+  return headline
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(new RegExp(HIGHLIGHT_START, 'g'), '<mark>')
+    .replace(new RegExp(HIGHLIGHT_STOP, 'g'), '</mark>');
+}
+
+// Position after the last result of a search page; createdAt is Postgres' own text form, so no precision is lost
+export interface AnalysisSearchCursor {
+  createdAt: string;
+  id: string;
+}
+
+export interface AnalysisSearchHit extends DocumentAnalysisSummary {
+  titleHighlight: string; // HTML-escaped, matches in <mark>
+  snippet: string | null; // Same, from the result summary and findings
+}
+
+// Columns holding secrets encrypted with lib/encryption, walked by the key rotation job
+export const ENCRYPTED_SECRET_COLUMNS = {
+  ai_providers: { table: aiProviders, columns: ['apiKey'] },
+  system_ai_providers: { table: systemAiProviders, columns: ['apiKey'] },
+  smtp_config: { table: smtpConfig, columns: ['password'] },
+  stripe_config: { table: stripeConfig, columns: ['testSecretKey', 'liveSecretKey', 'webhookSecret'] },
+} as const;
+
+export type EncryptedSecretTable = keyof typeof ENCRYPTED_SECRET_COLUMNS;
+
+// Coalesced batch document write; undefined fields keep the stored value
+export interface BatchDocumentStatusUpdate {
+  id: string;
+  status: string;
+  errorMessage: string | null;
+  creditsUsed?: number;
+  documentAnalysisId?: string;
+  processingStartedAt?: Date;
+  processingCompletedAt?: Date;
+  updatedAt: Date;
+}
 
 export interface IStorage {
   // User management
@@ -14,6 +93,7 @@ export interface IStorage {
   ensureUserBySupabase(supabaseId: string, email: string, supabaseUserData: any): Promise<User>;
   updateUserCredits(id: string, credits: number): Promise<User>;
   deductUserCredits(userId: string, amount: number, description: string): Promise<void>;
+  refundUserCredits(userId: string, amount: number, description: string): Promise<void>;
   updateUserRole(id: string, role: string): Promise<User>;
   updateStripeCustomerId(id: string, customerId: string): Promise<User>;
   updateUserStripeMode(id: string, stripeMode: 'test' | 'live'): Promise<User>;
@@ -63,25 +143,27 @@ export interface IStorage {
   updateCreditPackage(id: string, pkg: Partial<InsertCreditPackage>): Promise<CreditPackage>;
   deleteCreditPackage(id: string): Promise<void>;
 
-  // SECURITY: Migration functions for upgrading legacy encrypted keys
-  migrateSystemApiKeys(): Promise<{
-    total: number;
-    migrated: number;
-    alreadySecure: number;
-    errors: Array<{id: string, error: string}>;
-  }>;
-  performOneTimeMigration(): Promise<void>;
+  // SECURITY: Cursor-driven access to encrypted secret columns for key rotation
+  getEncryptedSecretBatch(table: EncryptedSecretTable, afterId: string | null, limit: number): Promise<Array<{ id: string; values: Record<string, string | null> }>>;
+  replaceEncryptedSecret(table: EncryptedSecretTable, id: string, column: string, expected: string, replacement: string): Promise<boolean>;
 
   // Document Analysis
-  getDocumentAnalyses(userId: string, limit?: number): Promise<DocumentAnalysis[]>;
-  getDeletedAnalyses(userId: string): Promise<DocumentAnalysis[]>;
+  getDocumentAnalyses(userId: string, limit?: number): Promise<DocumentAnalysisSummary[]>;
+  getDeletedAnalyses(userId: string): Promise<DocumentAnalysisSummary[]>;
   getDocumentAnalysis(id: string, userId: string): Promise<DocumentAnalysis | undefined>;
-  createDocumentAnalysis(userId: string, analysis: InsertDocumentAnalysis): Promise<DocumentAnalysis>;
-  updateDocumentAnalysisResult(id: string, result: any, status: string): Promise<DocumentAnalysis>;
-  softDeleteAnalysis(id: string, userId: string, deletedBy: string): Promise<DocumentAnalysis>;
-  restoreAnalysis(id: string, userId: string): Promise<DocumentAnalysis>;
+  createDocumentAnalysis(userId: string, analysis: InsertDocumentAnalysis, status?: string): Promise<DocumentAnalysis>;
+  updateDocumentAnalysisResult(id: string, result: any, status: string): Promise<DocumentAnalysisSummary>;
+  softDeleteAnalysis(id: string, userId: string, deletedBy: string): Promise<DocumentAnalysisSummary>;
+  restoreAnalysis(id: string, userId: string): Promise<DocumentAnalysisSummary>;
   hardDeleteAnalysis(id: string): Promise<void>;
-  cleanupExpiredAnalyses(): Promise<number>;
+  purgeExpiredAnalysesBatch(deletedBefore: Date, limit: number): Promise<number>;
+  searchDocumentAnalyses(userId: string, query: string, limit: number, after?: AnalysisSearchCursor): Promise<{ hits: AnalysisSearchHit[]; nextCursor: AnalysisSearchCursor | null }>;
+  indexAnalysesForSearchBatch(limit: number): Promise<number>;
+
+  // Compressed document content store
+  compactInlineAnalysisContentBatch(limit: number): Promise<number>;
+  purgeUnreferencedContentBatch(unreferencedBefore: Date, limit: number): Promise<number>;
+  getDocumentContentStats(): Promise<{ documents: number; originalBytes: number; storedBytes: number; inlineAnalyses: number }>;
 
   // Credit Transactions
   getCreditTransactions(userId: string): Promise<CreditTransaction[]>;
@@ -118,6 +200,20 @@ export interface IStorage {
   updateSmtpConfig(id: string, config: Partial<InsertSmtpConfig>): Promise<SmtpConfig>;
   deleteSmtpConfig(id: string): Promise<void>;
 
+  // Stripe webhook events
+  recordStripeEvent(event: { id: string; type: string; orderingKey: string; livemode: boolean; payload: unknown; stripeCreatedAt: Date }): Promise<boolean>;
+  claimStripeEvents(limit: number, leaseMs: number): Promise<StripeEvent[]>;
+  markStripeEventProcessed(id: string): Promise<void>;
+  markStripeEventAttemptFailed(id: string, error: string, nextAttemptAt: Date | null): Promise<void>;
+  getStripeEvents(limit?: number, status?: string): Promise<StripeEvent[]>;
+
+  // Email outbox
+  enqueueEmail(email: InsertEmailOutbox): Promise<EmailOutbox>;
+  getEmailOutboxEntry(id: string): Promise<EmailOutbox | undefined>;
+  claimEmailOutboxBatch(limit: number, leaseMs: number): Promise<EmailOutbox[]>;
+  markEmailSent(id: string, messageId: string): Promise<void>;
+  markEmailAttemptFailed(id: string, error: string, nextAttemptAt: Date | null): Promise<void>;
+
   // Stripe Configuration
   getStripeConfig(): Promise<StripeConfig | undefined>;
   createStripeConfig(config: InsertStripeConfig): Promise<StripeConfig>;
@@ -166,6 +262,7 @@ export interface IStorage {
   getLegalClauses(): Promise<LegalClause[]>;
   getLegalClausesByCategory(category: string): Promise<LegalClause[]>;
   getLegalClausesByTemplate(templateId: string): Promise<LegalClause[]>;
+  getLegalClausesByClauseIds(clauseIds: string[]): Promise<LegalClause[]>;
   createLegalClause(clause: InsertLegalClause): Promise<LegalClause>;
   updateLegalClause(id: string, clause: Partial<InsertLegalClause>): Promise<LegalClause>;
   deleteLegalClause(id: string): Promise<void>;
@@ -186,20 +283,36 @@ export interface IStorage {
   getBatchJobs(userId: string): Promise<BatchJob[]>;
   getAllBatchJobs(): Promise<BatchJob[]>;
   getBatchJob(id: string, userId?: string): Promise<BatchJob | undefined>;
-  createBatchJob(job: InsertBatchJob): Promise<BatchJob>;
-  updateBatchJobStatus(id: string, status: string): Promise<void>;
+  createBatchJob(userId: string, job: InsertBatchJob): Promise<BatchJob>;
+  getBatchJobById(id: string): Promise<BatchJob | undefined>;
+  updateBatchJobStatus(id: string, status: string, errorMessage?: string): Promise<void>;
+  updateBatchJob(id: string, updates: Partial<typeof batchJobs.$inferInsert>): Promise<void>;
+  refundUnusedBatchCredits(batchJobId: string): Promise<number>;
   deleteBatchJob(id: string): Promise<void>;
   getBatchJobStatistics(userId: string): Promise<any>;
 
   // Batch Documents
   getBatchDocuments(batchJobId: string): Promise<BatchDocument[]>;
   createBatchDocument(doc: InsertBatchDocument): Promise<BatchDocument>;
+  createBatchDocuments(docs: InsertBatchDocument[]): Promise<BatchDocument[]>;
+  updateBatchDocumentStatus(id: string, status: string, errorMessage?: string, creditsUsed?: number): Promise<void>;
+  linkBatchDocumentToAnalysis(documentId: string, analysisId: string): Promise<void>;
+  skipPendingBatchDocuments(batchJobId: string, reason: string): Promise<number>;
+  applyBatchDocumentUpdates(updates: BatchDocumentStatusUpdate[]): Promise<void>;
 
   // Queue Jobs
   getQueueJobs(): Promise<QueueJob[]>;
   createQueueJob(job: InsertQueueJob): Promise<QueueJob>;
+  getNextQueueJob(): Promise<QueueJob | undefined>;
+  updateQueueJobStatus(id: string, status: string, errorMessage?: string): Promise<void>;
+  rescheduleQueueJob(id: string, scheduledFor: Date, reason: string): Promise<void>;
   retryFailedQueueJob(id: string): Promise<void>;
   deleteQueueJob(id: string): Promise<void>;
+
+  // Model routing audit
+  createModelRoutingDecision(userId: string, decision: InsertModelRoutingDecision): Promise<ModelRoutingDecision>;
+  completeModelRoutingDecision(id: string, outcome: { status: 'completed' | 'failed'; actualProvider?: string; latencyMs: number; documentAnalysisId?: string; errorMessage?: string }): Promise<void>;
+  getModelRoutingDecisions(limit?: number, userId?: string): Promise<ModelRoutingDecision[]>;
 }
 
 export class DatabaseStorage implements IStorage {
@@ -291,6 +404,33 @@ export class DatabaseStorage implements IStorage {
     return user;
   }
 
+  // Give back credits reserved with deductUserCredits: balance and ledger row change together
+  async refundUserCredits(userId: string, amount: number, description: string): Promise<void> {
+    await db.transaction(async (tx) => {
+      const [user] = await tx
+        .update(users)
+        .set({
+          credits: sql`${users.credits} + ${amount}`,
+          updatedAt: sql`CURRENT_TIMESTAMP`
+        })
+        .where(eq(users.id, userId))
+        .returning({ id: users.id });
+
+      if (!user) {
+        throw new Error(`User not found: ${userId}`);
+      }
+
+      await tx
+        .insert(creditTransactions)
+        .values({
+          userId,
+          type: 'refund',
+          amount,
+          description,
+        });
+    });
+  }
+
   async deductUserCredits(userId: string, amount: number, description: string): Promise<void> {
     await db.transaction(async (tx) => {
       const [currentUser] = await tx
@@ -358,11 +498,25 @@ export class DatabaseStorage implements IStorage {
 
   // AI Provider management
   async getAiProviders(userId: string): Promise<AiProvider[]> {
-    return await db
+    const providers = await db
       .select()
       .from(aiProviders)
       .where(eq(aiProviders.userId, userId))
       .orderBy(aiProviders.createdAt);
+    return providers.map(provider => this.decryptAiProvider(provider));
+  }
+
+  // SECURITY: User keys are stored encrypted; rows saved before that are read as is.
+  // A key that no longer decrypts (e.g. its encryption key was retired) is returned
+  // as an inactive provider without a key, so callers skip it and the user sees it
+  // disabled until the key is saved again.
+  private decryptAiProvider(provider: AiProvider): AiProvider {
+    try {
+      return { ...provider, apiKey: decryptStoredSecret(provider.apiKey) };
+    } catch (error) {
+      console.error(`Failed to decrypt API key for provider ${provider.provider} (id ${provider.id}); marking it inactive:`, error);
+      return { ...provider, apiKey: '', isActive: false };
+    }
   }
 
   async getAiProvider(userId: string, provider: string): Promise<AiProvider | undefined> {
@@ -370,7 +524,7 @@ export class DatabaseStorage implements IStorage {
       .select()
       .from(aiProviders)
       .where(and(eq(aiProviders.userId, userId), eq(aiProviders.provider, provider)));
-    return result || undefined;
+    return result ? this.decryptAiProvider(result) : undefined;
   }
 
   async createAiProvider(userId: string, providerData: InsertAiProvider): Promise<AiProvider> {
@@ -378,20 +532,24 @@ export class DatabaseStorage implements IStorage {
       .insert(aiProviders)
       .values({
         ...providerData,
+        apiKey: encryptApiKey(providerData.apiKey),
         userId,
       })
       .returning();
-    return provider;
+    return this.decryptAiProvider(provider);
   }
 
   async updateAiProvider(id: string, providerData: Partial<InsertAiProvider>): Promise<AiProvider> {
+    const updateData = providerData.apiKey
+      ? { ...providerData, apiKey: encryptApiKey(providerData.apiKey) }
+      : providerData;
     const [provider] = await db
       .update(aiProviders)
-      .set(providerData)
+      .set(updateData)
       .where(eq(aiProviders.id, id))
       .returning();
     if (!provider) throw new Error("AI Provider not found");
-    return provider;
+    return this.decryptAiProvider(provider);
   }
 
   async deleteAiProvider(id: string): Promise<void> {
@@ -542,9 +700,10 @@ export class DatabaseStorage implements IStorage {
   }
 
   // Document Analysis
-  async getDocumentAnalyses(userId: string, limit?: number): Promise<DocumentAnalysis[]> {
+  // Document text lives in document_contents and large results are compressed; both are unpacked here
+  async getDocumentAnalyses(userId: string, limit?: number): Promise<DocumentAnalysisSummary[]> {
     const query = db
-      .select()
+      .select(analysisColumns)
       .from(documentAnalyses)
       .where(and(
         eq(documentAnalyses.userId, userId),
@@ -552,56 +711,77 @@ export class DatabaseStorage implements IStorage {
       ))
       .orderBy(desc(documentAnalyses.createdAt));
     
-    if (limit) {
-      return await query.limit(limit);
-    }
-    
-    return await query;
+    const rows = limit ? await query.limit(limit) : await query;
+    return await Promise.all(rows.map(row => this.toAnalysisSummary(row)));
   }
 
-  async getDeletedAnalyses(userId: string): Promise<DocumentAnalysis[]> {
-    return await db
-      .select()
+  async getDeletedAnalyses(userId: string): Promise<DocumentAnalysisSummary[]> {
+    const rows = await db
+      .select(analysisColumns)
       .from(documentAnalyses)
       .where(and(
         eq(documentAnalyses.userId, userId),
         isNotNull(documentAnalyses.deletedAt)
       ))
       .orderBy(desc(documentAnalyses.deletedAt));
+    return await Promise.all(rows.map(row => this.toAnalysisSummary(row)));
   }
 
   async getDocumentAnalysis(id: string, userId: string): Promise<DocumentAnalysis | undefined> {
-    const [analysis] = await db
-      .select()
+    const [row] = await db
+      .select({
+        analysis: { ...analysisColumns, content: documentAnalyses.content },
+        stored: { encoding: documentContents.encoding, data: documentContents.data },
+      })
       .from(documentAnalyses)
+      .leftJoin(documentContents, eq(documentAnalyses.contentSha256, documentContents.sha256))
       .where(and(eq(documentAnalyses.id, id), eq(documentAnalyses.userId, userId)));
-    return analysis || undefined;
+    if (!row) return undefined;
+
+    const { content: inlineContent, ...analysis } = row.analysis;
+    const [summary, content] = await Promise.all([
+      this.toAnalysisSummary(analysis),
+      inlineContent ?? (row.stored ? decompressText(row.stored.data, row.stored.encoding) : ''),
+    ]);
+    return { ...summary, content };
   }
 
-  async createDocumentAnalysis(userId: string, analysisData: InsertDocumentAnalysis): Promise<DocumentAnalysis> {
-    const [analysis] = await db
+  async createDocumentAnalysis(userId: string, analysisData: InsertDocumentAnalysis, status: string = "pending"): Promise<DocumentAnalysis> {
+    const { content, result, ...analysisFields } = analysisData;
+    const [contentSha256, packedResult] = await Promise.all([
+      this.storeDocumentContent(content),
+      this.packResult(result),
+    ]);
+
+    const [row] = await db
       .insert(documentAnalyses)
       .values({
-        ...analysisData,
+        ...analysisFields,
+        ...packedResult,
+        contentSha256,
+        searchText: analysisSearchText(result),
+        contentLexemes: contentLexemes(content),
         userId,
-        status: "pending",
+        status,
       })
-      .returning();
-    return analysis;
+      .returning(analysisColumns);
+    const { resultCompressed, ...analysis } = row;
+    return { ...analysis, result: result ?? null, content };
   }
 
-  async updateDocumentAnalysisResult(id: string, result: any, status: string): Promise<DocumentAnalysis> {
-    const [analysis] = await db
+  async updateDocumentAnalysisResult(id: string, result: any, status: string): Promise<DocumentAnalysisSummary> {
+    const [row] = await db
       .update(documentAnalyses)
-      .set({ result, status })
+      .set({ ...await this.packResult(result), searchText: analysisSearchText(result), status })
       .where(eq(documentAnalyses.id, id))
-      .returning();
-    if (!analysis) throw new Error("Document analysis not found");
-    return analysis;
+      .returning(analysisColumns);
+    if (!row) throw new Error("Document analysis not found");
+    const { resultCompressed, ...analysis } = row;
+    return { ...analysis, result };
   }
 
-  async softDeleteAnalysis(id: string, userId: string, deletedBy: string): Promise<DocumentAnalysis> {
-    const [analysis] = await db
+  async softDeleteAnalysis(id: string, userId: string, deletedBy: string): Promise<DocumentAnalysisSummary> {
+    const [row] = await db
       .update(documentAnalyses)
       .set({ 
         deletedAt: new Date(),
@@ -612,13 +792,13 @@ export class DatabaseStorage implements IStorage {
         eq(documentAnalyses.userId, userId),
         isNull(documentAnalyses.deletedAt)
       ))
-      .returning();
-    if (!analysis) throw new Error("Document analysis not found or already deleted");
-    return analysis;
+      .returning(analysisColumns);
+    if (!row) throw new Error("Document analysis not found or already deleted");
+    return await this.toAnalysisSummary(row);
   }
 
-  async restoreAnalysis(id: string, userId: string): Promise<DocumentAnalysis> {
-    const [analysis] = await db
+  async restoreAnalysis(id: string, userId: string): Promise<DocumentAnalysisSummary> {
+    const [row] = await db
       .update(documentAnalyses)
       .set({ 
         deletedAt: null,
@@ -629,29 +809,235 @@ export class DatabaseStorage implements IStorage {
         eq(documentAnalyses.userId, userId),
         isNotNull(documentAnalyses.deletedAt)
       ))
-      .returning();
-    if (!analysis) throw new Error("Document analysis not found or not deleted");
-    return analysis;
+      .returning(analysisColumns);
+    if (!row) throw new Error("Document analysis not found or not deleted");
+    return await this.toAnalysisSummary(row);
+  }
+
+  // Store document text once per distinct text; returns its hash
+  private async storeDocumentContent(text: string): Promise<string> {
+    const sha256 = sha256Hex(text);
+
+    // Already stored (same document analysed again, or by someone else): just mark it as in use
+    const touched = await db
+      .update(documentContents)
+      .set({ lastReferencedAt: new Date() })
+      .where(eq(documentContents.sha256, sha256))
+      .returning({ sha256: documentContents.sha256 });
+    if (touched.length > 0) return sha256;
+
+    const data = await compressText(text);
+    await db
+      .insert(documentContents)
+      .values({
+        sha256,
+        encoding: CONTENT_ENCODING,
+        data,
+        originalBytes: Buffer.byteLength(text, 'utf-8'),
+        storedBytes: data.length,
+      })
+      .onConflictDoUpdate({ target: documentContents.sha256, set: { lastReferencedAt: new Date() } });
+    return sha256;
+  }
+
+  private async packResult(result: unknown): Promise<{ result: unknown; resultCompressed: Buffer | null }> {
+    if (result === undefined || result === null) return { result: null, resultCompressed: null };
+    const json = JSON.stringify(result);
+    if (Buffer.byteLength(json, 'utf-8') < RESULT_COMPRESSION_MIN_BYTES) {
+      return { result, resultCompressed: null };
+    }
+    return { result: null, resultCompressed: await compressText(json) };
+  }
+
+  private async toAnalysisSummary(row: Omit<DocumentAnalysisRow, 'content'>): Promise<DocumentAnalysisSummary> {
+    const { resultCompressed, ...analysis } = row;
+    if (!resultCompressed) return analysis;
+    return { ...analysis, result: JSON.parse(await decompressText(resultCompressed)) };
   }
 
   async hardDeleteAnalysis(id: string): Promise<void> {
     await db.delete(documentAnalyses).where(eq(documentAnalyses.id, id));
   }
 
-  async cleanupExpiredAnalyses(): Promise<number> {
-    const thirtyDaysAgo = new Date();
-    thirtyDaysAgo.setDate(thirtyDaysAgo.getDate() - 30);
+  /**
+   * Permanently delete up to `limit` analyses trashed before `deletedBefore`.
+   * Called repeatedly by the maintenance job so each delete is a short
+   * transaction; rows locked by a concurrent restore are skipped, not waited on.
+   */
+  async purgeExpiredAnalysesBatch(deletedBefore: Date, limit: number): Promise<number> {
+    const expired = db
+      .select({ id: documentAnalyses.id })
+      .from(documentAnalyses)
+      .where(and(
+        isNotNull(documentAnalyses.deletedAt),
+        lte(documentAnalyses.deletedAt, deletedBefore)
+      ))
+      .orderBy(documentAnalyses.deletedAt)
+      .limit(limit)
+      .for('update', { skipLocked: true });
 
     const result = await db
       .delete(documentAnalyses)
+      .where(inArray(documentAnalyses.id, expired));
+
+    return result.rowCount || 0;
+  }
+
+  /**
+   * Full-text search over a user's live analyses (title, result fields and
+   * document text), newest first. Pages continue after `after`, the last hit
+   * of the previous page, so deep pages cost the same as the first. Matching
+   * uses the GIN index; snippets are only built for the page being returned.
+   */
+  async searchDocumentAnalyses(userId: string, query: string, limit: number, after?: AnalysisSearchCursor): Promise<{ hits: AnalysisSearchHit[]; nextCursor: AnalysisSearchCursor | null }> {
+    const tsQuery = sql`websearch_to_tsquery('portuguese', ${query})`;
+
+    // One extra row tells whether there is a next page
+    const page = db.$with('page').as(
+      db
+        .select({ id: documentAnalyses.id })
+        .from(documentAnalyses)
+        .where(and(
+          eq(documentAnalyses.userId, userId),
+          isNull(documentAnalyses.deletedAt),
+          sql`${documentAnalyses.searchVector} @@ ${tsQuery}`,
+          after ? sql`(${documentAnalyses.createdAt}, ${documentAnalyses.id}) < (${after.createdAt}::timestamp, ${after.id})` : undefined
+        ))
+        .orderBy(desc(documentAnalyses.createdAt), desc(documentAnalyses.id))
+        .limit(limit + 1)
+    );
+
+    const rows = await db
+      .with(page)
+      .select({
+        analysis: analysisColumns,
+        cursorCreatedAt: sql<string>`${documentAnalyses.createdAt}::text`,
+        titleHighlight: sql<string>`ts_headline('portuguese', ${documentAnalyses.title}, ${tsQuery}, ${TITLE_OPTIONS})`,
+        snippet: sql<string | null>`CASE WHEN ${documentAnalyses.searchText} IS NULL THEN NULL ELSE ts_headline('portuguese', ${documentAnalyses.searchText}, ${tsQuery}, ${SNIPPET_OPTIONS}) END`,
+      })
+      .from(documentAnalyses)
+      .innerJoin(page, eq(documentAnalyses.id, page.id))
+      .orderBy(desc(documentAnalyses.createdAt), desc(documentAnalyses.id));
+
+    const pageRows = rows.slice(0, limit);
+    const hits = await Promise.all(pageRows.map(async row => ({
+      ...await this.toAnalysisSummary(row.analysis),
+      titleHighlight: highlightHtml(row.titleHighlight),
+      snippet: row.snippet === null ? null : highlightHtml(row.snippet),
+    })));
+
+    const last = pageRows[pageRows.length - 1];
+    return {
+      hits,
+      nextCursor: rows.length > limit ? { createdAt: last.cursorCreatedAt, id: last.analysis.id } : null,
+    };
+  }
+
+  /**
+   * Fill the search columns of up to `limit` analyses written before search
+   * existed, reading their text and results from wherever they are stored.
+   */
+  async indexAnalysesForSearchBatch(limit: number): Promise<number> {
+    const rows = await db
+      .select({
+        id: documentAnalyses.id,
+        inlineContent: documentAnalyses.content,
+        result: documentAnalyses.result,
+        resultCompressed: documentAnalyses.resultCompressed,
+        stored: { encoding: documentContents.encoding, data: documentContents.data },
+      })
+      .from(documentAnalyses)
+      .leftJoin(documentContents, eq(documentAnalyses.contentSha256, documentContents.sha256))
+      .where(isNull(documentAnalyses.contentLexemes))
+      .limit(limit);
+
+    let indexed = 0;
+    for (const row of rows) {
+      const [content, result] = await Promise.all([
+        row.inlineContent ?? (row.stored ? decompressText(row.stored.data, row.stored.encoding) : ''),
+        row.resultCompressed ? decompressText(row.resultCompressed).then(json => JSON.parse(json)) : row.result,
+      ]);
+      const updated = await db
+        .update(documentAnalyses)
+        .set({ searchText: analysisSearchText(result), contentLexemes: contentLexemes(content) })
+        .where(and(eq(documentAnalyses.id, row.id), isNull(documentAnalyses.contentLexemes)))
+        .returning({ id: documentAnalyses.id });
+      indexed += updated.length;
+    }
+    return indexed;
+  }
+
+  /**
+   * Move the inline text of up to `limit` analyses written before the content
+   * store existed into document_contents, compressing large results on the way.
+   * A row whose result changed since it was read is left for the next batch.
+   */
+  async compactInlineAnalysisContentBatch(limit: number): Promise<number> {
+    const rows = await db
+      .select({ id: documentAnalyses.id, content: documentAnalyses.content, result: documentAnalyses.result })
+      .from(documentAnalyses)
+      .where(isNotNull(documentAnalyses.content))
+      .limit(limit);
+
+    let compacted = 0;
+    for (const row of rows) {
+      const contentSha256 = await this.storeDocumentContent(row.content!);
+      const packedResult = await this.packResult(row.result);
+      const updated = await db
+        .update(documentAnalyses)
+        .set({
+          content: null,
+          contentSha256,
+          ...(packedResult.resultCompressed ? packedResult : {}),
+        })
+        .where(and(
+          eq(documentAnalyses.id, row.id),
+          isNotNull(documentAnalyses.content),
+          packedResult.resultCompressed ? sql`${documentAnalyses.result} = ${JSON.stringify(row.result)}::jsonb` : undefined
+        ))
+        .returning({ id: documentAnalyses.id });
+      compacted += updated.length;
+    }
+    return compacted;
+  }
+
+  // Delete up to `limit` stored texts no analysis has referenced since `unreferencedBefore`
+  async purgeUnreferencedContentBatch(unreferencedBefore: Date, limit: number): Promise<number> {
+    const unreferenced = db
+      .select({ sha256: documentContents.sha256 })
+      .from(documentContents)
       .where(and(
-        isNotNull(documentAnalyses.deletedAt),
-        lte(documentAnalyses.deletedAt, thirtyDaysAgo)
-      ));
+        lt(documentContents.lastReferencedAt, unreferencedBefore),
+        sql`NOT EXISTS (SELECT 1 FROM ${documentAnalyses} WHERE ${documentAnalyses.contentSha256} = ${documentContents.sha256})`
+      ))
+      .limit(limit)
+      .for('update', { skipLocked: true });
+
+    const result = await db
+      .delete(documentContents)
+      .where(inArray(documentContents.sha256, unreferenced));
 
     return result.rowCount || 0;
   }
 
+  async getDocumentContentStats(): Promise<{ documents: number; originalBytes: number; storedBytes: number; inlineAnalyses: number }> {
+    const [[stored], [inline]] = await Promise.all([
+      db.select({
+        documents: count(),
+        originalBytes: sum(documentContents.originalBytes),
+        storedBytes: sum(documentContents.storedBytes),
+      }).from(documentContents),
+      db.select({ count: count() }).from(documentAnalyses).where(isNotNull(documentAnalyses.content)),
+    ]);
+
+    return {
+      documents: stored.documents,
+      originalBytes: Number(stored.originalBytes || 0),
+      storedBytes: Number(stored.storedBytes || 0),
+      inlineAnalyses: inline.count,
+    };
+  }
+
   // Credit Transactions
   async getCreditTransactions(userId: string): Promise<CreditTransaction[]> {
     return await db
@@ -827,164 +1213,40 @@ export class DatabaseStorage implements IStorage {
    * Migrates all system AI provider keys from legacy format to secure GCM format
    * @returns Migration results with counts and errors
    */
-  async migrateSystemApiKeys(): Promise<{
-    total: number;
-    migrated: number;
-    alreadySecure: number;
-    errors: Array<{id: string, error: string}>;
-  }> {
-    console.log('🔄 Starting migration of system AI provider keys...');
-    
-    try {
-      const providers = await db.select().from(systemAiProviders);
-      const results = {
-        total: providers.length,
-        migrated: 0,
-        alreadySecure: 0,
-        errors: [] as Array<{id: string, error: string}>
-      };
-      
-      for (const provider of providers) {
-        try {
-          if (!provider.apiKey) {
-            console.log(`⚠️  Provider ${provider.provider} has no API key, skipping`);
-            continue;
-          }
-          
-          // Check if key is in legacy format
-          if (isLegacyFormat(provider.apiKey)) {
-            console.log(`🔄 Migrating provider ${provider.provider} from legacy format`);
-            
-            // Migrate the key
-            const migratedKey = migrateApiKey(provider.apiKey);
-            
-            // Update in database
-            await db
-              .update(systemAiProviders)
-              .set({ 
-                apiKey: migratedKey,
-                updatedAt: new Date()
-              })
-              .where(eq(systemAiProviders.id, provider.id));
-            
-            results.migrated++;
-            console.log(`✅ Successfully migrated provider ${provider.provider}`);
-          } else {
-            results.alreadySecure++;
-            console.log(`✅ Provider ${provider.provider} already uses secure format`);
-          }
-        } catch (error) {
-          const errorMsg = error instanceof Error ? error.message : 'Unknown error';
-          results.errors.push({id: provider.id, error: errorMsg});
-          console.error(`❌ Failed to migrate provider ${provider.provider}:`, errorMsg);
-        }
-      }
-      
-      console.log(`🏁 Migration completed:`);
-      console.log(`   Total providers: ${results.total}`);
-      console.log(`   Migrated: ${results.migrated}`);
-      console.log(`   Already secure: ${results.alreadySecure}`);
-      console.log(`   Errors: ${results.errors.length}`);
-      
-      return results;
-    } catch (error) {
-      // DEFENSIVE: Handle case where table doesn't exist yet
-      const errorMsg = error instanceof Error ? error.message : 'Unknown error';
-      if (errorMsg.includes('relation') && errorMsg.includes('does not exist')) {
-        console.log(`✅ Table system_ai_providers doesn't exist yet - skipping migration (this is normal for new installations)`);
-        return {
-          total: 0,
-          migrated: 0,
-          alreadySecure: 0,
-          errors: []
-        };
-      }
-      
-      // Re-throw other errors
-      console.error('❌ Failed to access system_ai_providers table:', errorMsg);
-      throw error;
-    }
-  }
-  
-  /**
-   * One-time migration function to upgrade all encrypted data
-   * Should be called once during application startup after encryption validation
-   */
-  async performOneTimeMigration(): Promise<void> {
-    try {
-      console.log('🔄 Starting one-time security migration...');
-      
-      // Check if migration was already performed
-      const migrationKey = 'encryption_migration_v2_gcm';
-      const existingMigration = await this.checkMigrationStatus(migrationKey);
-      
-      if (existingMigration) {
-        console.log('✅ Migration already completed, skipping');
-        return;
-      }
-      
-      // Perform migration
-      const systemResults = await this.migrateSystemApiKeys();
-      
-      // Check if any errors occurred
-      if (systemResults.errors.length > 0) {
-        console.warn(`⚠️  Migration completed with ${systemResults.errors.length} errors`);
-        // Log errors but don't fail completely
-        systemResults.errors.forEach(error => {
-          console.error(`   Error migrating ${error.id}: ${error.error}`);
-        });
-      }
-      
-      // Mark migration as completed
-      await this.markMigrationCompleted(migrationKey);
-      
-      console.log('✅ One-time security migration completed successfully');
-    } catch (error) {
-      console.error('❌ Critical error during security migration:', error);
-      throw new Error(`Security migration failed: ${error instanceof Error ? error.message : 'Unknown error'}`);
-    }
-  }
-  
-  /**
-   * Check if a specific migration was already performed
-   * Uses a simple approach with platformStats or creates a migration tracking mechanism
-   */
-  private async checkMigrationStatus(migrationKey: string): Promise<boolean> {
-    try {
-      // Simple check: look for a marker in platformStats or use a file-based approach
-      // For now, we'll use a simple file-based approach
-      const fs = await import('fs');
-      const path = await import('path');
-      const migrationFile = path.join('/tmp', `${migrationKey}.completed`);
-      
-      return fs.existsSync(migrationFile);
-    } catch (error) {
-      console.warn('Migration status check failed, assuming not migrated:', error);
-      return false;
+  async getEncryptedSecretBatch(table: EncryptedSecretTable, afterId: string | null, limit: number): Promise<Array<{ id: string; values: Record<string, string | null> }>> {
+    const { table: target, columns } = ENCRYPTED_SECRET_COLUMNS[table];
+    const idColumn = (target as any).id;
+    const selection: Record<string, any> = { id: idColumn };
+    for (const column of columns) {
+      selection[column] = (target as any)[column];
     }
+
+    const rows = await db
+      .select(selection)
+      .from(target as any)
+      .where(afterId ? gt(idColumn, afterId) : undefined)
+      .orderBy(idColumn)
+      .limit(limit);
+
+    return rows.map((row: any) => {
+      const { id, ...values } = row;
+      return { id, values };
+    });
   }
-  
-  /**
-   * Mark a migration as completed
-   */
-  private async markMigrationCompleted(migrationKey: string): Promise<void> {
-    try {
-      const fs = await import('fs');
-      const path = await import('path');
-      const migrationFile = path.join('/tmp', `${migrationKey}.completed`);
-      
-      const migrationData = {
-        migrationKey,
-        completedAt: new Date().toISOString(),
-        version: 'v2_gcm'
-      };
-      
-      await fs.promises.writeFile(migrationFile, JSON.stringify(migrationData, null, 2));
-      console.log(`✅ Migration ${migrationKey} marked as completed`);
-    } catch (error) {
-      console.warn('Failed to mark migration as completed:', error);
-      // Don't throw here as this is not critical
+
+  // Compare-and-swap, so a secret changed by an admin meanwhile is never overwritten
+  async replaceEncryptedSecret(table: EncryptedSecretTable, id: string, column: string, expected: string, replacement: string): Promise<boolean> {
+    const { table: target, columns } = ENCRYPTED_SECRET_COLUMNS[table];
+    if (!(columns as readonly string[]).includes(column)) {
+      throw new Error(`Column ${column} is not an encrypted secret of ${table}`);
     }
+
+    const updated = await db
+      .update(target as any)
+      .set({ [column]: replacement })
+      .where(and(eq((target as any).id, id), eq((target as any)[column], expected)))
+      .returning({ id: (target as any).id });
+    return updated.length > 0;
   }
 
   // Site Configuration methods
@@ -1061,6 +1323,136 @@ export class DatabaseStorage implements IStorage {
     await db.delete(smtpConfig).where(eq(smtpConfig.id, id));
   }
 
+  // Stripe webhook event methods
+  // Returns false when the event was already stored (a Stripe redelivery)
+  async recordStripeEvent(event: { id: string; type: string; orderingKey: string; livemode: boolean; payload: unknown; stripeCreatedAt: Date }): Promise<boolean> {
+    const inserted = await db.insert(stripeEvents)
+      .values(event)
+      .onConflictDoNothing({ target: stripeEvents.id })
+      .returning({ id: stripeEvents.id });
+    return inserted.length > 0;
+  }
+
+  /**
+   * Claim the next event of every ordering key (Stripe customer) that is due.
+   * Only the oldest unfinished event of a key is ever claimable, and not while
+   * another worker holds it, so each customer's events run one at a time in
+   * Stripe's order. A 'processing' event whose lease expired is claimable again.
+   */
+  async claimStripeEvents(limit: number, leaseMs: number): Promise<StripeEvent[]> {
+    const now = new Date();
+    const leaseCutoff = new Date(now.getTime() - leaseMs);
+
+    const heads = await db
+      .selectDistinctOn([stripeEvents.orderingKey], {
+        id: stripeEvents.id,
+        status: stripeEvents.status,
+        nextAttemptAt: stripeEvents.nextAttemptAt,
+        updatedAt: stripeEvents.updatedAt,
+      })
+      .from(stripeEvents)
+      .where(inArray(stripeEvents.status, ['pending', 'processing']))
+      .orderBy(stripeEvents.orderingKey, stripeEvents.stripeCreatedAt, stripeEvents.receivedAt);
+
+    const due = heads
+      .filter(head => head.status === 'pending' ? head.nextAttemptAt <= now : head.updatedAt < leaseCutoff)
+      .slice(0, limit)
+      .map(head => head.id);
+    if (due.length === 0) return [];
+
+    // The status/lease condition is re-checked under the row lock, so two workers never both claim an event
+    return await db.update(stripeEvents)
+      .set({ status: 'processing', attempts: sql`${stripeEvents.attempts} + 1`, updatedAt: now })
+      .where(and(
+        inArray(stripeEvents.id, due),
+        or(
+          and(eq(stripeEvents.status, 'pending'), lte(stripeEvents.nextAttemptAt, now)),
+          and(eq(stripeEvents.status, 'processing'), lt(stripeEvents.updatedAt, leaseCutoff))
+        )
+      ))
+      .returning();
+  }
+
+  async markStripeEventProcessed(id: string): Promise<void> {
+    const now = new Date();
+    await db.update(stripeEvents)
+      .set({ status: 'processed', processedAt: now, lastError: null, updatedAt: now })
+      .where(eq(stripeEvents.id, id));
+  }
+
+  // nextAttemptAt null = out of attempts, give up
+  async markStripeEventAttemptFailed(id: string, error: string, nextAttemptAt: Date | null): Promise<void> {
+    await db.update(stripeEvents)
+      .set({
+        status: nextAttemptAt ? 'pending' : 'failed',
+        lastError: error,
+        ...(nextAttemptAt ? { nextAttemptAt } : {}),
+        updatedAt: new Date()
+      })
+      .where(eq(stripeEvents.id, id));
+  }
+
+  async getStripeEvents(limit: number = 100, status?: string): Promise<StripeEvent[]> {
+    return await db.select().from(stripeEvents)
+      .where(status ? eq(stripeEvents.status, status) : undefined)
+      .orderBy(desc(stripeEvents.receivedAt))
+      .limit(limit);
+  }
+
+  // Email outbox methods
+  async enqueueEmail(email: InsertEmailOutbox): Promise<EmailOutbox> {
+    const [entry] = await db.insert(emailOutbox).values(email).returning();
+    return entry;
+  }
+
+  async getEmailOutboxEntry(id: string): Promise<EmailOutbox | undefined> {
+    const [entry] = await db.select().from(emailOutbox).where(eq(emailOutbox.id, id));
+    return entry || undefined;
+  }
+
+  /**
+   * Claim due emails for sending. Rows are locked with SKIP LOCKED so several
+   * senders never claim the same email; a 'sending' row whose lease expired
+   * (its sender died mid-send) becomes claimable again.
+   */
+  async claimEmailOutboxBatch(limit: number, leaseMs: number): Promise<EmailOutbox[]> {
+    const now = new Date();
+    const due = db
+      .select({ id: emailOutbox.id })
+      .from(emailOutbox)
+      .where(or(
+        and(eq(emailOutbox.status, 'pending'), lte(emailOutbox.nextAttemptAt, now)),
+        and(eq(emailOutbox.status, 'sending'), lt(emailOutbox.updatedAt, new Date(now.getTime() - leaseMs)))
+      ))
+      .orderBy(emailOutbox.nextAttemptAt)
+      .limit(limit)
+      .for('update', { skipLocked: true });
+
+    return await db.update(emailOutbox)
+      .set({ status: 'sending', attempts: sql`${emailOutbox.attempts} + 1`, updatedAt: now })
+      .where(inArray(emailOutbox.id, due))
+      .returning();
+  }
+
+  async markEmailSent(id: string, messageId: string): Promise<void> {
+    const now = new Date();
+    await db.update(emailOutbox)
+      .set({ status: 'sent', messageId, sentAt: now, lastError: null, updatedAt: now })
+      .where(eq(emailOutbox.id, id));
+  }
+
+  // nextAttemptAt null = out of attempts, give up
+  async markEmailAttemptFailed(id: string, error: string, nextAttemptAt: Date | null): Promise<void> {
+    await db.update(emailOutbox)
+      .set({
+        status: nextAttemptAt ? 'pending' : 'failed',
+        lastError: error,
+        ...(nextAttemptAt ? { nextAttemptAt } : {}),
+        updatedAt: new Date()
+      })
+      .where(eq(emailOutbox.id, id));
+  }
+
   // Stripe Configuration methods
   async getStripeConfig(): Promise<StripeConfig | undefined> {
     const [config] = await db.select().from(stripeConfig).limit(1);
@@ -1171,31 +1563,21 @@ export class DatabaseStorage implements IStorage {
     return view;
   }
 
+  // Anti-join against the user's views: one index probe per active notification, however many the user has seen
   async getUnreadNotificationsForUser(userId: string): Promise<AdminNotification[]> {
-    // Get notifications that the user hasn't viewed yet
-    const viewedNotificationIds = await db.select({ notificationId: userNotificationViews.notificationId })
-      .from(userNotificationViews)
-      .where(eq(userNotificationViews.userId, userId));
-    
-    const viewedIds = viewedNotificationIds.map(v => v.notificationId);
-    
-    // Get active notifications that weren't viewed by this user
-    let query = db.select()
+    return await db.select()
       .from(adminNotifications)
-      .where(
-        and(
-          eq(adminNotifications.isActive, true),
-          // Only get non-expired notifications
-          sql`(${adminNotifications.expiresAt} IS NULL OR ${adminNotifications.expiresAt} > NOW())`
-        )
-      );
-    
-    // Filter out viewed notifications if there are any
-    if (viewedIds.length > 0) {
-      query = query.where(sql`${adminNotifications.id} NOT IN (${viewedIds.map(id => `'${id}'`).join(',')})`);
-    }
-    
-    return await query.orderBy(desc(adminNotifications.priority), desc(adminNotifications.createdAt));
+      .where(and(
+        eq(adminNotifications.isActive, true),
+        // Only get non-expired notifications
+        sql`(${adminNotifications.expiresAt} IS NULL OR ${adminNotifications.expiresAt} > NOW())`,
+        sql`NOT EXISTS (
+          SELECT 1 FROM ${userNotificationViews}
+          WHERE ${userNotificationViews.userId} = ${userId}
+            AND ${userNotificationViews.notificationId} = ${adminNotifications.id}
+        )`
+      ))
+      .orderBy(desc(adminNotifications.priority), desc(adminNotifications.createdAt));
   }
 
   // Payment processing (critical method)
@@ -1308,15 +1690,22 @@ export class DatabaseStorage implements IStorage {
     const template = await this.getDocumentTemplateById(templateId);
     if (!template) return null;
 
-    const prompts = await this.getTemplatePrompts(templateId);
-    const rules = await this.getTemplateAnalysisRules(templateId);
+    const requiredClauseIds = (template.requiredClauses as string[]) || [];
+    const optionalClauseIds = (template.optionalClauses as string[]) || [];
+
+    const [prompts, rules, clauses] = await Promise.all([
+      this.getTemplatePrompts(templateId),
+      this.getTemplateAnalysisRules(templateId),
+      this.getLegalClausesByClauseIds([...requiredClauseIds, ...optionalClauseIds])
+    ]);
+    const activeClauses = clauses.filter(clause => clause.isActive);
     
     return {
       template,
       prompts: aiProvider ? prompts.filter(p => p.aiProvider === aiProvider || p.aiProvider === 'all') : prompts,
       analysisRules: rules,
-      requiredClauses: [],
-      optionalClauses: []
+      requiredClauses: activeClauses.filter(clause => requiredClauseIds.includes(clause.clauseId)),
+      optionalClauses: activeClauses.filter(clause => !requiredClauseIds.includes(clause.clauseId))
     };
   }
 
@@ -1337,6 +1726,13 @@ export class DatabaseStorage implements IStorage {
       .orderBy(legalClauses.sortOrder);
   }
 
+  async getLegalClausesByClauseIds(clauseIds: string[]): Promise<LegalClause[]> {
+    if (clauseIds.length === 0) return [];
+    return await db.select().from(legalClauses)
+      .where(inArray(legalClauses.clauseId, clauseIds))
+      .orderBy(legalClauses.createdAt);
+  }
+
   async createLegalClause(clauseData: InsertLegalClause): Promise<LegalClause> {
     const [clause] = await db.insert(legalClauses).values(clauseData).returning();
     return clause;
@@ -1424,17 +1820,87 @@ export class DatabaseStorage implements IStorage {
     return job || undefined;
   }
 
-  async createBatchJob(jobData: InsertBatchJob): Promise<BatchJob> {
-    const [job] = await db.insert(batchJobs).values(jobData).returning();
+  async createBatchJob(userId: string, jobData: InsertBatchJob): Promise<BatchJob> {
+    const [job] = await db.insert(batchJobs).values({ ...jobData, userId }).returning();
     return job;
   }
 
-  async updateBatchJobStatus(id: string, status: string): Promise<void> {
+  async getBatchJobById(id: string): Promise<BatchJob | undefined> {
+    return await this.getBatchJob(id);
+  }
+
+  async updateBatchJobStatus(id: string, status: string, errorMessage?: string): Promise<void> {
+    const now = new Date();
     await db.update(batchJobs)
-      .set({ status })
+      .set({
+        status,
+        ...(errorMessage !== undefined ? { errorMessage } : {}),
+        ...(status === 'processing' ? { processingStartedAt: now } : {}),
+        ...(['completed', 'completed_with_errors', 'failed', 'cancelled'].includes(status) ? { processingCompletedAt: now } : {}),
+        updatedAt: now
+      })
       .where(eq(batchJobs.id, id));
   }
 
+  async updateBatchJob(id: string, updates: Partial<typeof batchJobs.$inferInsert>): Promise<void> {
+    await db.update(batchJobs)
+      .set({ ...updates, updatedAt: new Date() })
+      .where(eq(batchJobs.id, id));
+  }
+
+  // Return reserved credits not consumed by completed documents. Runs at most
+  // once per batch job (guarded by metadata.creditsRefunded under a row lock).
+  async refundUnusedBatchCredits(batchJobId: string): Promise<number> {
+    return await db.transaction(async (tx) => {
+      const [job] = await tx.select().from(batchJobs)
+        .where(eq(batchJobs.id, batchJobId))
+        .for('update');
+      if (!job) {
+        throw new Error(`Batch job not found: ${batchJobId}`);
+      }
+
+      const metadata = (job.metadata as BatchJobMetadata) || {};
+      if (metadata.creditsRefunded !== undefined) {
+        return 0;
+      }
+
+      const [usage] = await tx.select({ used: sum(batchDocuments.creditsUsed) })
+        .from(batchDocuments)
+        .where(and(
+          eq(batchDocuments.batchJobId, batchJobId),
+          eq(batchDocuments.status, 'completed')
+        ));
+      const creditsUsed = Number(usage?.used || 0);
+      const refund = Math.max(0, job.totalCreditsEstimated - creditsUsed);
+
+      if (refund > 0) {
+        await tx.update(users)
+          .set({
+            credits: sql`${users.credits} + ${refund}`,
+            updatedAt: sql`CURRENT_TIMESTAMP`
+          })
+          .where(eq(users.id, job.userId));
+
+        await tx.insert(creditTransactions).values({
+          userId: job.userId,
+          type: 'refund',
+          amount: refund,
+          description: `Batch cancelled - refund of unused credits: ${job.name}`
+        });
+      }
+
+      await tx.update(batchJobs)
+        .set({
+          totalCreditsUsed: creditsUsed,
+          metadata: { ...metadata, creditsRefunded: refund },
+          updatedAt: new Date()
+        })
+        .where(eq(batchJobs.id, batchJobId));
+
+      return refund;
+    });
+  }
+
   async deleteBatchJob(id: string): Promise<void> {
     await db.delete(batchJobs).where(eq(batchJobs.id, id));
   }
@@ -1463,6 +1929,75 @@ export class DatabaseStorage implements IStorage {
     return doc;
   }
 
+  async createBatchDocuments(docs: InsertBatchDocument[]): Promise<BatchDocument[]> {
+    if (docs.length === 0) return [];
+    return await db.insert(batchDocuments).values(docs).returning();
+  }
+
+  async updateBatchDocumentStatus(id: string, status: string, errorMessage?: string, creditsUsed?: number): Promise<void> {
+    const now = new Date();
+    await db.update(batchDocuments)
+      .set({
+        status,
+        errorMessage: errorMessage || null,
+        ...(creditsUsed !== undefined ? { creditsUsed } : {}),
+        ...(status === 'processing' ? { processingStartedAt: now } : {}),
+        ...(['completed', 'failed', 'skipped'].includes(status) ? { processingCompletedAt: now } : {}),
+        updatedAt: now
+      })
+      .where(eq(batchDocuments.id, id));
+  }
+
+  async linkBatchDocumentToAnalysis(documentId: string, analysisId: string): Promise<void> {
+    await db.update(batchDocuments)
+      .set({ documentAnalysisId: analysisId, updatedAt: new Date() })
+      .where(eq(batchDocuments.id, documentId));
+  }
+
+  async skipPendingBatchDocuments(batchJobId: string, reason: string): Promise<number> {
+    const skipped = await db.update(batchDocuments)
+      .set({ status: 'skipped', errorMessage: reason, processingCompletedAt: new Date(), updatedAt: new Date() })
+      .where(and(
+        eq(batchDocuments.batchJobId, batchJobId),
+        eq(batchDocuments.status, 'pending')
+      ))
+      .returning({ id: batchDocuments.id });
+    return skipped.length;
+  }
+
+  // Writes many document transitions in a single UPDATE ... FROM (VALUES ...)
+  async applyBatchDocumentUpdates(updates: BatchDocumentStatusUpdate[]): Promise<void> {
+    if (updates.length === 0) return;
+
+    const timestamp = (value?: Date) => value ? value.toISOString() : null;
+    const rows = updates.map(update => sql`(
+      ${update.id},
+      ${update.status},
+      ${update.errorMessage},
+      ${update.creditsUsed ?? null}::integer,
+      ${update.documentAnalysisId ?? null},
+      ${timestamp(update.processingStartedAt)}::timestamp,
+      ${timestamp(update.processingCompletedAt)}::timestamp,
+      ${timestamp(update.updatedAt)}::timestamp
+    )`);
+
+    await db.execute(sql`
+      UPDATE ${batchDocuments} AS d SET
+        status = v.status,
+        error_message = v.error_message,
+        credits_used = COALESCE(v.credits_used, d.credits_used),
+        document_analysis_id = COALESCE(v.document_analysis_id, d.document_analysis_id),
+        processing_started_at = COALESCE(v.processing_started_at, d.processing_started_at),
+        processing_completed_at = COALESCE(v.processing_completed_at, d.processing_completed_at),
+        updated_at = v.updated_at
+      FROM (VALUES ${sql.join(rows, sql`, `)}) AS v(
+        id, status, error_message, credits_used, document_analysis_id,
+        processing_started_at, processing_completed_at, updated_at
+      )
+      WHERE d.id = v.id
+    `);
+  }
+
   // Queue Jobs
   async getQueueJobs(): Promise<QueueJob[]> {
     return await db.select().from(queueJobs).orderBy(desc(queueJobs.priority), queueJobs.scheduledFor);
@@ -1473,6 +2008,42 @@ export class DatabaseStorage implements IStorage {
     return job;
   }
 
+  async getNextQueueJob(): Promise<QueueJob | undefined> {
+    const [job] = await db.select().from(queueJobs)
+      .where(and(
+        eq(queueJobs.status, 'pending'),
+        lte(queueJobs.scheduledFor, new Date())
+      ))
+      .orderBy(desc(queueJobs.priority), queueJobs.scheduledFor)
+      .limit(1);
+    return job || undefined;
+  }
+
+  async updateQueueJobStatus(id: string, status: string, errorMessage?: string): Promise<void> {
+    const now = new Date();
+    await db.update(queueJobs)
+      .set({
+        status,
+        errorMessage: errorMessage || null,
+        ...(status === 'processing' ? { processingStartedAt: now, attempts: sql`${queueJobs.attempts} + 1` } : {}),
+        ...(status === 'completed' || status === 'failed' ? { processingCompletedAt: now } : {}),
+        updatedAt: now
+      })
+      .where(eq(queueJobs.id, id));
+  }
+
+  // Put a job back in the queue to be picked up no earlier than scheduledFor
+  async rescheduleQueueJob(id: string, scheduledFor: Date, reason: string): Promise<void> {
+    await db.update(queueJobs)
+      .set({
+        status: 'pending',
+        scheduledFor,
+        errorMessage: reason,
+        updatedAt: new Date()
+      })
+      .where(eq(queueJobs.id, id));
+  }
+
   async retryFailedQueueJob(id: string): Promise<void> {
     await db.update(queueJobs)
       .set({ 
@@ -1486,6 +2057,32 @@ export class DatabaseStorage implements IStorage {
   async deleteQueueJob(id: string): Promise<void> {
     await db.delete(queueJobs).where(eq(queueJobs.id, id));
   }
+
+  // Model routing audit
+  async createModelRoutingDecision(userId: string, decision: InsertModelRoutingDecision): Promise<ModelRoutingDecision> {
+    const [created] = await db.insert(modelRoutingDecisions).values({ ...decision, userId }).returning();
+    return created;
+  }
+
+  async completeModelRoutingDecision(id: string, outcome: { status: 'completed' | 'failed'; actualProvider?: string; latencyMs: number; documentAnalysisId?: string; errorMessage?: string }): Promise<void> {
+    await db.update(modelRoutingDecisions)
+      .set({
+        status: outcome.status,
+        actualProvider: outcome.actualProvider,
+        latencyMs: outcome.latencyMs,
+        documentAnalysisId: outcome.documentAnalysisId,
+        errorMessage: outcome.errorMessage,
+        completedAt: new Date()
+      })
+      .where(eq(modelRoutingDecisions.id, id));
+  }
+
+  async getModelRoutingDecisions(limit: number = 100, userId?: string): Promise<ModelRoutingDecision[]> {
+    return await db.select().from(modelRoutingDecisions)
+      .where(userId ? eq(modelRoutingDecisions.userId, userId) : undefined)
+      .orderBy(desc(modelRoutingDecisions.createdAt))
+      .limit(limit);
+  }
 }
 
 export const storage = new DatabaseStorage();
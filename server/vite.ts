@@ -1,4 +1,4 @@
-import express, { type Express } from "express";
+import { type Express, type Request, type Response } from "express";
 import fs from "fs";
 import path from "path";
 import { createServer as createViteServer, createLogger } from "vite";
@@ -68,6 +68,17 @@ export async function setupVite(app: Express, server: Server) {
   });
 }
 
+// Written next to build files by scripts/compress-assets.mjs, in order of preference
+const PRECOMPRESSED_EXTENSIONS: Record<string, string> = { br: ".br", gzip: ".gz" };
+
+function listFiles(dir: string, base = dir): string[] {
+  return fs.readdirSync(dir, { withFileTypes: true }).flatMap(entry => {
+    const full = path.join(dir, entry.name);
+    if (entry.isDirectory()) return entry.name.startsWith(".") ? [] : listFiles(full, base);
+    return [path.relative(base, full).split(path.sep).join("/")];
+  });
+}
+
 export function serveStatic(app: Express) {
   const distPath = path.resolve(import.meta.dirname, "public");
 
@@ -77,10 +88,53 @@ export function serveStatic(app: Express) {
     );
   }
 
-  app.use(express.static(distPath));
+  // The build never changes while running, so look files up in memory instead of hitting the disk
+  const files = new Set(listFiles(distPath));
+  const prerendered = new Set<string>(
+    files.has("prerendered.json")
+      ? JSON.parse(fs.readFileSync(path.join(distPath, "prerendered.json"), "utf-8"))
+      : [],
+  );
+  // app.html is the bare SPA shell; without a prerender step index.html is that shell
+  const shell = files.has("app.html") ? "app.html" : "index.html";
+
+  const sendBuildFile = (req: Request, res: Response, file: string) => {
+    if (file.startsWith("assets/")) {
+      // Hashed file names: a changed file gets a new URL
+      res.set("Cache-Control", "public, max-age=31536000, immutable");
+    } else if (file.endsWith(".html")) {
+      res.set("Cache-Control", "no-cache");
+    }
+
+    const available = Object.keys(PRECOMPRESSED_EXTENSIONS)
+      .filter(encoding => files.has(file + PRECOMPRESSED_EXTENSIONS[encoding]));
+    if (available.length > 0) {
+      res.vary("Accept-Encoding");
+      const encoding = req.acceptsEncodings(available);
+      if (encoding) {
+        res.set("Content-Encoding", encoding);
+        res.type(path.extname(file));
+        return res.sendFile(path.join(distPath, file + PRECOMPRESSED_EXTENSIONS[encoding]));
+      }
+    }
+    res.sendFile(path.join(distPath, file));
+  };
+
+  app.use((req, res) => {
+    const pathname = req.path.replace(/\/+$/, "") || "/";
+
+    if (prerendered.has(pathname)) {
+      return sendBuildFile(req, res, pathname === "/" ? "index.html" : `${pathname.slice(1)}/index.html`);
+    }
+    const file = pathname.slice(1);
+    if (files.has(file) && !file.endsWith(".br") && !file.endsWith(".gz")) {
+      return sendBuildFile(req, res, file);
+    }
+    if (file.startsWith("assets/")) {
+      return res.status(404).end();
+    }
 
-  // fall through to index.html if the file doesn't exist
-  app.use("*", (_req, res) => {
-    res.sendFile(path.resolve(distPath, "index.html"));
+    // fall through to the app shell for client-side routes
+    sendBuildFile(req, res, shell);
   });
 }
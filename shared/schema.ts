@@ -1,5 +1,5 @@
 import { sql } from "drizzle-orm";
-import { pgTable, text, varchar, integer, timestamp, boolean, jsonb, decimal, uniqueIndex } from "drizzle-orm/pg-core";
+import { pgTable, text, varchar, integer, timestamp, boolean, jsonb, decimal, uniqueIndex, index, customType } from "drizzle-orm/pg-core";
 import { createInsertSchema } from "drizzle-zod";
 import { z } from "zod";
 
@@ -98,22 +98,64 @@ export const templateAnalysisRules = pgTable("template_analysis_rules", {
   updatedAt: timestamp("updated_at").notNull().default(sql`CURRENT_TIMESTAMP`),
 });
 
+const bytea = customType<{ data: Buffer; driverData: Buffer }>({
+  dataType() {
+    return "bytea";
+  },
+});
+
+const tsvector = customType<{ data: string }>({
+  dataType() {
+    return "tsvector";
+  },
+});
+
+// Extracted document text, stored once per distinct text and compressed
+export const documentContents = pgTable("document_contents", {
+  sha256: varchar("sha256", { length: 64 }).primaryKey(), // Of the uncompressed UTF-8 text
+  encoding: text("encoding").notNull(), // 'br' (brotli)
+  data: bytea("data").notNull(),
+  originalBytes: integer("original_bytes").notNull(),
+  storedBytes: integer("stored_bytes").notNull(),
+  createdAt: timestamp("created_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+  lastReferencedAt: timestamp("last_referenced_at").notNull().default(sql`CURRENT_TIMESTAMP`), // Unreferenced content is kept for a grace period after this
+});
+
 export const documentAnalyses = pgTable("document_analyses", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
   userId: varchar("user_id").notNull().references(() => users.id, { onDelete: "cascade" }),
   title: text("title").notNull(),
-  content: text("content").notNull(),
+  content: text("content"), // Legacy inline text; new rows reference document_contents instead
+  contentSha256: varchar("content_sha256", { length: 64 }).references(() => documentContents.sha256),
   aiProvider: text("ai_provider").notNull(),
   aiModel: text("ai_model").notNull(),
   analysisType: text("analysis_type").notNull(), // 'general', 'contract', 'legal', 'compliance'
   templateId: varchar("template_id").references(() => documentTemplates.id, { onDelete: "set null" }), // Optional template reference
   result: jsonb("result"),
+  resultCompressed: bytea("result_compressed"), // Brotli JSON of a large result (result is null then)
   creditsUsed: integer("credits_used").notNull(),
   status: text("status").notNull().default("completed"), // 'pending', 'processing', 'completed', 'failed'
   deletedAt: timestamp("deleted_at"), // Soft delete timestamp
   deletedBy: varchar("deleted_by").references(() => users.id, { onDelete: "set null" }), // Who deleted it
   createdAt: timestamp("created_at").notNull().default(sql`CURRENT_TIMESTAMP`),
-});
+  searchText: text("search_text"), // Key result fields (summary, findings, improvements, recommendations) as plain text, for search and snippets
+  contentLexemes: tsvector("content_lexemes"), // Lexemes of the document text, written with it since the text itself is stored compressed
+  searchVector: tsvector("search_vector").generatedAlwaysAs(
+    sql`setweight(to_tsvector('portuguese', title), 'A') || setweight(to_tsvector('portuguese', coalesce(search_text, '')), 'B') || coalesce(content_lexemes, ''::tsvector)`
+  ),
+}, (table) => ({
+  // A user's analyses newest first: the list view, and the order search pages are returned in
+  userCreatedAtIndex: index("document_analyses_user_created_at_idx").on(table.userId, table.createdAt),
+  // Full-text search over a user's live analyses; indexing user_id alongside the vector needs btree_gin
+  searchIndex: index("document_analyses_user_search_idx").using("gin", table.userId, table.searchVector).where(sql`${table.deletedAt} IS NULL`),
+  // Analyses written before search existed, for the job indexing them
+  unindexedIndex: index("document_analyses_unindexed_idx").on(table.id).where(sql`${table.contentLexemes} IS NULL`),
+  // Trash only: lets the purge job find expired rows without scanning live analyses
+  deletedAtIndex: index("document_analyses_deleted_at_idx").on(table.deletedAt).where(sql`${table.deletedAt} IS NOT NULL`),
+  contentSha256Index: index("document_analyses_content_sha256_idx").on(table.contentSha256),
+  // Rows still holding inline text, for the job moving it to document_contents
+  inlineContentIndex: index("document_analyses_inline_content_idx").on(table.id).where(sql`${table.content} IS NOT NULL`),
+}));
 
 export const creditTransactions = pgTable("credit_transactions", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
@@ -261,6 +303,27 @@ export const costModels = pgTable("cost_models", {
   updatedAt: timestamp("updated_at").notNull().default(sql`CURRENT_TIMESTAMP`),
 });
 
+// Audit trail for "auto" model routing: what was chosen, why, and how it went
+export const modelRoutingDecisions = pgTable("model_routing_decisions", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  userId: varchar("user_id").notNull().references(() => users.id, { onDelete: "cascade" }),
+  documentAnalysisId: varchar("document_analysis_id").references(() => documentAnalyses.id, { onDelete: "set null" }),
+  analysisType: text("analysis_type").notNull(),
+  sla: text("sla").notNull(), // 'fast', 'cheap', 'balanced'
+  estimatedTokens: integer("estimated_tokens").notNull(),
+  chosenProvider: text("chosen_provider").notNull(),
+  chosenModel: text("chosen_model").notNull(),
+  expectedLatencyMs: integer("expected_latency_ms"),
+  creditsCharged: integer("credits_charged").notNull().default(0),
+  candidates: jsonb("candidates").notNull().default([]), // Scored candidates and exclusion reasons
+  status: text("status").notNull().default("routed"), // 'routed', 'completed', 'failed'
+  actualProvider: text("actual_provider"), // Differs from chosenProvider after failover
+  latencyMs: integer("latency_ms"),
+  errorMessage: text("error_message"),
+  createdAt: timestamp("created_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+  completedAt: timestamp("completed_at"),
+});
+
 // Site configuration tables
 export const siteConfig = pgTable("site_config", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
@@ -291,6 +354,48 @@ export const smtpConfig = pgTable("smtp_config", {
   updatedAt: timestamp("updated_at").notNull().default(sql`CURRENT_TIMESTAMP`),
 });
 
+// Verified Stripe webhook events, stored as received and processed in the background
+export const stripeEvents = pgTable("stripe_events", {
+  id: varchar("id").primaryKey(), // Stripe event id (evt_...), so redeliveries are no-ops
+  type: text("type").notNull(),
+  orderingKey: text("ordering_key").notNull(), // Stripe customer (or user) whose events run in order
+  livemode: boolean("livemode").notNull().default(false),
+  payload: jsonb("payload").notNull(), // The full event as verified
+  status: text("status").notNull().default("pending"), // 'pending', 'processing', 'processed', 'failed'
+  attempts: integer("attempts").notNull().default(0),
+  maxAttempts: integer("max_attempts").notNull().default(8),
+  nextAttemptAt: timestamp("next_attempt_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+  lastError: text("last_error"),
+  stripeCreatedAt: timestamp("stripe_created_at").notNull(),
+  receivedAt: timestamp("received_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+  processedAt: timestamp("processed_at"),
+  updatedAt: timestamp("updated_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+}, (table) => ({
+  statusOrderingIndex: index("stripe_events_status_ordering_idx").on(table.status, table.orderingKey, table.stripeCreatedAt),
+}));
+
+// Outgoing email, written by request handlers and drained by the background sender
+export const emailOutbox = pgTable("email_outbox", {
+  id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
+  kind: text("kind").notNull(), // 'contact', 'smtp_test'
+  toAddress: text("to_address"), // null = the configured SMTP from address
+  replyTo: text("reply_to"),
+  subject: text("subject").notNull(),
+  textBody: text("text_body").notNull(),
+  htmlBody: text("html_body"),
+  status: text("status").notNull().default("pending"), // 'pending', 'sending', 'sent', 'failed'
+  attempts: integer("attempts").notNull().default(0),
+  maxAttempts: integer("max_attempts").notNull().default(6),
+  nextAttemptAt: timestamp("next_attempt_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+  lastError: text("last_error"),
+  messageId: text("message_id"),
+  sentAt: timestamp("sent_at"),
+  createdAt: timestamp("created_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+  updatedAt: timestamp("updated_at").notNull().default(sql`CURRENT_TIMESTAMP`),
+}, (table) => ({
+  statusNextAttemptIndex: index("email_outbox_status_next_attempt_idx").on(table.status, table.nextAttemptAt),
+}));
+
 export const adminNotifications = pgTable("admin_notifications", {
   id: varchar("id").primaryKey().default(sql`gen_random_uuid()`),
   title: text("title").notNull(),
@@ -381,6 +486,12 @@ export const insertDocumentAnalysisSchema = createInsertSchema(documentAnalyses)
   userId: true,
   createdAt: true,
   status: true,
+  contentSha256: true,
+  resultCompressed: true,
+  searchText: true,
+  contentLexemes: true,
+}).extend({
+  content: z.string(), // Stored in document_contents by storage
 });
 
 export const insertSupportTicketSchema = createInsertSchema(supportTickets).omit({
@@ -482,6 +593,29 @@ export const insertCostModelSchema = createInsertSchema(costModels).omit({
   updatedAt: true,
 });
 
+export const insertEmailOutboxSchema = createInsertSchema(emailOutbox).omit({
+  id: true,
+  status: true,
+  attempts: true,
+  nextAttemptAt: true,
+  lastError: true,
+  messageId: true,
+  sentAt: true,
+  createdAt: true,
+  updatedAt: true,
+});
+
+export const insertModelRoutingDecisionSchema = createInsertSchema(modelRoutingDecisions).omit({
+  id: true,
+  userId: true,
+  status: true,
+  actualProvider: true,
+  latencyMs: true,
+  errorMessage: true,
+  createdAt: true,
+  completedAt: true,
+});
+
 export const insertSiteConfigSchema = createInsertSchema(siteConfig).omit({
   id: true,
   createdAt: true,
@@ -543,7 +677,13 @@ export type LoginUser = z.infer<typeof loginUserSchema>;
 export type User = typeof users.$inferSelect;
 export type AiProvider = typeof aiProviders.$inferSelect;
 export type SystemAiProvider = typeof systemAiProviders.$inferSelect;
-export type DocumentAnalysis = typeof documentAnalyses.$inferSelect;
+// Search columns are only written and read inside SQL, never loaded
+export type DocumentAnalysisRow = Omit<typeof documentAnalyses.$inferSelect, 'searchText' | 'contentLexemes' | 'searchVector'>;
+// An analysis as returned by storage: content and result decompressed
+export type DocumentAnalysis = Omit<DocumentAnalysisRow, 'content' | 'resultCompressed'> & { content: string };
+// List views leave the document text out
+export type DocumentAnalysisSummary = Omit<DocumentAnalysis, 'content'>;
+export type DocumentContent = typeof documentContents.$inferSelect;
 export type CreditTransaction = typeof creditTransactions.$inferSelect;
 export type SupportTicket = typeof supportTickets.$inferSelect;
 export type TicketMessage = typeof ticketMessages.$inferSelect;
@@ -558,19 +698,35 @@ export type BatchJob = typeof batchJobs.$inferSelect;
 export type BatchDocument = typeof batchDocuments.$inferSelect;
 export type QueueJob = typeof queueJobs.$inferSelect;
 export type CostModel = typeof costModels.$inferSelect;
+export type ModelRoutingDecision = typeof modelRoutingDecisions.$inferSelect;
 export type SiteConfig = typeof siteConfig.$inferSelect;
 export type SmtpConfig = typeof smtpConfig.$inferSelect;
+export type EmailOutbox = typeof emailOutbox.$inferSelect;
+export type StripeEvent = typeof stripeEvents.$inferSelect;
 export type AdminNotification = typeof adminNotifications.$inferSelect;
 export type UserNotificationView = typeof userNotificationViews.$inferSelect;
 
 // Metadata type interfaces for proper typing
 export interface BatchJobMetadata {
   progressPercentage?: number;
+  creditsRefunded?: number; // Set once unused reserved credits were returned (cancel)
+  executionMode?: 'interactive' | 'economy'; // economy = provider batch API
+  providerBatch?: {
+    provider: string;
+    batchId: string;
+    status: string;
+    submittedAt: string;
+    completedAt?: string;
+    requestCount: number;
+  };
   [key: string]: any;
 }
 
 export interface BatchDocumentMetadata {
   fileBuffer?: string; // base64 encoded file content
+  content?: string; // Plain text sent inline (NDJSON stream ingestion), used instead of a file
+  objectKey?: string; // Object uploaded directly to object storage through a signed URL
+  deleteObjectAfterProcessing?: boolean;
   originalSize?: number;
   uploadedAt?: string;
   [key: string]: any;
@@ -609,8 +765,10 @@ export type InsertBatchJob = z.infer<typeof insertBatchJobSchema>;
 export type InsertBatchDocument = z.infer<typeof insertBatchDocumentSchema>;
 export type InsertQueueJob = z.infer<typeof insertQueueJobSchema>;
 export type InsertCostModel = z.infer<typeof insertCostModelSchema>;
+export type InsertModelRoutingDecision = z.infer<typeof insertModelRoutingDecisionSchema>;
 export type InsertSiteConfig = z.infer<typeof insertSiteConfigSchema>;
 export type InsertSmtpConfig = z.infer<typeof insertSmtpConfigSchema>;
+export type InsertEmailOutbox = z.infer<typeof insertEmailOutboxSchema>;
 export type InsertAdminNotification = z.infer<typeof insertAdminNotificationSchema>;
 export type InsertUserNotificationView = z.infer<typeof insertUserNotificationViewSchema>;
 export type StripeConfig = typeof stripeConfig.$inferSelect;
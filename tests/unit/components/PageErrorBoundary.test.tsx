@@ -0,0 +1,55 @@
+import { Suspense } from 'react';
+import { render, screen, fireEvent } from '@testing-library/react';
+import { lazyPage } from '@/lib/lazy-pages';
+import { PageErrorBoundary } from '@/components/ui/page-error-boundary';
+
+const page = { default: () => <p>Page content</p> };
+const chunkError = () => new Error('Failed to fetch dynamically imported module');
+
+function renderPage(Page: React.ComponentType<any>) {
+  return render(
+    <PageErrorBoundary resetKey="/test">
+      <Suspense fallback={<p>Loading</p>}>
+        <Page />
+      </Suspense>
+    </PageErrorBoundary>
+  );
+}
+
+describe('lazy pages under PageErrorBoundary', () => {
+  beforeEach(() => {
+    jest.spyOn(console, 'error').mockImplementation(() => {});
+  });
+
+  afterEach(() => {
+    jest.restoreAllMocks();
+  });
+
+  it('retries a failed chunk download before rendering the page', async () => {
+    const load = jest.fn()
+      .mockRejectedValueOnce(chunkError())
+      .mockResolvedValueOnce(page);
+    const Page = lazyPage('/test-render-retry', load);
+
+    renderPage(Page);
+
+    expect(await screen.findByText('Page content', {}, { timeout: 3000 })).toBeInTheDocument();
+    expect(load).toHaveBeenCalledTimes(2);
+  });
+
+  it('shows the error screen when every attempt fails and renders the page after "Tentar novamente"', async () => {
+    const load = jest.fn().mockRejectedValue(chunkError());
+    const Page = lazyPage('/test-render-failure', load);
+
+    renderPage(Page);
+
+    expect(await screen.findByText('Não foi possível carregar esta página', {}, { timeout: 5000 })).toBeInTheDocument();
+    const attempts = load.mock.calls.length;
+
+    load.mockResolvedValue(page);
+    fireEvent.click(screen.getByText('Tentar novamente'));
+
+    expect(await screen.findByText('Page content')).toBeInTheDocument();
+    expect(load.mock.calls.length).toBe(attempts + 1);
+  }, 10000);
+});
@@ -0,0 +1,47 @@
+import { lazyPage, prefetchRoute } from '@/lib/lazy-pages';
+
+const page = { default: () => null };
+
+describe('prefetchRoute', () => {
+  it('loads the chunk of an exact route once', async () => {
+    const load = jest.fn().mockResolvedValue(page);
+    lazyPage('/test-exact', load);
+
+    await prefetchRoute('/test-exact');
+    await prefetchRoute(`${window.location.origin}/test-exact`);
+
+    expect(load).toHaveBeenCalledTimes(1);
+  });
+
+  it('matches routes with parameters', async () => {
+    const load = jest.fn().mockResolvedValue(page);
+    lazyPage('/test-items/:id', load);
+
+    await prefetchRoute('/test-items');
+    expect(load).not.toHaveBeenCalled();
+
+    await prefetchRoute('/test-items/42?tab=details');
+    expect(load).toHaveBeenCalledTimes(1);
+  });
+
+  it('ignores links to other origins', async () => {
+    const load = jest.fn().mockResolvedValue(page);
+    lazyPage('/test-external', load);
+
+    await prefetchRoute('https://example.com/test-external');
+
+    expect(load).not.toHaveBeenCalled();
+  });
+
+  it('retries a chunk whose download failed', async () => {
+    const load = jest.fn()
+      .mockRejectedValueOnce(new Error('network error'))
+      .mockResolvedValueOnce(page);
+    lazyPage('/test-retry', load);
+
+    await expect(prefetchRoute('/test-retry')).resolves.toBeUndefined();
+    await prefetchRoute('/test-retry');
+
+    expect(load).toHaveBeenCalledTimes(2);
+  });
+});
@@ -0,0 +1,135 @@
+import { CircuitBreaker, CircuitOpenError, isProviderFailure, type CircuitBreakerOptions } from '../../../server/services/circuitBreaker';
+
+const options: CircuitBreakerOptions = {
+  errorRateThreshold: 0.5,
+  consecutiveFailureThreshold: 3,
+  slowCallThresholdMs: 0,
+  minimumCalls: 10,
+  windowSize: 20,
+  coolDownMs: 1000,
+};
+
+const providerError = (status: number) => Object.assign(new Error(`HTTP ${status}`), { status });
+const succeed = () => Promise.resolve('ok');
+const fail = (error: Error) => () => Promise.reject(error);
+
+describe('CircuitBreaker', () => {
+  let now: number;
+  let breaker: CircuitBreaker;
+
+  beforeEach(() => {
+    now = 1_000_000;
+    jest.spyOn(Date, 'now').mockImplementation(() => now);
+    jest.spyOn(console, 'log').mockImplementation(() => {});
+    jest.spyOn(console, 'warn').mockImplementation(() => {});
+    breaker = new CircuitBreaker('openai:gpt-5', options);
+  });
+
+  afterEach(() => {
+    jest.restoreAllMocks();
+  });
+
+  async function failTimes(count: number, error: Error = providerError(503)) {
+    for (let i = 0; i < count; i++) {
+      await expect(breaker.execute(fail(error))).rejects.toBe(error);
+    }
+  }
+
+  it('opens after consecutive provider failures and fails fast while open', async () => {
+    await failTimes(3);
+
+    expect(breaker.getState()).toBe('open');
+    const call = jest.fn(succeed);
+    await expect(breaker.execute(call)).rejects.toBeInstanceOf(CircuitOpenError);
+    expect(call).not.toHaveBeenCalled();
+  });
+
+  it('opens when the error rate crosses the threshold', async () => {
+    for (let i = 0; i < 5; i++) {
+      await breaker.execute(succeed);
+      await failTimes(1);
+    }
+    expect(breaker.getState()).toBe('open');
+  });
+
+  it('goes half-open after the cool-down and closes when the probe succeeds', async () => {
+    await failTimes(3);
+    now += options.coolDownMs;
+
+    expect(breaker.getState()).toBe('half-open');
+    await expect(breaker.execute(succeed)).resolves.toBe('ok');
+    expect(breaker.getState()).toBe('closed');
+  });
+
+  it('allows a single probe at a time while half-open', async () => {
+    await failTimes(3);
+    now += options.coolDownMs;
+
+    let finishProbe!: (value: string) => void;
+    const probe = breaker.execute(() => new Promise<string>(resolve => { finishProbe = resolve; }));
+    await expect(breaker.execute(succeed)).rejects.toBeInstanceOf(CircuitOpenError);
+
+    finishProbe('ok');
+    await expect(probe).resolves.toBe('ok');
+    expect(breaker.getState()).toBe('closed');
+  });
+
+  it('reopens when the probe fails', async () => {
+    await failTimes(3);
+    now += options.coolDownMs;
+
+    await failTimes(1);
+    expect(breaker.getState()).toBe('open');
+    expect(breaker.getRetryAt().getTime()).toBe(now + options.coolDownMs);
+  });
+
+  it('does not count caller-side errors such as a bad API key or an unparsable response', async () => {
+    await failTimes(5, providerError(401));
+    await failTimes(5, new SyntaxError('Unexpected token < in JSON'));
+
+    expect(breaker.getState()).toBe('closed');
+    expect(breaker.getStats().failures).toBe(0);
+  });
+
+  it('does not count calls cancelled by the caller', async () => {
+    const controller = new AbortController();
+    controller.abort();
+    const error = providerError(503);
+
+    for (let i = 0; i < 5; i++) {
+      await expect(breaker.execute(fail(error), controller.signal)).rejects.toBe(error);
+    }
+    expect(breaker.getState()).toBe('closed');
+  });
+
+  it('releases the probe slot when the probe hits a caller-side error', async () => {
+    await failTimes(3);
+    now += options.coolDownMs;
+
+    await failTimes(1, providerError(401));
+    expect(breaker.getState()).toBe('half-open');
+    await expect(breaker.execute(succeed)).resolves.toBe('ok');
+    expect(breaker.getState()).toBe('closed');
+  });
+});
+
+describe('isProviderFailure', () => {
+  it.each([500, 502, 503, 408, 429])('counts HTTP %i', status => {
+    expect(isProviderFailure(providerError(status))).toBe(true);
+  });
+
+  it.each([400, 401, 403, 404, 422])('ignores HTTP %i', status => {
+    expect(isProviderFailure(providerError(status))).toBe(false);
+  });
+
+  it('counts network failures and timeouts', () => {
+    expect(isProviderFailure(Object.assign(new Error('read ECONNRESET'), { code: 'ECONNRESET' }))).toBe(true);
+    expect(isProviderFailure(new TypeError('fetch failed'))).toBe(true);
+    expect(isProviderFailure(Object.assign(new Error('Request timed out.'), { name: 'APIConnectionTimeoutError' }))).toBe(true);
+  });
+
+  it('ignores local parse and validation errors', () => {
+    expect(isProviderFailure(new SyntaxError('Unexpected end of JSON input'))).toBe(false);
+    expect(isProviderFailure(new Error('No text content in response'))).toBe(false);
+  });
+});
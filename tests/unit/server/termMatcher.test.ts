@@ -0,0 +1,130 @@
+import { TermMatcher, legalTermMatcher, LEGAL_TERM_DICTIONARIES } from '../../../server/lib/termMatcher';
+import { analyzeWithRules } from '../../../server/services/freeAnalysis';
+
+// The regex/split heuristics the matcher replaced, kept as the reference behavior
+function legacyProfile(content: string) {
+  const lower = content.toLowerCase();
+  const count = (terms: string[]) => (lower.match(new RegExp(`\\b(${terms.join('|')})\\b`, 'gi')) || []).length;
+
+  return {
+    wordCount: content.split(' ').length,
+    sentenceCount: content.split(/[.!?]+/).filter(s => s.trim().length > 10).length,
+    paragraphCount: content.split('\n\n').filter(p => p.trim().length > 0).length,
+    termCounts: {
+      contract: count(LEGAL_TERM_DICTIONARIES.contract),
+      legal: count(LEGAL_TERM_DICTIONARIES.legal),
+      obligation: count(LEGAL_TERM_DICTIONARIES.obligation),
+      payment: count(LEGAL_TERM_DICTIONARIES.payment),
+      termination: count(LEGAL_TERM_DICTIONARIES.termination),
+    },
+    hasLgpd: content.indexOf('LGPD') > -1,
+    hasDados: content.indexOf('dados') > -1,
+    hasPegadinha: lower.includes('pegadinha'),
+  };
+}
+
+function currentProfile(content: string) {
+  const profile = legalTermMatcher.profileText(content);
+  return {
+    wordCount: profile.wordCount,
+    sentenceCount: profile.sentenceCount,
+    paragraphCount: profile.paragraphCount,
+    termCounts: {
+      contract: profile.termCounts.contract,
+      legal: profile.termCounts.legal,
+      obligation: profile.termCounts.obligation,
+      payment: profile.termCounts.payment,
+      termination: profile.termCounts.termination,
+    },
+    hasLgpd: profile.termCounts.lgpd > 0,
+    hasDados: profile.termCounts.personalData > 0,
+    hasPegadinha: profile.termCounts.suspicious > 0,
+  };
+}
+
+const SAMPLES = [
+  '',
+  'contrato',
+  'CLÁUSULA PRIMEIRA - DO OBJETO. O presente contrato tem por objeto a prestação de serviços.\n\nCLÁUSULA SEGUNDA - DO PAGAMENTO. O CONTRATANTE deve pagar o valor mensal, sob pena de multa!',
+  'A obrigação do contratado é responsável... O dever de pagar honorários?! Leis, leí e lei; afim, fim.',
+  'Os dados pessoais seguem a LGPD.\n\n\n\nRescisão: rescindir ou rescind o acordo; pacto/convenção (decreto-lei).',
+  'Texto  com   espaços duplos\tе tabs\nsem ponto final e com Dados, lgpd e uma Pegadinhas',
+  'Obrigações, obrigaçãoes, parágrafos e parágrafo_1 artigo2 artigo 2 taxa_fixa preçoé multas.',
+  '  \n\n  \n\nfim.  .  .  !!! ??? valor do contrato antes do fim do prazo estabelecido\n\n',
+];
+
+describe('TermMatcher', () => {
+  it('reports every overlapping term across categories', () => {
+    const matcher = new TermMatcher([
+      { term: 'he', category: 'a', wholeWord: false },
+      { term: 'she', category: 'b', wholeWord: false },
+      { term: 'hers', category: 'c', wholeWord: false },
+    ]);
+
+    const { termCounts, matches } = matcher.profileText('ushers');
+
+    expect(termCounts).toEqual({ a: 1, b: 1, c: 1 });
+    expect(matches.map(m => [m.term, m.start, m.end])).toEqual(
+      expect.arrayContaining([['she', 1, 4], ['he', 2, 4], ['hers', 2, 6]])
+    );
+  });
+
+  it('keeps hits within a category non-overlapping, preferring the term listed first', () => {
+    const matcher = new TermMatcher([
+      { term: 'aa', category: 'x', wholeWord: false },
+      { term: 'aaa', category: 'x', wholeWord: false },
+    ]);
+
+    const { termCounts, matches } = matcher.profileText('aaaaa');
+
+    expect(termCounts.x).toBe(2);
+    expect(matches.map(m => [m.term, m.start])).toEqual([['aa', 0], ['aa', 2]]);
+  });
+
+  it('matches case-insensitively, accents included, but not accent-insensitively', () => {
+    const matcher = new TermMatcher([{ term: 'cláusula', category: 'legal' }]);
+
+    expect(matcher.profileText('CLÁUSULA Cláusula cláusula').termCounts.legal).toBe(3);
+    expect(matcher.profileText('CLAUSULA clausula').termCounts.legal).toBe(0);
+  });
+
+  it('honours matchCase terms', () => {
+    const matcher = new TermMatcher([{ term: 'LGPD', category: 'lgpd', wholeWord: false, matchCase: true }]);
+
+    expect(matcher.profileText('conforme a LGPD').termCounts.lgpd).toBe(1);
+    expect(matcher.profileText('conforme a lgpd ou Lgpd').termCounts.lgpd).toBe(0);
+  });
+
+  it('uses ASCII word boundaries for whole-word terms', () => {
+    const matcher = new TermMatcher([{ term: 'lei', category: 'legal' }]);
+
+    expect(matcher.profileText('lei, (lei) lei.').termCounts.legal).toBe(3);
+    expect(matcher.profileText('leis releitura lei_1 lei2').termCounts.legal).toBe(0);
+    // Like the old non-unicode \b, accented letters are not word characters
+    expect(matcher.profileText('leié').termCounts.legal).toBe(1);
+  });
+
+  it('matches substrings when wholeWord is false', () => {
+    const matcher = new TermMatcher([{ term: 'pegadinha', category: 'suspicious', wholeWord: false }]);
+
+    expect(matcher.profileText('Pegadinhas!').termCounts.suspicious).toBe(1);
+  });
+
+  it.each(SAMPLES.map(sample => [JSON.stringify(sample).slice(0, 40), sample]))(
+    'matches the legacy regex heuristics for %s',
+    (_label, sample) => {
+      expect(currentProfile(sample)).toEqual(legacyProfile(sample));
+    }
+  );
+});
+
+describe('analyzeWithRules', () => {
+  const lgpdHint = 'Considerar cláusulas LGPD se houver tratamento de dados';
+
+  it('suggests LGPD clauses only when "dados" appears without the uppercase acronym', () => {
+    expect(analyzeWithRules('Tratamento de dados pessoais.').improvements).toContain(lgpdHint);
+    expect(analyzeWithRules('Tratamento de dados conforme a lgpd.').improvements).toContain(lgpdHint);
+    expect(analyzeWithRules('Tratamento de dados conforme a LGPD.').improvements).not.toContain(lgpdHint);
+    expect(analyzeWithRules('Dados pessoais.').improvements).not.toContain(lgpdHint);
+  });
+});
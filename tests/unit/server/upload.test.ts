@@ -0,0 +1,98 @@
+/**
+ * @jest-environment node
+ */
+import express from 'express';
+import http from 'http';
+import fs from 'fs';
+import { createHash } from 'crypto';
+import type { AddressInfo } from 'net';
+import { upload, readUploadedFile, UPLOAD_DIR } from '../../../server/middleware/upload';
+import { tempFiles } from '../../../server/services/tempFiles';
+import { textExtraction } from '../../../server/services/textExtraction';
+
+const BOUNDARY = '----upload-test-boundary';
+
+function postFile(port: number, filename: string, mimeType: string, content: Buffer): Promise<{ status: number; body: any }> {
+  const payload = Buffer.concat([
+    Buffer.from(`--${BOUNDARY}\r\nContent-Disposition: form-data; name="file"; filename="${filename}"\r\nContent-Type: ${mimeType}\r\n\r\n`),
+    content,
+    Buffer.from(`\r\n--${BOUNDARY}--\r\n`),
+  ]);
+
+  return new Promise((resolve, reject) => {
+    const req = http.request({
+      port,
+      method: 'POST',
+      path: '/upload',
+      headers: {
+        'content-type': `multipart/form-data; boundary=${BOUNDARY}`,
+        'content-length': payload.length,
+      },
+    }, res => {
+      const chunks: Buffer[] = [];
+      res.on('data', chunk => chunks.push(chunk));
+      res.on('end', () => resolve({ status: res.statusCode!, body: JSON.parse(Buffer.concat(chunks).toString('utf-8')) }));
+    });
+    req.on('error', reject);
+    req.end(payload);
+  });
+}
+
+describe('upload middleware', () => {
+  let server: http.Server;
+  let port: number;
+
+  beforeAll(async () => {
+    await fs.promises.mkdir(UPLOAD_DIR, { recursive: true });
+
+    // Same steps as /api/documents/inspect and /api/analyze
+    const app = express();
+    app.post('/upload', upload.single('file'), async (req, res) => {
+      try {
+        if (!req.file) {
+          return res.status(400).json({ message: 'No file provided' });
+        }
+        const buffer = await readUploadedFile(req.file);
+        const inspection = await textExtraction.inspect(buffer, req.file.mimetype);
+        const extracted = await textExtraction.extract(buffer, req.file.mimetype);
+        res.json({ hasBuffer: req.file.buffer !== undefined, path: req.file.path, inspection, text: extracted.text });
+      } catch (error: any) {
+        res.status(500).json({ message: error.message });
+      } finally {
+        if (req.file) await tempFiles.remove(req.file.path);
+      }
+    });
+
+    server = app.listen(0);
+    await new Promise(resolve => server.once('listening', resolve));
+    port = (server.address() as AddressInfo).port;
+  });
+
+  afterAll(async () => {
+    await new Promise(resolve => server.close(resolve));
+  });
+
+  it('stores the upload on disk and hands its bytes to text extraction', async () => {
+    const content = Buffer.from('Contrato de prestação de serviços entre as partes.', 'utf-8');
+
+    const { status, body } = await postFile(port, 'contrato.txt', 'text/plain', content);
+
+    expect(status).toBe(200);
+    expect(body.hasBuffer).toBe(false);
+    expect(body.path.startsWith(UPLOAD_DIR)).toBe(true);
+    expect(body.inspection).toEqual({
+      sha256: createHash('sha256').update(content).digest('hex'),
+      mimeType: 'text/plain',
+      sizeBytes: content.length,
+    });
+    expect(body.text).toBe(content.toString('utf-8'));
+    expect(fs.existsSync(body.path)).toBe(false);
+  });
+
+  it('drops files of unsupported types', async () => {
+    const { status, body } = await postFile(port, 'script.sh', 'application/x-sh', Buffer.from('echo hi'));
+
+    expect(status).toBe(400);
+    expect(body.message).toBe('No file provided');
+  });
+});
@@ -0,0 +1,5 @@
+"""Open-loop load generator for the JusValida API, built from the TC_BE backend flows.
+
+Install its dependency with ``pip install -r loadtest/requirements.txt`` and
+run ``python -m loadtest --help`` from ``testsprite_tests/``.
+"""
@@ -0,0 +1,118 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+
+from .runner import run_step, saturation_reason
+from .scenarios import SCENARIOS
+from .stats import format_step
+
+BASE_URL = "http://localhost:3000"
+
+
+def parse_mix(value):
+    """``login=3,credit_reads=5`` -> weights; scenarios not listed keep their default weight."""
+    weights = {}
+    for part in filter(None, value.split(",")):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r} (choose from {', '.join(SCENARIOS)})")
+        weights[name] = float(weight)
+    return weights
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest",
+        description="Step up an open-loop arrival rate against the API until it saturates.",
+    )
+    parser.add_argument("--base-url", default=os.environ.get("LOADTEST_BASE_URL", BASE_URL))
+    parser.add_argument("--rates", default="1,2,5,10,20,50",
+                        help="scenario starts per second to offer, one step each (default: %(default)s)")
+    parser.add_argument("--step-duration", type=float, default=30, help="seconds per step (default: %(default)s)")
+    parser.add_argument("--users", type=int, default=100,
+                        help="virtual users, i.e. most scenarios in flight at once (default: %(default)s)")
+    parser.add_argument("--mix", type=parse_mix, default={},
+                        help="scenario weights, e.g. login=3,credit_reads=5,analyze_free=0")
+    parser.add_argument("--access-token", default=os.environ.get("LOADTEST_ACCESS_TOKEN"),
+                        help="Supabase access token for the authenticated scenarios")
+    parser.add_argument("--email", default=os.environ.get("LOADTEST_EMAIL"),
+                        help="test account email for the login scenario (or LOADTEST_EMAIL)")
+    parser.add_argument("--password", default=os.environ.get("LOADTEST_PASSWORD"),
+                        help="test account password for the login scenario (or LOADTEST_PASSWORD)")
+    parser.add_argument("--timeout", type=float, default=30, help="per-request timeout in seconds")
+    parser.add_argument("--max-p95-ms", type=float, default=2000, help="p95 above this counts as saturated")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="error rate above this counts as saturated")
+    parser.add_argument("--keep-going", action="store_true", help="run every rate even after saturation")
+    parser.add_argument("--seed", type=int, help="seed for reproducible arrivals and scenario picks")
+    parser.add_argument("--json", dest="json_path", help="also write the per-step results to this file")
+    return parser.parse_args(argv)
+
+
+async def main(argv):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    credentials = (args.email, args.password) if args.email and args.password else None
+
+    mix = {}
+    for name, (scenario, default_weight, needs) in SCENARIOS.items():
+        weight = args.mix.get(name, default_weight)
+        if weight <= 0:
+            continue
+        if needs == "token" and not args.access_token:
+            print(f"⚠️  Skipping {name}: needs --access-token (or LOADTEST_ACCESS_TOKEN)")
+            continue
+        if needs == "credentials" and not credentials:
+            # Asked for explicitly: fail instead of quietly running a different mix
+            if name in args.mix:
+                print(f"❌ {name} needs --email and --password (or LOADTEST_EMAIL and LOADTEST_PASSWORD)")
+                return 1
+            print(f"⚠️  Skipping {name}: needs --email and --password (or LOADTEST_EMAIL and LOADTEST_PASSWORD)")
+            continue
+        mix[name] = (scenario, weight)
+    if not mix:
+        print("❌ No scenarios to run")
+        return 1
+
+    print(f"🚀 Load testing {args.base_url} with {', '.join(f'{n}={w:g}' for n, (_, w) in mix.items())}")
+    report = []
+    saturated_at = None
+    for rate in (float(r) for r in args.rates.split(",")):
+        step, elapsed_s = await run_step(
+            args.base_url, rate, args.step_duration, args.users, mix, args.access_token, credentials, args.timeout, rng
+        )
+        print(format_step(step, elapsed_s))
+
+        reason = saturation_reason(step, elapsed_s, args.max_p95_ms, args.max_error_rate)
+        report.append({
+            "rate": rate,
+            "elapsed_s": elapsed_s,
+            "scenarios_started": step.scenarios_started,
+            "scenarios_failed": step.scenarios_failed,
+            "saturated": reason,
+            "total": step.totals(elapsed_s),
+            "endpoints": {name: stats.summary(elapsed_s) for name, stats in step.endpoints.items()},
+        })
+        if reason:
+            print(f"🔥 Saturated at {rate:g} scenarios/s: {reason}")
+            saturated_at = saturated_at or rate
+            if not args.keep_going:
+                break
+
+    if saturated_at is None:
+        print("\n✅ No saturation up to the highest rate offered")
+    else:
+        last_ok = [step["rate"] for step in report if not step["saturated"]]
+        print(f"\n📈 Last rate sustained: {last_ok[-1]:g} scenarios/s" if last_ok else "\n📈 Saturated at the first rate")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
@@ -0,0 +1,74 @@
+"""Open-loop arrivals: scenarios start on a Poisson schedule whatever the server's
+speed, so a slow server shows up as growing latency and backlog instead of
+quietly lowering the offered load (as a closed loop of N users would)."""
+
+import asyncio
+import random
+
+import httpx
+
+from .scenarios import ScenarioContext
+from .stats import StepStats, percentile
+
+# Arrivals waiting this long for a free virtual user mean the backlog is growing
+MAX_START_LAG_MS = 1000
+
+
+async def _run_arrival(ctx, scenario, user_slots, scheduled_at, loop):
+    async with user_slots:
+        ctx.step.start_lag_ms.append((loop.time() - scheduled_at) * 1000)
+        ctx.step.scenarios_started += 1
+        try:
+            ok = await scenario(ctx)
+        except Exception:  # e.g. a 200 whose body is not the JSON the flow expects
+            ok = False
+        if not ok:
+            ctx.step.scenarios_failed += 1
+
+
+async def run_step(base_url, rate, duration_s, users, mix, access_token=None, credentials=None, timeout=30.0, rng=None):
+    """Offer ``rate`` scenario starts per second for ``duration_s``, with at most
+    ``users`` scenarios in flight; returns the step's stats and elapsed seconds
+    (including the time to drain scenarios still running at the end)."""
+    rng = rng or random.Random()
+    names = list(mix)
+    weights = [mix[name][1] for name in names]
+    step = StepStats(rate)
+
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        ctx = ScenarioContext(client, step, access_token, credentials)
+        user_slots = asyncio.Semaphore(users)
+        loop = asyncio.get_running_loop()
+        tasks = set()
+
+        started_at = loop.time()
+        scheduled_at = started_at
+        while True:
+            scheduled_at += rng.expovariate(rate)
+            if scheduled_at - started_at >= duration_s:
+                break
+            await asyncio.sleep(max(0.0, scheduled_at - loop.time()))
+            scenario = mix[rng.choices(names, weights)[0]][0]
+            task = asyncio.create_task(_run_arrival(ctx, scenario, user_slots, scheduled_at, loop))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return step, loop.time() - started_at
+
+
+def saturation_reason(step, elapsed_s, max_p95_ms, max_error_rate):
+    """Why this step counts as saturated, or None if the server kept up."""
+    totals = step.totals(elapsed_s)
+    if totals["requests"] == 0:
+        return "no requests completed"
+    if totals["error_rate"] > max_error_rate:
+        return f"error rate {totals['error_rate'] * 100:.1f}% > {max_error_rate * 100:.1f}%"
+    if totals["p95_ms"] > max_p95_ms:
+        return f"p95 {totals['p95_ms']:.0f} ms > {max_p95_ms:.0f} ms"
+    lag_p95 = percentile(sorted(step.start_lag_ms), 95)
+    if lag_p95 is not None and lag_p95 > MAX_START_LAG_MS:
+        return f"arrivals backing up (start lag p95 {lag_p95:.0f} ms)"
+    return None
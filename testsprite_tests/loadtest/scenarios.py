@@ -0,0 +1,118 @@
+"""The TC_BE backend flows as load-test scenarios.
+
+Each scenario is one user journey against the API. ``login`` needs the test
+account's email and password; scenarios needing a token call routes behind
+Supabase auth and only run when an access token is supplied (``/auth/login``
+returns a test token the API does not accept).
+"""
+
+import time
+import uuid
+
+import httpx
+
+SAMPLE_DOCUMENT = (
+    "CONTRATO DE PRESTAÇÃO DE SERVIÇOS. Cláusula 1ª - O CONTRATADO prestará ao CONTRATANTE "
+    "serviços de consultoria jurídica. Cláusula 2ª - O pagamento será realizado mensalmente, "
+    "até o quinto dia útil. Cláusula 3ª - O contrato vigora por 12 meses, podendo ser rescindido "
+    "por qualquer das partes mediante aviso prévio de 30 dias."
+)
+
+
+class ScenarioContext:
+    def __init__(self, client, step, access_token=None, credentials=None):
+        self.client = client
+        self.step = step
+        self.access_token = access_token
+        self.credentials = credentials  # (email, password) for the login scenario
+
+    def auth_headers(self):
+        return {"Authorization": f"Bearer {self.access_token}"}
+
+    async def request(self, endpoint, method, url, **kwargs):
+        """Send one request, recording its latency under ``endpoint``; None if it never got a response."""
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.step.record(endpoint, (time.perf_counter() - started) * 1000, error=True)
+            return None
+        self.step.record(endpoint, (time.perf_counter() - started) * 1000, status=response.status_code)
+        return response
+
+
+async def login(ctx):
+    """TC_BE001: log in, then validate the returned token."""
+    email, password = ctx.credentials
+    response = await ctx.request(
+        "POST /auth/login", "POST", "/auth/login", json={"email": email, "password": password}
+    )
+    if response is None or response.status_code != 200:
+        return False
+    token = response.json().get("access_token")
+    response = await ctx.request(
+        "GET /auth/validate-token", "GET", "/auth/validate-token", headers={"Authorization": f"Bearer {token}"}
+    )
+    return response is not None and response.status_code == 200
+
+
+async def credit_reads(ctx):
+    """TC_BE003: the credit balance, plus the user's own transactions and profile when authenticated."""
+    response = await ctx.request("GET /api/credits", "GET", "/api/credits")
+    if response is None or response.status_code != 200:
+        return False
+    if ctx.access_token:
+        for url in ("/api/credit-transactions", "/api/user/profile"):
+            response = await ctx.request(f"GET {url}", "GET", url, headers=ctx.auth_headers())
+            if response is None or response.status_code != 200:
+                return False
+    return True
+
+
+async def analyze_free(ctx):
+    """TC_BE002: analyse a short contract with the free provider."""
+    response = await ctx.request(
+        "POST /api/analyze",
+        "POST",
+        "/api/analyze",
+        headers={**ctx.auth_headers(), "Idempotency-Key": str(uuid.uuid4())},
+        json={
+            "title": "Load test contract",
+            "content": SAMPLE_DOCUMENT,
+            "analysisType": "general",
+            "aiProvider": "free",
+            "aiModel": "basic",
+        },
+    )
+    return response is not None and response.status_code == 200
+
+
+async def batch_create(ctx):
+    """TC_BE004: submit a two-document batch. Consumes credits of the token's user."""
+    files = [
+        ("files", (f"contrato-{i}.txt", SAMPLE_DOCUMENT.encode("utf-8"), "text/plain"))
+        for i in range(2)
+    ]
+    response = await ctx.request(
+        "POST /api/batch/create",
+        "POST",
+        "/api/batch/create",
+        headers={**ctx.auth_headers(), "Idempotency-Key": str(uuid.uuid4())},
+        data={
+            "name": "Load test batch",
+            "analysisType": "general",
+            "aiProvider": "free",
+            "aiModel": "basic",
+        },
+        files=files,
+    )
+    return response is not None and response.status_code in (200, 201, 202)
+
+
+# name -> (scenario, default weight, what it needs: None, "credentials" or "token")
+SCENARIOS = {
+    "login": (login, 3, "credentials"),
+    "credit_reads": (credit_reads, 5, None),
+    "analyze_free": (analyze_free, 2, "token"),
+    "batch_create": (batch_create, 1, "token"),
+}
@@ -0,0 +1,87 @@
+import math
+from collections import defaultdict
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latencies_ms = []
+        self.status_counts = defaultdict(int)
+        self.client_errors = 0  # 4xx: the API said no (e.g. free analysis limit reached)
+        self.errors = 0  # 5xx, timeouts and connection failures
+
+    @property
+    def requests(self):
+        return len(self.latencies_ms)
+
+    def summary(self, elapsed_s):
+        latencies = sorted(self.latencies_ms)
+        return {
+            "requests": self.requests,
+            "throughput_rps": self.requests / elapsed_s if elapsed_s > 0 else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "error_rate": self.errors / self.requests if self.requests else 0.0,
+            "client_error_rate": self.client_errors / self.requests if self.requests else 0.0,
+            "statuses": dict(self.status_counts),
+        }
+
+
+class StepStats:
+    """Everything measured while one arrival rate was offered."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.endpoints = defaultdict(EndpointStats)
+        self.scenarios_started = 0
+        self.scenarios_failed = 0
+        # Time from an arrival's scheduled start until a virtual user picked it up
+        self.start_lag_ms = []
+
+    def record(self, endpoint, latency_ms, status=None, error=False):
+        stats = self.endpoints[endpoint]
+        stats.latencies_ms.append(latency_ms)
+        stats.status_counts[str(status) if status is not None else "exception"] += 1
+        if error or status is None or status >= 500:
+            stats.errors += 1
+        elif status >= 400:
+            stats.client_errors += 1
+
+    def totals(self, elapsed_s):
+        merged = EndpointStats()
+        for stats in self.endpoints.values():
+            merged.latencies_ms.extend(stats.latencies_ms)
+            merged.errors += stats.errors
+            merged.client_errors += stats.client_errors
+            for status, count in stats.status_counts.items():
+                merged.status_counts[status] += count
+        return merged.summary(elapsed_s)
+
+
+def _ms(value):
+    return "-" if value is None else f"{value:.0f}"
+
+
+def format_step(step, elapsed_s):
+    lines = [
+        f"\n=== {step.rate:g} scenarios/s offered, {step.scenarios_started} started, "
+        f"{step.scenarios_failed} failed, start lag p95 {_ms(percentile(sorted(step.start_lag_ms), 95))} ms ===",
+        f"{'endpoint':<34} {'reqs':>6} {'rps':>7} {'p50':>7} {'p95':>7} {'p99':>7} {'err%':>6} {'4xx%':>6}",
+    ]
+    rows = [(name, stats.summary(elapsed_s)) for name, stats in sorted(step.endpoints.items())]
+    rows.append(("TOTAL", step.totals(elapsed_s)))
+    for name, summary in rows:
+        lines.append(
+            f"{name:<34} {summary['requests']:>6} {summary['throughput_rps']:>7.1f} "
+            f"{_ms(summary['p50_ms']):>7} {_ms(summary['p95_ms']):>7} {_ms(summary['p99_ms']):>7} "
+            f"{summary['error_rate'] * 100:>6.1f} {summary['client_error_rate'] * 100:>6.1f}"
+        )
+    return "\n".join(lines)
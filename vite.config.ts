@@ -17,6 +17,8 @@ export default defineConfig({
   build: {
     outDir: path.resolve(__dirname, "dist/public"),
     emptyOutDir: true,
+    // Read by scripts/check-bundle-size.mjs
+    manifest: true,
   },
   server: {
     fs: {